@@ -0,0 +1,21 @@
+"""
+AIDE-X マイクロベンチマーク
+
+使用方法:
+    python -m benchmarks run [--scale small|medium|large] [--filter "extract_json.*"]
+        [--output benchmarks/results/current.json] [--save-baseline]
+    python -m benchmarks compare benchmarks/baselines/small.json benchmarks/results/current.json [--threshold 0.1]
+    python -m benchmarks list
+    python -m benchmarks.loadtest [--concurrency 1,2,4,8] [--sessions 3] [--output benchmarks/results/load.json]
+"""
+
+from benchmarks.corpus import SCALES
+from benchmarks.runner import benchmark, compare_reports, measure, run_benchmarks
+
+__all__ = [
+    "SCALES",
+    "benchmark",
+    "compare_reports",
+    "measure",
+    "run_benchmarks",
+]
@@ -0,0 +1,138 @@
+"""
+ベンチマークのコマンドラインインターフェース
+"""
+
+import argparse
+import importlib
+import logging
+import os
+import sys
+from typing import List, Optional
+
+from benchmarks.corpus import SCALES
+from benchmarks.runner import (
+    DEFAULT_THRESHOLD,
+    compare_reports,
+    format_seconds,
+    get_cases,
+    load_report,
+    run_benchmarks,
+    save_report,
+)
+
+# ベンチマークケースを登録する
+importlib.import_module("benchmarks.cases")
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_DIR = os.path.join(BENCH_DIR, "baselines")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+
+def _print_comparison(rows, threshold: float) -> int:
+    """比較結果を表示し、回帰の件数を返す"""
+    marks = {"regression": "🔴", "improved": "🟢", "unchanged": "⚪", "new": "🆕", "missing": "❔"}
+    print(f"{'benchmark':40} {'baseline':>12} {'current':>12} {'change':>9}")
+    for row in rows:
+        change = f"{row['change'] * 100:+.1f}%" if row["change"] is not None else "-"
+        print(f"{marks[row['status']]} {row['name']:38} {format_seconds(row['baseline']):>12} {format_seconds(row['current']):>12} {change:>9}")
+    regressions = [row for row in rows if row["status"] == "regression"]
+    if regressions:
+        print(f"\n❌ {len(regressions)} 件の回帰を検出しました（しきい値 {threshold * 100:.0f}%）")
+    else:
+        print(f"\n✅ 回帰はありません（しきい値 {threshold * 100:.0f}%）")
+    return len(regressions)
+
+
+def cmd_run(args) -> int:
+    """ベンチマークを実行する"""
+    scale = dict(SCALES[args.scale])
+    for key in ("structures", "modules", "messages"):
+        if getattr(args, key) is not None:
+            scale[key] = getattr(args, key)
+
+    print(f"🏁 ベンチマーク開始 - scale: {args.scale} {scale}")
+    report = run_benchmarks(
+        args.scale,
+        scale,
+        patterns=args.filter,
+        min_time=args.min_time,
+        rounds=args.rounds,
+        progress=lambda name, r: print(f"   {name:40} median {format_seconds(r['median']):>10}  (±{format_seconds(r['stdev'])}, {r['loops']} loops)")
+    )
+    for name, reason in report["skipped"].items():
+        print(f"   ⏭️ {name}: {reason}")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{args.scale}.json")
+    save_report(report, output)
+    print(f"💾 結果を保存しました: {output}")
+
+    if args.save_baseline:
+        baseline = os.path.join(BASELINE_DIR, f"{args.scale}.json")
+        save_report(report, baseline)
+        print(f"📌 ベースラインを更新しました: {baseline}")
+    elif args.compare:
+        baseline_path = os.path.join(BASELINE_DIR, f"{args.scale}.json")
+        if os.path.exists(baseline_path):
+            print()
+            return 1 if _print_comparison(compare_reports(load_report(baseline_path), report, args.threshold), args.threshold) else 0
+        print(f"⚠️ ベースラインがありません: {baseline_path}")
+    return 0
+
+
+def cmd_compare(args) -> int:
+    """保存済みの2つの結果を比較する"""
+    baseline = load_report(args.baseline)
+    current = load_report(args.current)
+    if baseline.get("params") != current.get("params"):
+        print(f"⚠️ スケールが異なります: {baseline.get('params')} / {current.get('params')}")
+    return 1 if _print_comparison(compare_reports(baseline, current, args.threshold), args.threshold) else 0
+
+
+def cmd_list(args) -> int:
+    """登録済みのベンチマークを表示する"""
+    for case in get_cases(args.filter):
+        print(f"{case.name:40} {case.description}")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="AIDE-X マイクロベンチマーク")
+    parser.add_argument("--verbose", action="store_true", help="計測対象のログを表示する")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="ベンチマークを実行する")
+    run_parser.add_argument("--scale", choices=sorted(SCALES), default="small", help="コーパスの規模")
+    run_parser.add_argument("--structures", type=int, help="構成数の上書き")
+    run_parser.add_argument("--modules", type=int, help="モジュール数の上書き")
+    run_parser.add_argument("--messages", type=int, help="会話長の上書き")
+    run_parser.add_argument("--filter", action="append", help="実行するベンチマーク名（fnmatch形式、複数指定可）")
+    run_parser.add_argument("--min-time", type=float, default=0.2, help="1ラウンドの最小計測時間（秒）")
+    run_parser.add_argument("--rounds", type=int, default=5, help="ラウンド数")
+    run_parser.add_argument("--output", help="結果の保存先（既定: benchmarks/results/<scale>.json）")
+    run_parser.add_argument("--save-baseline", action="store_true", help="結果をベースラインとして保存する")
+    run_parser.add_argument("--compare", action="store_true", help="実行後にベースラインと比較する")
+    run_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="回帰と判定する悪化率")
+    run_parser.set_defaults(func=cmd_run)
+
+    compare_parser = subparsers.add_parser("compare", help="2つの結果を比較する")
+    compare_parser.add_argument("baseline", help="ベースラインの結果JSON")
+    compare_parser.add_argument("current", help="比較する結果JSON")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="回帰と判定する悪化率")
+    compare_parser.set_defaults(func=cmd_compare)
+
+    list_parser = subparsers.add_parser("list", help="ベンチマークの一覧を表示する")
+    list_parser.add_argument("--filter", action="append", help="表示するベンチマーク名（fnmatch形式）")
+    list_parser.set_defaults(func=cmd_list)
+
+    args = parser.parse_args(argv)
+    # 計測対象のログは生成コストを含めて計測しつつ、出力は捨てる
+    logging.basicConfig(
+        level=logging.INFO,
+        handlers=[logging.StreamHandler() if args.verbose else logging.NullHandler()],
+        force=True
+    )
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
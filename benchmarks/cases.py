@@ -0,0 +1,193 @@
+"""
+パイプラインのCPU負荷の高い処理のベンチマークケース
+
+各ケースは計測対象のモジュールを遅延インポートするため、
+依存パッケージがない環境ではそのケースだけがスキップされます。
+"""
+
+import itertools
+import os
+import random
+
+from benchmarks.corpus import DEFAULT_SEED, make_llm_response, make_messages, make_module, make_structure, write_structure_corpus
+from benchmarks.runner import benchmark, require
+
+
+@benchmark("extract_json.fenced", "```json ブロックからのJSON抽出")
+def bench_extract_json_fenced(scale, workdir):
+    from src.utils.files import extract_json_part
+    text = make_llm_response(random.Random(DEFAULT_SEED), scale["modules"], style="fenced")
+    return lambda: extract_json_part(text)
+
+
+@benchmark("extract_json.prose", "本文中のJSONの括弧対応による抽出")
+def bench_extract_json_prose(scale, workdir):
+    from src.utils.files import extract_json_part
+    text = make_llm_response(random.Random(DEFAULT_SEED), scale["modules"], style="prose")
+    return lambda: extract_json_part(text)
+
+
+@benchmark("extract_json.repair", "未クオートキー・末尾カンマの修復を伴う抽出")
+def bench_extract_json_repair(scale, workdir):
+    from src.utils.files import extract_json_part
+    text = make_llm_response(random.Random(DEFAULT_SEED), scale["modules"], style="broken")
+    return lambda: extract_json_part(text)
+
+
+@benchmark("validate_gemini_response", "Gemini応答の構造検証")
+def bench_validate_gemini_response(scale, workdir):
+    from src.routes.unified_routes import validate_gemini_response_structure
+    text = make_llm_response(random.Random(DEFAULT_SEED), scale["modules"], style="fenced")
+    return lambda: validate_gemini_response_structure(text)
+
+
+@benchmark("diff.module_diff", "モジュール差分の抽出")
+def bench_module_diff(scale, workdir):
+    from src.structure.diff_utils import generate_module_diff
+    rng = random.Random(DEFAULT_SEED)
+    before = [make_module(rng, i) for i in range(scale["modules"])]
+    after = [dict(module) for module in before[1:]] + [make_module(rng, scale["modules"])]
+    for module in after[::3]:
+        module["description"] += "（更新）"
+    return lambda: generate_module_diff(before, after)
+
+
+@benchmark("diff.html", "構成差分HTMLの生成")
+def bench_diff_html(scale, workdir):
+    from src.structure.diff_utils import generate_diff_html
+    # generate_diff_html は deepdiff がないとエラー文字列を返すだけになる
+    require("deepdiff")
+    rng = random.Random(DEFAULT_SEED)
+    before = make_structure(rng, "before", scale["modules"], 0)["content"]
+    after = make_structure(random.Random(DEFAULT_SEED + 1), "after", scale["modules"], 0)["content"]
+    return lambda: generate_diff_html(before, after)
+
+
+@benchmark("conversation.repeated_messages", "ユーザー発言の再発話検出（最悪ケース: 該当なし）")
+def bench_repeated_messages(scale, workdir):
+    from src.analysis.conversation import detect_repeated_user_messages
+    history = make_messages(random.Random(DEFAULT_SEED), scale["messages"], repeat_ratio=0.0)
+    history.append({"role": "user", "content": "まったく新しい要望として請求書の承認フローを追加したい"})
+    return lambda: detect_repeated_user_messages(history)
+
+
+@benchmark("conversation.repeated_messages_indexed", "構成ごとの類似度インデックスを使った再発話検出（発言1件追加ごと）")
+def bench_repeated_messages_indexed(scale, workdir):
+    from src.analysis.conversation import detect_repeated_user_messages
+    from src.analysis.similarity import clear_repeat_indexes
+    clear_repeat_indexes()
+    history = make_messages(random.Random(DEFAULT_SEED), scale["messages"], repeat_ratio=0.0)
+    detect_repeated_user_messages(history, structure_id="bench-repeat")
+    counter = itertools.count()
+
+    def run():
+        history.append({"role": "user", "content": f"まったく新しい要望として請求書の承認フローを追加したい（{next(counter)}）"})
+        return detect_repeated_user_messages(history, structure_id="bench-repeat")
+    return run
+
+
+@benchmark("analysis.structure_rules", "構成分析ルールの評価（メモ化なしの1回走査）")
+def bench_structure_rules(scale, workdir):
+    from src.structure.rule_engine import StructureRuleEngine
+    engine = StructureRuleEngine()
+    structure = make_structure(random.Random(DEFAULT_SEED), "bench-rules", scale["modules"], 0)
+
+    def run():
+        engine.clear()
+        return engine.analyze(structure)
+    return run
+
+
+@benchmark("storage.load_structures", "データディレクトリからの全構成読み込み")
+def bench_load_structures(scale, workdir):
+    from src.structure import utils as structure_utils
+    data_dir = os.path.join(workdir, "data")
+    write_structure_corpus(data_dir, scale["structures"], scale["modules"], min(scale["messages"], 20))
+    os.environ["AIDEX_DATA_DIR"] = data_dir
+    return structure_utils.load_structures
+
+
+@benchmark("storage.save_structure", "長い会話履歴を持つ構成の保存")
+def bench_save_structure(scale, workdir):
+    from src.structure import utils as structure_utils
+    os.environ["AIDEX_DATA_DIR"] = os.path.join(workdir, "data")
+    structure = make_structure(random.Random(DEFAULT_SEED), "bench-save", scale["modules"], scale["messages"] * 4)
+    return lambda: structure_utils.save_structure("bench-save", structure)
+
+
+def _save_structure_with_codec(scale, workdir, codec):
+    """保存形式を指定して長い会話履歴を持つ構成を保存するケース"""
+    from src.structure import utils as structure_utils
+    os.environ["AIDEX_DATA_DIR"] = os.path.join(workdir, "data")
+    os.environ["AIDEX_STORAGE_CODEC"] = codec
+    structure = make_structure(random.Random(DEFAULT_SEED), "bench-save", scale["modules"], scale["messages"] * 4)
+    return lambda: structure_utils.save_structure("bench-save", structure)
+
+
+def _load_structure_with_codec(scale, workdir, codec):
+    """保存形式を指定して保存した構成を読み込むケース"""
+    from src.common.storage_codec import write_json
+    from src.structure import utils as structure_utils
+    data_dir = os.path.join(workdir, "data")
+    os.environ["AIDEX_DATA_DIR"] = data_dir
+    structure = make_structure(random.Random(DEFAULT_SEED), "bench-load", scale["modules"], scale["messages"] * 4)
+    write_json(os.path.join(data_dir, "bench-load.json"), structure, codec=codec)
+    return lambda: structure_utils.load_structure_by_id("bench-load")
+
+
+@benchmark("storage.save_structure.gzip", "長い会話履歴を持つ構成の保存（gzip圧縮）")
+def bench_save_structure_gzip(scale, workdir):
+    return _save_structure_with_codec(scale, workdir, "gzip")
+
+
+@benchmark("storage.save_structure.zstd", "長い会話履歴を持つ構成の保存（zstd圧縮）")
+def bench_save_structure_zstd(scale, workdir):
+    require("zstandard")
+    return _save_structure_with_codec(scale, workdir, "zstd")
+
+
+@benchmark("storage.load_structure.json", "長い会話履歴を持つ構成の読み込み（非圧縮JSON）")
+def bench_load_structure_json(scale, workdir):
+    return _load_structure_with_codec(scale, workdir, "json")
+
+
+@benchmark("storage.load_structure.gzip", "長い会話履歴を持つ構成の読み込み（gzip圧縮）")
+def bench_load_structure_gzip(scale, workdir):
+    return _load_structure_with_codec(scale, workdir, "gzip")
+
+
+@benchmark("storage.load_structure.zstd", "長い会話履歴を持つ構成の読み込み（zstd圧縮）")
+def bench_load_structure_zstd(scale, workdir):
+    require("zstandard")
+    return _load_structure_with_codec(scale, workdir, "zstd")
+
+
+def _json_request_work(scale, backend):
+    """
+    1リクエスト分のJSON変換（プロンプトへの埋め込み・レスポンス・保存・読み込み）を行うケース
+
+    AIDEX_JSON_BACKEND で json_codec の実装を切り替え、json と orjson の差を1リクエストあたりの
+    CPU時間として比べる。
+    """
+    from src.common import json_codec
+    os.environ["AIDEX_JSON_BACKEND"] = backend
+    structure = make_structure(random.Random(DEFAULT_SEED), "bench-json", scale["modules"], scale["messages"] * 4)
+    stored = json_codec.dumps_bytes(structure, indent=2, default=str)
+
+    def run():
+        json_codec.dumps(structure, indent=2, default=str)
+        json_codec.dumps(structure, indent=2, sort_keys=True, default=str)
+        json_codec.dumps_bytes(structure, indent=2, default=str)
+        return json_codec.loads(stored)
+    return run
+
+
+@benchmark("json.request.stdlib", "1リクエスト分のJSON変換（標準ライブラリ）")
+def bench_json_request_stdlib(scale, workdir):
+    return _json_request_work(scale, "json")
+
+
+@benchmark("json.request.orjson", "1リクエスト分のJSON変換（orjson）")
+def bench_json_request_orjson(scale, workdir):
+    require("orjson")
+    return _json_request_work(scale, "orjson")
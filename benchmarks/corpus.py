@@ -0,0 +1,187 @@
+"""
+ベンチマーク用の合成コーパス生成
+
+構成数・モジュール数・会話長をスケールさせた決定的なデータを生成します。
+同じシードからは常に同じデータが生成されるため、実行間の比較に使えます。
+"""
+
+import json
+import os
+import random
+from typing import Any, Dict, List
+
+# スケールごとの既定サイズ
+SCALES: Dict[str, Dict[str, int]] = {
+    "small": {"structures": 20, "modules": 5, "messages": 20},
+    "medium": {"structures": 200, "modules": 20, "messages": 100},
+    "large": {"structures": 1000, "modules": 50, "messages": 500},
+}
+
+DEFAULT_SEED = 20240601
+
+_SCREENS = ["ログイン", "ダッシュボード", "一覧", "詳細", "編集", "設定", "通知", "レポート", "検索", "ヘルプ"]
+_FEATURES = ["勤怠管理", "在庫管理", "予約受付", "顧客管理", "請求書発行", "シフト作成", "日報", "備品貸出"]
+_PHRASES = [
+    "{feature}のアプリを作りたいです",
+    "{screen}画面に{feature}の情報を表示したい",
+    "{screen}画面で{feature}を編集できるようにしてください",
+    "{feature}の通知をメールでも送りたい",
+    "管理者だけが{screen}画面を見られるようにしたい",
+    "{feature}のデータをCSVで出力したいです",
+]
+
+
+def make_module(rng: random.Random, index: int, sections: int = 4) -> Dict[str, Any]:
+    """
+    モジュールを1件生成する
+
+    Args:
+        rng: 乱数生成器
+        index: モジュール番号
+        sections: セクション数
+
+    Returns:
+        Dict[str, Any]: モジュール
+    """
+    screen = _SCREENS[index % len(_SCREENS)]
+    return {
+        "id": f"module_{index}",
+        "name": f"{screen}{index}",
+        "title": f"{screen}画面 {index}",
+        "description": f"{rng.choice(_FEATURES)}の{screen}を提供するモジュール",
+        "type": rng.choice(["ui", "api", "data"]),
+        "fields": [
+            {"name": f"field_{i}", "label": f"項目{i}", "required": rng.random() < 0.5}
+            for i in range(sections)
+        ],
+        "actions": [f"action_{i}" for i in range(rng.randint(1, 3))],
+    }
+
+
+def make_messages(rng: random.Random, count: int, repeat_ratio: float = 0.1) -> List[Dict[str, Any]]:
+    """
+    ユーザーとアシスタントが交互に話す会話を生成する
+
+    Args:
+        rng: 乱数生成器
+        count: メッセージ数
+        repeat_ratio: 過去のユーザー発言をほぼそのまま繰り返す割合
+
+    Returns:
+        List[Dict[str, Any]]: メッセージのリスト
+    """
+    messages: List[Dict[str, Any]] = []
+    user_messages: List[str] = []
+    for i in range(count):
+        if i % 2 == 0:
+            if user_messages and rng.random() < repeat_ratio:
+                content = rng.choice(user_messages) + rng.choice(["", "。", "！"])
+            else:
+                content = rng.choice(_PHRASES).format(feature=rng.choice(_FEATURES), screen=rng.choice(_SCREENS))
+                content += f"（要望{i}）"
+            user_messages.append(content)
+            messages.append({"role": "user", "content": content, "type": "user", "source": "chat"})
+        else:
+            messages.append({
+                "role": "assistant",
+                "content": f"承知しました。{rng.choice(_SCREENS)}画面の構成を更新します。" * rng.randint(1, 4),
+                "type": "assistant",
+                "source": "chatgpt",
+            })
+    return messages
+
+
+def make_structure(rng: random.Random, structure_id: str, modules: int, messages: int) -> Dict[str, Any]:
+    """
+    構成を1件生成する
+
+    Args:
+        rng: 乱数生成器
+        structure_id: 構成ID
+        modules: モジュール数
+        messages: メッセージ数
+
+    Returns:
+        Dict[str, Any]: 構成
+    """
+    feature = rng.choice(_FEATURES)
+    module_list = [make_module(rng, i) for i in range(modules)]
+    return {
+        "id": structure_id,
+        "title": f"{feature}アプリ",
+        "description": f"{feature}を行うための業務アプリケーション",
+        "content": {
+            "title": f"{feature}アプリ",
+            "description": f"{feature}を行うための業務アプリケーション",
+            "modules": module_list,
+        },
+        "modules": module_list,
+        "messages": make_messages(rng, messages),
+        "evaluation": {"intent_match": round(rng.random(), 3), "quality_score": round(rng.random(), 3)},
+    }
+
+
+def make_llm_response(rng: random.Random, modules: int, style: str = "fenced") -> str:
+    """
+    JSONを含むLLM応答テキストを生成する
+
+    Args:
+        rng: 乱数生成器
+        modules: モジュール数
+        style: "fenced"（```json ブロック）/ "prose"（本文中のJSON）/ "broken"（修復が必要なJSON）
+
+    Returns:
+        str: 応答テキスト
+    """
+    payload = {
+        "title": f"{rng.choice(_FEATURES)}アプリ",
+        "description": "生成された構成",
+        "modules": [make_module(rng, i) for i in range(modules)],
+    }
+    body = json.dumps(payload, ensure_ascii=False, indent=2)
+    if style == "fenced":
+        return f"以下が構成案です。\n\n```json\n{body}\n```\n\nご確認ください。"
+    if style == "prose":
+        return f"構成案は次の通りです: {body} 以上です。"
+    if style == "broken":
+        # 末尾カンマと未クオートキーを混入させる
+        broken = body.replace('"description": "生成された構成"', 'description: "生成された構成"', 1)
+        broken = broken.replace("\n  ]\n}", ",\n  ]\n}")
+        return f"構成案です。\n{broken}\nよろしくお願いします。"
+    raise ValueError(f"不明なスタイル: {style}")
+
+
+def write_structure_corpus(directory: str, count: int, modules: int, messages: int, seed: int = DEFAULT_SEED) -> List[str]:
+    """
+    構成ファイルのコーパスをディレクトリに書き出す
+
+    Args:
+        directory: 出力ディレクトリ
+        count: 構成数
+        modules: 1構成あたりのモジュール数
+        messages: 1構成あたりのメッセージ数
+        seed: 乱数シード
+
+    Returns:
+        List[str]: 書き出した構成ID
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    ids = []
+    for i in range(count):
+        structure_id = f"bench-{i:05d}"
+        with open(os.path.join(directory, f"{structure_id}.json"), "w", encoding="utf-8") as f:
+            json.dump(make_structure(rng, structure_id, modules, messages), f, ensure_ascii=False, indent=2)
+        ids.append(structure_id)
+    return ids
+
+
+__all__ = [
+    "DEFAULT_SEED",
+    "SCALES",
+    "make_llm_response",
+    "make_messages",
+    "make_module",
+    "make_structure",
+    "write_structure_corpus",
+]
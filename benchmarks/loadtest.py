@@ -0,0 +1,414 @@
+"""
+unified_bp エンドポイントのHTTP負荷試験
+
+フェイクプロバイダーに接続したローカルのアプリケーションを起動し（または --url で
+起動済みのサーバーを指定し）、実際の利用に近いセッション
+（構成作成 → 数ターンのチャット → 評価 → 構成データ・履歴・差分の表示）を
+同時実行数を段階的に上げながら実行します。スループット・レイテンシの分位点・
+エラー率とエンドポイント別の内訳をJSONレポートとして書き出します。
+
+使用方法:
+    python -m benchmarks.loadtest [--concurrency 1,2,4,8] [--sessions 4] [--chat-turns 3]
+        [--latency-ms 200 --latency-jitter-ms 50] [--error-rate 0.0]
+        [--output benchmarks/results/load.json] [--compare benchmarks/baselines/load.json]
+        [--url http://127.0.0.1:5000]
+"""
+
+import argparse
+import http.client
+import json
+import logging
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from benchmarks.runner import save_report, load_report, working_directory
+
+logger = logging.getLogger(__name__)
+
+# 飽和と判定するp95の悪化倍率（同時実行数1の p95 に対する倍率）
+SATURATION_FACTOR = 3.0
+
+CHAT_MESSAGES = [
+    "社内の勤怠管理アプリを作りたいです。打刻と残業申請ができるようにしてください。",
+    "管理者が部署ごとの残業時間を一覧で確認できる画面を追加してください。",
+    "申請が承認されたらメールで通知したいです。",
+    "月末にCSVで勤怠データを出力できるようにしてください。",
+]
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """
+    線形補間による分位点を返す
+
+    Args:
+        values: 値のリスト
+        q: 分位（0-100）
+
+    Returns:
+        Optional[float]: 分位点（値がない場合None）
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower, upper = math.floor(position), math.ceil(position)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(samples: List[Tuple[str, int, float]], elapsed: float) -> Dict[str, Any]:
+    """
+    リクエストのサンプルを集計する
+
+    Args:
+        samples: (エンドポイント, ステータス, レイテンシ秒) のリスト。ステータス0は接続エラー
+        elapsed: 計測時間（秒）
+
+    Returns:
+        Dict[str, Any]: 件数・エラー率・スループット・レイテンシ分位点（ミリ秒）
+    """
+    latencies = [latency * 1000 for _, _, latency in samples]
+    errors = sum(1 for _, status, _ in samples if status == 0 or status >= 500)
+    statuses: Dict[str, int] = defaultdict(int)
+    for _, status, _ in samples:
+        statuses[str(status)] += 1
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed > 0 else 0.0,
+        "statuses": dict(statuses),
+        "latency_ms": {
+            "p50": _round(percentile(latencies, 50)),
+            "p90": _round(percentile(latencies, 90)),
+            "p95": _round(percentile(latencies, 95)),
+            "p99": _round(percentile(latencies, 99)),
+            "max": _round(max(latencies) if latencies else None),
+        },
+    }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 2) if value is not None else None
+
+
+class SessionClient:
+    """1ユーザー分のセッションを実行するHTTPクライアント（キープアライブ接続を再利用）"""
+
+    def __init__(self, base_url: str, timeout: float = 60.0):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self.samples: List[Tuple[str, int, float]] = []
+        self._connection: Optional[http.client.HTTPConnection] = None
+        self._etags: Dict[str, str] = {}
+
+    def _connect(self) -> http.client.HTTPConnection:
+        if self._connection is None:
+            self._connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return self._connection
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def request(self, label: str, method: str, path: str, body: Optional[Dict[str, Any]] = None, revalidate: bool = False) -> Tuple[int, Dict[str, str], bytes]:
+        """
+        リクエストを送信し、サンプルを記録する
+
+        Args:
+            label: 集計用のエンドポイント名
+            method: HTTPメソッド
+            path: パス（/unified/... ）
+            body: JSONボディ
+            revalidate: 前回のETagで条件付きGETを行うか
+
+        Returns:
+            Tuple[int, Dict[str, str], bytes]: ステータス・ヘッダー・本文（接続エラー時はステータス0）
+        """
+        headers = {"Accept": "application/json"}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        if revalidate and path in self._etags:
+            headers["If-None-Match"] = self._etags[path]
+
+        start = time.perf_counter()
+        try:
+            connection = self._connect()
+            connection.request(method, self.prefix + path, body=payload, headers=headers)
+            response = connection.getresponse()
+            data = response.read()
+            status, response_headers = response.status, {k.lower(): v for k, v in response.getheaders()}
+        except (OSError, http.client.HTTPException) as e:
+            logger.debug(f"接続エラー: {method} {path} - {e}")
+            self.close()
+            status, response_headers, data = 0, {}, b""
+        self.samples.append((label, status, time.perf_counter() - start))
+
+        if "etag" in response_headers:
+            self._etags[path] = response_headers["etag"]
+        return status, response_headers, data
+
+    def run_session(self, chat_turns: int) -> None:
+        """
+        構成作成から差分表示までのセッションを1回実行する
+
+        Args:
+            chat_turns: チャットのターン数
+        """
+        status, headers, _ = self.request("new", "GET", "/unified/new")
+        location = headers.get("location", "")
+        if status not in (301, 302, 303) or not location:
+            return
+        structure_id = urlsplit(location).path.rstrip("/").rsplit("/", 1)[-1]
+        base = f"/unified/{structure_id}"
+
+        for turn in range(chat_turns):
+            message = CHAT_MESSAGES[turn % len(CHAT_MESSAGES)]
+            self.request("chat", "POST", f"{base}/chat", body={"message": message})
+            self.request("data", "GET", f"{base}/data", revalidate=True)
+
+        self.request("evaluate", "POST", f"{base}/evaluate", body={})
+        self.request("data", "GET", f"{base}/data", revalidate=True)
+        self.request("structure-history", "GET", f"{base}/structure-history", revalidate=True)
+        self.request("module-diff", "GET", f"{base}/module-diff", revalidate=True)
+        # 変更のない再表示（条件付きGETで304になることを期待）
+        self.request("data", "GET", f"{base}/data", revalidate=True)
+
+
+def run_level(base_url: str, concurrency: int, sessions: int, chat_turns: int) -> Dict[str, Any]:
+    """
+    指定した同時実行数でセッションを実行して集計する
+
+    Args:
+        base_url: サーバーのURL
+        concurrency: 同時実行するユーザー数
+        sessions: 1ユーザーあたりのセッション数
+        chat_turns: 1セッションあたりのチャットのターン数
+
+    Returns:
+        Dict[str, Any]: 全体とエンドポイント別の集計
+    """
+    clients = [SessionClient(base_url) for _ in range(concurrency)]
+
+    def worker(client: SessionClient) -> None:
+        try:
+            for _ in range(sessions):
+                client.run_session(chat_turns)
+        finally:
+            client.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(worker, clients))
+    elapsed = time.perf_counter() - start
+
+    samples = [sample for client in clients for sample in client.samples]
+    by_endpoint: Dict[str, List[Tuple[str, int, float]]] = defaultdict(list)
+    for sample in samples:
+        by_endpoint[sample[0]].append(sample)
+
+    level = {"concurrency": concurrency, "elapsed_s": round(elapsed, 3), **summarize(samples, elapsed)}
+    level["endpoints"] = {label: summarize(items, elapsed) for label, items in sorted(by_endpoint.items())}
+    return level
+
+
+def find_saturation(levels: List[Dict[str, Any]], factor: float = SATURATION_FACTOR) -> Optional[int]:
+    """
+    レイテンシが崩れる前の最大同時実行数を返す
+
+    p95 が最初の段階の factor 倍を超えるか、エラー率が5%を超えた段階の1つ前を返す。
+
+    Args:
+        levels: 同時実行数の昇順の集計
+        factor: 飽和と判定するp95の倍率
+
+    Returns:
+        Optional[int]: 維持できた最大同時実行数（最初の段階から崩れている場合None）
+    """
+    if not levels:
+        return None
+    base_p95 = levels[0]["latency_ms"]["p95"] or 0.0
+    sustained = None
+    for level in levels:
+        p95 = level["latency_ms"]["p95"] or 0.0
+        if level["error_rate"] > 0.05 or (base_p95 > 0 and p95 > base_p95 * factor):
+            break
+        sustained = level["concurrency"]
+    return sustained
+
+
+def compare_load_reports(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    2つの負荷試験レポートを同時実行数ごとに比較する
+
+    Args:
+        baseline: 基準のレポート
+        current: 比較するレポート
+
+    Returns:
+        List[Dict[str, Any]]: concurrency / throughput / p95 / error_rate の変化
+    """
+    base_levels = {level["concurrency"]: level for level in baseline.get("levels", [])}
+    rows = []
+    for level in current.get("levels", []):
+        before = base_levels.get(level["concurrency"])
+        if not before:
+            continue
+
+        def change(a, b):
+            return round(b / a - 1, 4) if a else None
+
+        rows.append({
+            "concurrency": level["concurrency"],
+            "throughput_change": change(before["throughput_rps"], level["throughput_rps"]),
+            "p95_change": change(before["latency_ms"]["p95"], level["latency_ms"]["p95"]),
+            "error_rate": (before["error_rate"], level["error_rate"]),
+        })
+    return rows
+
+
+def start_local_server(fake_config: Dict[str, Any], workdir: str) -> Tuple[str, Any]:
+    """
+    フェイクプロバイダーに接続したアプリケーションをスレッドで起動する
+
+    Args:
+        fake_config: フェイクプロバイダーの設定
+        workdir: データ・ログの書き込み先
+
+    Returns:
+        Tuple[str, Any]: (ベースURL, サーバー)
+    """
+    from werkzeug.serving import make_server
+
+    config_path = os.path.join(workdir, "fake_llm.json")
+    with open(config_path, "w", encoding="utf-8") as f:
+        json.dump(fake_config, f, ensure_ascii=False)
+
+    # コントローラーはインポート時に作成されるため、アプリのインポート前に設定する
+    os.environ["LLM_PROVIDER_MODE"] = "fake"
+    os.environ["FAKE_LLM_CONFIG"] = config_path
+    os.environ["LLM_CASSETTE_DIR"] = os.path.join(workdir, "cassettes")
+    os.environ["AIDEX_DATA_DIR"] = os.path.join(workdir, "data")
+
+    from src.app import create_app
+    app = create_app()
+    app.config["WTF_CSRF_ENABLED"] = False
+    app.config["DEBUG"] = False
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+
+def run_load_test(
+    base_url: str,
+    concurrency_levels: List[int],
+    sessions: int,
+    chat_turns: int,
+    progress: bool = True
+) -> Dict[str, Any]:
+    """
+    同時実行数を段階的に上げて負荷試験を実行する
+
+    Args:
+        base_url: サーバーのURL
+        concurrency_levels: 同時実行数のリスト
+        sessions: 1ユーザーあたりのセッション数
+        chat_turns: 1セッションあたりのチャットのターン数
+        progress: 段階ごとに結果を表示するか
+
+    Returns:
+        Dict[str, Any]: レポート
+    """
+    report: Dict[str, Any] = {
+        "created_at": datetime.now().isoformat(),
+        "base_url": base_url,
+        "sessions_per_user": sessions,
+        "chat_turns": chat_turns,
+        "levels": [],
+    }
+    for concurrency in sorted(concurrency_levels):
+        level = run_level(base_url, concurrency, sessions, chat_turns)
+        report["levels"].append(level)
+        if progress:
+            latency = level["latency_ms"]
+            print(
+                f"   c={concurrency:<3} {level['throughput_rps']:>8.1f} req/s  "
+                f"p50 {latency['p50']}ms  p95 {latency['p95']}ms  p99 {latency['p99']}ms  "
+                f"errors {level['error_rate'] * 100:.1f}%"
+            )
+    report["max_sustainable_concurrency"] = find_saturation(report["levels"])
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.loadtest", description="unified_bp の負荷試験")
+    parser.add_argument("--url", help="起動済みサーバーのURL（省略時はフェイクプロバイダーでローカル起動）")
+    parser.add_argument("--concurrency", default="1,2,4,8", help="同時実行数（カンマ区切り）")
+    parser.add_argument("--sessions", type=int, default=3, help="1ユーザーあたりのセッション数")
+    parser.add_argument("--chat-turns", type=int, default=3, help="1セッションあたりのチャットのターン数")
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="フェイクプロバイダーの平均レイテンシ")
+    parser.add_argument("--latency-jitter-ms", type=float, default=50.0, help="フェイクプロバイダーのレイテンシのばらつき")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="フェイクプロバイダーのエラー率")
+    parser.add_argument("--seed", type=int, default=1, help="フェイクプロバイダーの乱数シード")
+    parser.add_argument("--output", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", "load.json"), help="レポートの保存先")
+    parser.add_argument("--compare", help="比較する基準レポート")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, handlers=[logging.NullHandler()], force=True)
+    levels = [int(value) for value in args.concurrency.split(",") if value.strip()]
+
+    with tempfile.TemporaryDirectory(prefix="aidex-load-") as workdir:
+        server = None
+        base_url = args.url
+        if not base_url:
+            fake_config = {
+                "default": {
+                    "mode": "synthesize",
+                    "latency_distribution": "lognormal",
+                    "latency_ms": args.latency_ms,
+                    "latency_jitter_ms": args.latency_jitter_ms,
+                    "error_rate": args.error_rate,
+                    "seed": args.seed,
+                }
+            }
+            with working_directory(workdir):
+                base_url, server = start_local_server(fake_config, workdir)
+            print(f"🧪 フェイクプロバイダーでローカル起動しました: {base_url}")
+
+        print(f"🏁 負荷試験開始 - 同時実行数: {levels}, セッション数/ユーザー: {args.sessions}, チャット: {args.chat_turns}ターン")
+        try:
+            with working_directory(workdir):
+                report = run_load_test(base_url, levels, args.sessions, args.chat_turns)
+        finally:
+            if server is not None:
+                server.shutdown()
+
+    print(f"📈 維持できた最大同時実行数: {report['max_sustainable_concurrency']}")
+    save_report(report, args.output)
+    print(f"💾 レポートを保存しました: {args.output}")
+
+    if args.compare:
+        for row in compare_load_reports(load_report(args.compare), report):
+            throughput = f"{row['throughput_change'] * 100:+.1f}%" if row["throughput_change"] is not None else "-"
+            p95 = f"{row['p95_change'] * 100:+.1f}%" if row["p95_change"] is not None else "-"
+            print(f"   c={row['concurrency']:<3} throughput {throughput:>8}  p95 {p95:>8}  errors {row['error_rate'][0]} -> {row['error_rate'][1]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,294 @@
+"""
+ベンチマークの実行・保存・比較
+
+各ベンチマークは setup 関数として登録し、setup が返した関数の実行時間を
+自動調整したループ回数で複数ラウンド計測します。結果はJSONで保存でき、
+ベースラインと比較して一定以上の劣化を回帰として検出します。
+"""
+
+import contextlib
+import fnmatch
+import importlib
+import json
+import logging
+import os
+import platform
+import statistics
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 回帰と判定する中央値の悪化率のデフォルト（10%）
+DEFAULT_THRESHOLD = 0.10
+
+
+@dataclass
+class BenchmarkCase:
+    """ベンチマークケース"""
+    name: str
+    setup: Callable[[Dict[str, int], str], Callable[[], Any]]
+    description: str = ""
+
+
+_REGISTRY: Dict[str, BenchmarkCase] = {}
+
+
+def benchmark(name: str, description: str = "") -> Callable:
+    """
+    ベンチマークケースを登録するデコレーター
+
+    デコレートする関数は (scale, workdir) を受け取り、計測対象の引数なし関数を返す。
+    依存モジュールが使えない場合は ImportError を送出すればスキップ扱いになる。
+
+    Args:
+        name: ベンチマーク名（"group.case" 形式）
+        description: 説明
+
+    Returns:
+        Callable: デコレーター
+    """
+    def decorator(setup: Callable[[Dict[str, int], str], Callable[[], Any]]) -> Callable:
+        _REGISTRY[name] = BenchmarkCase(name=name, setup=setup, description=description)
+        return setup
+    return decorator
+
+
+def require(*modules: str) -> None:
+    """
+    ベンチマークに必要な任意依存モジュールを読み込む（ない場合は ImportError でスキップさせる）
+
+    Args:
+        *modules: モジュール名
+    """
+    for module in modules:
+        importlib.import_module(module)
+
+
+def get_cases(patterns: Optional[List[str]] = None) -> List[BenchmarkCase]:
+    """
+    登録済みのベンチマークケースを返す
+
+    Args:
+        patterns: fnmatch形式の名前パターン（省略時は全件）
+
+    Returns:
+        List[BenchmarkCase]: 名前順のケース
+    """
+    cases = sorted(_REGISTRY.values(), key=lambda case: case.name)
+    if patterns:
+        cases = [case for case in cases if any(fnmatch.fnmatch(case.name, p) for p in patterns)]
+    return cases
+
+
+@contextlib.contextmanager
+def working_directory(path: str) -> Iterator[str]:
+    """計測対象が相対パスに書き込むログなどを一時ディレクトリに閉じ込める"""
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield path
+    finally:
+        os.chdir(previous)
+
+
+@contextlib.contextmanager
+def preserved_environ() -> Iterator[None]:
+    """ケースが設定した環境変数（AIDEX_DATA_DIR など）を終了時に元に戻す"""
+    saved = dict(os.environ)
+    try:
+        yield
+    finally:
+        os.environ.clear()
+        os.environ.update(saved)
+
+
+def measure(func: Callable[[], Any], min_time: float = 0.2, rounds: int = 5) -> Dict[str, Any]:
+    """
+    関数の1回あたりの実行時間を計測する
+
+    1ラウンドが min_time 秒以上になるようループ回数を調整し、rounds ラウンド計測する。
+
+    Args:
+        func: 計測対象の関数
+        min_time: 1ラウンドの最小計測時間（秒）
+        rounds: ラウンド数
+
+    Returns:
+        Dict[str, Any]: median / min / mean / stdev（秒/回）と loops / rounds
+    """
+    func()  # ウォームアップ
+
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or loops >= 1_000_000:
+            break
+        loops = max(loops * 2, int(loops * min_time / max(elapsed, 1e-9)))
+
+    samples = [elapsed / loops]
+    for _ in range(rounds - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        samples.append((time.perf_counter() - start) / loops)
+
+    return {
+        "median": statistics.median(samples),
+        "min": min(samples),
+        "mean": statistics.fmean(samples),
+        "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "loops": loops,
+        "rounds": len(samples),
+    }
+
+
+def run_benchmarks(
+    scale_name: str,
+    scale: Dict[str, int],
+    patterns: Optional[List[str]] = None,
+    min_time: float = 0.2,
+    rounds: int = 5,
+    progress: Optional[Callable[[str, Dict[str, Any]], None]] = None
+) -> Dict[str, Any]:
+    """
+    ベンチマークを実行してレポートを返す
+
+    Args:
+        scale_name: スケール名
+        scale: スケール（structures / modules / messages）
+        patterns: 実行するベンチマーク名のパターン
+        min_time: 1ラウンドの最小計測時間（秒）
+        rounds: ラウンド数
+        progress: ケースごとに呼ばれるコールバック
+
+    Returns:
+        Dict[str, Any]: レポート
+    """
+    report: Dict[str, Any] = {
+        "scale": scale_name,
+        "params": dict(scale),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created_at": datetime.now().isoformat(),
+        "results": {},
+        "skipped": {},
+    }
+
+    for case in get_cases(patterns):
+        with tempfile.TemporaryDirectory(prefix="aidex-bench-") as workdir, working_directory(workdir), preserved_environ():
+            try:
+                func = case.setup(dict(scale), workdir)
+            except ImportError as e:
+                report["skipped"][case.name] = f"依存モジュールがありません: {e}"
+                logger.warning(f"⏭️ {case.name} をスキップしました: {e}")
+                continue
+            result = measure(func, min_time=min_time, rounds=rounds)
+        report["results"][case.name] = result
+        if progress:
+            progress(case.name, result)
+    return report
+
+
+def save_report(report: Dict[str, Any], path: str) -> None:
+    """
+    レポートをJSONで保存する
+
+    Args:
+        report: レポート
+        path: 保存先
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def load_report(path: str) -> Dict[str, Any]:
+    """
+    保存したレポートを読み込む
+
+    Args:
+        path: レポートのパス
+
+    Returns:
+        Dict[str, Any]: レポート
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare_reports(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = DEFAULT_THRESHOLD) -> List[Dict[str, Any]]:
+    """
+    ベースラインと現在の結果を中央値で比較する
+
+    Args:
+        baseline: ベースラインのレポート
+        current: 比較するレポート
+        threshold: 回帰・改善と判定する変化率
+
+    Returns:
+        List[Dict[str, Any]]: name / baseline / current / change / status の行
+            status は "regression" / "improved" / "unchanged" / "new" / "missing"
+    """
+    base_results = baseline.get("results", {})
+    current_results = current.get("results", {})
+    rows = []
+    for name in sorted(set(base_results) | set(current_results)):
+        before = base_results.get(name, {}).get("median")
+        after = current_results.get(name, {}).get("median")
+        row: Dict[str, Any] = {"name": name, "baseline": before, "current": after, "change": None}
+        if before is None:
+            row["status"] = "new"
+        elif after is None:
+            row["status"] = "missing"
+        else:
+            change = after / before - 1 if before > 0 else 0.0
+            row["change"] = change
+            if change > threshold:
+                row["status"] = "regression"
+            elif change < -threshold:
+                row["status"] = "improved"
+            else:
+                row["status"] = "unchanged"
+        rows.append(row)
+    return rows
+
+
+def format_seconds(value: Optional[float]) -> str:
+    """
+    秒を読みやすい単位の文字列にする
+
+    Args:
+        value: 秒
+
+    Returns:
+        str: 例 "12.3 µs"
+    """
+    if value is None:
+        return "-"
+    for unit, factor in (("s", 1), ("ms", 1e-3), ("µs", 1e-6)):
+        if value >= factor:
+            return f"{value / factor:.3g} {unit}"
+    return f"{value / 1e-9:.3g} ns"
+
+
+__all__ = [
+    "DEFAULT_THRESHOLD",
+    "BenchmarkCase",
+    "benchmark",
+    "compare_reports",
+    "format_seconds",
+    "get_cases",
+    "load_report",
+    "measure",
+    "require",
+    "run_benchmarks",
+    "save_report",
+    "working_directory",
+]
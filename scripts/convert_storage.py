@@ -0,0 +1,224 @@
+"""
+構成・履歴ファイルの保存形式の変換スクリプト
+
+既存の構成ファイル（*.json）と履歴（*.json / *.jsonl）を指定の保存形式で書き直し、
+変換前後のサイズと読み込み時間を表示します。読み込みは src.common.storage_codec が
+形式を判定して行うため、変換の途中で止めても古い形式のファイルはそのまま読めます。
+
+使用方法:
+    python -m scripts.convert_storage [PATH ...] [--codec gzip|zstd|json] [--dry-run]
+    python -m scripts.convert_storage --train-dict data/.storage.zdict [--dict-size 16384]
+
+PATH を省略した場合は、データディレクトリ（AIDEX_DATA_DIR）・構造履歴（structure_history）・
+logs/structure_history を対象にします。辞書を学習した場合は AIDEX_STORAGE_ZSTD_DICT に
+そのパスを指定してから zstd で変換してください。
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from src.common import json_codec
+from src.common.storage_codec import (
+    CODECS,
+    compress,
+    decompress,
+    dumps,
+    get_write_codec,
+    loads,
+    train_dictionary,
+    write_bytes,
+)
+from src.structure.history import get_structure_history_dir
+from src.structure.utils import get_data_dir
+
+# 対象にしないディレクトリ（バージョンストアのオブジェクトなど）
+SKIP_DIRS = {".versions", "__pycache__"}
+
+
+def default_paths() -> List[str]:
+    """既定の変換対象ディレクトリを返す"""
+    return [get_data_dir(), get_structure_history_dir(), os.path.join("logs", "structure_history")]
+
+
+def iter_storage_files(paths: List[str]) -> Iterator[str]:
+    """
+    変換対象のファイル（*.json / *.jsonl）を重複なく返す
+
+    Args:
+        paths: ファイルまたはディレクトリのパス
+
+    Yields:
+        str: ファイルパス
+    """
+    seen = set()
+    for path in paths:
+        if os.path.isfile(path):
+            candidates = [path]
+        else:
+            candidates = []
+            for root, dirs, files in os.walk(path):
+                dirs[:] = [name for name in dirs if name not in SKIP_DIRS and not name.startswith(".")]
+                candidates.extend(os.path.join(root, name) for name in sorted(files))
+        for candidate in candidates:
+            real = os.path.realpath(candidate)
+            if real in seen or not candidate.endswith((".json", ".jsonl")):
+                continue
+            seen.add(real)
+            yield candidate
+
+
+def encode_file(path: str, data: bytes, codec: str) -> bytes:
+    """
+    ファイルの内容を指定の形式で符号化し直す
+
+    JSON Lines は全行を1つのgzipメンバー / zstdフレームにまとめる。
+
+    Args:
+        path: ファイルパス（拡張子で JSON / JSON Lines を判定する）
+        data: 現在のファイルの内容
+        codec: 変換後の形式
+
+    Returns:
+        bytes: 変換後の内容
+    """
+    if path.endswith(".jsonl"):
+        lines = [line for line in decompress(data).decode("utf-8").splitlines() if line.strip()]
+        return compress("".join(f"{line}\n" for line in lines).encode("utf-8"), codec)
+    return dumps(loads(data), codec=codec)
+
+
+def _load_seconds(data: bytes, path: str, repeat: int = 3) -> float:
+    """ファイルの内容を読み込む時間（repeat 回の最小値）"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        if path.endswith(".jsonl"):
+            for line in decompress(data).decode("utf-8").splitlines():
+                if line.strip():
+                    json_codec.loads(line)
+        else:
+            loads(data)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def convert(paths: List[str], codec: str, dry_run: bool = False) -> Dict[str, Any]:
+    """
+    ファイルを指定の形式に変換し、変換前後のサイズと読み込み時間を集計する
+
+    Args:
+        paths: 対象のファイル・ディレクトリ
+        codec: 変換後の形式
+        dry_run: True の場合は書き込まずに集計だけ行う
+
+    Returns:
+        Dict[str, Any]: files / converted / failed / bytes_before / bytes_after / load_before / load_after
+    """
+    report: Dict[str, Any] = {
+        "codec": codec, "files": 0, "converted": 0, "failed": [],
+        "bytes_before": 0, "bytes_after": 0, "load_before": 0.0, "load_after": 0.0,
+    }
+    for path in iter_storage_files(paths):
+        with open(path, "rb") as f:
+            data = f.read()
+        try:
+            encoded = encode_file(path, data, codec)
+        except ValueError as e:
+            report["failed"].append({"path": path, "error": str(e)})
+            continue
+        report["files"] += 1
+        report["bytes_before"] += len(data)
+        report["bytes_after"] += len(encoded)
+        report["load_before"] += _load_seconds(data, path)
+        report["load_after"] += _load_seconds(encoded, path)
+        if encoded != data:
+            report["converted"] += 1
+            if not dry_run:
+                write_bytes(path, encoded)
+    return report
+
+
+def collect_samples(paths: List[str], limit: int = 2000) -> List[bytes]:
+    """
+    辞書の学習に使うサンプル（区切り文字を詰めたJSON）を集める
+
+    JSON Lines は1行を1サンプルにする（追記時は1行ごとに圧縮されるため）。
+
+    Args:
+        paths: 対象のファイル・ディレクトリ
+        limit: 最大サンプル数
+
+    Returns:
+        List[bytes]: サンプル
+    """
+    samples: List[bytes] = []
+    for path in iter_storage_files(paths):
+        with open(path, "rb") as f:
+            data = f.read()
+        try:
+            if path.endswith(".jsonl"):
+                samples.extend(
+                    line.encode("utf-8")
+                    for line in decompress(data).decode("utf-8").splitlines() if line.strip()
+                )
+            else:
+                compact = json_codec.dumps(loads(data), separators=json_codec.COMPACT_SEPARATORS, default=str)
+                samples.append(compact.encode("utf-8"))
+        except ValueError:
+            continue
+        if len(samples) >= limit:
+            break
+    return samples[:limit]
+
+
+def _format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GB"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="構成・履歴ファイルの保存形式を変換します")
+    parser.add_argument("paths", nargs="*", help="対象のファイル・ディレクトリ（省略時はデータディレクトリと履歴）")
+    parser.add_argument("--codec", choices=CODECS, default=None, help="変換後の形式（既定: AIDEX_STORAGE_CODEC）")
+    parser.add_argument("--dry-run", action="store_true", help="書き込まずにサイズと読み込み時間だけ表示する")
+    parser.add_argument("--train-dict", metavar="PATH", help="zstdの辞書を学習して保存する（変換は行わない）")
+    parser.add_argument("--dict-size", type=int, default=16 * 1024, help="学習する辞書の最大サイズ（バイト）")
+    args = parser.parse_args(argv)
+    paths = args.paths or default_paths()
+
+    if args.train_dict:
+        samples = collect_samples(paths)
+        if not samples:
+            print("⚠️ 学習に使えるファイルがありません")
+            return 1
+        try:
+            dictionary = train_dictionary(samples, size=args.dict_size)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return 1
+        write_bytes(args.train_dict, dictionary)
+        print(f"📚 辞書を保存しました: {args.train_dict}（{_format_bytes(len(dictionary))}, サンプル {len(samples)}件）")
+        print(f"   AIDEX_STORAGE_ZSTD_DICT={args.train_dict} を指定してから zstd で変換してください")
+        return 0
+
+    codec = args.codec or get_write_codec()
+    report = convert(paths, codec, dry_run=args.dry_run)
+    before, after = report["bytes_before"], report["bytes_after"]
+    ratio = after / before if before else 1.0
+    print(f"{'🔍 変換の見積もり' if args.dry_run else '✅ 変換完了'} - 形式: {codec}")
+    print(f"   ファイル数: {report['files']}（変更 {report['converted']}件）")
+    print(f"   サイズ: {_format_bytes(before)} → {_format_bytes(after)}（{ratio * 100:.1f}%）")
+    print(f"   読み込み時間の合計: {report['load_before'] * 1000:.1f}ms → {report['load_after'] * 1000:.1f}ms")
+    for failed in report["failed"]:
+        print(f"   ⚠️ 変換できませんでした: {failed['path']} - {failed['error']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,22 @@
 """
 Batch evolution script
+
+使用方法:
+    python -m scripts.evolve_batch [--threshold 0.85] [--workers 4]
+        [--provider-limit chatgpt=2 --provider-limit claude=2]
+        [--checkpoint logs/evolve_checkpoint.jsonl] [--no-resume] [--dry-run]
+        [--report logs/evolve_report.json]
 """
 
 import os
 import json
 import logging
+import argparse
+from datetime import datetime
 from typing import Dict, Any, List, Optional
 from src.structure.utils import get_candidates_for_evolution, save_structure
-from src.llm.providers.openai import generate_improvement
-from src.llm.providers.claude import get_claude_intent_reason
+from src.structure.evolution_runner import BatchEvolutionRunner, DEFAULT_ADOPT_THRESHOLD
+from src.common.llm_usage import usage_context
 
 logger = logging.getLogger(__name__)
 
@@ -24,9 +32,61 @@ logging.basicConfig(
 )
 
 # 自動採用（上書き）しきい値
-ADOPT_THRESHOLD = 0.90
+ADOPT_THRESHOLD = DEFAULT_ADOPT_THRESHOLD
+
+# チェックポイントのデフォルトパス
+DEFAULT_CHECKPOINT = os.path.join(LOG_DIR, 'evolve_checkpoint.jsonl')
 
-def run_evolution_loop(threshold=0.85):
+IMPROVEMENT_PROMPT = """以下の構成をユーザーの意図により合致するよう改善してください。
+改善後の構成は、元の構成と同じキー構造のJSONのみで返してください。
+
+{structure}
+"""
+
+
+def generate_improvement(item: Dict[str, Any]) -> Dict[str, Any]:
+    """ChatGPTで構成の改善案を生成する"""
+    from src.llm.providers.chatgpt import generate_improvement as chatgpt_generate_improvement
+    from src.utils.files import extract_json_part
+
+    prompt = IMPROVEMENT_PROMPT.format(structure=json.dumps(item, ensure_ascii=False, indent=2))
+    improved = extract_json_part(chatgpt_generate_improvement(prompt))
+    if not improved or "error" in improved:
+        raise ValueError(f"改善案のJSON抽出に失敗しました: {improved.get('error') if improved else '空の応答'}")
+    return improved
+
+
+def get_claude_intent_reason(improved: Dict[str, Any]) -> Dict[str, Any]:
+    """Claudeで改善案を評価し、intent_matchと理由を返す"""
+    from src.structure.evaluator import evaluate_structure_with
+    from src.llm.prompts import prompt_manager
+
+    result = evaluate_structure_with(improved, provider="claude", prompt_manager=prompt_manager, use_cache=False)
+    score = result.get("score", 0.0) if isinstance(result, dict) else getattr(result, "score", 0.0)
+    feedback = result.get("feedback", "") if isinstance(result, dict) else getattr(result, "feedback", "")
+    return {"intent_match": float(score or 0.0), "intent_reason": feedback}
+
+
+def _parse_provider_limits(values: Optional[List[str]]) -> Dict[str, int]:
+    """--provider-limit name=N の指定を辞書に変換する"""
+    limits: Dict[str, int] = {}
+    for value in values or []:
+        name, _, limit = value.partition("=")
+        if not name or not limit.isdigit():
+            raise argparse.ArgumentTypeError(f"不正なプロバイダー制限: {value}（例: chatgpt=2）")
+        limits[name] = int(limit)
+    return limits
+
+
+def run_evolution_loop(
+    threshold: float = 0.85,
+    max_workers: int = 4,
+    provider_limits: Optional[Dict[str, int]] = None,
+    checkpoint_path: Optional[str] = DEFAULT_CHECKPOINT,
+    resume: bool = True,
+    dry_run: bool = False,
+    report_path: Optional[str] = None
+) -> Dict[str, Any]:
     print("🔁 自動進化ループ開始")
     logging.info("自動進化ループ開始")
 
@@ -34,41 +94,66 @@ def run_evolution_loop(threshold=0.85):
     print(f"[CHECK] 対象テンプレート数: {len(candidates)} 件")
     logging.info(f"対象テンプレート数: {len(candidates)} 件")
 
-    for item in candidates:
-        id = item["id"]
-        print(f"▶ 改善対象: {id}")
-        logging.info(f"改善対象: {id}")
-
-        try:
-            improved = generate_improvement(item)
-            new_id = id + "_evolved"
-
-            improved["source"] = "evolved"
-            save_structure(new_id, improved)
-
-            evaluation = get_claude_intent_reason(improved)
-            improved.update(evaluation)
-
-            save_structure(new_id, improved)
-
-            print(f"[OK] {new_id} 保存・評価完了\n")
-            logging.info(f"{new_id} 保存・評価完了")
-
-            # intent_match が一定以上なら元構成に自動採用（上書き）
-            intent_match_score = improved.get("intent_match", 0)
-            if intent_match_score >= ADOPT_THRESHOLD:
-                save_structure(id, improved)
-                msg = f"{id} を自動採用（元構成を上書き）しました。"
-                print(f"🔄 {msg}")
-                logging.info(msg)
-
-        except Exception as e:
-            err_msg = f"処理失敗: {id} → {str(e)}"
-            print(f"[ERROR] {err_msg}")
-            logging.error(err_msg)
+    runner = BatchEvolutionRunner(
+        improve=generate_improvement,
+        evaluate=get_claude_intent_reason,
+        save=save_structure,
+        max_workers=max_workers,
+        provider_limits=provider_limits,
+        checkpoint_path=checkpoint_path,
+        adopt_threshold=ADOPT_THRESHOLD
+    )
+
+    if dry_run:
+        report = runner.dry_run(candidates, resume=resume)
+        print(f"🧮 ドライラン: 処理予定 {report['to_process']} 件（スキップ {report['skipped']} 件）")
+        for provider, count in report["calls"].items():
+            tokens = report["tokens"].get(provider, {})
+            print(f"   - {provider}: {count} 回, 入力 約{tokens.get('prompt', 0)} / 出力 約{tokens.get('completion', 0)} トークン")
+    else:
+        # 一括進化の実行全体を1セッションとして利用量を記録する（クォータもこの単位で効く）
+        with usage_context(session_id=f"evolve_batch:{datetime.now().strftime('%Y%m%d_%H%M%S')}"):
+            report = runner.run(candidates, resume=resume)
+        latency = report.get("latency", {})
+        print(f"📊 結果: {report['counts']}")
+        if latency:
+            print(f"⏱️ レイテンシ: 平均 {latency['mean']}s, p95 {latency['p95']}s, 最大 {latency['max']}s")
+        for item in report["candidates"]:
+            suffix = f" - {item['error']}" if item.get("error") else ""
+            print(f"   [{item['status']}] {item['id']} ({item['latency']}s){suffix}")
+
+    if report_path is None:
+        report_path = os.path.join(LOG_DIR, f"evolve_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"💾 レポートを保存しました: {report_path}")
 
     print("🎉 自動進化ループ完了")
     logging.info("自動進化ループ完了")
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="構成の一括進化を実行します")
+    parser.add_argument("--threshold", type=float, default=0.85, help="intent_matchがこの値未満の構成を対象にする")
+    parser.add_argument("--workers", type=int, default=4, help="並列ワーカー数")
+    parser.add_argument("--provider-limit", action="append", help="プロバイダーごとの同時実行数（例: chatgpt=2）")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="チェックポイントファイルのパス")
+    parser.add_argument("--no-resume", action="store_true", help="チェックポイントを無視して全候補を処理する")
+    parser.add_argument("--dry-run", action="store_true", help="呼び出し数とトークン数の見積もりのみ行う")
+    parser.add_argument("--report", default=None, help="サマリーレポートの出力先")
+    args = parser.parse_args()
+
+    run_evolution_loop(
+        threshold=args.threshold,
+        max_workers=args.workers,
+        provider_limits=_parse_provider_limits(args.provider_limit),
+        checkpoint_path=args.checkpoint,
+        resume=not args.no_resume,
+        dry_run=args.dry_run,
+        report_path=args.report
+    )
+
 
 if __name__ == "__main__":
-    run_evolution_loop()
+    main()
@@ -8,10 +8,13 @@ from .conversation import (
     detect_missing_info,
     GUIDED_MESSAGES
 )
+from .similarity import RepeatIndex, get_repeat_index
 
 __all__ = [
     'analyze_conversation',
     'detect_repeated_user_messages',
     'detect_missing_info',
-    'GUIDED_MESSAGES'
+    'GUIDED_MESSAGES',
+    'RepeatIndex',
+    'get_repeat_index'
 ] 
\ No newline at end of file
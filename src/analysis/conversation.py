@@ -2,9 +2,10 @@
 会話分析とガイダンス機能を提供するモジュール
 """
 
-import difflib
 from typing import List, Dict, Any, Tuple, Optional
 
+from src.analysis.similarity import find_similar_message, get_repeat_index
+
 # ガイダンスメッセージの定義
 GUIDED_MESSAGES = {
     "repeat_detected": {
@@ -25,13 +26,17 @@ GUIDED_MESSAGES = {
     }
 }
 
-def analyze_conversation(chat_history: List[Dict[str, Any]]) -> Optional[str]:
+def analyze_conversation(
+    chat_history: List[Dict[str, Any]],
+    structure_id: Optional[str] = None
+) -> Optional[str]:
     """
     会話履歴を分析し、次のアクションを返す
 
     Args:
         chat_history (List[Dict[str, Any]]): チャット履歴のリスト。
             各要素は {"role": str, "content": str} の形式
+        structure_id (Optional[str]): 構成ID。指定すると再発話検出のインデックスを会話間で再利用する
 
     Returns:
         Optional[str]: 
@@ -55,7 +60,9 @@ def analyze_conversation(chat_history: List[Dict[str, Any]]) -> Optional[str]:
         return None
 
     # 類似発言の繰り返し検出
-    is_similar, _ = detect_repeated_user_messages(chat_history, similarity_threshold=0.85)
+    is_similar, _ = detect_repeated_user_messages(
+        chat_history, similarity_threshold=0.85, structure_id=structure_id
+    )
     if is_similar:
         message = GUIDED_MESSAGES["repeat_detected"]
         return f"prompt:{message['content']}"
@@ -69,14 +76,19 @@ def analyze_conversation(chat_history: List[Dict[str, Any]]) -> Optional[str]:
 
 def detect_repeated_user_messages(
     chat_history: List[Dict[str, Any]], 
-    similarity_threshold: float = 0.90
+    similarity_threshold: float = 0.90,
+    structure_id: Optional[str] = None
 ) -> Tuple[bool, Optional[str]]:
     """
     過去のユーザー発言と最新の発言を比較し、類似度が高ければ再発話と見なす
 
+    structure_id を指定すると、構成ごとの類似度インデックス（src.analysis.similarity）に
+    追加分の発言だけを登録し、候補の発言だけを比較する。
+
     Args:
         chat_history (List[Dict[str, Any]]): チャット履歴のリスト
         similarity_threshold (float): 類似度の閾値（0.0-1.0）
+        structure_id (Optional[str]): 構成ID
 
     Returns:
         Tuple[bool, Optional[str]]: 
@@ -96,13 +108,14 @@ def detect_repeated_user_messages(
     if len(user_messages) < 2:
         return False, None
 
-    latest = user_messages[-1]
-    for prev in user_messages[:-1][::-1]:
-        ratio = difflib.SequenceMatcher(None, latest, prev).ratio()
-        if ratio >= similarity_threshold:
-            return True, prev
+    if structure_id:
+        index = get_repeat_index(structure_id)
+        index.sync(user_messages)
+        prev = index.find_repeat(-1, similarity_threshold)
+    else:
+        prev = find_similar_message(user_messages[-1], user_messages[:-1], similarity_threshold)
 
-    return False, None
+    return (True, prev) if prev is not None else (False, None)
 
 def detect_missing_info(chat_history: List[Dict[str, Any]]) -> bool:
     """
@@ -0,0 +1,228 @@
+"""
+ユーザー発言の再発話検出用の類似度インデックスを提供するモジュール
+
+発言ごとに文字・文字bigramのMinHash署名を計算し、LSH（バンド分割）のバケットに登録します。
+新しい発言はバケットを引くだけで候補が得られ、候補だけを difflib.SequenceMatcher で
+検証するため、判定基準は従来の総当たりと同じ（ratio >= 閾値）です。
+候補の取りこぼしは確率的に起こり得ますが、閾値0.85以上ではほぼ起こりません。
+"""
+
+import difflib
+import random
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+__all__ = [
+    "RepeatIndex",
+    "find_similar_message",
+    "get_repeat_index",
+    "clear_repeat_indexes",
+]
+
+# MinHash の署名長とLSHのバンド分割（rows=2 は Jaccard 0.5 程度でもほぼ確実に候補になる）
+DEFAULT_NUM_PERM = 64
+DEFAULT_ROWS = 2
+
+# 構成IDごとに保持するインデックスの上限
+MAX_INDEXES = 256
+
+_MASK64 = (1 << 64) - 1
+_SEED = 20250701
+
+
+def _shingles(text: str) -> Iterable[str]:
+    """
+    文字と文字bigramの集合を返す
+
+    短い発言では1文字の挿入でbigramの大半が変わるため、文字単体も含めて
+    SequenceMatcher で類似と判定される組の Jaccard 係数が下がりすぎないようにする。
+    """
+    shingles = set(text) | {text[i:i + 2] for i in range(len(text) - 1)}
+    return shingles or {""}
+
+
+def _passes(matcher: difflib.SequenceMatcher, threshold: float) -> bool:
+    """SequenceMatcher の上限値で足切りしてから ratio を計算する"""
+    return (
+        matcher.real_quick_ratio() >= threshold
+        and matcher.quick_ratio() >= threshold
+        and matcher.ratio() >= threshold
+    )
+
+
+def find_similar_message(latest: str, previous: List[str], threshold: float) -> Optional[str]:
+    """
+    最新の発言に類似する過去の発言を新しい順に探す（インデックスなし）
+
+    real_quick_ratio / quick_ratio は ratio の上限なので、結果は総当たりと同じになる。
+
+    Args:
+        latest: 最新の発言
+        previous: 過去の発言（古い順）
+        threshold: 類似度の閾値（0.0-1.0）
+
+    Returns:
+        Optional[str]: 最初に閾値を超えた過去の発言。見つからない場合はNone
+    """
+    matcher = difflib.SequenceMatcher(None)
+    matcher.set_seq1(latest)
+    for prev in reversed(previous):
+        matcher.set_seq2(prev)
+        if _passes(matcher, threshold):
+            return prev
+    return None
+
+
+class RepeatIndex:
+    """
+    1つの会話のユーザー発言を追記型で保持する類似度インデックス
+
+    sync() に会話全体の発言リストを渡すと、前回からの追加分だけを登録する。
+    過去の発言が書き換えられていた場合は作り直す。
+    """
+
+    def __init__(self, num_perm: int = DEFAULT_NUM_PERM, rows: int = DEFAULT_ROWS):
+        """
+        Args:
+            num_perm: MinHash の署名長
+            rows: LSHの1バンドあたりの行数（num_perm を割り切れる値）
+        """
+        if rows <= 0 or num_perm % rows:
+            raise ValueError("num_perm は rows で割り切れる必要があります")
+        self.num_perm = num_perm
+        self.rows = rows
+        rng = random.Random(_SEED)
+        self._perms = [
+            (rng.getrandbits(64) | 1, rng.getrandbits(64))
+            for _ in range(num_perm)
+        ]
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """登録済みの発言をすべて破棄する"""
+        self._messages: List[str] = []
+        self._exact: Dict[str, List[int]] = {}
+        self._keys: List[List[Tuple[int, ...]]] = []
+        self._buckets: List[Dict[Tuple[int, ...], List[int]]] = [
+            {} for _ in range(self.num_perm // self.rows)
+        ]
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def _signature(self, text: str) -> List[int]:
+        """MinHash 署名を計算する（64bitの乗算ハッシュで順列を近似する）"""
+        hashes = [zlib.crc32(s.encode("utf-8")) for s in _shingles(text)]
+        mask = _MASK64
+        return [min([(a * h + b) & mask for h in hashes]) for a, b in self._perms]
+
+    def _band_keys(self, signature: List[int]) -> List[Tuple[int, ...]]:
+        rows = self.rows
+        return [tuple(signature[i:i + rows]) for i in range(0, self.num_perm, rows)]
+
+    def _add(self, text: str) -> int:
+        position = len(self._messages)
+        self._messages.append(text)
+        self._exact.setdefault(text, []).append(position)
+        keys = self._band_keys(self._signature(text))
+        self._keys.append(keys)
+        for band, key in zip(self._buckets, keys):
+            band.setdefault(key, []).append(position)
+        return position
+
+    def add(self, text: str) -> int:
+        """
+        発言を1件追加する
+
+        Args:
+            text: 発言
+
+        Returns:
+            int: 追加した発言の位置
+        """
+        with self._lock:
+            return self._add(text)
+
+    def sync(self, messages: List[str]) -> None:
+        """
+        会話全体の発言リストとインデックスを揃える（追加分だけを登録する）
+
+        Args:
+            messages: ユーザー発言（古い順）
+        """
+        with self._lock:
+            known = len(self._messages)
+            if known > len(messages) or (known and (
+                    messages[known - 1] != self._messages[-1] or messages[0] != self._messages[0])):
+                self.reset()
+                known = 0
+            for text in messages[known:]:
+                self._add(text)
+
+    def _candidates(self, position: int) -> List[int]:
+        """位置 position の発言と同じバケットに入っている、より古い発言の位置（新しい順）"""
+        text = self._messages[position]
+        found = set(p for p in self._exact.get(text, ()) if p < position)
+        for band, key in zip(self._buckets, self._keys[position]):
+            found.update(p for p in band.get(key, ()) if p < position)
+        return sorted(found, reverse=True)
+
+    def find_repeat(self, position: int = -1, threshold: float = 0.90) -> Optional[str]:
+        """
+        登録済みの発言が、それより古い発言の再発話かどうかを判定する
+
+        Args:
+            position: 判定する発言の位置（負の値は末尾から）
+            threshold: SequenceMatcher の類似度の閾値（0.0-1.0）
+
+        Returns:
+            Optional[str]: 類似した過去の発言のうち最も新しいもの。なければNone
+        """
+        with self._lock:
+            if not self._messages:
+                return None
+            if position < 0:
+                position += len(self._messages)
+            latest = self._messages[position]
+            matcher = difflib.SequenceMatcher(None)
+            matcher.set_seq1(latest)
+            for candidate in self._candidates(position):
+                matcher.set_seq2(self._messages[candidate])
+                if _passes(matcher, threshold):
+                    return self._messages[candidate]
+            return None
+
+
+_indexes: "OrderedDict[str, RepeatIndex]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_repeat_index(key: str) -> RepeatIndex:
+    """
+    構成IDなどのキーごとのインデックスを返す（最近使われていないものから破棄する）
+
+    Args:
+        key: 会話を識別するキー（構成ID）
+
+    Returns:
+        RepeatIndex: 類似度インデックス
+    """
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = RepeatIndex()
+            _indexes[key] = index
+            while len(_indexes) > MAX_INDEXES:
+                _indexes.popitem(last=False)
+        else:
+            _indexes.move_to_end(key)
+        return index
+
+
+def clear_repeat_indexes() -> None:
+    """保持しているインデックスをすべて破棄する"""
+    with _indexes_lock:
+        _indexes.clear()
@@ -13,6 +13,7 @@ from src.common.logging_utils import setup_logging, get_logger
 LOG_LEVEL = "DEBUG" if os.getenv("FLASK_DEBUG") == "1" else "INFO"
 setup_logging(log_level=LOG_LEVEL)
 
+from src.common.json_provider import init_json_provider
 from src.routes import register_routes
 from src.routes.edit_routes import edit_bp
 
@@ -51,6 +52,9 @@ def create_app() -> Flask:
     app.config['DEBUG'] = True
     app.config['TEMPLATES_AUTO_RELOAD'] = True
     
+    # jsonify・request.get_json を json_codec（orjson が使えれば orjson）で変換する
+    init_json_provider(app)
+    
     # セキュリティ設定
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-for-csrf')
     csrf = CSRFProtect()
@@ -1,6 +1,6 @@
-import difflib
 from typing import Optional, List, Dict, Any
 from src.types import StructureDict, EvaluationResult
+from src.analysis.conversation import detect_repeated_user_messages
 
 # 🧠 指示・誘導メッセージ（ChatGPT向け）
 GUIDED_MESSAGES = {
@@ -23,12 +23,14 @@ GUIDED_MESSAGES = {
 }
 
 
-def analyze_conversation(chat_history: List[Dict[str, Any]]) -> Optional[str]:
+def analyze_conversation(chat_history: List[Dict[str, Any]], structure_id: Optional[str] = None) -> Optional[str]:
     """
     会話履歴を分析し、次のアクションを返す：
     - "prompt:〇〇" → GPTに渡す指示
     - 通常文字列 → analyzerの発話
     - None → 何もしない
+
+    structure_id を指定すると、再発話検出の類似度インデックスを構成ごとに再利用する。
     """
     if not chat_history:
         return None
@@ -38,7 +40,9 @@ def analyze_conversation(chat_history: List[Dict[str, Any]]) -> Optional[str]:
         return None
 
     # ✅ 類似発言の繰り返し検出（意味ベース）
-    is_similar, _ = detect_repeated_user_messages(chat_history, similarity_threshold=0.85)
+    is_similar, _ = detect_repeated_user_messages(
+        chat_history, similarity_threshold=0.85, structure_id=structure_id
+    )
     if is_similar:
         message = GUIDED_MESSAGES["repeat_detected"]
         return f"prompt:{message['content']}"
@@ -51,23 +55,6 @@ def analyze_conversation(chat_history: List[Dict[str, Any]]) -> Optional[str]:
     return None
 
 
-def detect_repeated_user_messages(chat_history: List[Dict[str, Any]], similarity_threshold: float = 0.90) -> tuple[bool, Optional[str]]:
-    """
-    過去のユーザー発言と最新の発言を比較し、類似度が高ければ再発話と見なす。
-    """
-    user_messages = [m['content'] for m in chat_history if m['role'] == 'user']
-    if len(user_messages) < 2:
-        return False, None
-
-    latest = user_messages[-1]
-    for prev in user_messages[:-1][::-1]:
-        ratio = difflib.SequenceMatcher(None, latest, prev).ratio()
-        if ratio >= similarity_threshold:
-            return True, prev
-
-    return False, None
-
-
 def detect_missing_info(chat_history: List[Dict[str, Any]]) -> bool:
     """
     ユーザーの発話に重要な要素が欠けていないかを検出。
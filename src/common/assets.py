@@ -0,0 +1,390 @@
+"""
+静的アセットパイプライン
+
+このモジュールは、static/ 配下のJS/CSSをコンテンツハッシュ付きのファイル名で出力し、
+gzip/brotli の事前圧縮版とページ単位のバンドルを作成してマニフェストに記録します。
+テンプレートはマニフェストを参照してURLを解決するため、内容が変わらない限りURLも変わらず、
+ブラウザは1年間の immutable キャッシュを安全に利用できます。
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from typing import Any, Dict, List, Optional
+
+try:
+    import brotli  # type: ignore
+except ImportError:  # brotliは任意依存（未インストール時はgzipのみ作成）
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# ビルド出力ディレクトリ（static/ からの相対パス）
+DIST_DIR = "dist"
+
+# マニフェストのファイル名
+MANIFEST_NAME = "manifest.json"
+
+# ハッシュ付与・圧縮の対象拡張子
+ASSET_EXTENSIONS = (".js", ".css")
+
+# ファイル名に埋め込むハッシュの桁数
+HASH_LENGTH = 12
+
+# この値より小さいファイルは圧縮版を作成しない
+MIN_COMPRESS_SIZE = 1024
+
+# 1年間のimmutableキャッシュ
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# ページ単位のバンドル定義（読み込み順を保持する）
+ASSET_BUNDLES: Dict[str, List[str]] = {
+    "unified_interface.css": [
+        "css/base.css",
+        "css/layout.css",
+        "css/chat.css",
+        "css/structure.css",
+        "css/completion.css",
+        "css/pane_toggle.css",
+    ],
+    "unified_interface.js": [
+        "js/gemini_parser.js",
+        "js/layout_manager.js",
+        "js/utils.js",
+        "js/chat_handler.js",
+        "js/claude_renderer.js",
+        "js/structure_cards.js",
+        "js/diff_renderer.js",
+        "js/history_handler.js",
+        "js/module_diff.js",
+        "js/renderer.js",
+    ],
+    "unified_v2.css": [
+        "css/base.css",
+        "css/unified_v2.css",
+        "css/chat.css",
+        "css/structure.css",
+        "css/completion.css",
+    ],
+    "unified_v2.js": [
+        "js/layout_manager_v2.js",
+        "js/gemini_parser_v2.js",
+        "js/unified_v2_app.js",
+        "js/utils.js",
+        "js/chat_handler.js",
+        "js/claude_renderer.js",
+        "js/structure_cards.js",
+        "js/diff_renderer.js",
+        "js/history_handler.js",
+    ],
+}
+
+# 事前圧縮版の拡張子（Content-Encoding名 -> 拡張子）
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+def content_hash(data: bytes) -> str:
+    """
+    アセット内容のハッシュを計算する
+
+    Args:
+        data: ファイル内容
+
+    Returns:
+        str: 先頭 HASH_LENGTH 桁のsha256
+    """
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def hashed_name(logical_path: str, digest: str) -> str:
+    """
+    論理パスにハッシュを埋め込んだファイル名を返す（js/utils.js -> js/utils.<hash>.js）
+
+    Args:
+        logical_path: static/ からの相対パス
+        digest: コンテンツハッシュ
+
+    Returns:
+        str: ハッシュ付きの相対パス
+    """
+    base, ext = os.path.splitext(logical_path)
+    return f"{base}.{digest}{ext}"
+
+
+def _write_compressed_variants(path: str, data: bytes) -> List[str]:
+    """ハッシュ付きファイルの事前圧縮版を作成し、作成したエンコーディングを返す"""
+    if len(data) < MIN_COMPRESS_SIZE:
+        return []
+
+    encodings = []
+    if brotli is not None:
+        compressed = brotli.compress(data, quality=11)
+        if len(compressed) < len(data):
+            with open(path + ENCODING_SUFFIXES["br"], "wb") as f:
+                f.write(compressed)
+            encodings.append("br")
+
+    # mtime=0 で出力を決定的にする（再ビルドしても同じバイト列になる）
+    compressed = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(compressed) < len(data):
+        with open(path + ENCODING_SUFFIXES["gzip"], "wb") as f:
+            f.write(compressed)
+        encodings.append("gzip")
+    return encodings
+
+
+def _emit(dist_dir: str, logical_path: str, data: bytes, compress: bool) -> Dict[str, Any]:
+    """ハッシュ付きファイル（と圧縮版）を書き出し、マニフェストのエントリを返す"""
+    digest = content_hash(data)
+    relative = hashed_name(logical_path, digest)
+    output_path = os.path.join(dist_dir, relative)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, "wb") as f:
+        f.write(data)
+
+    return {
+        "path": relative.replace(os.sep, "/"),
+        "hash": digest,
+        "size": len(data),
+        "encodings": _write_compressed_variants(output_path, data) if compress else [],
+    }
+
+
+def _join_bundle(sources: List[str], contents: Dict[str, bytes]) -> bytes:
+    """バンドル対象のファイルを読み込み順に連結する"""
+    is_js = sources[0].endswith(".js")
+    parts = []
+    for source in sources:
+        data = contents[source].rstrip()
+        # JSは直前のファイルが文で終わっていなくても安全に連結できるよう区切る
+        if is_js:
+            data += b"\n;"
+        parts.append(f"/* {source} */\n".encode("utf-8") + data + b"\n")
+    return b"".join(parts)
+
+
+def collect_assets(static_dir: str) -> List[str]:
+    """
+    ハッシュ付与の対象となるアセットの論理パスを列挙する
+
+    Args:
+        static_dir: staticディレクトリ
+
+    Returns:
+        List[str]: static/ からの相対パス（ビルド出力は除く）
+    """
+    assets = []
+    for root, dirs, files in os.walk(static_dir):
+        relative_root = os.path.relpath(root, static_dir)
+        if relative_root.split(os.sep)[0] == DIST_DIR:
+            dirs[:] = []
+            continue
+        for name in files:
+            if name.endswith(ASSET_EXTENSIONS):
+                assets.append(os.path.normpath(os.path.join(relative_root, name)).replace(os.sep, "/"))
+    return sorted(assets)
+
+
+def build_assets(
+    static_dir: str,
+    bundles: Optional[Dict[str, List[str]]] = None,
+    compress: bool = True,
+    clean: bool = True
+) -> Dict[str, Any]:
+    """
+    ハッシュ付きアセット・圧縮版・バンドルを作成し、マニフェストを書き出す
+
+    Args:
+        static_dir: staticディレクトリ
+        bundles: バンドル定義（Noneの場合は ASSET_BUNDLES）
+        compress: gzip/brotliの事前圧縮版を作成するか
+        clean: 出力ディレクトリの古いファイルを削除するか
+
+    Returns:
+        Dict[str, Any]: マニフェスト
+    """
+    bundles = ASSET_BUNDLES if bundles is None else bundles
+    dist_dir = os.path.join(static_dir, DIST_DIR)
+    if clean and os.path.isdir(dist_dir):
+        shutil.rmtree(dist_dir)
+    os.makedirs(dist_dir, exist_ok=True)
+
+    contents: Dict[str, bytes] = {}
+    manifest: Dict[str, Any] = {"files": {}, "bundles": {}}
+    for logical_path in collect_assets(static_dir):
+        with open(os.path.join(static_dir, logical_path), "rb") as f:
+            contents[logical_path] = f.read()
+        manifest["files"][logical_path] = _emit(dist_dir, logical_path, contents[logical_path], compress)
+
+    for name, sources in bundles.items():
+        missing = [source for source in sources if source not in contents]
+        if missing:
+            logger.warning(f"⚠️ バンドル {name} をスキップしました（見つからないファイル: {', '.join(missing)}）")
+            continue
+        entry = _emit(dist_dir, f"bundles/{name}", _join_bundle(sources, contents), compress)
+        entry["sources"] = list(sources)
+        manifest["bundles"][name] = entry
+
+    with open(os.path.join(dist_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+    logger.info(f"✅ アセットをビルドしました: ファイル {len(manifest['files'])} 件, バンドル {len(manifest['bundles'])} 件")
+    return manifest
+
+
+class AssetManifest:
+    """
+    マニフェストを読み込み、論理パスからハッシュ付きパスを解決するクラス
+
+    マニフェストがない場合（未ビルドの開発環境）は、ファイル内容のハッシュを
+    クエリ文字列に付けたURLへフォールバックする。ハッシュはmtimeとサイズが
+    変わったときだけ再計算する。
+    """
+
+    def __init__(self, static_dir: str):
+        self.static_dir = static_dir
+        self.manifest_path = os.path.join(static_dir, DIST_DIR, MANIFEST_NAME)
+        self._lock = threading.Lock()
+        self._manifest: Optional[Dict[str, Any]] = None
+        self._manifest_mtime: Optional[int] = None
+        self._fallback_hashes: Dict[str, Any] = {}
+
+    def _load(self) -> Dict[str, Any]:
+        """マニフェストを読み込む（更新された場合のみ再読み込み）"""
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime_ns
+        except OSError:
+            mtime = None
+
+        with self._lock:
+            if self._manifest is None or mtime != self._manifest_mtime:
+                manifest: Dict[str, Any] = {"files": {}, "bundles": {}}
+                if mtime is not None:
+                    try:
+                        with open(self.manifest_path, "r", encoding="utf-8") as f:
+                            manifest = json.load(f)
+                    except (OSError, ValueError) as e:
+                        logger.warning(f"⚠️ アセットマニフェストの読み込みに失敗しました: {str(e)}")
+                self._manifest = manifest
+                self._manifest_mtime = mtime
+            return self._manifest
+
+    def lookup(self, logical_path: str) -> Optional[Dict[str, Any]]:
+        """
+        ハッシュ付きファイルのエントリを返す
+
+        Args:
+            logical_path: static/ からの相対パス
+
+        Returns:
+            Optional[Dict[str, Any]]: マニフェストのエントリ（未ビルドの場合None）
+        """
+        return self._load().get("files", {}).get(logical_path)
+
+    def bundle(self, name: str) -> Optional[Dict[str, Any]]:
+        """
+        バンドルのエントリを返す
+
+        Args:
+            name: バンドル名
+
+        Returns:
+            Optional[Dict[str, Any]]: マニフェストのエントリ（未ビルドの場合None）
+        """
+        return self._load().get("bundles", {}).get(name)
+
+    def find_by_hashed_path(self, hashed_path: str) -> Optional[Dict[str, Any]]:
+        """
+        ハッシュ付きパスからエントリを逆引きする
+
+        Args:
+            hashed_path: dist/ からの相対パス
+
+        Returns:
+            Optional[Dict[str, Any]]: マニフェストのエントリ
+        """
+        manifest = self._load()
+        for section in ("files", "bundles"):
+            for entry in manifest.get(section, {}).values():
+                if entry.get("path") == hashed_path:
+                    return entry
+        return None
+
+    def fallback_hash(self, logical_path: str) -> Optional[str]:
+        """
+        未ビルド時のキャッシュバスター用に、ファイル内容のハッシュを返す
+
+        Args:
+            logical_path: static/ からの相対パス
+
+        Returns:
+            Optional[str]: コンテンツハッシュ（ファイルがない場合None）
+        """
+        path = os.path.join(self.static_dir, logical_path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+
+        key = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._fallback_hashes.get(logical_path)
+            if cached and cached[0] == key:
+                return cached[1]
+
+        with open(path, "rb") as f:
+            digest = content_hash(f.read())
+        with self._lock:
+            self._fallback_hashes[logical_path] = (key, digest)
+        return digest
+
+
+def negotiate_encoding(accept_encoding: str, available: List[str]) -> Optional[str]:
+    """
+    Accept-Encoding と利用可能な事前圧縮版から、返すエンコーディングを選ぶ
+
+    Args:
+        accept_encoding: Accept-Encodingヘッダー値
+        available: 作成済みのエンコーディング
+
+    Returns:
+        Optional[str]: "br" / "gzip"（非圧縮を返す場合None）
+    """
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[token] = quality
+
+    for encoding in ("br", "gzip"):
+        if encoding in available and accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+__all__ = [
+    "ASSET_BUNDLES",
+    "DIST_DIR",
+    "ENCODING_SUFFIXES",
+    "IMMUTABLE_CACHE_CONTROL",
+    "MANIFEST_NAME",
+    "AssetManifest",
+    "build_assets",
+    "collect_assets",
+    "content_hash",
+    "hashed_name",
+    "negotiate_encoding",
+]
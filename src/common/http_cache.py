@@ -0,0 +1,158 @@
+"""
+HTTP条件付きGETユーティリティ
+
+このモジュールは、読み取り系JSONエンドポイントに ETag / Last-Modified / Cache-Control を付与し、
+クライアントが保持している版が最新であれば本体を読み込まずに 304 を返すデコレーターを提供します。
+scope を指定したエンドポイントのETagには共有キャッシュのリビジョン（src.common.shared_cache）を含めます。
+"""
+
+import hashlib
+import logging
+import os
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Any, Callable, Iterable, Optional, Tuple
+
+from flask import make_response, request
+
+from src.common.shared_cache import get_revision
+
+logger = logging.getLogger(__name__)
+
+# 読み取り系APIのデフォルトのCache-Control（保存はさせるが毎回再検証させる）
+DEFAULT_CACHE_CONTROL = "private, no-cache"
+
+
+def compute_file_validator(paths: Iterable[Optional[str]], variant: str = "") -> Optional[Tuple[str, datetime]]:
+    """
+    ファイルのstat情報から検証子（ETagと最終更新日時）を計算する（ファイル本体は読まない）
+
+    Args:
+        paths: 応答の元になるファイルパス
+        variant: クエリ文字列など、同じファイルから異なる応答を返す場合の識別子
+
+    Returns:
+        Optional[Tuple[str, datetime]]: (ETag, 最終更新日時)。対象ファイルが1つもない場合はNone
+    """
+    digest = hashlib.sha1(variant.encode("utf-8"))
+    latest_mtime = None
+    found = False
+    for path in sorted(p for p in paths if p):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        found = True
+        digest.update(f"{path}:{stat.st_mtime_ns}:{stat.st_size};".encode("utf-8"))
+        if latest_mtime is None or stat.st_mtime > latest_mtime:
+            latest_mtime = stat.st_mtime
+
+    if not found:
+        return None
+    last_modified = datetime.fromtimestamp(int(latest_mtime), tz=timezone.utc)
+    return digest.hexdigest(), last_modified
+
+
+def is_not_modified(etag: str, last_modified: Optional[datetime]) -> bool:
+    """
+    リクエストの条件ヘッダーから、クライアントの版が最新かどうかを判定する
+
+    If-None-Match が指定されている場合はそちらを優先する（RFC 9110）。
+    If-None-Match は弱い比較で判定するため、W/ 付きで送られたETagも一致とみなす。
+
+    Args:
+        etag: 現在のETag
+        last_modified: 現在の最終更新日時
+
+    Returns:
+        bool: 304を返してよい場合True
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def apply_cache_headers(response: Any, etag: str, last_modified: Optional[datetime], cache_control: str = DEFAULT_CACHE_CONTROL) -> Any:
+    """
+    レスポンスに検証子とCache-Controlを設定する
+
+    ETagは強い検証子として送る（ファイルのstat情報が同じなら応答本体も同じため）。
+
+    Args:
+        response: Flaskレスポンス
+        etag: ETag
+        last_modified: 最終更新日時
+        cache_control: Cache-Controlヘッダー値
+
+    Returns:
+        Any: ヘッダーを設定したレスポンス
+    """
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers["Cache-Control"] = cache_control
+    return response
+
+
+def conditional_get(
+    resolve_paths: Callable[..., Iterable[Optional[str]]],
+    cache_control: str = DEFAULT_CACHE_CONTROL,
+    version: str = "1",
+    scope: Optional[Callable[..., str]] = None
+) -> Callable:
+    """
+    読み取り系エンドポイントを条件付きGETに対応させるデコレーター
+
+    resolve_paths にはビューと同じ引数が渡され、応答の元になるファイルパスを返す。
+    検証子はファイルのstat情報とリクエストのクエリ文字列（scope を指定した場合はそのリビジョンも）から計算し、
+    クライアントの版が最新であればビュー本体を呼ばずに 304 を返す。
+
+    Args:
+        resolve_paths: ビュー引数から元ファイルのパスを返す関数
+        cache_control: 200応答に付与するCache-Control
+        version: 応答形式を変更した際にETagを無効化するためのバージョン
+        scope: ビュー引数から共有キャッシュのスコープ名を返す関数（例: structure_scope）
+
+    Returns:
+        Callable: デコレーター
+    """
+    def decorator(view: Callable) -> Callable:
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(*args, **kwargs)
+            try:
+                variant = f"{version}|{request.endpoint}|{request.query_string.decode('utf-8', 'replace')}"
+                if scope is not None:
+                    variant = f"{variant}|{get_revision(scope(*args, **kwargs))}"
+                validator = compute_file_validator(resolve_paths(*args, **kwargs), variant=variant)
+            except Exception as e:
+                logger.warning(f"⚠️ 検証子の計算に失敗しました: {str(e)}")
+                validator = None
+
+            if validator is None:
+                # 元ファイルがない場合はビューに任せる（404などの応答は検証子なし）
+                return view(*args, **kwargs)
+
+            etag, last_modified = validator
+            if is_not_modified(etag, last_modified):
+                logger.debug(f"♻️ 304 Not Modified - {request.path}")
+                return apply_cache_headers(make_response("", 304), etag, last_modified, cache_control)
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                apply_cache_headers(response, etag, last_modified, cache_control)
+            return response
+        return wrapper
+    return decorator
+
+
+__all__ = [
+    "DEFAULT_CACHE_CONTROL",
+    "compute_file_validator",
+    "is_not_modified",
+    "apply_cache_headers",
+    "conditional_get",
+]
@@ -0,0 +1,146 @@
+"""
+高コストなPOSTエンドポイントの重複実行防止ユーティリティ
+
+このモジュールは、LLMパイプラインを実行するPOSTエンドポイント向けに次の2つを行うデコレーターを提供します。
+
+- 同じ構成・同じ本文のリクエストが実行中であれば、後続のリクエストは完了を待って同じ応答を返す
+  （ダブルクリックや複数タブからの同時送信）
+- Idempotency-Key ヘッダーが指定された場合は応答を保持期間のあいだ保存し、
+  同じキーの再送には元の応答を返す（本文が異なる場合は 422）。応答は共有キャッシュ
+  （src.common.shared_cache）に保存するため、再送が別のワーカープロセスに届いても元の応答を返す
+"""
+
+import hashlib
+import logging
+import os
+from functools import wraps
+from typing import Any, Callable, Optional, Tuple
+
+from flask import Flask, current_app, jsonify, make_response, request
+
+from src.common.shared_cache import TieredCache, get_shared_backend
+from src.common.single_flight import (
+    DEFAULT_MAX_ENTRIES,
+    DEFAULT_TTL_SECONDS,
+    IDEMPOTENCY_NAMESPACE,
+    IdempotencyStore,
+    SingleFlight,
+    StoredResponse,
+)
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+COALESCED_HEADER = "X-Coalesced"
+
+# app.extensions に保存するキー
+EXTENSION_KEY = "request_coalescing"
+
+# 冪等キーの最大長
+MAX_KEY_LENGTH = 255
+
+# 実行中の同一リクエストを待つ既定の最大秒数
+DEFAULT_WAIT_SECONDS = 300.0
+
+# 共有・再送する応答に含めるヘッダー（Set-Cookie などリクエスト固有のものは含めない）
+SHARED_HEADERS = ("Content-Type",)
+
+
+def _state(app: Optional[Flask] = None) -> Tuple[SingleFlight, IdempotencyStore]:
+    """
+    アプリケーションごとのシングルフライトと冪等キーストアを返す
+
+    保持期間は app.config["IDEMPOTENCY_TTL"]、環境変数 AIDEX_IDEMPOTENCY_TTL_S、24時間の順に決まる。
+    冪等キーの応答はワーカープロセス間で共有する（共有層は AIDEX_CACHE_BACKEND で選ぶ）。
+    """
+    app = app or current_app
+    state = app.extensions.get(EXTENSION_KEY)
+    if state is None:
+        ttl = float(app.config.get("IDEMPOTENCY_TTL") or os.getenv("AIDEX_IDEMPOTENCY_TTL_S", DEFAULT_TTL_SECONDS))
+        cache = TieredCache(IDEMPOTENCY_NAMESPACE, shared=get_shared_backend(), max_entries=DEFAULT_MAX_ENTRIES, ttl=ttl)
+        state = (SingleFlight(), IdempotencyStore(ttl=ttl, cache=cache))
+        app.extensions[EXTENSION_KEY] = state
+    return state
+
+
+def _capture(response: Any) -> StoredResponse:
+    """ビューの戻り値を、他のリクエストでも使える形（本文・ステータス・ヘッダー）にする"""
+    response = make_response(response)
+    headers = {name: response.headers[name] for name in SHARED_HEADERS if name in response.headers}
+    return StoredResponse("", response.status_code, response.get_data(), headers)
+
+
+def _rebuild(stored: StoredResponse, extra_header: Optional[str] = None) -> Any:
+    response = make_response(stored.body, stored.status)
+    response.headers.update(stored.headers)
+    if extra_header:
+        response.headers[extra_header] = "true"
+    return response
+
+
+def coalesce_post(target_arg: str = "structure_id") -> Callable:
+    """
+    POSTエンドポイントの重複実行を防ぐデコレーター
+
+    同時実行をまとめるキーはエンドポイント・target_arg の値・本文のハッシュ。
+    Idempotency-Key が指定された場合はキーごとに応答を保存し（5xxは保存しない）、再送に返す。
+
+    Args:
+        target_arg: 対象（構成ID）を表すビュー引数の名前
+
+    Returns:
+        Callable: デコレーター
+    """
+    def decorator(view: Callable) -> Callable:
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != "POST":
+                return view(*args, **kwargs)
+
+            flights, store = _state()
+            scope = f"{request.endpoint}:{kwargs.get(target_arg, '')}"
+            fingerprint = hashlib.sha256(request.query_string + b"\0" + request.get_data()).hexdigest()
+            idempotency_key = (request.headers.get(IDEMPOTENCY_HEADER) or "").strip()
+
+            if len(idempotency_key) > MAX_KEY_LENGTH:
+                return jsonify({"success": False, "error": f"{IDEMPOTENCY_HEADER} は{MAX_KEY_LENGTH}文字以内で指定してください"}), 400
+
+            store_key = f"{scope}:{idempotency_key}" if idempotency_key else None
+            if store_key:
+                stored = store.get(store_key)
+                if stored is not None:
+                    if stored.fingerprint != fingerprint:
+                        return jsonify({
+                            "success": False,
+                            "error": f"同じ {IDEMPOTENCY_HEADER} で異なる内容のリクエストが送信されました"
+                        }), 422
+                    logger.info(f"♻️ 冪等キーの保存済み応答を返します - {scope}")
+                    return _rebuild(stored, REPLAYED_HEADER)
+
+            def execute() -> StoredResponse:
+                captured = _capture(view(*args, **kwargs))
+                if store_key and captured.status < 500:
+                    store.put(store_key, fingerprint, captured.status, captured.body, captured.headers)
+                return captured
+
+            wait = float(current_app.config.get("COALESCE_WAIT_SECONDS", DEFAULT_WAIT_SECONDS))
+            try:
+                captured, shared = flights.do(f"{scope}:{fingerprint}", execute, timeout=wait)
+            except TimeoutError:
+                return jsonify({"success": False, "error": "同じ操作を実行中です。しばらくしてから再度お試しください"}), 409
+
+            if shared:
+                logger.info(f"🔗 実行中の同一リクエストの結果を共有しました - {scope}")
+                return _rebuild(captured, COALESCED_HEADER)
+            return _rebuild(captured)
+        return wrapper
+    return decorator
+
+
+__all__ = [
+    "COALESCED_HEADER",
+    "IDEMPOTENCY_HEADER",
+    "REPLAYED_HEADER",
+    "coalesce_post",
+]
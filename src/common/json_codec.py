@@ -0,0 +1,255 @@
+"""
+JSONのエンコード・デコード（高速な実装への切り替え）
+
+構成の保存・読み込み、履歴のJSON Lines、APIレスポンス、LLMのプロンプトに埋め込む
+整形済みJSONなど、JSONの変換はリクエストの処理時間の多くを占めます。
+このモジュールはそれらの呼び出し元が共通で使う dumps / loads を提供し、
+orjson がインストールされていればそれを使い、なければ標準ライブラリの json を使います。
+
+出力は標準ライブラリの json.dumps と1バイトも変わらないことを保証します。
+orjson の出力が標準ライブラリと一致する組み合わせ（ensure_ascii=False で、indent=2 または
+区切り文字を詰めた形式）だけ orjson を使い、それ以外や一致しない値を含む場合は
+標準ライブラリで変換します。
+
+- 浮動小数点数は 0 または 1e-4 <= |x| < 1e16 の範囲だけ（指数表記の書き方が異なるため）
+- NaN・Infinity、str / int 以外を継承した Enum、UUID、str 以外のキー、64ビットを超える整数は標準ライブラリ
+- datetime・dataclass は default に渡す（標準ライブラリと同じく default=str なら str() になる）
+
+環境変数 AIDEX_JSON_BACKEND=json を指定すると常に標準ライブラリを使います。
+"""
+
+import enum
+import json
+import os
+import uuid
+from typing import Any, Callable, List, Optional, Set, Tuple, Union
+
+try:
+    import orjson  # type: ignore
+except ImportError:  # orjsonは任意依存（未インストール時は標準ライブラリのみ）
+    orjson = None
+
+BACKEND_JSON = "json"
+BACKEND_ORJSON = "orjson"
+
+# orjson と標準ライブラリで浮動小数点数の表記が一致する範囲（0 は常に一致する）
+FAST_FLOAT_MIN = 1e-4
+FAST_FLOAT_MAX = 1e16
+
+COMPACT_SEPARATORS = (",", ":")
+INDENT_SEPARATORS = (",", ": ")
+
+_FAST_INDENTS = (None, 2)
+
+# _fast_path_safe のスタックでリスト・辞書をたどり終えたことを示す目印
+_EXIT = object()
+
+# orjson は64ビットを超える整数を float にして読み込むため、19桁以上の数字の並びを含む入力は
+# 標準ライブラリで読み込む（数字を "0"、それ以外を空白にしてから連続する "0" を探す）
+_DIGIT_TABLE = bytes(0x30 if 0x30 <= code <= 0x39 else 0x20 for code in range(256))
+_LONG_DIGITS = b"0" * 19
+
+
+def get_backend() -> str:
+    """
+    使用する実装を返す（orjson がなければ、または AIDEX_JSON_BACKEND=json なら json）
+
+    Returns:
+        str: json / orjson
+    """
+    if orjson is None or os.environ.get("AIDEX_JSON_BACKEND", "").strip().lower() == BACKEND_JSON:
+        return BACKEND_JSON
+    return BACKEND_ORJSON
+
+
+def _fast_path_safe(value: Any) -> bool:
+    """
+    値が orjson で標準ライブラリと同じ出力になるかどうかを調べる
+
+    再帰の深さに制限されないようにスタックでたどる。循環参照を含む値は標準ライブラリに任せて
+    ValueError にする。default に渡される値（datetime など）は
+    default の戻り値を別に調べるため、ここでは対象にしない。
+
+    Args:
+        value: 変換する値
+
+    Returns:
+        bool: orjson を使ってよい場合は True
+    """
+    stack: List[Any] = [value]
+    # たどっている途中のリスト・辞書（親をたどり終えるまで残し、再び現れたら循環参照）
+    active: Set[int] = set()
+    while stack:
+        item = stack.pop()
+        if item is _EXIT:
+            active.discard(stack.pop())
+            continue
+        if isinstance(item, (str, bool)) or item is None:
+            continue
+        if isinstance(item, float):
+            magnitude = abs(item)
+            # NaN・Infinity も範囲外として扱う
+            if magnitude != 0.0 and not (FAST_FLOAT_MIN <= magnitude < FAST_FLOAT_MAX):
+                return False
+            continue
+        if isinstance(item, enum.Enum) and not isinstance(item, (int, str)):
+            # orjson は値を、標準ライブラリは default（str なら "Class.NAME"）を使う
+            return False
+        if isinstance(item, int):
+            continue
+        if isinstance(item, (dict, list, tuple)):
+            if id(item) in active:
+                return False
+            active.add(id(item))
+            stack.extend((id(item), _EXIT))
+        if isinstance(item, dict):
+            for key, child in item.items():
+                if type(key) is not str:
+                    return False
+                stack.append(child)
+            continue
+        if isinstance(item, (list, tuple)):
+            stack.extend(item)
+            continue
+        if isinstance(item, uuid.UUID):
+            # orjson は UUID をそのまま変換するが、標準ライブラリは default に渡す
+            return False
+    return True
+
+
+def _checked_default(default: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    """default の戻り値も orjson で同じ出力になるかを調べるラッパー"""
+    if default is str:
+        return default
+
+    def wrapper(obj: Any) -> Any:
+        result = default(obj)
+        if not _fast_path_safe(result):
+            # orjson の変換を中断して標準ライブラリでやり直す
+            raise TypeError("orjsonと標準ライブラリで出力が異なる値です")
+        return result
+
+    return wrapper
+
+
+def _orjson_option(indent: Optional[int], separators: Optional[Tuple[str, str]], sort_keys: bool,
+                   ensure_ascii: bool) -> Optional[int]:
+    """標準ライブラリと同じ出力になる orjson のオプションを返す（一致しない引数なら None）"""
+    if ensure_ascii or indent not in _FAST_INDENTS or get_backend() != BACKEND_ORJSON:
+        return None
+    if indent is None and separators != COMPACT_SEPARATORS:
+        # 標準ライブラリの既定の区切り文字（", " / ": "）は orjson にない
+        return None
+    if indent is not None and separators not in (None, INDENT_SEPARATORS):
+        return None
+    option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+    if indent is not None:
+        option |= orjson.OPT_INDENT_2
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    return option
+
+
+def _fast_dumps(value: Any, indent: Optional[int], separators: Optional[Tuple[str, str]], sort_keys: bool,
+                default: Optional[Callable[[Any], Any]], ensure_ascii: bool) -> Optional[bytes]:
+    """orjson で変換できればUTF-8のバイト列を返す（標準ライブラリを使う場合は None）"""
+    option = _orjson_option(indent, separators, sort_keys, ensure_ascii)
+    if option is None or not _fast_path_safe(value):
+        return None
+    try:
+        return orjson.dumps(value, default=_checked_default(default) if default else None, option=option)
+    except TypeError:
+        # str 以外のキー、64ビットを超える整数、サロゲート文字などは標準ライブラリに任せる
+        return None
+
+
+def dumps(value: Any, *, indent: Optional[int] = None, separators: Optional[Tuple[str, str]] = None,
+          sort_keys: bool = False, default: Optional[Callable[[Any], Any]] = None,
+          ensure_ascii: bool = False) -> str:
+    """
+    値をJSON文字列にする（json.dumps と同じ引数・同じ出力）
+
+    ensure_ascii の既定値は False（日本語をそのまま出力する）。
+
+    Args:
+        value: 変換する値
+        indent: インデント
+        separators: 区切り文字
+        sort_keys: キーを並べ替えるかどうか
+        default: JSONにできない値を変換する関数
+        ensure_ascii: 非ASCII文字をエスケープするかどうか
+
+    Returns:
+        str: JSON文字列
+
+    Raises:
+        TypeError: JSONにできない値を含む場合
+        ValueError: 循環参照を含む場合
+    """
+    encoded = _fast_dumps(value, indent, separators, sort_keys, default, ensure_ascii)
+    if encoded is not None:
+        return encoded.decode("utf-8")
+    return json.dumps(value, indent=indent, separators=separators, sort_keys=sort_keys,
+                      default=default, ensure_ascii=ensure_ascii)
+
+
+def dumps_bytes(value: Any, *, indent: Optional[int] = None, separators: Optional[Tuple[str, str]] = None,
+                sort_keys: bool = False, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+    """
+    値をUTF-8のJSONバイト列にする（ファイル保存用。文字列を経由しない）
+
+    Args:
+        value: 変換する値
+        indent: インデント
+        separators: 区切り文字
+        sort_keys: キーを並べ替えるかどうか
+        default: JSONにできない値を変換する関数
+
+    Returns:
+        bytes: dumps(value, ...) をUTF-8にしたバイト列
+    """
+    encoded = _fast_dumps(value, indent, separators, sort_keys, default, False)
+    if encoded is not None:
+        return encoded
+    return json.dumps(value, indent=indent, separators=separators, sort_keys=sort_keys,
+                      default=default, ensure_ascii=False).encode("utf-8")
+
+
+def loads(data: Union[str, bytes, bytearray]) -> Any:
+    """
+    JSONを読み込む（json.loads と同じ結果）
+
+    orjson が受け付けない入力（NaN・Infinity、UTF-8以外のバイト列など）と、
+    64ビットを超える整数を含みうる入力は標準ライブラリで読み込む。
+
+    Args:
+        data: JSON文字列またはバイト列
+
+    Returns:
+        Any: 読み込んだ値
+
+    Raises:
+        json.JSONDecodeError: JSONとして読めない場合
+    """
+    if get_backend() == BACKEND_ORJSON and isinstance(data, (str, bytes, bytearray)):
+        try:
+            encoded = data.encode("utf-8") if isinstance(data, str) else bytes(data)
+        except UnicodeEncodeError:
+            encoded = None
+        if encoded is not None and encoded.translate(_DIGIT_TABLE).find(_LONG_DIGITS) < 0:
+            try:
+                return orjson.loads(encoded)
+            except orjson.JSONDecodeError:
+                pass
+    return json.loads(data)
+
+
+__all__ = [
+    "BACKEND_JSON",
+    "BACKEND_ORJSON",
+    "COMPACT_SEPARATORS",
+    "dumps",
+    "dumps_bytes",
+    "get_backend",
+    "loads",
+]
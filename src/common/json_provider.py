@@ -0,0 +1,72 @@
+"""
+FlaskのJSONプロバイダー
+
+jsonify・request.get_json・テンプレートの tojson が src.common.json_codec を使うようにします。
+構成全体を返すAPIのレスポンスでは、orjson が使える場合にJSONへの変換が速くなります
+（出力は標準ライブラリで変換した場合と同じ）。
+
+Flaskの既定との違いは ensure_ascii=False（日本語をエスケープせずに返す）だけで、
+キーの並べ替え（sort_keys）や datetime・dataclass などの変換は DefaultJSONProvider と同じです。
+"""
+
+from typing import Any
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from src.common import json_codec
+
+# json_codec.dumps が受け付ける引数（これ以外の引数は標準ライブラリの json.dumps に任せる）
+_CODEC_DUMPS_ARGS = frozenset({"indent", "separators", "sort_keys", "default", "ensure_ascii"})
+
+
+class CodecJSONProvider(DefaultJSONProvider):
+    """json_codec で変換するJSONプロバイダー"""
+
+    ensure_ascii = False
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        """
+        値をJSON文字列にする
+
+        Args:
+            obj: 変換する値
+            **kwargs: json.dumps の引数
+
+        Returns:
+            str: JSON文字列
+        """
+        kwargs.setdefault("default", self.default)
+        kwargs.setdefault("ensure_ascii", self.ensure_ascii)
+        kwargs.setdefault("sort_keys", self.sort_keys)
+        if not _CODEC_DUMPS_ARGS.issuperset(kwargs):
+            return super().dumps(obj, **kwargs)
+        return json_codec.dumps(obj, **kwargs)
+
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        """
+        JSONを読み込む
+
+        Args:
+            s: JSON文字列またはバイト列
+            **kwargs: json.loads の引数
+
+        Returns:
+            Any: 読み込んだ値
+        """
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return json_codec.loads(s)
+
+
+def init_json_provider(app: Flask) -> None:
+    """
+    アプリケーションのJSONプロバイダーを CodecJSONProvider にする
+
+    Args:
+        app: Flaskアプリケーション
+    """
+    app.json = CodecJSONProvider(app)
+
+
+__all__ = ["CodecJSONProvider", "init_json_provider"]
@@ -0,0 +1,466 @@
+"""
+LLM入出力のキャプチャストア
+
+LLMへのプロンプト・生の応答・JSON修復の差分などを、1件ずつ小さなファイルに書く代わりに
+gzip圧縮したセグメントファイル（logs/llm_capture/segment-*.jsonl.gz）へ追記します。
+
+- 書き込みはメモリにバッファし、一定件数・一定サイズ・一定時間ごとに1つのgzipメンバーとして
+  まとめて追記する（失敗の記録はすぐに書き出す）
+- セグメントが上限サイズを超えたら新しいセグメントに切り替え、古いものから削除する
+- セグメントごとのインデックス（*.idx.jsonl）に call_id / structure_id / provider /
+  timestamp / outcome とgzipメンバーの位置を記録し、該当メンバーだけを展開して取り出す
+- プロバイダーと結果ごとにサンプリング率を設定できる（失敗は常に保存する）
+"""
+
+import atexit
+import glob
+import gzip
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from src.common import json_codec
+from src.common.tracing import current_trace, current_trace_id
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CAPTURE_DIR = os.path.join("logs", "llm_capture")
+
+OUTCOME_SUCCESS = "success"
+OUTCOME_ERROR = "error"
+
+# インデックスに載せる項目
+INDEX_FIELDS = ("call_id", "timestamp", "provider", "source", "structure_id", "trace_id", "outcome")
+
+# セグメント名に入れるナノ秒の桁数（ゼロ埋めして名前の順を作成順にそろえる）
+SEGMENT_STAMP_DIGITS = 20
+
+
+@dataclass
+class CaptureConfig:
+    """
+    キャプチャの設定
+
+    sample_rates のキーは "provider:outcome"、"provider"、"*:outcome" の順に参照し、
+    どれもなければ default_rate を使う。
+    """
+    enabled: bool = True
+    default_rate: float = 1.0
+    sample_rates: Dict[str, float] = field(default_factory=dict)
+    always_keep_failures: bool = True
+    max_segment_bytes: int = 16 * 1024 * 1024
+    max_segments: int = 20
+    flush_records: int = 50
+    flush_bytes: int = 256 * 1024
+    flush_interval: float = 5.0
+    seed: Optional[int] = None
+
+    @classmethod
+    def from_env(cls) -> "CaptureConfig":
+        """
+        環境変数から設定を作る
+
+        LLM_CAPTURE_ENABLED（"0"/"false" で無効）、LLM_CAPTURE_SAMPLE_RATE（既定のサンプリング率）、
+        LLM_CAPTURE_RATES（例: {"gemini:success": 0.1, "claude": 0.5}）
+
+        Returns:
+            CaptureConfig: 設定
+        """
+        config = cls()
+        config.enabled = os.getenv("LLM_CAPTURE_ENABLED", "1").lower() not in ("0", "false", "no")
+        if os.getenv("LLM_CAPTURE_SAMPLE_RATE"):
+            config.default_rate = float(os.environ["LLM_CAPTURE_SAMPLE_RATE"])
+        if os.getenv("LLM_CAPTURE_RATES"):
+            config.sample_rates = {key: float(value) for key, value in json_codec.loads(os.environ["LLM_CAPTURE_RATES"]).items()}
+        return config
+
+    def rate_for(self, provider: str, outcome: str) -> float:
+        """プロバイダーと結果に対するサンプリング率を返す"""
+        if self.always_keep_failures and outcome != OUTCOME_SUCCESS:
+            return 1.0
+        for key in (f"{provider}:{outcome}", provider, f"*:{outcome}"):
+            if key in self.sample_rates:
+                return self.sample_rates[key]
+        return self.default_rate
+
+
+def _segment_order(path: str) -> tuple:
+    """
+    セグメントを作成順に並べるためのキー
+
+    名前のナノ秒で並べる。ナノ秒を含まない旧形式の名前（秒単位）は更新時刻で並べる。
+
+    Args:
+        path: セグメントのパス
+
+    Returns:
+        tuple: (作成時刻のナノ秒, 名前)
+    """
+    name = os.path.basename(path)
+    stamp = name[len("segment-"):].split("-", 1)[0]
+    if len(stamp) == SEGMENT_STAMP_DIGITS and stamp.isdigit():
+        return int(stamp), name
+    try:
+        return os.stat(path).st_mtime_ns, name
+    except OSError:
+        return 0, name
+
+
+def _decompress_member(fh, offset: int) -> bytes:
+    """セグメントの指定位置から始まるgzipメンバーを1つだけ展開する"""
+    fh.seek(offset)
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    chunks = []
+    while not decompressor.eof:
+        data = fh.read(64 * 1024)
+        if not data:
+            break
+        chunks.append(decompressor.decompress(data))
+    return b"".join(chunks)
+
+
+class CaptureStore:
+    """圧縮セグメントに追記するキャプチャストア"""
+
+    def __init__(self, directory: str = DEFAULT_CAPTURE_DIR, config: Optional[CaptureConfig] = None):
+        """
+        初期化
+
+        Args:
+            directory: 保存先ディレクトリ
+            config: キャプチャの設定
+        """
+        self.directory = directory
+        self.config = config or CaptureConfig()
+        self._random = random.Random(self.config.seed)
+        self._lock = threading.RLock()
+        self._buffer: List[Dict[str, Any]] = []
+        self._buffer_bytes = 0
+        self._buffer_since = 0.0
+        self._segment: Optional[str] = None
+        self._last_stamp = 0
+        self.stats = {"captured": 0, "sampled_out": 0, "flushes": 0, "errors": 0}
+
+    # ------------------------------------------------------------------
+    # 書き込み
+    # ------------------------------------------------------------------
+    @property
+    def segment_path(self) -> Optional[str]:
+        """現在書き込み中のセグメントのパス"""
+        return self._segment
+
+    def should_capture(self, provider: str, outcome: str) -> bool:
+        """サンプリング率に従って保存するかどうかを決める"""
+        rate = self.config.rate_for(provider, outcome)
+        if rate >= 1.0:
+            return True
+        return rate > 0 and self._random.random() < rate
+
+    def capture(
+        self,
+        provider: str,
+        source: str,
+        payload: Dict[str, Any],
+        outcome: str = OUTCOME_SUCCESS,
+        structure_id: Optional[str] = None,
+        call_id: Optional[str] = None,
+        flush: bool = False
+    ) -> Optional[str]:
+        """
+        1件のLLM入出力を記録する
+
+        Args:
+            provider: プロバイダー名（"gemini"、"claude"、"chatgpt" など）
+            source: 記録した箇所（"gemini.chat"、"extract_json_part" など）
+            payload: prompt / response / error などの本体
+            outcome: "success"、"error" などの結果
+            structure_id: 構成ID（省略時は実行中のトレースの属性から取得）
+            call_id: 呼び出しID（省略時は新規発行）
+            flush: すぐにセグメントへ書き出す
+
+        Returns:
+            Optional[str]: 記録した call_id。無効・サンプリング対象外の場合はNone
+        """
+        if not self.config.enabled:
+            return None
+        if not self.should_capture(provider, outcome):
+            self.stats["sampled_out"] += 1
+            return None
+
+        trace = current_trace()
+        if structure_id is None and trace is not None:
+            structure_id = trace.attributes.get("structure_id")
+        record = {
+            "call_id": call_id or uuid.uuid4().hex,
+            "timestamp": datetime.now().isoformat(),
+            "provider": provider,
+            "source": source,
+            "structure_id": structure_id,
+            "trace_id": current_trace_id(),
+            "outcome": outcome,
+            "payload": payload,
+        }
+        try:
+            line = json_codec.dumps(record, separators=json_codec.COMPACT_SEPARATORS, default=str)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"⚠️ キャプチャをシリアライズできません: {e}")
+            self.stats["errors"] += 1
+            return None
+
+        with self._lock:
+            if not self._buffer:
+                self._buffer_since = time.monotonic()
+            self._buffer.append(record)
+            record["_line"] = line
+            self._buffer_bytes += len(line)
+            self.stats["captured"] += 1
+            if (flush or outcome != OUTCOME_SUCCESS
+                    or len(self._buffer) >= self.config.flush_records
+                    or self._buffer_bytes >= self.config.flush_bytes
+                    or time.monotonic() - self._buffer_since >= self.config.flush_interval):
+                self.flush()
+        return record["call_id"]
+
+    def flush(self) -> int:
+        """
+        バッファを1つのgzipメンバーとしてセグメントに追記する
+
+        Returns:
+            int: 書き出した件数
+        """
+        with self._lock:
+            if not self._buffer:
+                return 0
+            records, self._buffer, self._buffer_bytes = self._buffer, [], 0
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                segment = self._current_segment()
+                body = "".join(record.pop("_line") + "\n" for record in records).encode("utf-8")
+                member = gzip.compress(body)
+                with open(segment, "ab") as f:
+                    offset = f.tell()
+                    f.write(member)
+                with open(self._index_path(segment), "a", encoding="utf-8") as f:
+                    for record in records:
+                        entry = {key: record.get(key) for key in INDEX_FIELDS}
+                        entry["member"] = offset
+                        f.write(json_codec.dumps(entry, separators=json_codec.COMPACT_SEPARATORS) + "\n")
+                self.stats["flushes"] += 1
+                return len(records)
+            except OSError as e:
+                logger.warning(f"⚠️ キャプチャの書き出しに失敗しました: {e}")
+                self.stats["errors"] += 1
+                return 0
+
+    def close(self) -> None:
+        """残りのバッファを書き出す"""
+        self.flush()
+
+    def _current_segment(self) -> str:
+        """書き込み先のセグメントを返す（上限サイズを超えたら切り替える）"""
+        if self._segment and os.path.exists(self._segment) and os.path.getsize(self._segment) < self.config.max_segment_bytes:
+            return self._segment
+        # 同じ秒に切り替えても名前の順が作成順になるよう、ゼロ埋めしたナノ秒を使う
+        stamp = max(time.time_ns(), self._last_stamp + 1)
+        self._last_stamp = stamp
+        self._segment = os.path.join(self.directory, f"segment-{stamp:0{SEGMENT_STAMP_DIGITS}d}-{uuid.uuid4().hex[:6]}.jsonl.gz")
+        self._apply_retention()
+        return self._segment
+
+    def _apply_retention(self) -> None:
+        """保持数を超えた古いセグメントとインデックスを削除する"""
+        segments = self.segments()
+        for segment in segments[:max(0, len(segments) - self.config.max_segments + 1)]:
+            for path in (segment, self._index_path(segment)):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    @staticmethod
+    def _index_path(segment: str) -> str:
+        return segment[:-len(".jsonl.gz")] + ".idx.jsonl"
+
+    # ------------------------------------------------------------------
+    # 取得
+    # ------------------------------------------------------------------
+    def segments(self) -> List[str]:
+        """セグメントを古い順に返す"""
+        return sorted(glob.glob(os.path.join(glob.escape(self.directory), "segment-*.jsonl.gz")),
+                      key=_segment_order)
+
+    def _iter_index(self) -> Iterator[Dict[str, Any]]:
+        """全セグメントのインデックスを新しい順に返す"""
+        for segment in reversed(self.segments()):
+            try:
+                with open(self._index_path(segment), "r", encoding="utf-8") as f:
+                    lines = f.readlines()
+            except OSError:
+                continue
+            for line in reversed(lines):
+                try:
+                    entry = json_codec.loads(line)
+                except ValueError:
+                    continue
+                entry["segment"] = segment
+                yield entry
+
+    def query(
+        self,
+        call_id: Optional[str] = None,
+        structure_id: Optional[str] = None,
+        provider: Optional[str] = None,
+        outcome: Optional[str] = None,
+        trace_id: Optional[str] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """
+        インデックスを検索する（本体は読まない）
+
+        Args:
+            call_id: 呼び出しID
+            structure_id: 構成ID
+            provider: プロバイダー名
+            outcome: 結果
+            trace_id: トレースID
+            start: この時刻以降（ISO形式の前方一致で比較）
+            end: この時刻以前
+            limit: 最大件数
+
+        Returns:
+            List[Dict[str, Any]]: 新しい順のインデックスエントリ
+        """
+        self.flush()
+        wanted = {"call_id": call_id, "structure_id": structure_id, "provider": provider, "outcome": outcome, "trace_id": trace_id}
+        wanted = {key: value for key, value in wanted.items() if value}
+        results = []
+        for entry in self._iter_index():
+            if any(entry.get(key) != value for key, value in wanted.items()):
+                continue
+            if start and entry["timestamp"] < start:
+                continue
+            if end and entry["timestamp"][:len(end)] > end:
+                continue
+            results.append(entry)
+            if len(results) >= limit:
+                break
+        return results
+
+    def load(self, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        インデックスエントリに対応する記録の本体を読み出す（該当するgzipメンバーだけを展開する）
+
+        Args:
+            entries: query() の戻り値
+
+        Returns:
+            List[Dict[str, Any]]: 記録（entries と同じ順）
+        """
+        wanted: Dict[tuple, Dict[str, Any]] = {}
+        for entry in entries:
+            wanted.setdefault((entry["segment"], entry["member"]), {})[entry["call_id"]] = None
+
+        found: Dict[str, Dict[str, Any]] = {}
+        for (segment, member), call_ids in wanted.items():
+            try:
+                with open(segment, "rb") as fh:
+                    data = _decompress_member(fh, member)
+            except (OSError, zlib.error) as e:
+                logger.warning(f"⚠️ キャプチャを読み出せません: {segment}@{member} - {e}")
+                continue
+            for line in data.decode("utf-8").splitlines():
+                record = json_codec.loads(line)
+                if record["call_id"] in call_ids:
+                    found[record["call_id"]] = record
+        return [found[entry["call_id"]] for entry in entries if entry["call_id"] in found]
+
+    def get(self, call_id: str) -> Optional[Dict[str, Any]]:
+        """
+        call_id で記録を1件取得する
+
+        Args:
+            call_id: 呼び出しID
+
+        Returns:
+            Optional[Dict[str, Any]]: 記録。見つからない場合はNone
+        """
+        records = self.load(self.query(call_id=call_id, limit=1))
+        return records[0] if records else None
+
+
+_default_store: Optional[CaptureStore] = None
+_default_lock = threading.Lock()
+
+
+def get_capture_store() -> CaptureStore:
+    """
+    アプリケーション共通のキャプチャストアを返す
+
+    保存先は環境変数 LLM_CAPTURE_DIR（既定: logs/llm_capture）、設定は CaptureConfig.from_env()。
+
+    Returns:
+        CaptureStore: キャプチャストア
+    """
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = CaptureStore(os.getenv("LLM_CAPTURE_DIR", DEFAULT_CAPTURE_DIR), CaptureConfig.from_env())
+            atexit.register(_default_store.close)
+        return _default_store
+
+
+def set_capture_store(store: Optional[CaptureStore]) -> None:
+    """共通のキャプチャストアを差し替える（テスト・設定変更用）"""
+    global _default_store
+    with _default_lock:
+        _default_store = store
+
+
+def capture_llm_io(
+    provider: str,
+    source: str,
+    outcome: str = OUTCOME_SUCCESS,
+    structure_id: Optional[str] = None,
+    call_id: Optional[str] = None,
+    **payload: Any
+) -> Optional[str]:
+    """
+    共通のキャプチャストアにLLM入出力を記録する（記録の失敗は呼び出し元に伝えない）
+
+    Args:
+        provider: プロバイダー名
+        source: 記録した箇所
+        outcome: 結果
+        structure_id: 構成ID
+        call_id: 呼び出しID
+        **payload: prompt / response / error などの本体
+
+    Returns:
+        Optional[str]: 記録した call_id
+    """
+    try:
+        return get_capture_store().capture(provider, source, payload, outcome=outcome, structure_id=structure_id, call_id=call_id)
+    except Exception as e:
+        logger.warning(f"⚠️ LLM入出力のキャプチャに失敗しました: {e}")
+        return None
+
+
+__all__ = [
+    "DEFAULT_CAPTURE_DIR",
+    "OUTCOME_ERROR",
+    "OUTCOME_SUCCESS",
+    "CaptureConfig",
+    "CaptureStore",
+    "capture_llm_io",
+    "get_capture_store",
+    "set_capture_store",
+]
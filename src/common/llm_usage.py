@@ -0,0 +1,720 @@
+"""
+LLM利用量の台帳（トークン数の記録・集計・クォータ）
+
+AIController などから呼び出しごとの入力/出力トークン数を記録し、
+プロバイダー・モデル・プロンプト名・構成ID・セッションIDごとに分単位と日単位で集計します。
+
+- 記録は logs/usage/usage-YYYYMMDD.jsonl に1行ずつ追記し、起動時に直近の日付分を読み直す
+- クォータは global / provider / structure / session の単位で、分・日ごとのトークン数と呼び出し回数を指定する
+- 呼び出し前に check() / acquire() で判定し、超過時は UsageQuotaExceededError を送出する
+  （分単位の超過は設定により次の分まで待機できる）
+- acquire() は判定と同時に見積もりのトークン数と呼び出し1回分を予約し、record() で実際の値に精算する
+  （呼び出さずに終わった場合は release() で戻す）。同時に呼び出されても予約の合計でクォータを判定する
+- 集計とクォータの判定はプロセスごとに行う。複数のワーカープロセスで動かす場合、記録のファイルは共有されるが
+  他のプロセスの消費は起動時の読み直しまで反映されないため、クォータは実質的にワーカーごとの上限になる
+- 構成ID・セッションID・プロンプト名は usage_context() で呼び出し元のコンテキストに設定する
+- プロンプトキャッシュから読んだ・書いたトークン数も記録し、集計に含める
+
+集計の時間区切りはUTCです。
+"""
+
+import contextlib
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from src.common import json_codec
+from src.common.prompt_cache import content_text
+from src.exceptions import UsageQuotaExceededError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_USAGE_DIR = os.path.join("logs", "usage")
+
+# 集計の単位
+WINDOW_MINUTE = "minute"
+WINDOW_DAY = "day"
+WINDOW_SECONDS = {WINDOW_MINUTE: 60, WINDOW_DAY: 86400}
+
+# クォータの対象
+SCOPE_GLOBAL = "global"
+SCOPE_PROVIDER = "provider"
+SCOPE_STRUCTURE = "structure"
+SCOPE_SESSION = "session"
+SCOPES = (SCOPE_GLOBAL, SCOPE_PROVIDER, SCOPE_STRUCTURE, SCOPE_SESSION)
+
+# クォータの項目（項目名 → (集計単位, 数える値)）
+LIMIT_FIELDS = {
+    "tokens_per_minute": (WINDOW_MINUTE, "tokens"),
+    "calls_per_minute": (WINDOW_MINUTE, "calls"),
+    "tokens_per_day": (WINDOW_DAY, "tokens"),
+    "calls_per_day": (WINDOW_DAY, "calls"),
+}
+
+# 超過時の動作
+QUOTA_MODE_REJECT = "reject"
+QUOTA_MODE_DEFER = "defer"
+
+# 集計を保持する期間
+MINUTE_RETENTION_SECONDS = 3 * 3600
+DAY_RETENTION_DAYS = 31
+
+# 起動時に読み直す日数
+LOAD_DAYS = 7
+
+# 集計のキーに使う項目
+ROLLUP_FIELDS = ("provider", "model", "prompt_name", "structure_id", "session_id")
+
+_context: contextvars.ContextVar[Dict[str, Any]] = contextvars.ContextVar("aidex_usage_context", default={})
+
+
+def current_usage_context() -> Dict[str, Any]:
+    """現在の利用量コンテキスト（structure_id / session_id / prompt_name）を返す"""
+    return dict(_context.get())
+
+
+def set_usage_context(**attributes: Any) -> Callable[[], None]:
+    """
+    利用量コンテキストを設定する（Flaskの before_request / teardown_request 用）
+
+    Args:
+        **attributes: structure_id / session_id / prompt_name など（Noneは無視する）
+
+    Returns:
+        Callable[[], None]: 元のコンテキストに戻す関数
+    """
+    merged = {**_context.get(), **{key: value for key, value in attributes.items() if value is not None}}
+    token = _context.set(merged)
+
+    def restore() -> None:
+        _context.reset(token)
+
+    return restore
+
+
+@contextlib.contextmanager
+def usage_context(**attributes: Any) -> Iterator[Dict[str, Any]]:
+    """
+    ブロック内のLLM呼び出しに構成ID・セッションID・プロンプト名を付ける
+
+    Args:
+        **attributes: structure_id / session_id / prompt_name など（Noneは無視する）
+    """
+    restore = set_usage_context(**attributes)
+    try:
+        yield current_usage_context()
+    finally:
+        restore()
+
+
+def _read(source: Any, *names: str) -> int:
+    for name in names:
+        value = source.get(name) if isinstance(source, dict) else getattr(source, name, None)
+        if isinstance(value, (int, float)):
+            return int(value)
+    return 0
+
+
+def normalize_usage(usage: Any) -> Tuple[int, int]:
+    """
+    プロバイダーごとに異なるusageの形式を (入力トークン数, 出力トークン数) にそろえる
+
+    OpenAI（prompt_tokens / completion_tokens）、Anthropic（input_tokens / output_tokens）、
+    Gemini（prompt_token_count / candidates_token_count）の辞書またはオブジェクトに対応する。
+    Anthropic の input_tokens はキャッシュの読み書き分を含まないため、他のプロバイダーとそろえて加算する。
+
+    Args:
+        usage: usage の辞書またはオブジェクト
+
+    Returns:
+        Tuple[int, int]: 入力トークン数と出力トークン数
+    """
+    if not usage:
+        return 0, 0
+    input_tokens = _read(usage, "input_tokens", "prompt_tokens", "prompt_token_count")
+    input_tokens += _read(usage, "cache_read_input_tokens") + _read(usage, "cache_creation_input_tokens")
+    output_tokens = _read(usage, "output_tokens", "completion_tokens", "candidates_token_count")
+    return input_tokens, output_tokens
+
+
+def normalize_cache_usage(usage: Any) -> Tuple[int, int]:
+    """
+    usage からプロンプトキャッシュのトークン数を (キャッシュから読んだ数, キャッシュに書いた数) で取り出す
+
+    Anthropic（cache_read_input_tokens / cache_creation_input_tokens）、
+    OpenAI（prompt_tokens_details.cached_tokens）、Gemini（cached_content_token_count）に対応する。
+    キャッシュへの書き込みを報告するのは Anthropic のみ。
+
+    Args:
+        usage: usage の辞書またはオブジェクト
+
+    Returns:
+        Tuple[int, int]: キャッシュから読んだ入力トークン数と、キャッシュに書いた入力トークン数
+    """
+    if not usage:
+        return 0, 0
+    details = usage.get("prompt_tokens_details") if isinstance(usage, dict) else getattr(usage, "prompt_tokens_details", None)
+    cache_read = _read(usage, "cache_read_input_tokens", "cached_content_token_count", "cached_tokens")
+    if not cache_read and details:
+        cache_read = _read(details, "cached_tokens")
+    return cache_read, _read(usage, "cache_creation_input_tokens")
+
+
+def estimate_tokens(messages: Any) -> int:
+    """
+    送信前のおおよその入力トークン数を見積もる（英数字は4文字、それ以外は1文字を1トークンとする）
+
+    Args:
+        messages: メッセージのリストまたはプロンプト文字列
+
+    Returns:
+        int: 見積もりトークン数
+    """
+    if isinstance(messages, str):
+        texts = [messages]
+    else:
+        texts = [
+            content_text(message.get("content", "")) if isinstance(message, dict) else str(message)
+            for message in messages or []
+        ]
+    total = 0
+    for text in texts:
+        ascii_chars = sum(1 for char in text if ord(char) < 128)
+        total += ascii_chars // 4 + (len(text) - ascii_chars)
+    return total
+
+
+def load_quotas(value: Optional[str]) -> Dict[str, Dict[str, int]]:
+    """
+    クォータ設定（JSON文字列またはJSONファイルのパス）を読み込む
+
+    例: {"session": {"tokens_per_minute": 20000}, "provider:chatgpt": {"tokens_per_day": 2000000}}
+    "scope" は対象ごとに、"scope:key" は特定の対象だけに適用する。
+
+    Args:
+        value: 環境変数 AIDEX_USAGE_QUOTAS の値
+
+    Returns:
+        Dict[str, Dict[str, int]]: クォータ設定（読み込めない場合は空）
+    """
+    if not value:
+        return {}
+    try:
+        if value.lstrip().startswith("{"):
+            data = json_codec.loads(value)
+        else:
+            with open(value, "r", encoding="utf-8") as f:
+                data = json_codec.loads(f.read())
+    except Exception as e:
+        logger.error(f"❌ 利用量クォータの設定を読み込めません: {str(e)}")
+        return {}
+    quotas: Dict[str, Dict[str, int]] = {}
+    for target, limits in data.items():
+        if target.partition(":")[0] not in SCOPES or not isinstance(limits, dict):
+            logger.warning(f"⚠️ 不明なクォータ対象を無視します: {target}")
+            continue
+        quotas[target] = {name: int(limit) for name, limit in limits.items() if name in LIMIT_FIELDS}
+    return quotas
+
+
+def _bucket(timestamp: float, window: str) -> int:
+    size = WINDOW_SECONDS[window]
+    return int(timestamp // size * size)
+
+
+def _bucket_label(bucket: int) -> str:
+    return datetime.fromtimestamp(bucket, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class Reservation:
+    """acquire() で予約した利用量（record() で精算するか release() で戻す）"""
+
+    __slots__ = ("provider", "tokens", "keys", "settled")
+
+    def __init__(self, provider: str, tokens: int, keys: List[Tuple[str, int, str, str]]):
+        self.provider = provider
+        self.tokens = tokens
+        # 予約を加えた (集計単位, 区切りの開始時刻, 対象, キー)
+        self.keys = keys
+        self.settled = False
+
+
+class UsageLedger:
+    """
+    LLM利用量の台帳
+
+    呼び出しごとの記録から、対象（global / provider / structure / session）ごとの
+    分・日単位の合計と、ROLLUP_FIELDS の組み合わせごとの集計を更新する。
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        quotas: Optional[Dict[str, Dict[str, int]]] = None,
+        mode: str = QUOTA_MODE_REJECT,
+        max_defer_seconds: float = 30.0,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        """
+        Args:
+            directory: 記録を追記するディレクトリ（Noneの場合はメモリのみ）
+            quotas: クォータ設定（load_quotas() の形式）
+            mode: 分単位のクォータ超過時の動作（"reject" / "defer"）
+            max_defer_seconds: "defer" のときに待機する最大秒数
+            clock: 現在時刻（UNIX秒）を返す関数
+            sleep: 待機する関数
+        """
+        self.directory = directory
+        self.quotas = quotas or {}
+        self.mode = mode
+        self.max_defer_seconds = max_defer_seconds
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.RLock()
+        # (集計単位, 区切りの開始時刻, 対象, キー) → {"calls", "tokens"}
+        self._totals: Dict[Tuple[str, int, str, str], Dict[str, int]] = defaultdict(lambda: {"calls": 0, "tokens": 0})
+        # 実行中の呼び出しの予約（_totals と同じキー）
+        self._reserved: Dict[Tuple[str, int, str, str], Dict[str, int]] = {}
+        # (集計単位, 区切りの開始時刻, ROLLUP_FIELDS の値) → 集計
+        self._rollups: Dict[Tuple[str, int, Tuple[str, ...]], Dict[str, int]] = {}
+        self._rejected = 0
+        self._deferred = 0
+        self._pruned_at = 0
+        if directory:
+            self._load()
+
+    # ------------------------------------------------------------------
+    # 永続化
+    # ------------------------------------------------------------------
+
+    def _path(self, timestamp: float) -> str:
+        day = datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime("%Y%m%d")
+        return os.path.join(self.directory, f"usage-{day}.jsonl")
+
+    def _load(self) -> None:
+        now = self._clock()
+        for days_ago in range(LOAD_DAYS - 1, -1, -1):
+            path = self._path(now - days_ago * 86400)
+            if not os.path.exists(path):
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self._apply(json_codec.loads(line))
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        self._prune(now)
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        if not self.directory:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self._path(record["ts"]), "a", encoding="utf-8") as f:
+                f.write(json_codec.dumps(record, separators=json_codec.COMPACT_SEPARATORS) + "\n")
+        except OSError as e:
+            logger.warning(f"⚠️ 利用量の記録を書き込めません: {e}")
+
+    # ------------------------------------------------------------------
+    # 集計
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _targets(provider: str, structure_id: Optional[str], session_id: Optional[str]) -> List[Tuple[str, str]]:
+        targets = [(SCOPE_GLOBAL, "*"), (SCOPE_PROVIDER, provider)]
+        if structure_id:
+            targets.append((SCOPE_STRUCTURE, structure_id))
+        if session_id:
+            targets.append((SCOPE_SESSION, session_id))
+        return targets
+
+    def _apply(self, record: Dict[str, Any]) -> None:
+        tokens = int(record.get("input_tokens", 0)) + int(record.get("output_tokens", 0))
+        key = tuple(str(record.get(name) or "") for name in ROLLUP_FIELDS)
+        for window in (WINDOW_MINUTE, WINDOW_DAY):
+            bucket = _bucket(record["ts"], window)
+            for scope, target in self._targets(record["provider"], record.get("structure_id"), record.get("session_id")):
+                total = self._totals[(window, bucket, scope, target)]
+                total["calls"] += 1
+                total["tokens"] += tokens
+            rollup = self._rollups.setdefault((window, bucket, key), {
+                "calls": 0, "errors": 0, "input_tokens": 0, "output_tokens": 0,
+                "cache_read_tokens": 0, "cache_write_tokens": 0, "latency_ms": 0,
+            })
+            rollup["calls"] += 1
+            rollup["errors"] += 0 if record.get("outcome", "success") == "success" else 1
+            rollup["input_tokens"] += int(record.get("input_tokens", 0))
+            rollup["output_tokens"] += int(record.get("output_tokens", 0))
+            rollup["cache_read_tokens"] += int(record.get("cache_read_tokens", 0))
+            rollup["cache_write_tokens"] += int(record.get("cache_write_tokens", 0))
+            rollup["latency_ms"] += int(record.get("latency_ms") or 0)
+
+    def _prune(self, now: float) -> None:
+        # 分が変わったときだけ古い区切りを削除する
+        minute = _bucket(now, WINDOW_MINUTE)
+        if minute == self._pruned_at:
+            return
+        self._pruned_at = minute
+        limits = {
+            WINDOW_MINUTE: now - MINUTE_RETENTION_SECONDS,
+            WINDOW_DAY: now - DAY_RETENTION_DAYS * 86400,
+        }
+        for store in (self._totals, self._rollups, self._reserved):
+            for key in [key for key in store if key[1] < limits[key[0]]]:
+                del store[key]
+
+    def record(
+        self,
+        provider: str,
+        usage: Any = None,
+        model: Optional[str] = None,
+        prompt_name: Optional[str] = None,
+        structure_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+        latency_ms: Optional[float] = None,
+        outcome: str = "success",
+        reservation: Optional[Reservation] = None,
+    ) -> Dict[str, Any]:
+        """
+        1回の呼び出しの利用量を記録する
+
+        構成ID・セッションID・プロンプト名を省略した場合は usage_context() の値を使う。
+        reservation を渡すと acquire() の予約を戻してから実際の利用量を加える。
+
+        Args:
+            provider: プロバイダー名
+            usage: プロバイダーが返した usage（normalize_usage() で読む）
+            model: モデル名
+            prompt_name: プロンプト名
+            structure_id: 構成ID
+            session_id: セッションID
+            latency_ms: 所要時間（ミリ秒）
+            outcome: "success" / "error"
+            reservation: acquire() が返した予約
+
+        Returns:
+            Dict[str, Any]: 記録した内容
+        """
+        context = _context.get()
+        input_tokens, output_tokens = normalize_usage(usage)
+        cache_read_tokens, cache_write_tokens = normalize_cache_usage(usage)
+        record = {
+            "ts": round(self._clock(), 3),
+            "provider": provider,
+            "model": model,
+            "prompt_name": prompt_name or context.get("prompt_name"),
+            "structure_id": structure_id or context.get("structure_id"),
+            "session_id": session_id or context.get("session_id"),
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cache_read_tokens": cache_read_tokens,
+            "cache_write_tokens": cache_write_tokens,
+            "latency_ms": round(latency_ms) if latency_ms is not None else None,
+            "outcome": outcome,
+        }
+        with self._lock:
+            self.release(reservation)
+            self._apply(record)
+            self._append(record)
+            self._prune(record["ts"])
+        return record
+
+    # ------------------------------------------------------------------
+    # クォータ
+    # ------------------------------------------------------------------
+
+    def _limits_for(self, scope: str, target: str) -> Dict[str, int]:
+        return {**self.quotas.get(scope, {}), **self.quotas.get(f"{scope}:{target}", {})}
+
+    def check(
+        self,
+        provider: str,
+        estimated_tokens: int = 0,
+        structure_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        呼び出し前にクォータを判定する
+
+        Args:
+            provider: プロバイダー名
+            estimated_tokens: 送信するおおよその入力トークン数
+            structure_id: 構成ID（省略時は usage_context() の値）
+            session_id: セッションID（省略時は usage_context() の値）
+
+        used には実行中の呼び出しの予約を含む。
+
+        Returns:
+            Optional[Dict[str, Any]]: 超過した場合は {"scope", "target", "limit", "used", "window", "retry_after"}。
+            日単位の超過を分単位より優先する。超過しない場合はNone
+        """
+        if not self.quotas:
+            return None
+        context = _context.get()
+        structure_id = structure_id or context.get("structure_id")
+        session_id = session_id or context.get("session_id")
+        now = self._clock()
+        exceeded = None
+        with self._lock:
+            for scope, target in self._targets(provider, structure_id, session_id):
+                for name, limit in self._limits_for(scope, target).items():
+                    window, field = LIMIT_FIELDS[name]
+                    bucket = _bucket(now, window)
+                    key = (window, bucket, scope, target)
+                    used = self._totals.get(key, {}).get(field, 0) + self._reserved.get(key, {}).get(field, 0)
+                    requested = 1 if field == "calls" else estimated_tokens
+                    if used + requested <= limit:
+                        continue
+                    violation = {
+                        "scope": scope,
+                        "target": target,
+                        "limit": name,
+                        "quota": limit,
+                        "used": used,
+                        "window": window,
+                        "retry_after": round(bucket + WINDOW_SECONDS[window] - now, 3),
+                    }
+                    if exceeded is None or (window == WINDOW_DAY and exceeded["window"] != WINDOW_DAY):
+                        exceeded = violation
+        return exceeded
+
+    def acquire(
+        self,
+        provider: str,
+        estimated_tokens: int = 0,
+        structure_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+    ) -> Reservation:
+        """
+        クォータ内であることを確認し、見積もりのトークン数と呼び出し1回分を予約する
+        （超過時は設定に従って待機するか例外を送出する）
+
+        判定と予約は同じロックの中で行うため、同時に呼び出されてもクォータを超えて通すことはない。
+        予約は record(reservation=...) で精算し、呼び出さなかった場合は release() で戻す。
+
+        Args:
+            provider: プロバイダー名
+            estimated_tokens: 送信するおおよその入力トークン数
+            structure_id: 構成ID（省略時は usage_context() の値）
+            session_id: セッションID（省略時は usage_context() の値）
+
+        Returns:
+            Reservation: 予約
+
+        Raises:
+            UsageQuotaExceededError: クォータを超過し、待機もできない場合
+        """
+        context = _context.get()
+        structure_id = structure_id or context.get("structure_id")
+        session_id = session_id or context.get("session_id")
+        waited = 0.0
+        while True:
+            with self._lock:
+                exceeded = self.check(provider, estimated_tokens, structure_id=structure_id, session_id=session_id)
+                if exceeded is None:
+                    return self._reserve(provider, estimated_tokens, structure_id, session_id)
+            can_defer = (
+                self.mode == QUOTA_MODE_DEFER
+                and exceeded["window"] == WINDOW_MINUTE
+                and waited + exceeded["retry_after"] <= self.max_defer_seconds
+            )
+            if not can_defer:
+                with self._lock:
+                    self._rejected += 1
+                logger.warning(
+                    f"🚫 利用量クォータを超過しました - {exceeded['scope']}:{exceeded['target']} "
+                    f"{exceeded['limit']}={exceeded['quota']} (使用量: {exceeded['used']})"
+                )
+                raise UsageQuotaExceededError(
+                    provider,
+                    f"{exceeded['scope']} '{exceeded['target']}' の {exceeded['limit']}（{exceeded['quota']}）を超過しました",
+                    retry_after=exceeded["retry_after"],
+                    violation=exceeded,
+                )
+            with self._lock:
+                self._deferred += 1
+            logger.info(f"⏳ 利用量クォータのため {exceeded['retry_after']:.1f} 秒待機します - {exceeded['scope']}:{exceeded['target']}")
+            self._sleep(exceeded["retry_after"])
+            waited += exceeded["retry_after"]
+
+    def _reserve(
+        self,
+        provider: str,
+        tokens: int,
+        structure_id: Optional[str],
+        session_id: Optional[str],
+    ) -> Reservation:
+        now = self._clock()
+        keys = [
+            (window, _bucket(now, window), scope, target)
+            for window in (WINDOW_MINUTE, WINDOW_DAY)
+            for scope, target in self._targets(provider, structure_id, session_id)
+        ]
+        for key in keys:
+            reserved = self._reserved.setdefault(key, {"calls": 0, "tokens": 0})
+            reserved["calls"] += 1
+            reserved["tokens"] += tokens
+        return Reservation(provider, tokens, keys)
+
+    def release(self, reservation: Optional[Reservation]) -> None:
+        """
+        acquire() の予約を戻す（呼び出しに失敗して record() しない場合に使う。2回目以降は何もしない）
+
+        Args:
+            reservation: acquire() が返した予約
+        """
+        if reservation is None:
+            return
+        with self._lock:
+            if reservation.settled:
+                return
+            reservation.settled = True
+            for key in reservation.keys:
+                reserved = self._reserved.get(key)
+                if reserved is None:
+                    # 区切りが古くなり削除済み
+                    continue
+                reserved["calls"] -= 1
+                reserved["tokens"] -= reservation.tokens
+                if reserved["calls"] <= 0:
+                    del self._reserved[key]
+
+    # ------------------------------------------------------------------
+    # 参照
+    # ------------------------------------------------------------------
+
+    def rollups(
+        self,
+        window: str = WINDOW_MINUTE,
+        group_by: Optional[List[str]] = None,
+        since: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        分・日単位の集計を返す
+
+        Args:
+            window: "minute" / "day"
+            group_by: まとめる項目（ROLLUP_FIELDS の一部。省略時はすべて）
+            since: この時刻（UNIX秒）以降の区切りだけを返す
+
+        Returns:
+            List[Dict[str, Any]]: 区切りの古い順の集計
+        """
+        if window not in WINDOW_SECONDS:
+            raise ValueError(f"不明な集計単位です: {window}")
+        fields = [name for name in ROLLUP_FIELDS if name in (group_by or ROLLUP_FIELDS)]
+        merged: Dict[Tuple[int, Tuple[str, ...]], Dict[str, int]] = {}
+        with self._lock:
+            for (rollup_window, bucket, key), values in self._rollups.items():
+                if rollup_window != window or (since is not None and bucket + WINDOW_SECONDS[window] <= since):
+                    continue
+                labels = dict(zip(ROLLUP_FIELDS, key))
+                group = (bucket, tuple(labels[name] for name in fields))
+                target = merged.setdefault(group, dict.fromkeys(values, 0))
+                for name, value in values.items():
+                    target[name] += value
+        return [
+            {"bucket": _bucket_label(bucket), **dict(zip(fields, labels)), **values}
+            for (bucket, labels), values in sorted(merged.items())
+        ]
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        現在の分・日の消費量とクォータの残量を返す
+
+        Returns:
+            Dict[str, Any]: {"minute", "day", "quotas", "mode", "rejected", "deferred"}
+        """
+        now = self._clock()
+        result: Dict[str, Any] = {}
+        with self._lock:
+            for window in (WINDOW_MINUTE, WINDOW_DAY):
+                bucket = _bucket(now, window)
+                usage: Dict[str, Dict[str, Any]] = defaultdict(dict)
+                for (total_window, total_bucket, scope, target), values in self._totals.items():
+                    if total_window == window and total_bucket == bucket:
+                        usage[scope][target] = dict(values)
+                result[window] = {"bucket": _bucket_label(bucket), "usage": dict(usage)}
+            quotas = []
+            for quota_key, limits in self.quotas.items():
+                scope, _, target = quota_key.partition(":")
+                for name, limit in limits.items():
+                    window, field = LIMIT_FIELDS[name]
+                    current = result[window]["usage"].get(scope, {})
+                    if scope == SCOPE_GLOBAL:
+                        targets = ["*"]
+                    else:
+                        targets = [target] if target else list(current)
+                    used = {key: current.get(key, {}).get(field, 0) for key in targets}
+                    quotas.append({
+                        "scope": scope,
+                        "target": target or None,
+                        "limit": name,
+                        "quota": limit,
+                        "used": used,
+                        "remaining": {key: max(limit - value, 0) for key, value in used.items()},
+                    })
+            result.update({
+                "quotas": quotas,
+                "mode": self.mode,
+                "rejected": self._rejected,
+                "deferred": self._deferred,
+            })
+        return result
+
+
+_default_ledger: Optional[UsageLedger] = None
+_default_lock = threading.Lock()
+
+
+def get_usage_ledger() -> UsageLedger:
+    """
+    共通の利用量台帳を返す
+
+    環境変数 AIDEX_USAGE_DIR（記録先、既定は logs/usage）、AIDEX_USAGE_QUOTAS（クォータ）、
+    AIDEX_USAGE_QUOTA_MODE（"reject" / "defer"）、AIDEX_USAGE_MAX_DEFER_S（最大待機秒数）を参照する。
+
+    Returns:
+        UsageLedger: 利用量台帳
+    """
+    global _default_ledger
+    with _default_lock:
+        if _default_ledger is None:
+            _default_ledger = UsageLedger(
+                os.getenv("AIDEX_USAGE_DIR", DEFAULT_USAGE_DIR),
+                quotas=load_quotas(os.getenv("AIDEX_USAGE_QUOTAS")),
+                mode=os.getenv("AIDEX_USAGE_QUOTA_MODE", QUOTA_MODE_REJECT),
+                max_defer_seconds=float(os.getenv("AIDEX_USAGE_MAX_DEFER_S", "30")),
+            )
+        return _default_ledger
+
+
+def set_usage_ledger(ledger: Optional[UsageLedger]) -> None:
+    """共通の利用量台帳を差し替える（テスト・設定変更用）"""
+    global _default_ledger
+    with _default_lock:
+        _default_ledger = ledger
+
+
+__all__ = [
+    "DEFAULT_USAGE_DIR",
+    "QUOTA_MODE_DEFER",
+    "QUOTA_MODE_REJECT",
+    "Reservation",
+    "UsageLedger",
+    "current_usage_context",
+    "estimate_tokens",
+    "get_usage_ledger",
+    "load_quotas",
+    "normalize_cache_usage",
+    "normalize_usage",
+    "set_usage_context",
+    "set_usage_ledger",
+    "usage_context",
+]
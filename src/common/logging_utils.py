@@ -10,6 +10,8 @@ import sys
 import traceback
 from typing import Optional
 
+from src.common.tracing import TraceContextFilter
+
 
 def setup_logging(
     log_file: str = "app.log",
@@ -40,23 +42,27 @@ def setup_logging(
     root_logger.handlers.clear()  # 重複登録を防ぐ
     
     # ログフォーマッター（詳細版）
+    # trace_tag はリクエスト処理中のみ " [request_id=<id>]" になる（TraceContextFilter）
     detailed_formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s"
+        "%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s%(trace_tag)s"
     )
     
     # シンプルフォーマッター
-    simple_formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+    simple_formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s%(trace_tag)s")
+    trace_filter = TraceContextFilter()
     
     # ファイルハンドラーを標準として追加（app.log）
     file_handler = logging.FileHandler(log_file, mode='a', encoding='utf-8')
     file_handler.setFormatter(detailed_formatter)
     file_handler.setLevel(logging.DEBUG)  # ファイルにはすべてのログを出力
+    file_handler.addFilter(trace_filter)
     root_logger.addHandler(file_handler)
     
     # コンソールハンドラー（常に出力）
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setFormatter(simple_formatter)
     console_handler.setLevel(level)
+    console_handler.addFilter(trace_filter)
     root_logger.addHandler(console_handler)
     
     # Flask関連のログレベルを調整
@@ -0,0 +1,401 @@
+"""
+タスク別のモデルルーティング
+
+LLM呼び出しはタスクの種類（extract / summarize / evaluate / complete / generate）を宣言し、
+ルーティングポリシーがプロバイダーとモデルを選びます。
+
+- ポリシーはタスクごとに候補（軽い順のプロバイダー・モデル）、レイテンシSLO、最低成功率を持つ
+- 観測した直近の成功率とp95レイテンシが目標を満たす最初の候補を選ぶ
+- 検証に失敗した応答は、次の（より強い）候補にエスカレーションできる
+- すべてのルーティング判断をログ（logger と logs/routing の JSON Lines）に記録する
+
+ポリシーは環境変数 AIDEX_ROUTING_POLICY（JSON文字列またはファイルパス）でタスク単位に上書きできます。
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from src.common import json_codec
+
+logger = logging.getLogger(__name__)
+
+TASK_CLASSES = ("extract", "summarize", "evaluate", "complete", "generate")
+
+# ポリシーに候補がないプロバイダーで使うモデル（各プロバイダークラスの既定値）
+PROVIDER_DEFAULT_MODELS = {
+    "chatgpt": "gpt-4",
+    "claude": "claude-3-opus-20240229",
+    "gemini": "gemini-1.5-flash",
+}
+
+# 既定のポリシー（候補は軽い順。後ろの候補ほどエスカレーション先として強い）
+DEFAULT_POLICY: Dict[str, Any] = {
+    "window": 50,
+    "min_samples": 5,
+    "tasks": {
+        "extract": {
+            "candidates": [
+                {"provider": "chatgpt", "model": "gpt-4o-mini"},
+                {"provider": "gemini", "model": "gemini-1.5-flash"},
+                {"provider": "chatgpt", "model": "gpt-4o"},
+            ],
+            "latency_slo_ms": 10000,
+            "min_success_rate": 0.8,
+            "max_escalations": 1,
+        },
+        "summarize": {
+            "candidates": [
+                {"provider": "gemini", "model": "gemini-1.5-flash"},
+                {"provider": "chatgpt", "model": "gpt-4o-mini"},
+                {"provider": "claude", "model": "claude-3-haiku-20240307"},
+            ],
+            "latency_slo_ms": 8000,
+            "min_success_rate": 0.8,
+            "max_escalations": 0,
+        },
+        "evaluate": {
+            "candidates": [
+                {"provider": "claude", "model": "claude-3-5-sonnet-20240620"},
+                {"provider": "claude", "model": "claude-3-opus-20240229"},
+                {"provider": "chatgpt", "model": "gpt-4o"},
+                {"provider": "gemini", "model": "gemini-1.5-pro"},
+            ],
+            "latency_slo_ms": 30000,
+            "min_success_rate": 0.7,
+            "max_escalations": 1,
+        },
+        "complete": {
+            "candidates": [
+                {"provider": "gemini", "model": "gemini-1.5-flash"},
+                {"provider": "gemini", "model": "gemini-1.5-pro"},
+                {"provider": "chatgpt", "model": "gpt-4o"},
+                {"provider": "claude", "model": "claude-3-5-sonnet-20240620"},
+            ],
+            "latency_slo_ms": 30000,
+            "min_success_rate": 0.7,
+            "max_escalations": 1,
+        },
+        "generate": {
+            "candidates": [
+                {"provider": "chatgpt", "model": "gpt-4o"},
+                {"provider": "claude", "model": "claude-3-5-sonnet-20240620"},
+                {"provider": "gemini", "model": "gemini-1.5-pro"},
+            ],
+            "latency_slo_ms": 45000,
+            "min_success_rate": 0.7,
+            "max_escalations": 1,
+        },
+    },
+}
+
+# 直近の判断を保持する件数
+RECENT_DECISIONS = 200
+
+
+@dataclass
+class RouteDecision:
+    """1回のルーティング判断"""
+    task: str
+    provider: str
+    model: str
+    reason: str
+    tier: int = -1
+    escalated_from: Optional[str] = None
+    skipped: List[Dict[str, Any]] = field(default_factory=list)
+    decided_at: str = ""
+
+    @property
+    def target(self) -> str:
+        return f"{self.provider}/{self.model}"
+
+
+class _ModelStats:
+    """プロバイダー・モデルごとの直近の結果"""
+
+    def __init__(self, window: int):
+        self.results: Deque[Tuple[bool, float]] = deque(maxlen=window)
+
+    def success_rate(self) -> Optional[float]:
+        if not self.results:
+            return None
+        return sum(1 for success, _ in self.results if success) / len(self.results)
+
+    def p95_latency_ms(self) -> Optional[float]:
+        if not self.results:
+            return None
+        latencies = sorted(latency for _, latency in self.results)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+
+    def to_dict(self) -> Dict[str, Any]:
+        rate, p95 = self.success_rate(), self.p95_latency_ms()
+        return {
+            "samples": len(self.results),
+            "success_rate": round(rate, 4) if rate is not None else None,
+            "p95_latency_ms": round(p95, 1) if p95 is not None else None,
+        }
+
+
+def load_routing_policy(source: Optional[str] = None) -> Dict[str, Any]:
+    """
+    ルーティングポリシーを読み込み、既定のポリシーにタスク単位で上書きする
+
+    Args:
+        source: JSON文字列またはファイルパス（Noneまたは空の場合は既定のポリシー）
+
+    Returns:
+        Dict[str, Any]: ポリシー
+
+    Raises:
+        ValueError: 読み込めない、または不明なタスクを含む場合
+    """
+    policy = json_codec.loads(json_codec.dumps(DEFAULT_POLICY))
+    if not source:
+        return policy
+    try:
+        if source.lstrip().startswith("{"):
+            override = json_codec.loads(source)
+        else:
+            with open(source, "r", encoding="utf-8") as f:
+                override = json_codec.loads(f.read())
+    except (OSError, ValueError) as e:
+        raise ValueError(f"ルーティングポリシーを読み込めません: {e}") from e
+
+    for task, settings in (override.get("tasks") or {}).items():
+        if task not in TASK_CLASSES:
+            raise ValueError(f"不明なタスクです: {task}（{' / '.join(TASK_CLASSES)}）")
+        policy["tasks"][task].update(settings)
+    for key in ("window", "min_samples"):
+        if key in override:
+            policy[key] = int(override[key])
+    return policy
+
+
+class ModelRouter:
+    """
+    タスク別のモデルルーター
+
+    observe() で記録した成功率・レイテンシをもとに choose() が候補を選ぶ。
+    観測数が min_samples に満たない候補は目標を満たすものとして扱う。
+    """
+
+    def __init__(self, policy: Optional[Dict[str, Any]] = None, log_dir: Optional[str] = None,
+                 clock: Callable[[], float] = time.time):
+        """
+        Args:
+            policy: ルーティングポリシー（省略時は既定のポリシー）
+            log_dir: 判断を JSON Lines で記録するディレクトリ（Noneの場合はloggerのみ）
+            clock: 現在時刻（UNIX秒）を返す関数
+        """
+        self.policy = policy or load_routing_policy()
+        self.log_dir = log_dir
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._stats: Dict[Tuple[str, str], _ModelStats] = {}
+        self._decisions: Deque[Dict[str, Any]] = deque(maxlen=RECENT_DECISIONS)
+
+    def _task_policy(self, task: str) -> Dict[str, Any]:
+        if task not in self.policy["tasks"]:
+            raise ValueError(f"不明なタスクです: {task}（{' / '.join(TASK_CLASSES)}）")
+        return self.policy["tasks"][task]
+
+    def _candidates(self, task: str, providers: Optional[Iterable[str]],
+                    available: Optional[Iterable[str]]) -> List[Tuple[int, Dict[str, str]]]:
+        allowed = set(providers) if providers else None
+        registered = set(available) if available is not None else None
+        return [
+            (tier, candidate) for tier, candidate in enumerate(self._task_policy(task)["candidates"])
+            if (allowed is None or candidate["provider"] in allowed)
+            and (registered is None or candidate["provider"] in registered)
+        ]
+
+    def _miss_reason(self, task: str, candidate: Dict[str, str]) -> Optional[str]:
+        """候補が目標を満たさない理由（満たす場合はNone）"""
+        settings = self._task_policy(task)
+        with self._lock:
+            stats = self._stats.get((candidate["provider"], candidate["model"]))
+            if stats is None or len(stats.results) < self.policy.get("min_samples", 0):
+                return None
+            rate, p95 = stats.success_rate(), stats.p95_latency_ms()
+        if rate is not None and rate < settings.get("min_success_rate", 0.0):
+            return f"success_rate {rate:.2f} < {settings['min_success_rate']}"
+        slo = settings.get("latency_slo_ms")
+        if slo and p95 is not None and p95 > slo:
+            return f"p95 {p95:.0f}ms > SLO {slo}ms"
+        return None
+
+    def _decide(self, decision: RouteDecision) -> RouteDecision:
+        """判断を記録して返す"""
+        decision.decided_at = datetime.fromtimestamp(self._clock(), timezone.utc).isoformat()
+        record = asdict(decision)
+        with self._lock:
+            self._decisions.append(record)
+        logger.info(f"🧭 ルーティング - task: {decision.task} → {decision.target}（{decision.reason}）")
+        if self.log_dir:
+            try:
+                os.makedirs(self.log_dir, exist_ok=True)
+                path = os.path.join(self.log_dir, f"decisions-{decision.decided_at[:10].replace('-', '')}.jsonl")
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write(json_codec.dumps(record, separators=json_codec.COMPACT_SEPARATORS) + "\n")
+            except OSError as e:
+                logger.warning(f"⚠️ ルーティング判断の記録に失敗しました: {e}")
+        return decision
+
+    def choose(self, task: str, providers: Optional[Iterable[str]] = None,
+               available: Optional[Iterable[str]] = None) -> RouteDecision:
+        """
+        タスクのプロバイダーとモデルを選ぶ
+
+        Args:
+            task: タスクの種類
+            providers: 使ってよいプロバイダー（省略時は制限なし）
+            available: 登録済みのプロバイダー（省略時はすべて利用可能とみなす）
+
+        Returns:
+            RouteDecision: 判断
+
+        Raises:
+            ValueError: 不明なタスクの場合
+        """
+        candidates = self._candidates(task, providers, available)
+        if not candidates:
+            provider = next(iter(providers or []), None) or next(iter(sorted(available or [])), "chatgpt")
+            return self._decide(RouteDecision(
+                task, provider, PROVIDER_DEFAULT_MODELS.get(provider, ""), "no policy candidate; provider default"
+            ))
+
+        skipped = []
+        for tier, candidate in candidates:
+            reason = self._miss_reason(task, candidate)
+            if reason is None:
+                return self._decide(RouteDecision(
+                    task, candidate["provider"], candidate["model"],
+                    "first candidate" if not skipped else "earlier candidates missed targets",
+                    tier=tier, skipped=skipped
+                ))
+            skipped.append({"target": f"{candidate['provider']}/{candidate['model']}", "reason": reason})
+
+        # すべて目標を満たさない場合は成功率が最も高い候補にする
+        def rate(item: Tuple[int, Dict[str, str]]) -> float:
+            with self._lock:
+                stats = self._stats.get((item[1]["provider"], item[1]["model"]))
+                return (stats.success_rate() if stats else None) or 0.0
+
+        tier, candidate = max(candidates, key=lambda item: (rate(item), -item[0]))
+        return self._decide(RouteDecision(
+            task, candidate["provider"], candidate["model"], "no candidate met targets; best success rate",
+            tier=tier, skipped=skipped
+        ))
+
+    def escalate(self, decision: RouteDecision, providers: Optional[Iterable[str]] = None,
+                 available: Optional[Iterable[str]] = None) -> Optional[RouteDecision]:
+        """
+        検証に失敗した判断から、次の（より強い）候補にエスカレーションする
+
+        Args:
+            decision: 失敗した判断
+            providers: 使ってよいプロバイダー
+            available: 登録済みのプロバイダー
+
+        Returns:
+            Optional[RouteDecision]: 新しい判断（次の候補がない場合はNone）
+        """
+        for tier, candidate in self._candidates(decision.task, providers, available):
+            if tier > decision.tier:
+                return self._decide(RouteDecision(
+                    decision.task, candidate["provider"], candidate["model"], "escalated after validation failure",
+                    tier=tier, escalated_from=decision.target
+                ))
+        logger.info(f"🧭 エスカレーション先がありません - task: {decision.task}, {decision.target}")
+        return None
+
+    def max_escalations(self, task: str) -> int:
+        """タスクで許すエスカレーションの回数"""
+        return int(self._task_policy(task).get("max_escalations", 0))
+
+    def observe(self, provider: str, model: str, latency_ms: float, success: bool) -> None:
+        """
+        呼び出しの結果を記録する
+
+        Args:
+            provider: プロバイダー名
+            model: モデル名
+            latency_ms: レイテンシ（ミリ秒）
+            success: 呼び出しと検証に成功したかどうか
+        """
+        with self._lock:
+            stats = self._stats.get((provider, model))
+            if stats is None:
+                stats = self._stats[(provider, model)] = _ModelStats(self.policy.get("window", 50))
+            stats.results.append((bool(success), float(latency_ms)))
+
+    def model_for(self, task: str, provider: str) -> str:
+        """
+        プロバイダーが固定された呼び出しで使うモデル（タスクの候補のうちそのプロバイダーの最初のもの）
+
+        Args:
+            task: タスクの種類
+            provider: プロバイダー名
+
+        Returns:
+            str: モデル名
+        """
+        for _, candidate in self._candidates(task, [provider], None):
+            return candidate["model"]
+        return PROVIDER_DEFAULT_MODELS.get(provider, "")
+
+    def stats(self) -> Dict[str, Any]:
+        """モデルごとの観測値と直近の判断を返す"""
+        with self._lock:
+            return {
+                "models": {f"{provider}/{model}": stats.to_dict() for (provider, model), stats in self._stats.items()},
+                "recent_decisions": list(self._decisions)[-20:],
+                "policy": self.policy,
+            }
+
+
+_router: Optional[ModelRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_model_router() -> ModelRouter:
+    """
+    プロセス共通のモデルルーターを返す
+
+    ポリシーは環境変数 AIDEX_ROUTING_POLICY、判断の記録先は AIDEX_ROUTING_LOG_DIR（既定は logs/routing）。
+
+    Returns:
+        ModelRouter: モデルルーター
+    """
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = ModelRouter(
+                load_routing_policy(os.getenv("AIDEX_ROUTING_POLICY")),
+                log_dir=os.getenv("AIDEX_ROUTING_LOG_DIR", os.path.join("logs", "routing")) or None,
+            )
+        return _router
+
+
+def set_model_router(router: Optional[ModelRouter]) -> None:
+    """プロセス共通のモデルルーターを差し替える（Noneで次回に作り直す）"""
+    global _router
+    with _router_lock:
+        _router = router
+
+
+__all__ = [
+    "DEFAULT_POLICY",
+    "PROVIDER_DEFAULT_MODELS",
+    "TASK_CLASSES",
+    "ModelRouter",
+    "RouteDecision",
+    "get_model_router",
+    "load_routing_policy",
+    "set_model_router",
+]
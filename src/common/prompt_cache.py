@@ -0,0 +1,147 @@
+"""
+プロバイダー側のプロンプトキャッシュを効かせるためのプロンプトの配置
+
+プロバイダーのプロンプトキャッシュは、前回と先頭から一致する部分（プレフィックス）だけを再利用します。
+長い固定の指示と構成ごとのデータが混在したプロンプトでは一致する部分がほとんど残らないため、
+プロンプトを「固定のプレフィックス」と「呼び出しごとに変わるサフィックス」に分けて、
+固定部分を必ず先頭に置きます。
+
+- PromptLayout.to_messages() はプレフィックスの末尾にキャッシュの区切り（Anthropic の cache_control）を付けた
+  コンテンツブロック形式のメッセージを作る
+- 区切りを扱えないプロバイダー（OpenAI・Gemini）は flatten_messages() で本文を連結して送る。
+  連結後もプレフィックスが先頭にあるため、各プロバイダーの自動のプレフィックスキャッシュが効く
+- cache_prefix() はメッセージの先頭から最後の区切りまでを返す（フェイクプロバイダーのキャッシュの模倣用）
+"""
+
+import hashlib
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from src.common import json_codec
+
+# Anthropic のキャッシュの区切り（既定の有効期間は5分）
+CACHE_CONTROL: Dict[str, str] = {"type": "ephemeral"}
+
+# プレフィックスとサフィックスの間に入れる文字列
+DEFAULT_SEPARATOR = "\n\n"
+
+
+@dataclass(frozen=True)
+class PromptLayout:
+    """固定のプレフィックスと呼び出しごとのサフィックスに分けたプロンプト"""
+    prefix: str
+    suffix: str
+    separator: str = DEFAULT_SEPARATOR
+
+    @property
+    def text(self) -> str:
+        """プレフィックスとサフィックスを連結した本文"""
+        if not self.prefix:
+            return self.suffix
+        if not self.suffix:
+            return self.prefix
+        return f"{self.prefix}{self.separator}{self.suffix}"
+
+    @property
+    def prefix_key(self) -> str:
+        """プレフィックスのハッシュ（同じプレフィックスを共有する呼び出しの識別用）"""
+        return hashlib.sha256(self.prefix.encode("utf-8")).hexdigest()[:16]
+
+    def to_messages(self, role: str = "user") -> List[Dict[str, Any]]:
+        """
+        プレフィックスの末尾にキャッシュの区切りを付けたメッセージを作る
+
+        プレフィックスが空の場合は区切りを付けず、本文を文字列で持つ通常のメッセージにする。
+
+        Args:
+            role: メッセージのロール
+
+        Returns:
+            List[Dict[str, Any]]: role / content（コンテンツブロックのリストまたは文字列）のメッセージ
+        """
+        if not self.prefix:
+            return [{"role": role, "content": self.suffix}]
+        blocks: List[Dict[str, Any]] = [
+            {"type": "text", "text": self.prefix + (self.separator if self.suffix else ""), "cache_control": dict(CACHE_CONTROL)}
+        ]
+        if self.suffix:
+            blocks.append({"type": "text", "text": self.suffix})
+        return [{"role": role, "content": blocks}]
+
+
+def content_text(content: Any) -> str:
+    """
+    メッセージの content を本文の文字列にする（コンテンツブロックは text を連結する）
+
+    Args:
+        content: 文字列、またはコンテンツブロックのリスト
+
+    Returns:
+        str: 本文
+    """
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            block.get("text", "") if isinstance(block, dict) else str(block)
+            for block in content
+        )
+    if content is None:
+        return ""
+    return json_codec.dumps(content)
+
+
+def flatten_messages(messages: List[Any]) -> List[Dict[str, Any]]:
+    """
+    コンテンツブロックのメッセージを文字列の content に戻す（キャッシュの区切りは取り除く）
+
+    Args:
+        messages: メッセージのリスト
+
+    Returns:
+        List[Dict[str, Any]]: content が文字列のメッセージのリスト（role 以外の項目はそのまま）
+    """
+    flattened = []
+    for message in messages or []:
+        if isinstance(message, dict) and isinstance(message.get("content"), list):
+            message = {**message, "content": content_text(message["content"])}
+        flattened.append(message)
+    return flattened
+
+
+def cache_prefix(messages: Any) -> Optional[str]:
+    """
+    メッセージの先頭から最後のキャッシュの区切りまでを、一致判定に使う文字列にして返す
+
+    Args:
+        messages: メッセージのリスト（文字列の場合は区切りなし）
+
+    Returns:
+        Optional[str]: ロールと本文を連結したキャッシュ対象のプレフィックス（区切りがない場合はNone）
+    """
+    if isinstance(messages, str):
+        return None
+    parts: List[str] = []
+    prefix: Optional[str] = None
+    for message in messages or []:
+        content = message.get("content", "") if isinstance(message, dict) else getattr(message, "content", "")
+        # ロールが変わると別のプレフィックスになるため、ロールも含める
+        parts.append(f"\x1e{message.get('role', 'user') if isinstance(message, dict) else 'user'}\x1f")
+        for block in content if isinstance(content, list) else [content]:
+            if isinstance(block, dict):
+                parts.append(block.get("text", ""))
+                if block.get("cache_control"):
+                    prefix = "".join(parts)
+            else:
+                parts.append(content_text(block))
+    return prefix
+
+
+__all__ = [
+    "CACHE_CONTROL",
+    "DEFAULT_SEPARATOR",
+    "PromptLayout",
+    "cache_prefix",
+    "content_text",
+    "flatten_messages",
+]
@@ -0,0 +1,637 @@
+"""
+プロセス間で共有するキャッシュ
+
+gunicorn などで複数のワーカープロセスを動かすと、プロセス内のキャッシュ（プレビューのHTML、
+構成分析の結果など）はワーカーごとに重複して計算され、別のワーカーで構成が保存されても
+無効化されません。このモジュールは2段のキャッシュを提供します。
+
+- ローカル層: プロセス内のLRU（LocalCache）。値はそのまま保持する
+- 共有層: 同じホストのプロセス間で共有するストア。既定はデータディレクトリ直下のSQLite
+  （SQLiteCacheBackend）で、AIDEX_CACHE_BACKEND=redis と AIDEX_CACHE_REDIS_URL を指定すると
+  Redis（redis パッケージが必要）を使う。値は json_codec でJSONにして保存する
+
+構成IDなどに依存するエントリは scope を指定して保存します。scope ごとのリビジョン番号は
+共有層にあり、save_structure が保存のたびに構成のスコープ（structure_scope(id)）のリビジョンを
+bump_revision() で進めます。各プロセスはリビジョンを最大 AIDEX_CACHE_REVISION_INTERVAL 秒
+（既定1秒）だけ手元に保持するため、別のワーカーで保存された構成の古いエントリが読まれるのは
+その間だけです（プレビューのHTMLとETag、条件付きGETのETagがこのリビジョンを含みます）。
+冪等キーの応答は保存時の応答をそのまま返す必要があるため scope を使いません。
+
+AIDEX_CACHE_BACKEND=local を指定すると共有層を使わずにプロセス内だけでキャッシュします。
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+try:
+    import redis  # type: ignore
+except ImportError:  # redisは任意依存（未インストール時はSQLiteを使う）
+    redis = None
+
+from src.common import json_codec
+
+logger = logging.getLogger(__name__)
+
+BACKEND_LOCAL = "local"
+BACKEND_SQLITE = "sqlite"
+BACKEND_REDIS = "redis"
+
+# 共有キャッシュのファイル名（データディレクトリ直下。load_structures は .json のみを読む）
+CACHE_FILENAME = ".shared_cache.sqlite3"
+
+# 共有層に保持するエントリの上限（SQLite）と、上限を確認する書き込みの間隔
+MAX_SHARED_ENTRIES = 10000
+TRIM_INTERVAL = 100
+
+# リビジョンを手元に保持する秒数の既定値（別のワーカーの保存が見えるまでの最大の遅れ）
+DEFAULT_REVISION_INTERVAL = 1.0
+
+# Redis のキーの接頭辞（値とリビジョン）
+REDIS_KEY_PREFIX = "aidex:cache:"
+REDIS_REVISION_PREFIX = "aidex:revision:"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires_at REAL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_entries_updated_at ON cache_entries (updated_at);
+CREATE TABLE IF NOT EXISTS cache_revisions (
+    name TEXT PRIMARY KEY,
+    revision INTEGER NOT NULL
+);
+"""
+
+
+def structure_scope(structure_id: str) -> str:
+    """
+    構成IDのスコープ名を返す（save_structure が保存のたびにリビジョンを進める）
+
+    Args:
+        structure_id: 構成ID
+
+    Returns:
+        str: スコープ名
+    """
+    return f"structure:{structure_id}"
+
+
+class LocalCache:
+    """
+    プロセス内のLRUキャッシュ（有効期限付き）
+
+    Args:
+        max_entries: 保持するエントリの上限
+        clock: 現在時刻を返す関数（テスト用）
+    """
+
+    def __init__(self, max_entries: int = 256, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[Any, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        """値を返す（ない場合・期限切れの場合は None）"""
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at is not None and expires_at <= self._clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """値を保存する（上限を超えたら最も使われていないものから破棄する）"""
+        expires_at = self._clock() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        """値を削除する"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """すべての値を削除する"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class SQLiteCacheBackend:
+    """
+    SQLiteファイルによる共有層（同じホストのプロセス間で共有する）
+
+    WALモードで開くため、読み込みは他のプロセスの書き込みを待たない。
+    fork 後の子プロセスでは接続を開き直す。
+
+    Args:
+        path: SQLiteファイルのパス（":memory:" も可）
+        max_entries: 保持するエントリの上限
+        clock: 現在時刻（エポック秒）を返す関数（テスト用）
+    """
+
+    name = BACKEND_SQLITE
+
+    def __init__(self, path: str, max_entries: int = MAX_SHARED_ENTRIES, clock: Callable[[], float] = time.time):
+        self.path = path
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid = 0
+        self._writes = 0
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            if self.path != ":memory:":
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            conn.commit()
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def close(self) -> None:
+        """接続を閉じる"""
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+    def get(self, key: str) -> Optional[bytes]:
+        """値を返す（ない場合・期限切れの場合は None）"""
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT value, expires_at FROM cache_entries WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or (row[1] is not None and row[1] <= self._clock()):
+            return None
+        return bytes(row[0])
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        """値を保存する（TRIM_INTERVAL 回ごとに期限切れと上限を超えた古いエントリを削除する）"""
+        now = self._clock()
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache_entries (key, value, expires_at, updated_at) VALUES (?, ?, ?, ?)",
+                    (key, sqlite3.Binary(value), now + ttl if ttl else None, now),
+                )
+            self._writes += 1
+            if self._writes % TRIM_INTERVAL == 0:
+                self._trim(conn, now)
+
+    def _trim(self, conn: sqlite3.Connection, now: float) -> None:
+        with conn:
+            conn.execute("DELETE FROM cache_entries WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+            (count,) = conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()
+            if count > self.max_entries:
+                conn.execute(
+                    "DELETE FROM cache_entries WHERE key IN "
+                    "(SELECT key FROM cache_entries ORDER BY updated_at LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+
+    def delete(self, key: str) -> None:
+        """値を削除する"""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+
+    def clear(self, prefix: str = "") -> None:
+        """キーが prefix で始まる値をすべて削除する"""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM cache_entries WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+
+    def incr(self, name: str) -> int:
+        """カウンターを1つ進めて新しい値を返す"""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "INSERT INTO cache_revisions (name, revision) VALUES (?, 1) "
+                    "ON CONFLICT(name) DO UPDATE SET revision = revision + 1",
+                    (name,),
+                )
+                (revision,) = conn.execute("SELECT revision FROM cache_revisions WHERE name = ?", (name,)).fetchone()
+        return int(revision)
+
+    def counter(self, name: str) -> int:
+        """カウンターの値を返す（未使用なら0）"""
+        with self._lock:
+            row = self._connection().execute("SELECT revision FROM cache_revisions WHERE name = ?", (name,)).fetchone()
+        return int(row[0]) if row else 0
+
+
+class RedisCacheBackend:
+    """
+    Redis（またはRedisプロトコル互換のサーバー）による共有層
+
+    Args:
+        url: 接続先（例: redis://localhost:6379/0）
+        client: 接続済みのクライアント（テスト用。指定時は url を使わない）
+    """
+
+    name = BACKEND_REDIS
+
+    def __init__(self, url: str = "", client: Any = None):
+        if client is None:
+            if redis is None:
+                raise ValueError("Redis を共有キャッシュに使うには redis パッケージが必要です")
+            client = redis.Redis.from_url(url)
+        self._client = client
+
+    def get(self, key: str) -> Optional[bytes]:
+        """値を返す（ない場合は None）"""
+        return self._client.get(REDIS_KEY_PREFIX + key)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        """値を保存する（ttl は秒）"""
+        if ttl:
+            self._client.set(REDIS_KEY_PREFIX + key, value, px=max(1, int(ttl * 1000)))
+        else:
+            self._client.set(REDIS_KEY_PREFIX + key, value)
+
+    def delete(self, key: str) -> None:
+        """値を削除する"""
+        self._client.delete(REDIS_KEY_PREFIX + key)
+
+    def clear(self, prefix: str = "") -> None:
+        """キーが prefix で始まる値をすべて削除する（リビジョンは残す）"""
+        for key in self._client.scan_iter(match=f"{REDIS_KEY_PREFIX}{prefix}*"):
+            self._client.delete(key)
+
+    def incr(self, name: str) -> int:
+        """カウンターを1つ進めて新しい値を返す"""
+        return int(self._client.incr(REDIS_REVISION_PREFIX + name))
+
+    def counter(self, name: str) -> int:
+        """カウンターの値を返す（未使用なら0）"""
+        value = self._client.get(REDIS_REVISION_PREFIX + name)
+        return int(value) if value else 0
+
+
+class _Revisions:
+    """
+    スコープごとのリビジョン番号（共有層がない場合はプロセス内のカウンター）
+
+    共有層から読んだ値は interval 秒のあいだ手元に保持する。
+    """
+
+    def __init__(self, interval: float = DEFAULT_REVISION_INTERVAL, clock: Callable[[], float] = time.monotonic):
+        self.interval = interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._local: Dict[str, int] = {}
+        self._seen: Dict[Tuple[int, str], Tuple[int, float]] = {}
+
+    def get(self, backend: Any, scope: str) -> int:
+        if backend is None:
+            with self._lock:
+                return self._local.get(scope, 0)
+        now = self._clock()
+        key = (id(backend), scope)
+        with self._lock:
+            seen = self._seen.get(key)
+            if seen is not None and now - seen[1] < self.interval:
+                return seen[0]
+        try:
+            revision = backend.counter(scope)
+        except Exception as e:
+            logger.warning(f"⚠️ 共有キャッシュのリビジョンを読めません（手元の値を使います）: {e}")
+            return seen[0] if seen is not None else 0
+        with self._lock:
+            self._seen[key] = (revision, now)
+        return revision
+
+    def bump(self, backend: Any, scope: str) -> int:
+        if backend is None:
+            with self._lock:
+                self._local[scope] = self._local.get(scope, 0) + 1
+                return self._local[scope]
+        revision = backend.incr(scope)
+        with self._lock:
+            # 保存したプロセスでは待たずに新しいリビジョンを使う
+            self._seen[(id(backend), scope)] = (revision, self._clock())
+        return revision
+
+
+_revisions = _Revisions(
+    float(os.environ.get("AIDEX_CACHE_REVISION_INTERVAL", DEFAULT_REVISION_INTERVAL) or DEFAULT_REVISION_INTERVAL)
+)
+
+
+class TieredCache:
+    """
+    ローカル層と共有層の2段のキャッシュ
+
+    get はローカル層、共有層の順に探し、共有層で見つかった値はローカル層にも保存する。
+    共有層にはJSONにできる値だけを保存する（できない値はローカル層だけに保存する）。
+    共有層の読み書きに失敗してもエラーにはせず、ローカル層だけで動作を続ける。
+    None はキャッシュできない（get の None はキャッシュにないことを表す）。
+
+    Args:
+        namespace: キーの名前空間（キャッシュの用途ごとに分ける）
+        shared: 共有層（None の場合はローカル層のみ）
+        max_entries: ローカル層のエントリの上限
+        ttl: エントリの有効期間の既定値（秒。None は無期限）
+    """
+
+    def __init__(self, namespace: str, shared: Any = None, max_entries: int = 256, ttl: Optional[float] = None):
+        self.namespace = namespace
+        self.shared = shared
+        self.ttl = ttl
+        self.local = LocalCache(max_entries)
+        self._lock = threading.Lock()
+        self._stats = {"local_hits": 0, "shared_hits": 0, "misses": 0}
+
+    def _key(self, key: str, scope: Optional[str]) -> str:
+        if scope is None:
+            return f"{self.namespace}:{key}"
+        return f"{self.namespace}:{scope}@{_revisions.get(self.shared, scope)}:{key}"
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def get(self, key: str, scope: Optional[str] = None) -> Any:
+        """
+        値を返す
+
+        Args:
+            key: キー
+            scope: リビジョンで無効化するスコープ
+
+        Returns:
+            Any: 値（ない場合は None）
+        """
+        full_key = self._key(key, scope)
+        value = self.local.get(full_key)
+        if value is not None:
+            self._count("local_hits")
+            return value
+        if self.shared is not None:
+            try:
+                data = self.shared.get(full_key)
+                value = json_codec.loads(data) if data is not None else None
+            except Exception as e:
+                logger.warning(f"⚠️ 共有キャッシュの読み込みに失敗: {full_key} → {e}")
+                value = None
+            if value is not None:
+                self.local.set(full_key, value, self.ttl)
+                self._count("shared_hits")
+                return value
+        self._count("misses")
+        return None
+
+    def set(self, key: str, value: Any, scope: Optional[str] = None, ttl: Optional[float] = None) -> None:
+        """
+        値を保存する
+
+        Args:
+            key: キー
+            value: 値（共有層にはJSONにできる場合だけ保存する）
+            scope: リビジョンで無効化するスコープ
+            ttl: 有効期間（秒。省略時は既定値）
+        """
+        if value is None:
+            return
+        ttl = ttl if ttl is not None else self.ttl
+        full_key = self._key(key, scope)
+        self.local.set(full_key, value, ttl)
+        if self.shared is None:
+            return
+        try:
+            data = json_codec.dumps_bytes(value, separators=json_codec.COMPACT_SEPARATORS)
+        except (TypeError, ValueError):
+            return
+        try:
+            self.shared.set(full_key, data, ttl)
+        except Exception as e:
+            logger.warning(f"⚠️ 共有キャッシュへの書き込みに失敗: {full_key} → {e}")
+
+    def delete(self, key: str, scope: Optional[str] = None) -> None:
+        """
+        値をローカル層・共有層から削除する
+
+        Args:
+            key: キー
+            scope: リビジョンで無効化するスコープ
+        """
+        full_key = self._key(key, scope)
+        self.local.delete(full_key)
+        if self.shared is None:
+            return
+        try:
+            self.shared.delete(full_key)
+        except Exception as e:
+            logger.warning(f"⚠️ 共有キャッシュの削除に失敗: {full_key} → {e}")
+
+    def get_or_set(self, key: str, compute: Callable[[], Any], scope: Optional[str] = None,
+                   ttl: Optional[float] = None) -> Any:
+        """
+        値を返す（ない場合は compute の結果を保存して返す）
+
+        Args:
+            key: キー
+            compute: 値を計算する関数
+            scope: リビジョンで無効化するスコープ
+            ttl: 有効期間（秒。省略時は既定値）
+
+        Returns:
+            Any: 値
+        """
+        value = self.get(key, scope)
+        if value is None:
+            value = compute()
+            self.set(key, value, scope, ttl)
+        return value
+
+    def bump_revision(self, scope: str) -> int:
+        """
+        この共有層でスコープのリビジョンを進め、そのスコープで保存したエントリを無効にする
+
+        Args:
+            scope: スコープ名
+
+        Returns:
+            int: 新しいリビジョン
+        """
+        return _revisions.bump(self.shared, scope)
+
+    def clear(self) -> None:
+        """この名前空間の値をローカル層・共有層からすべて削除する"""
+        self.local.clear()
+        with self._lock:
+            self._stats = {"local_hits": 0, "shared_hits": 0, "misses": 0}
+        if self.shared is not None:
+            try:
+                self.shared.clear(f"{self.namespace}:")
+            except Exception as e:
+                logger.warning(f"⚠️ 共有キャッシュの削除に失敗: {self.namespace} → {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """ローカル層・共有層のヒット数とミス数、ローカル層の件数"""
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._stats)
+        stats["entries"] = len(self.local)
+        stats["backend"] = self.shared.name if self.shared is not None else BACKEND_LOCAL
+        return stats
+
+
+_backends: Dict[str, Any] = {}
+_caches: Dict[Tuple[str, int], TieredCache] = {}
+_registry_lock = threading.Lock()
+
+
+def get_shared_backend(data_dir: Optional[str] = None) -> Any:
+    """
+    環境変数 AIDEX_CACHE_BACKEND で選んだ共有層を返す
+
+    - sqlite（既定）: AIDEX_CACHE_PATH、省略時はデータディレクトリ直下の .shared_cache.sqlite3
+    - redis: AIDEX_CACHE_REDIS_URL（redis パッケージがない場合は sqlite）
+    - local: 共有層を使わない（None を返す）
+
+    Args:
+        data_dir: 構成ディレクトリ（省略時は get_data_dir()）
+
+    Returns:
+        Any: SQLiteCacheBackend / RedisCacheBackend（local の場合は None）
+    """
+    kind = os.environ.get("AIDEX_CACHE_BACKEND", BACKEND_SQLITE).strip().lower() or BACKEND_SQLITE
+    if kind == BACKEND_LOCAL:
+        return None
+    if kind == BACKEND_REDIS:
+        if redis is not None:
+            url = os.environ.get("AIDEX_CACHE_REDIS_URL", "redis://localhost:6379/0")
+            with _registry_lock:
+                backend = _backends.get(url)
+                if backend is None:
+                    backend = RedisCacheBackend(url)
+                    _backends[url] = backend
+                return backend
+        logger.warning("⚠️ redis パッケージがないため共有キャッシュに SQLite を使います")
+    elif kind != BACKEND_SQLITE:
+        logger.warning(f"⚠️ 不明な共有キャッシュのため SQLite を使います: {kind}")
+    if data_dir is None:
+        from src.structure.utils import get_data_dir
+        data_dir = get_data_dir()
+    path = os.environ.get("AIDEX_CACHE_PATH") or os.path.join(data_dir, CACHE_FILENAME)
+    key = os.path.abspath(path) if path != ":memory:" else path
+    with _registry_lock:
+        backend = _backends.get(key)
+        if backend is None:
+            backend = SQLiteCacheBackend(path)
+            _backends[key] = backend
+        return backend
+
+
+def get_tiered_cache(namespace: str, max_entries: int = 256, ttl: Optional[float] = None,
+                     data_dir: Optional[str] = None) -> TieredCache:
+    """
+    名前空間と共有層ごとの TieredCache を返す
+
+    Args:
+        namespace: キーの名前空間
+        max_entries: ローカル層のエントリの上限（初回の作成時のみ使う）
+        ttl: エントリの有効期間の既定値（初回の作成時のみ使う）
+        data_dir: 構成ディレクトリ（省略時は get_data_dir()）
+
+    Returns:
+        TieredCache: キャッシュ
+    """
+    shared = get_shared_backend(data_dir)
+    key = (namespace, id(shared))
+    with _registry_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = TieredCache(namespace, shared=shared, max_entries=max_entries, ttl=ttl)
+            _caches[key] = cache
+        return cache
+
+
+def bump_revision(scope: str, data_dir: Optional[str] = None) -> int:
+    """
+    スコープのリビジョンを進め、そのスコープで保存したエントリを無効にする
+
+    Args:
+        scope: スコープ名（構成の場合は structure_scope(id)）
+        data_dir: 構成ディレクトリ（省略時は get_data_dir()）
+
+    Returns:
+        int: 新しいリビジョン
+    """
+    return _revisions.bump(get_shared_backend(data_dir), scope)
+
+
+def get_revision(scope: str, data_dir: Optional[str] = None) -> int:
+    """
+    スコープの現在のリビジョンを返す（最大 AIDEX_CACHE_REVISION_INTERVAL 秒前の値）
+
+    Args:
+        scope: スコープ名
+        data_dir: 構成ディレクトリ（省略時は get_data_dir()）
+
+    Returns:
+        int: リビジョン
+    """
+    return _revisions.get(get_shared_backend(data_dir), scope)
+
+
+def invalidate_structure(structure_id: str, data_dir: Optional[str] = None) -> None:
+    """
+    構成の保存を他のワーカープロセスに知らせる（構成のスコープのリビジョンを進める）
+
+    失敗しても保存処理には影響させない。
+
+    Args:
+        structure_id: 構成ID
+        data_dir: 構成ディレクトリ（省略時は get_data_dir()）
+    """
+    try:
+        bump_revision(structure_scope(structure_id), data_dir)
+    except Exception as e:
+        logger.warning(f"⚠️ 共有キャッシュのリビジョンを更新できません: {structure_id} → {e}")
+
+
+__all__ = [
+    "BACKEND_LOCAL",
+    "BACKEND_REDIS",
+    "BACKEND_SQLITE",
+    "LocalCache",
+    "RedisCacheBackend",
+    "SQLiteCacheBackend",
+    "TieredCache",
+    "bump_revision",
+    "get_revision",
+    "get_shared_backend",
+    "get_tiered_cache",
+    "invalidate_structure",
+    "structure_scope",
+]
@@ -0,0 +1,205 @@
+"""
+同一処理の同時実行をまとめるシングルフライトと、冪等キーの応答ストア
+
+- SingleFlight: 同じキーの処理が実行中であれば、後から来た呼び出しは完了を待って同じ結果を受け取る
+- IdempotencyStore: 冪等キーごとの応答を保持期間のあいだ保存し、再送に同じ応答を返せるようにする
+
+SingleFlight はプロセス内のメモリで動作します。IdempotencyStore は応答を TieredCache に保存するため、
+共有層を持つキャッシュを渡せば別のワーカープロセスで保存した応答も再送に返せます
+（Flaskからの利用は src.common.idempotency を参照）。
+"""
+
+import base64
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from src.common.shared_cache import TieredCache
+
+# 冪等キーの応答の既定の保持期間（秒）と件数の上限
+DEFAULT_TTL_SECONDS = 24 * 3600
+DEFAULT_MAX_ENTRIES = 1000
+
+# 冪等キーの応答を保存するキャッシュの名前空間
+IDEMPOTENCY_NAMESPACE = "idempotency"
+
+
+class _Call:
+    """実行中の1回の処理"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    キーごとに実行中の処理を1つに保つ
+
+    先に来た呼び出し（リーダー）だけが func を実行し、実行中に同じキーで来た呼び出しは
+    その結果（または例外）を共有する。完了後に来た呼び出しは新しく実行する。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._executed = 0
+        self._shared = 0
+
+    def do(self, key: str, func: Callable[[], Any], timeout: Optional[float] = None) -> Tuple[Any, bool]:
+        """
+        キーの処理を実行する（実行中であれば完了を待って結果を共有する）
+
+        Args:
+            key: 同一処理を識別するキー
+            func: 実行する処理
+            timeout: 実行中の処理を待つ最大秒数（Noneは無制限）
+
+        Returns:
+            Tuple[Any, bool]: (結果, 他の呼び出しの結果を共有した場合True)
+
+        Raises:
+            TimeoutError: 実行中の処理が timeout 秒以内に終わらなかった場合
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self._executed += 1
+            else:
+                call.waiters += 1
+                self._shared += 1
+
+        if not leader:
+            if not call.done.wait(timeout):
+                raise TimeoutError(f"実行中の処理が {timeout} 秒以内に完了しませんでした: {key}")
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> Dict[str, int]:
+        """実行回数・共有回数・実行中の件数を返す"""
+        with self._lock:
+            return {"executed": self._executed, "shared": self._shared, "in_flight": len(self._calls)}
+
+
+@dataclass
+class StoredResponse:
+    """冪等キーで保存した応答"""
+    fingerprint: str
+    status: int
+    body: bytes
+    headers: Dict[str, str] = field(default_factory=dict)
+    stored_at: float = 0.0
+
+
+class IdempotencyStore:
+    """
+    冪等キーごとの応答を保持期間のあいだ保存する
+
+    応答は TieredCache に保存する（本文はBase64にしてJSONで保存する）。保持期間を過ぎたものは返さず、
+    プロセス内では使われていない古いものから件数の上限を超えた分を破棄する。
+    応答は保存した時点のものを返すため、対象の構成がその後に更新されても無効にはしない（scope なし）。
+    """
+
+    def __init__(self, ttl: float = DEFAULT_TTL_SECONDS, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 clock: Callable[[], float] = time.time, cache: Optional[TieredCache] = None):
+        """
+        Args:
+            ttl: 保持期間（秒）
+            max_entries: 保存する件数の上限（cache を省略した場合のプロセス内の上限）
+            clock: 現在時刻（UNIX秒）を返す関数
+            cache: 保存先（省略時はプロセス内だけのキャッシュ）
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._cache = cache if cache is not None else TieredCache(IDEMPOTENCY_NAMESPACE, max_entries=max_entries, ttl=ttl)
+        self._lock = threading.Lock()
+        self._replayed = 0
+
+    def get(self, key: str) -> Optional[StoredResponse]:
+        """
+        保持期間内の応答を返す
+
+        Args:
+            key: 冪等キー（エンドポイントなどを含めたもの）
+
+        Returns:
+            Optional[StoredResponse]: 保存した応答。ないか期限切れの場合はNone
+        """
+        value = self._cache.get(key)
+        if value is None:
+            return None
+        try:
+            entry = StoredResponse(
+                value["fingerprint"], int(value["status"]), base64.b64decode(value["body"]),
+                dict(value.get("headers") or {}), float(value["stored_at"]),
+            )
+        except (KeyError, TypeError, ValueError):
+            self._cache.delete(key)
+            return None
+        if self._clock() - entry.stored_at >= self.ttl:
+            self._cache.delete(key)
+            return None
+        with self._lock:
+            self._replayed += 1
+        return entry
+
+    def put(self, key: str, fingerprint: str, status: int, body: bytes,
+            headers: Optional[Dict[str, str]] = None) -> StoredResponse:
+        """
+        応答を保存する
+
+        Args:
+            key: 冪等キー
+            fingerprint: リクエスト本文のハッシュ（同じキーで別の内容が送られたことの検出用）
+            status: ステータスコード
+            body: 応答本文
+            headers: 再送時にも返すヘッダー
+
+        Returns:
+            StoredResponse: 保存した応答
+        """
+        entry = StoredResponse(fingerprint, status, body, dict(headers or {}), self._clock())
+        self._cache.set(key, {
+            "fingerprint": entry.fingerprint,
+            "status": entry.status,
+            "body": base64.b64encode(entry.body).decode("ascii"),
+            "headers": entry.headers,
+            "stored_at": entry.stored_at,
+        }, ttl=self.ttl)
+        return entry
+
+    def stats(self) -> Dict[str, Any]:
+        """保存件数と再送に応答した回数を返す"""
+        with self._lock:
+            replayed = self._replayed
+        return {"entries": len(self._cache.local), "replayed": replayed, "ttl": self.ttl,
+                "backend": self._cache.stats()["backend"]}
+
+
+__all__ = [
+    "DEFAULT_MAX_ENTRIES",
+    "DEFAULT_TTL_SECONDS",
+    "IDEMPOTENCY_NAMESPACE",
+    "IdempotencyStore",
+    "SingleFlight",
+    "StoredResponse",
+]
@@ -0,0 +1,339 @@
+"""
+構成・履歴ファイルの保存形式（コーデック）
+
+構成ファイル・履歴のJSON/JSON Linesを、書き込み時に選んだコーデックで保存し、
+読み込み時は先頭のバイト列から形式を判定して透過的に展開します。
+
+- json: 従来どおりの非圧縮JSON（既定。構成ファイルは整形済み）
+- gzip: 区切り文字を詰めたJSONをgzipで圧縮する（標準ライブラリのみ）
+- zstd: 区切り文字を詰めたJSONをzstdで圧縮する（zstandard パッケージが必要）。
+  AIDEX_STORAGE_ZSTD_DICT に学習済み辞書を指定すると、同じスキーマの小さなファイルや
+  JSON Linesの1行ごとの圧縮率が上がる
+
+書き込むコーデックは環境変数 AIDEX_STORAGE_CODEC で選びます（zstd を指定して
+zstandard がない場合は gzip で書く）。拡張子は変えないため、既存のパスのまま
+従来のファイルと新しいファイルが混在しても読めます。JSON Lines の追記は1件ごとに
+gzipメンバー / zstdフレームを連結します。
+"""
+
+import gzip
+import io
+import logging
+import os
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import zstandard  # type: ignore
+except ImportError:  # zstandardは任意依存（未インストール時はgzipで書く）
+    zstandard = None
+
+from src.common import json_codec
+
+logger = logging.getLogger(__name__)
+
+CODEC_JSON = "json"
+CODEC_GZIP = "gzip"
+CODEC_ZSTD = "zstd"
+CODECS = (CODEC_JSON, CODEC_GZIP, CODEC_ZSTD)
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+# 圧縮レベル（読み書きの速さを優先する）
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+_dictionary_lock = threading.Lock()
+_dictionaries: Dict[str, Any] = {}
+
+
+def zstd_available() -> bool:
+    """zstandard パッケージが使えるかどうか"""
+    return zstandard is not None
+
+
+def get_write_codec() -> str:
+    """
+    書き込みに使うコーデックを返す（環境変数 AIDEX_STORAGE_CODEC、既定は json）
+
+    Returns:
+        str: json / gzip / zstd
+    """
+    codec = os.environ.get("AIDEX_STORAGE_CODEC", CODEC_JSON).strip().lower() or CODEC_JSON
+    if codec not in CODECS:
+        logger.warning(f"⚠️ 不明な保存形式のため json で保存します: {codec}")
+        return CODEC_JSON
+    if codec == CODEC_ZSTD and not zstd_available():
+        return CODEC_GZIP
+    return codec
+
+
+def detect_codec(data: bytes) -> str:
+    """
+    先頭のバイト列から保存形式を判定する
+
+    Args:
+        data: ファイルの内容
+
+    Returns:
+        str: json / gzip / zstd
+    """
+    if data[:2] == GZIP_MAGIC:
+        return CODEC_GZIP
+    if data[:4] == ZSTD_MAGIC:
+        return CODEC_ZSTD
+    return CODEC_JSON
+
+
+def _zstd_dictionary(path: Optional[str] = None) -> Any:
+    """AIDEX_STORAGE_ZSTD_DICT の学習済み辞書を読み込む（未指定ならNone）"""
+    path = path if path is not None else os.environ.get("AIDEX_STORAGE_ZSTD_DICT", "")
+    if not path or not zstd_available():
+        return None
+    with _dictionary_lock:
+        if path not in _dictionaries:
+            with open(path, "rb") as f:
+                _dictionaries[path] = zstandard.ZstdCompressionDict(f.read())
+        return _dictionaries[path]
+
+
+def compress(data: bytes, codec: str) -> bytes:
+    """
+    バイト列を指定のコーデックで圧縮する（json はそのまま返す）
+
+    Args:
+        data: 圧縮するバイト列
+        codec: json / gzip / zstd
+
+    Returns:
+        bytes: 圧縮したバイト列
+    """
+    if codec == CODEC_GZIP:
+        # mtime を固定して同じ内容から同じバイト列を作る
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    if codec == CODEC_ZSTD:
+        if not zstd_available():
+            raise ValueError("zstd で保存するには zstandard パッケージが必要です")
+        dictionary = _zstd_dictionary()
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=dictionary) if dictionary is not None \
+            else zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+        return compressor.compress(data)
+    return data
+
+
+def decompress(data: bytes) -> bytes:
+    """
+    形式を判定して展開する（連結されたgzipメンバー・zstdフレームもまとめて展開する）
+
+    Args:
+        data: ファイルの内容
+
+    Returns:
+        bytes: 展開したバイト列
+
+    Raises:
+        ValueError: 展開できない場合
+    """
+    codec = detect_codec(data)
+    if codec == CODEC_GZIP:
+        try:
+            return gzip.decompress(data)
+        except (OSError, EOFError) as e:
+            raise ValueError(f"gzipの展開に失敗しました: {e}") from e
+    if codec == CODEC_ZSTD:
+        if not zstd_available():
+            raise ValueError("zstd で保存されたファイルの読み込みには zstandard パッケージが必要です")
+        try:
+            dictionary = None
+            if zstandard.get_frame_parameters(data).dict_id:
+                dictionary = _zstd_dictionary()
+                if dictionary is None:
+                    raise ValueError("辞書付きで圧縮されています。AIDEX_STORAGE_ZSTD_DICT を指定してください")
+            decompressor = zstandard.ZstdDecompressor(dict_data=dictionary) if dictionary is not None \
+                else zstandard.ZstdDecompressor()
+            with decompressor.stream_reader(io.BytesIO(data), read_across_frames=True) as reader:
+                return reader.read()
+        except zstandard.ZstdError as e:
+            raise ValueError(f"zstdの展開に失敗しました: {e}") from e
+    return data
+
+
+def dumps(value: Any, codec: Optional[str] = None, indent: Optional[int] = 2) -> bytes:
+    """
+    値をJSONにして指定のコーデックで符号化する
+
+    json の場合は従来どおり indent で整形し、圧縮する場合は区切り文字を詰める。
+
+    Args:
+        value: 保存する値
+        codec: コーデック（省略時は get_write_codec()）
+        indent: json の場合のインデント
+
+    Returns:
+        bytes: 保存するバイト列
+    """
+    codec = codec or get_write_codec()
+    if codec == CODEC_JSON:
+        return json_codec.dumps_bytes(value, indent=indent, default=str)
+    return compress(json_codec.dumps_bytes(value, separators=json_codec.COMPACT_SEPARATORS, default=str), codec)
+
+
+def loads(data: bytes) -> Any:
+    """
+    保存形式を判定してJSONを読み込む
+
+    Args:
+        data: ファイルの内容
+
+    Returns:
+        Any: 読み込んだ値
+
+    Raises:
+        ValueError: 展開できない、またはJSONとして読めない場合（json.JSONDecodeError を含む）
+    """
+    return json_codec.loads(decompress(data))
+
+
+def read_json(path: str) -> Any:
+    """
+    ファイルを保存形式を判定して読み込む
+
+    Args:
+        path: ファイルパス
+
+    Returns:
+        Any: 読み込んだ値
+    """
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+def write_json(path: str, value: Any, codec: Optional[str] = None, indent: Optional[int] = 2) -> None:
+    """
+    値をJSONとして保存する（一時ファイルに書いてから置き換える）
+
+    Args:
+        path: ファイルパス
+        value: 保存する値
+        codec: コーデック（省略時は get_write_codec()）
+        indent: json の場合のインデント
+    """
+    write_bytes(path, dumps(value, codec=codec, indent=indent))
+
+
+def write_bytes(path: str, data: bytes) -> None:
+    """
+    バイト列をファイルに保存する（一時ファイルに書いてから置き換える）
+
+    Args:
+        path: ファイルパス
+        data: 保存するバイト列
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    # 拡張子の後ろに付けるため load_structures などの *.json の走査には含まれない
+    temp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def append_jsonl(path: str, entry: Any, codec: Optional[str] = None) -> None:
+    """
+    JSON Linesのファイルに1件追記する
+
+    圧縮する場合は1行を1つのgzipメンバー / zstdフレームとして連結し、行の区切り文字を詰める。
+    既存のファイルと形式が異なる場合は、既存の形式に合わせる（1つのファイルに形式を混在させない）。
+
+    Args:
+        path: ファイルパス
+        entry: 追記する値
+        codec: コーデック（省略時は get_write_codec()）
+    """
+    codec = codec or get_write_codec()
+    if os.path.exists(path) and os.path.getsize(path) > 0:
+        with open(path, "rb") as f:
+            existing = detect_codec(f.read(4))
+        if existing == CODEC_ZSTD and not zstd_available():
+            raise ValueError("zstd で保存されたファイルへの追記には zstandard パッケージが必要です")
+        codec = existing
+    if codec == CODEC_JSON:
+        line = json_codec.dumps_bytes(entry, default=str)
+    else:
+        line = json_codec.dumps_bytes(entry, separators=json_codec.COMPACT_SEPARATORS, default=str)
+    with open(path, "ab") as f:
+        f.write(compress(line + b"\n", codec))
+
+
+def read_lines(path: str) -> Iterator[str]:
+    """
+    JSON Linesのファイルを保存形式を判定して1行ずつ返す
+
+    Args:
+        path: ファイルパス
+
+    Yields:
+        str: 1行（改行を除く）
+    """
+    with open(path, "rb") as f:
+        text = decompress(f.read()).decode("utf-8")
+    for line in text.splitlines():
+        if line.strip():
+            yield line
+
+
+def file_codec(path: str) -> str:
+    """
+    ファイルの保存形式を返す
+
+    Args:
+        path: ファイルパス
+
+    Returns:
+        str: json / gzip / zstd
+    """
+    with open(path, "rb") as f:
+        return detect_codec(f.read(4))
+
+
+def train_dictionary(samples: List[bytes], size: int = 16 * 1024) -> bytes:
+    """
+    既存のファイルからzstdの辞書を学習する
+
+    Args:
+        samples: 展開済みのファイル内容（区切り文字を詰めたJSON）
+        size: 辞書の最大サイズ（バイト）
+
+    Returns:
+        bytes: 辞書（AIDEX_STORAGE_ZSTD_DICT に指定するファイルの内容）
+    """
+    if not zstd_available():
+        raise ValueError("辞書の学習には zstandard パッケージが必要です")
+    return zstandard.train_dictionary(size, samples).as_bytes()
+
+
+__all__ = [
+    "CODECS",
+    "CODEC_GZIP",
+    "CODEC_JSON",
+    "CODEC_ZSTD",
+    "append_jsonl",
+    "compress",
+    "decompress",
+    "detect_codec",
+    "dumps",
+    "file_codec",
+    "get_write_codec",
+    "loads",
+    "read_json",
+    "read_lines",
+    "train_dictionary",
+    "write_bytes",
+    "write_json",
+    "zstd_available",
+]
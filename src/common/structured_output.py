@@ -0,0 +1,313 @@
+"""
+構成出力の共通スキーマとプロバイダー別の構造化出力設定
+
+構成を生成・補完するLLM呼び出しが返すJSONの形（title / description / modules）を
+1つのJSON Schemaで定義し、各プロバイダーのネイティブな構造化出力の設定に変換します。
+
+- OpenAI: response_format（json_schema, strict）
+- Gemini: response_mime_type="application/json" と response_schema（OpenAPIのサブセット）
+- Claude: 入力スキーマを持つツールと、そのツールを強制する tool_choice
+
+応答の検証とフェイクプロバイダー用のスキーマ準拠データの合成もここで行います。
+"""
+
+import copy
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+from src.common import json_codec
+from src.exceptions import StructuredOutputError
+
+# 構成スキーマの名前（OpenAIのスキーマ名・Claudeのツール名に使う）
+STRUCTURE_SCHEMA_NAME = "app_structure"
+
+# モジュールの種類（_retry_structure_generation のプロンプトと同じ）
+MODULE_TYPES = ("form", "table", "api", "chart", "auth", "database", "config", "page", "component")
+
+FIELD_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "label": {"type": "string", "description": "画面に表示する項目名"},
+        "name": {"type": "string", "description": "項目の識別名（英数字）"},
+        "type": {"type": "string", "description": "入力の種類（text / email / number / date / select など）"},
+        "required": {"type": "boolean", "description": "必須項目かどうか"},
+    },
+    "required": ["label", "name", "type", "required"],
+    "additionalProperties": False,
+}
+
+COLUMN_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "key": {"type": "string", "description": "列の識別名（英数字）"},
+        "label": {"type": "string", "description": "画面に表示する列名"},
+        "type": {"type": "string", "description": "値の種類（text / number / date など）"},
+    },
+    "required": ["key", "label", "type"],
+    "additionalProperties": False,
+}
+
+MODULE_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "id": {"type": "string", "description": "モジュールの識別名（英数字）"},
+        "type": {"type": "string", "enum": list(MODULE_TYPES), "description": "モジュールの種類"},
+        "title": {"type": "string", "description": "モジュールのタイトル"},
+        "description": {"type": "string", "description": "モジュールの説明"},
+        "fields": {"type": "array", "items": FIELD_SCHEMA, "description": "フォームの入力項目（不要なら空配列）"},
+        "columns": {"type": "array", "items": COLUMN_SCHEMA, "description": "テーブルの列（不要なら空配列）"},
+    },
+    "required": ["id", "type", "title", "description", "fields", "columns"],
+    "additionalProperties": False,
+}
+
+# 構成を出力するすべての呼び出しで共有するスキーマ
+STRUCTURE_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string", "description": "アプリ（構成）のタイトル"},
+        "description": {"type": "string", "description": "アプリ（構成）の説明"},
+        "modules": {"type": "array", "items": MODULE_SCHEMA, "description": "画面・機能のモジュール"},
+    },
+    "required": ["title", "description", "modules"],
+    "additionalProperties": False,
+}
+
+# 構造化出力の呼び出しの既定の最大出力トークン数（構成JSONが途中で切れないように通常の呼び出しより大きくする）
+STRUCTURED_MAX_TOKENS = 4096
+
+# Gemini の response_schema が受け付けるキー（それ以外は取り除く）
+GEMINI_SCHEMA_KEYS = ("type", "format", "description", "nullable", "enum", "properties", "required", "items")
+
+_JSON_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "boolean": bool,
+    "integer": int,
+    "number": (int, float),
+}
+
+
+def to_openai_response_format(schema: Dict[str, Any] = STRUCTURE_SCHEMA,
+                              name: str = STRUCTURE_SCHEMA_NAME) -> Dict[str, Any]:
+    """
+    OpenAI Chat Completions の response_format を作る
+
+    Args:
+        schema: JSON Schema
+        name: スキーマ名
+
+    Returns:
+        Dict[str, Any]: response_format の値
+    """
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": name, "schema": copy.deepcopy(schema), "strict": True},
+    }
+
+
+def to_gemini_response_schema(schema: Dict[str, Any] = STRUCTURE_SCHEMA) -> Dict[str, Any]:
+    """
+    Gemini の response_schema を作る（対応していないキーを除き、型名を大文字にする）
+
+    Args:
+        schema: JSON Schema
+
+    Returns:
+        Dict[str, Any]: response_schema の値
+    """
+    converted: Dict[str, Any] = {}
+    for key in GEMINI_SCHEMA_KEYS:
+        if key not in schema:
+            continue
+        value = schema[key]
+        if key == "type":
+            value = str(value).upper()
+        elif key == "properties":
+            value = {name: to_gemini_response_schema(child) for name, child in value.items()}
+        elif key == "items":
+            value = to_gemini_response_schema(value)
+        else:
+            value = copy.deepcopy(value)
+        converted[key] = value
+    return converted
+
+
+def to_claude_tool(schema: Dict[str, Any] = STRUCTURE_SCHEMA, name: str = STRUCTURE_SCHEMA_NAME,
+                   description: str = "生成したアプリ構成を記録する") -> Dict[str, Any]:
+    """
+    Claude の tool 定義を作る（応答はこのツールの入力として受け取る）
+
+    Args:
+        schema: JSON Schema
+        name: ツール名
+        description: ツールの説明
+
+    Returns:
+        Dict[str, Any]: tools に渡す定義
+    """
+    return {"name": name, "description": description, "input_schema": copy.deepcopy(schema)}
+
+
+def to_claude_tool_choice(name: str = STRUCTURE_SCHEMA_NAME) -> Dict[str, Any]:
+    """指定したツールの使用を強制する tool_choice を作る"""
+    return {"type": "tool", "name": name}
+
+
+def validate_against_schema(data: Any, schema: Dict[str, Any] = STRUCTURE_SCHEMA, path: str = "$") -> List[str]:
+    """
+    データをスキーマで検証する（type / enum / properties / required / additionalProperties / items のみ）
+
+    Args:
+        data: 検証するデータ
+        schema: JSON Schema
+        path: エラーメッセージに使う位置
+
+    Returns:
+        List[str]: エラーの一覧（空なら妥当）
+    """
+    expected = schema.get("type")
+    if expected:
+        python_type = _JSON_TYPES.get(expected)
+        # bool は int のサブクラスなので数値としては扱わない
+        if python_type and (not isinstance(data, python_type)
+                            or (expected in ("integer", "number") and isinstance(data, bool))):
+            return [f"{path}: {expected} が必要です（{type(data).__name__}）"]
+
+    errors: List[str] = []
+    if "enum" in schema and data not in schema["enum"]:
+        errors.append(f"{path}: {', '.join(map(str, schema['enum']))} のいずれかが必要です（{data!r}）")
+
+    if isinstance(data, dict):
+        properties = schema.get("properties", {})
+        for name in schema.get("required", []):
+            if name not in data:
+                errors.append(f"{path}.{name}: 必須項目がありません")
+        for name, value in data.items():
+            if name in properties:
+                errors.extend(validate_against_schema(value, properties[name], f"{path}.{name}"))
+            elif schema.get("additionalProperties") is False:
+                errors.append(f"{path}.{name}: 定義されていない項目です")
+    elif isinstance(data, list) and "items" in schema:
+        for index, item in enumerate(data):
+            errors.extend(validate_against_schema(item, schema["items"], f"{path}[{index}]"))
+    return errors
+
+
+def parse_structured_content(content: Any, schema: Dict[str, Any] = STRUCTURE_SCHEMA,
+                             provider: str = "unknown") -> Dict[str, Any]:
+    """
+    構造化出力の応答（JSON文字列または辞書）を読み込み、スキーマで検証する
+
+    JSONモードの応答はコードブロックを含まないが、念のため ```json の囲みは取り除く。
+
+    Args:
+        content: 応答の本文、またはツール入力などの辞書
+        schema: JSON Schema
+        provider: エラーに含めるプロバイダー名
+
+    Returns:
+        Dict[str, Any]: 検証済みのデータ
+
+    Raises:
+        StructuredOutputError: JSONとして読めない、またはスキーマに合わない場合
+    """
+    if isinstance(content, str):
+        text = re.sub(r"^\s*```(?:json)?\s*|\s*```\s*$", "", content)
+        try:
+            data = json_codec.loads(text)
+        except ValueError as e:
+            raise StructuredOutputError(provider, f"構造化出力をJSONとして読み込めません: {e}") from e
+    else:
+        data = content
+
+    errors = validate_against_schema(data, schema)
+    if errors:
+        raise StructuredOutputError(provider, f"構造化出力がスキーマに合いません: {errors[0]}", errors=errors)
+    return data
+
+
+def structured_response(data: Dict[str, Any], provider: str, model: Optional[str] = None,
+                        usage: Optional[Dict[str, Any]] = None, **extra: Any) -> Dict[str, Any]:
+    """
+    call_structured の戻り値を作る
+
+    Args:
+        data: 検証済みのデータ
+        provider: プロバイダー名
+        model: モデル名
+        usage: トークン使用量
+        **extra: 追加の項目（source など）
+
+    Returns:
+        Dict[str, Any]: content（JSON文字列）/ data / provider / model / usage
+    """
+    return {
+        "content": json_codec.dumps(data, indent=2),
+        "data": data,
+        "provider": provider,
+        "model": model,
+        "usage": usage or {},
+        **extra,
+    }
+
+
+def is_structured_output_enabled() -> bool:
+    """環境変数 AIDEX_STRUCTURED_OUTPUT=0 で構造化出力を使わず従来のテキスト応答からの抽出にする"""
+    return os.environ.get("AIDEX_STRUCTURED_OUTPUT", "1") != "0"
+
+
+def synthesize_from_schema(schema: Dict[str, Any], hint: str = "", path: str = "") -> Any:
+    """
+    スキーマに合うデータを決定的に合成する（フェイクプロバイダー用）
+
+    文字列は hint と位置から作り、配列は要素を1つ持つ。enum は先頭の値を使う。
+
+    Args:
+        schema: JSON Schema
+        hint: 文字列に含める要約（プロンプトの一部など）
+        path: 合成中の位置（文字列の値に使う）
+
+    Returns:
+        Any: スキーマに合うデータ
+    """
+    if "enum" in schema:
+        return schema["enum"][0]
+    expected = schema.get("type")
+    if expected == "object":
+        return {
+            name: synthesize_from_schema(child, hint, f"{path}.{name}" if path else name)
+            for name, child in schema.get("properties", {}).items()
+        }
+    if expected == "array":
+        return [synthesize_from_schema(schema.get("items", {}), hint, f"{path}[0]")] if "items" in schema else []
+    if expected == "boolean":
+        return True
+    if expected in ("integer", "number"):
+        return 1
+    leaf = path.rsplit(".", 1)[-1]
+    if leaf in ("id", "name", "key"):
+        return re.sub(r"[^a-z0-9]+", "_", path.lower()).strip("_")
+    return f"{hint} の{leaf}" if hint else leaf
+
+
+__all__ = [
+    "COLUMN_SCHEMA",
+    "FIELD_SCHEMA",
+    "MODULE_SCHEMA",
+    "MODULE_TYPES",
+    "STRUCTURE_SCHEMA",
+    "STRUCTURE_SCHEMA_NAME",
+    "STRUCTURED_MAX_TOKENS",
+    "is_structured_output_enabled",
+    "parse_structured_content",
+    "structured_response",
+    "synthesize_from_schema",
+    "to_claude_tool",
+    "to_claude_tool_choice",
+    "to_gemini_response_schema",
+    "to_openai_response_format",
+    "validate_against_schema",
+]
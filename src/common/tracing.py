@@ -0,0 +1,507 @@
+"""
+リクエスト単位のトレース
+
+contextvars でトレースIDと現在のスパンを保持し、各処理段階（LLM呼び出し・JSON抽出・
+検証・ディスク書き込みなど）をスパンとして記録します。スレッドやエグゼキューターに
+処理を渡すときは propagate() / submit_in_context() / start_thread_in_context() で
+コンテキストを引き継ぎます。
+
+トレース中でなければ span() / traced() は何も記録せず、ほぼコストなしで素通りします。
+完了したトレースは TraceStore にJSONで保存し、ウォーターフォール表示に使います。
+"""
+
+import contextlib
+import contextvars
+import functools
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import Executor, Future
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar
+
+from src.common import json_codec
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+DEFAULT_TRACE_DIR = os.path.join("logs", "traces")
+
+# 保存するトレースファイルの上限
+DEFAULT_MAX_TRACES = 500
+
+# 外部から受け取るリクエストIDとして許可する形式
+_TRACE_ID_RE = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+
+def new_trace_id() -> str:
+    """新しいトレースIDを返す"""
+    return uuid.uuid4().hex[:16]
+
+
+def is_valid_trace_id(value: Optional[str]) -> bool:
+    """X-Request-ID などで受け取った値をトレースIDとして使えるか判定する"""
+    return bool(value) and bool(_TRACE_ID_RE.match(value))
+
+
+@dataclass
+class Span:
+    """処理段階1つ分の記録"""
+    span_id: str
+    name: str
+    parent_id: Optional[str]
+    start_ms: float
+    duration_ms: Optional[float] = None
+    thread: str = ""
+    status: str = "ok"
+    error: Optional[str] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+    def set(self, **attributes: Any) -> None:
+        """属性を追加する"""
+        self.attributes.update(attributes)
+
+
+class Trace:
+    """1リクエスト分のトレース"""
+
+    def __init__(self, name: str, trace_id: Optional[str] = None, **attributes: Any):
+        self.trace_id = trace_id or new_trace_id()
+        self.name = name
+        self.started_at = datetime.now().isoformat()
+        self.attributes: Dict[str, Any] = dict(attributes)
+        self.spans: List[Span] = []
+        self.duration_ms: Optional[float] = None
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._counter = 0
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._start) * 1000
+
+    def new_span(self, name: str, parent_id: Optional[str], attributes: Dict[str, Any]) -> Span:
+        """スパンを開始して登録する（複数スレッドから呼ばれてもよい）"""
+        with self._lock:
+            self._counter += 1
+            span = Span(
+                span_id=f"{self._counter:04d}",
+                name=name,
+                parent_id=parent_id,
+                start_ms=round(self.elapsed_ms(), 3),
+                thread=threading.current_thread().name,
+                attributes=dict(attributes),
+            )
+            self.spans.append(span)
+        return span
+
+    def finish(self) -> None:
+        """トレースを終了する"""
+        if self.duration_ms is None:
+            self.duration_ms = round(self.elapsed_ms(), 3)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """保存・表示用の辞書にする"""
+        with self._lock:
+            spans = [asdict(span) for span in self.spans]
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "attributes": dict(self.attributes),
+            "spans": spans,
+        }
+
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("aidex_trace", default=None)
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("aidex_span", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    """実行中のトレースを返す"""
+    return _current_trace.get()
+
+
+def current_trace_id() -> Optional[str]:
+    """実行中のトレースID（リクエストID）を返す"""
+    trace = _current_trace.get()
+    return trace.trace_id if trace else None
+
+
+def current_span() -> Optional[Span]:
+    """実行中のスパンを返す"""
+    return _current_span.get()
+
+
+def annotate(**attributes: Any) -> None:
+    """
+    実行中のスパン（なければトレース）に属性を追加する
+
+    Args:
+        **attributes: 追加する属性
+    """
+    span = _current_span.get()
+    if span is not None:
+        span.set(**attributes)
+        return
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.attributes.update(attributes)
+
+
+@contextlib.contextmanager
+def start_trace(name: str, trace_id: Optional[str] = None, **attributes: Any) -> Iterator[Trace]:
+    """
+    トレースを開始する
+
+    Args:
+        name: トレース名（例: "POST /unified/<id>/chat"）
+        trace_id: 引き継ぐトレースID（省略時は新規発行）
+        **attributes: トレースの属性
+
+    Yields:
+        Trace: 開始したトレース
+    """
+    trace = Trace(name, trace_id, **attributes)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(None)
+    try:
+        yield trace
+    finally:
+        trace.finish()
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+
+
+def activate_trace(trace: Trace) -> Callable[[], None]:
+    """
+    既に作成したトレースを現在のコンテキストで有効にする（before/after フック用）
+
+    Args:
+        trace: 有効にするトレース
+
+    Returns:
+        Callable[[], None]: 元に戻す関数
+    """
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(None)
+
+    def restore() -> None:
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+    return restore
+
+
+@contextlib.contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """
+    処理段階をスパンとして記録する
+
+    トレース中でなければ何も記録せず None を渡す。
+
+    Args:
+        name: スパン名（例: "llm.call"、"json.extract"、"storage.save"）
+        **attributes: スパンの属性
+
+    Yields:
+        Optional[Span]: 記録中のスパン
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+
+    parent = _current_span.get()
+    current = trace.new_span(name, parent.span_id if parent else None, attributes)
+    token = _current_span.set(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.status = "error"
+        current.error = f"{type(e).__name__}: {e}"[:500]
+        raise
+    finally:
+        current.duration_ms = round((time.perf_counter() - start) * 1000, 3)
+        _current_span.reset(token)
+
+
+def traced(name: Optional[str] = None, **attributes: Any) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """
+    関数の実行をスパンとして記録するデコレーター
+
+    Args:
+        name: スパン名（省略時は "モジュール.関数名"）
+        **attributes: スパンの属性
+
+    Returns:
+        Callable: デコレーター
+    """
+    def decorator(func: Callable[..., T]) -> Callable[..., T]:
+        span_name = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> T:
+            if _current_trace.get() is None:
+                return func(*args, **kwargs)
+            with span(span_name, **attributes):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def propagate(func: Callable[..., T]) -> Callable[..., T]:
+    """
+    現在のコンテキスト（トレース・スパン）を引き継いで実行する関数を返す
+
+    呼び出しごとにコンテキストを複製するため、同じ関数を複数スレッドで同時に実行してよい。
+
+    Args:
+        func: 別スレッドで実行する関数
+
+    Returns:
+        Callable: コンテキストを引き継ぐ関数
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> T:
+        return context.copy().run(func, *args, **kwargs)
+    return wrapper
+
+
+def submit_in_context(executor: Executor, func: Callable[..., T], *args: Any, **kwargs: Any) -> "Future[T]":
+    """
+    現在のコンテキストを引き継いでエグゼキューターに処理を投入する
+
+    Args:
+        executor: エグゼキューター
+        func: 実行する関数
+        *args: 位置引数
+        **kwargs: キーワード引数
+
+    Returns:
+        Future: 実行結果
+    """
+    return executor.submit(contextvars.copy_context().run, func, *args, **kwargs)
+
+
+def start_thread_in_context(target: Callable[..., Any], *args: Any, name: Optional[str] = None, daemon: bool = True) -> threading.Thread:
+    """
+    現在のコンテキストを引き継いだスレッドを開始する
+
+    Args:
+        target: スレッドで実行する関数
+        *args: 位置引数
+        name: スレッド名
+        daemon: デーモンスレッドにするかどうか
+
+    Returns:
+        threading.Thread: 開始したスレッド
+    """
+    thread = threading.Thread(target=contextvars.copy_context().run, args=(target, *args), name=name, daemon=daemon)
+    thread.start()
+    return thread
+
+
+class TraceContextFilter(logging.Filter):
+    """
+    ログレコードにトレースIDを付与するフィルター
+
+    record.request_id にトレースID（トレース外では "-"）、record.trace_tag に
+    " [request_id=<id>]"（トレース外では空文字）を設定する。
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        trace_id = current_trace_id()
+        record.request_id = trace_id or "-"
+        record.trace_tag = f" [request_id={trace_id}]" if trace_id else ""
+        return True
+
+
+class TraceStore:
+    """
+    完了したトレースをJSONファイルで保存するストア
+
+    1トレース1ファイル（<directory>/<trace_id>.json）で保存し、上限を超えたら古いものから削除する。
+    """
+
+    def __init__(self, directory: str = DEFAULT_TRACE_DIR, max_traces: int = DEFAULT_MAX_TRACES):
+        """
+        初期化
+
+        Args:
+            directory: 保存先ディレクトリ
+            max_traces: 保持するトレース数の上限
+        """
+        self.directory = directory
+        self.max_traces = max_traces
+        self._lock = threading.Lock()
+        self._saved_since_prune = 0
+
+    def _path(self, trace_id: str) -> str:
+        return os.path.join(self.directory, f"{trace_id}.json")
+
+    def save(self, trace: Trace) -> bool:
+        """
+        トレースを保存する
+
+        Args:
+            trace: 完了したトレース
+
+        Returns:
+            bool: 保存に成功したかどうか
+        """
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path(trace.trace_id)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(json_codec.dumps(trace.to_dict(), separators=json_codec.COMPACT_SEPARATORS, default=str))
+            os.replace(tmp_path, path)
+
+            with self._lock:
+                self._saved_since_prune += 1
+                should_prune = self._saved_since_prune >= max(1, self.max_traces // 10)
+                if should_prune:
+                    self._saved_since_prune = 0
+            if should_prune:
+                self.prune()
+            return True
+        except Exception as e:
+            logger.warning(f"⚠️ トレースの保存に失敗しました: {trace.trace_id} - {e}")
+            return False
+
+    def get(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        """
+        トレースを読み込む
+
+        Args:
+            trace_id: トレースID
+
+        Returns:
+            Optional[Dict[str, Any]]: トレース。存在しない場合はNone
+        """
+        if not is_valid_trace_id(trace_id):
+            return None
+        try:
+            with open(self._path(trace_id), "r", encoding="utf-8") as f:
+                return json_codec.loads(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def _files(self) -> List[os.DirEntry]:
+        try:
+            entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith(".json")]
+        except FileNotFoundError:
+            return []
+        return sorted(entries, key=lambda entry: (entry.stat().st_mtime_ns, entry.name), reverse=True)
+
+    def list(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        新しい順にトレースの概要を返す
+
+        Args:
+            limit: 最大件数
+
+        Returns:
+            List[Dict[str, Any]]: trace_id / name / started_at / duration_ms / span_count / attributes
+        """
+        summaries = []
+        for entry in self._files()[:limit]:
+            trace = self.get(entry.name[:-len(".json")])
+            if trace is None:
+                continue
+            summaries.append({
+                "trace_id": trace["trace_id"],
+                "name": trace["name"],
+                "started_at": trace["started_at"],
+                "duration_ms": trace["duration_ms"],
+                "span_count": len(trace["spans"]),
+                "attributes": trace["attributes"],
+            })
+        return summaries
+
+    def prune(self) -> int:
+        """
+        上限を超えた古いトレースを削除する
+
+        Returns:
+            int: 削除した件数
+        """
+        removed = 0
+        for entry in self._files()[self.max_traces:]:
+            try:
+                os.remove(entry.path)
+                removed += 1
+            except OSError:
+                continue
+        return removed
+
+
+def build_waterfall(trace: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    トレースのスパンをウォーターフォール表示用の行にする
+
+    親子関係の深さ優先順に並べ、全体に対する開始位置と幅を百分率で付ける。
+
+    Args:
+        trace: TraceStore.get() の戻り値
+
+    Returns:
+        List[Dict[str, Any]]: スパンに depth / offset_pct / width_pct を加えた行
+    """
+    spans = trace.get("spans", [])
+    total = trace.get("duration_ms") or max(
+        [(s["start_ms"] + (s["duration_ms"] or 0)) for s in spans] or [0]
+    ) or 1
+
+    children: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    known = {s["span_id"] for s in spans}
+    for s in spans:
+        parent = s["parent_id"] if s["parent_id"] in known else None
+        children.setdefault(parent, []).append(s)
+
+    rows: List[Dict[str, Any]] = []
+
+    def visit(parent: Optional[str], depth: int) -> None:
+        for s in sorted(children.get(parent, []), key=lambda item: item["start_ms"]):
+            duration = s["duration_ms"] if s["duration_ms"] is not None else total - s["start_ms"]
+            rows.append({
+                **s,
+                "depth": depth,
+                "offset_pct": round(100 * s["start_ms"] / total, 2),
+                "width_pct": round(max(100 * duration / total, 0.3), 2),
+            })
+            visit(s["span_id"], depth + 1)
+
+    visit(None, 0)
+    return rows
+
+
+__all__ = [
+    "DEFAULT_TRACE_DIR",
+    "Span",
+    "Trace",
+    "TraceContextFilter",
+    "TraceStore",
+    "activate_trace",
+    "annotate",
+    "build_waterfall",
+    "current_span",
+    "current_trace",
+    "current_trace_id",
+    "is_valid_trace_id",
+    "new_trace_id",
+    "propagate",
+    "span",
+    "start_thread_in_context",
+    "start_trace",
+    "submit_in_context",
+    "traced",
+]
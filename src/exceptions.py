@@ -4,7 +4,7 @@
 このモジュールは、AIDE-X全体で使用される例外クラスを提供します。
 """
 
-from typing import List
+from typing import Any, Dict, List, Optional
 
 class PromptError(Exception):
     """プロンプト関連の基本例外クラス"""
@@ -74,16 +74,39 @@ class ResponseFormatError(AIError):
     """Raised when the AI provider returns an unexpected format."""
     pass
 
+class StructuredOutputError(ResponseFormatError):
+    """構造化出力（JSONモード・スキーマ指定）の応答がスキーマに合わない場合の例外"""
+    def __init__(self, provider: str, message: str, errors: Optional[List[str]] = None):
+        self.provider = provider
+        self.errors = errors or []
+        super().__init__(provider, message)
+
 class APIRequestError(AIError):
     """Raised when an API request fails."""
     pass
 
+class RateLimitError(APIRequestError):
+    """プロバイダーのレート制限に達した場合の例外"""
+    def __init__(self, provider: str, message: str, retry_after: Optional[float] = None):
+        self.provider = provider
+        self.retry_after = retry_after
+        super().__init__(provider, message)
+
+class UsageQuotaExceededError(RateLimitError):
+    """利用量クォータ（src.common.llm_usage）を超過したため送信しなかった場合の例外"""
+    def __init__(self, provider: str, message: str, retry_after: Optional[float] = None, violation: Optional[Dict[str, Any]] = None):
+        self.violation = violation or {}
+        super().__init__(provider, message, retry_after=retry_after)
+
 __all__ = [
     'AIError',
     'AIProviderError',
     'ProviderError',
     'EvaluationError',
     'ResponseFormatError',
+    'StructuredOutputError',
     'PromptNotFoundError',
-    'APIRequestError'
+    'APIRequestError',
+    'RateLimitError',
+    'UsageQuotaExceededError'
 ] 
\ No newline at end of file
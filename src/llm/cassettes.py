@@ -0,0 +1,254 @@
+"""
+LLM呼び出しのカセット（記録・再生）
+
+このモジュールは、プロンプト→応答の組をプロンプトのハッシュをキーとして
+JSONL形式で保存するカセットストアと、実プロバイダーへの呼び出しを
+カセットに記録するラッパーを提供します。記録したカセットはフェイクプロバイダーで
+再生でき、APIキーやネットワークなしでパイプラインを再現できます。
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Union
+
+from src.common import json_codec
+from src.common.prompt_cache import content_text
+from src.common.structured_output import STRUCTURE_SCHEMA_NAME
+
+logger = logging.getLogger(__name__)
+
+# カセットのデフォルト保存先
+DEFAULT_CASSETTE_DIR = "data/cassettes"
+
+
+def normalize_messages(prompt: Union[str, List[Any], Dict[str, Any]]) -> List[Dict[str, str]]:
+    """
+    プロバイダーへの入力をメッセージのリストに正規化する
+
+    Args:
+        prompt: プロンプト文字列、メッセージ辞書、またはメッセージのリスト
+
+    Returns:
+        List[Dict[str, str]]: role/content のみを持つメッセージのリスト
+    """
+    if isinstance(prompt, str):
+        return [{"role": "user", "content": prompt}]
+    if isinstance(prompt, dict):
+        prompt = [prompt]
+
+    messages = []
+    for message in prompt or []:
+        if isinstance(message, dict):
+            role, content = message.get("role", "user"), message.get("content", "")
+        else:
+            role, content = getattr(message, "role", "user"), getattr(message, "content", str(message))
+        # コンテンツブロック（キャッシュの区切り付き）は本文を連結し、区切りの有無でキーが変わらないようにする
+        if isinstance(content, list):
+            content = content_text(content)
+        messages.append({"role": str(role), "content": content if isinstance(content, str) else json_codec.dumps(content, sort_keys=True)})
+    return messages
+
+
+def prompt_hash(provider: str, prompt: Union[str, List[Any], Dict[str, Any]]) -> str:
+    """
+    カセットのキーとなるプロンプトのハッシュを計算する
+
+    Args:
+        provider: プロバイダー名
+        prompt: プロンプト文字列またはメッセージのリスト
+
+    Returns:
+        str: sha256のhex文字列
+    """
+    payload = json_codec.dumps(
+        {"provider": provider, "messages": normalize_messages(prompt)},
+        sort_keys=True,
+        separators=json_codec.COMPACT_SEPARATORS
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CassetteStore:
+    """
+    プロバイダーごとのJSONLファイルにプロンプト→応答を保存するストア
+
+    同じキーが複数回記録された場合は最後の記録を再生する。
+    """
+
+    def __init__(self, directory: str = DEFAULT_CASSETTE_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+    def _path(self, provider: str) -> str:
+        """プロバイダーのカセットファイルのパスを返す"""
+        return os.path.join(self.directory, f"{provider}.jsonl")
+
+    def _load(self, provider: str) -> Dict[str, Dict[str, Any]]:
+        """プロバイダーのカセットを読み込む（初回のみ）"""
+        with self._lock:
+            if provider in self._entries:
+                return self._entries[provider]
+
+            entries: Dict[str, Dict[str, Any]] = {}
+            path = self._path(provider)
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    for line_number, line in enumerate(f, 1):
+                        line = line.strip()
+                        if not line:
+                            continue
+                        try:
+                            entry = json_codec.loads(line)
+                        except json.JSONDecodeError:
+                            logger.warning(f"⚠️ カセットの不正な行をスキップしました: {path}:{line_number}")
+                            continue
+                        entries[entry["key"]] = entry
+                logger.info(f"📼 カセットを読み込みました: {path}（{len(entries)}件）")
+            self._entries[provider] = entries
+            return entries
+
+    def get(self, provider: str, prompt: Union[str, List[Any], Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        プロンプトに対応する記録を返す
+
+        Args:
+            provider: プロバイダー名
+            prompt: プロンプト文字列またはメッセージのリスト
+
+        Returns:
+            Optional[Dict[str, Any]]: 記録（content, usage, latency_ms など）。未記録の場合None
+        """
+        return self._load(provider).get(prompt_hash(provider, prompt))
+
+    def record(
+        self,
+        provider: str,
+        prompt: Union[str, List[Any], Dict[str, Any]],
+        content: str,
+        usage: Optional[Dict[str, Any]] = None,
+        latency_ms: Optional[float] = None,
+        model: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        プロンプト→応答の組を記録する
+
+        Args:
+            provider: プロバイダー名
+            prompt: プロンプト文字列またはメッセージのリスト
+            content: 応答本文
+            usage: トークン使用量
+            latency_ms: 実際の応答時間（ミリ秒）
+            model: モデル名
+
+        Returns:
+            Dict[str, Any]: 保存した記録
+        """
+        entries = self._load(provider)
+        entry = {
+            "key": prompt_hash(provider, prompt),
+            "provider": provider,
+            "model": model,
+            "messages": normalize_messages(prompt),
+            "content": content,
+            "usage": usage or {},
+            "latency_ms": round(latency_ms, 1) if latency_ms is not None else None,
+            "recorded_at": datetime.now().isoformat()
+        }
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self._path(provider), "a", encoding="utf-8") as f:
+                f.write(json_codec.dumps(entry, separators=json_codec.COMPACT_SEPARATORS) + "\n")
+            entries[entry["key"]] = entry
+        logger.debug(f"📼 カセットに記録しました - provider: {provider}, key: {entry['key'][:12]}")
+        return entry
+
+    def count(self, provider: str) -> int:
+        """
+        プロバイダーの記録件数を返す
+
+        Args:
+            provider: プロバイダー名
+
+        Returns:
+            int: 記録件数
+        """
+        return len(self._load(provider))
+
+
+class RecordingProvider:
+    """
+    実プロバイダーへの呼び出しをカセットに記録するラッパー
+
+    call / call_structured / generate_response / chat の成功した応答を記録し、
+    それ以外の属性は元のプロバイダーに委譲する。
+    """
+
+    def __init__(self, inner: Any, store: CassetteStore, provider_name: str):
+        self._inner = inner
+        self._store = store
+        self.provider_name = provider_name
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._inner, name)
+
+    def _timed(self, func, *args, **kwargs):
+        """呼び出しを実行し、(結果, 経過ミリ秒) を返す"""
+        start = time.monotonic()
+        result = func(*args, **kwargs)
+        return result, (time.monotonic() - start) * 1000
+
+    def call(self, messages: List[Dict[str, str]], **kwargs) -> Any:
+        """元のプロバイダーのcallを呼び出し、応答を記録する"""
+        response, latency_ms = self._timed(self._inner.call, messages, **kwargs)
+        if isinstance(response, dict):
+            content, usage = response.get("content", ""), response.get("usage")
+        else:
+            content, usage = getattr(response, "content", response), None
+            if getattr(response, "error", None):
+                return response
+        self._store.record(self.provider_name, messages, content or "", usage=usage, latency_ms=latency_ms, model=getattr(self._inner, "model_name", None))
+        return response
+
+    def generate_response(self, prompt: str, **kwargs) -> str:
+        """元のプロバイダーのgenerate_responseを呼び出し、応答を記録する"""
+        response, latency_ms = self._timed(self._inner.generate_response, prompt, **kwargs)
+        self._store.record(self.provider_name, prompt, response or "", latency_ms=latency_ms, model=getattr(self._inner, "model_name", None))
+        return response
+
+    def call_structured(self, messages: List[Dict[str, str]], *args, **kwargs) -> Dict[str, Any]:
+        """
+        元のプロバイダーのcall_structuredを呼び出し、応答を「プロバイダー名.スキーマ名」のカセットに記録する
+
+        フェイクプロバイダーの構造化出力はこのカセットを再生する。
+        """
+        response, latency_ms = self._timed(self._inner.call_structured, messages, *args, **kwargs)
+        name = kwargs.get("name") or (args[1] if len(args) > 1 else STRUCTURE_SCHEMA_NAME)
+        self._store.record(f"{self.provider_name}.{name}", messages, response.get("content", ""), usage=response.get("usage"), latency_ms=latency_ms, model=response.get("model"))
+        return response
+
+    def chat(self, prompt: Any, *args, **kwargs) -> Any:
+        """元のプロバイダーのchatを呼び出し、整形後のプロンプトで応答を記録する"""
+        response, latency_ms = self._timed(self._inner.chat, prompt, *args, **kwargs)
+        if hasattr(prompt, "format") and not isinstance(prompt, str):
+            try:
+                prompt = prompt.format(**kwargs)
+            except Exception:
+                prompt = str(prompt)
+        if isinstance(response, str):
+            self._store.record(self.provider_name, prompt, response, latency_ms=latency_ms, model=getattr(self._inner, "model_name", None))
+        return response
+
+
+__all__ = [
+    "DEFAULT_CASSETTE_DIR",
+    "CassetteStore",
+    "RecordingProvider",
+    "normalize_messages",
+    "prompt_hash",
+]
@@ -4,9 +4,11 @@ AIコントローラー
 このモジュールは、AIプロバイダーの管理とリクエストの制御を行います。
 """
 
-from typing import Dict, Any, Optional, List, Union
+from typing import Dict, Any, Optional, List, Union, Sequence, Callable
+import contextvars
 import logging
 import os
+import time
 from enum import Enum
 from dotenv import load_dotenv
 import json
@@ -14,8 +16,14 @@ from .providers.base import BaseLLMProvider, ChatMessage
 from .providers.chatgpt import ChatGPTProvider
 from .providers.claude import ClaudeProvider
 from .providers.gemini import GeminiProvider
+from .providers.fake import FakeLLMProvider, FakeProviderConfig
+from .cassettes import CassetteStore, RecordingProvider, DEFAULT_CASSETTE_DIR
 from .prompts import prompt_manager
 from src.exceptions import AIProviderError, ResponseFormatError
+from src.common.tracing import span
+from src.common.llm_usage import estimate_tokens, get_usage_ledger
+from src.common.structured_output import STRUCTURE_SCHEMA, STRUCTURE_SCHEMA_NAME
+from src.common.model_routing import get_model_router
 from src.llm.prompts.manager import PromptManager
 from src.types import LLMResponse, AIProviderResponse, StructureDict, EvaluationResult
 
@@ -26,6 +34,26 @@ os.environ.setdefault("OPENAI_API_KEY", "dummy_key")
 
 logger = logging.getLogger(__name__)
 
+# プロバイダーモード（環境変数 LLM_PROVIDER_MODE で切り替え）
+PROVIDER_MODE_LIVE = "live"      # 実APIを呼び出す
+PROVIDER_MODE_FAKE = "fake"      # フェイクプロバイダー（カセット再生・応答合成）
+PROVIDER_MODE_RECORD = "record"  # 実APIを呼び出し、カセットに記録する
+PROVIDER_MODES = (PROVIDER_MODE_LIVE, PROVIDER_MODE_FAKE, PROVIDER_MODE_RECORD)
+
+# route が最後に応答を得たプロバイダー（validate と呼び出し元がキャプチャに記録するため）
+_routed_provider: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("aidex_routed_provider", default=None)
+
+
+def routed_provider() -> Optional[str]:
+    """
+    現在のコンテキストで AIController.route が最後に応答を得たプロバイダーを返す
+
+    Returns:
+        Optional[str]: プロバイダー名（route を呼んでいなければ None）
+    """
+    return _routed_provider.get()
+
+
 class AIProviderType(Enum):
     """AIプロバイダの種類"""
     CHATGPT = "chatgpt"
@@ -35,19 +63,23 @@ class AIProviderType(Enum):
 class AIController:
     """AIコントローラークラス"""
     
-    def __init__(self, prompt_manager: PromptManager):
+    def __init__(self, prompt_manager: PromptManager, provider_mode: str = PROVIDER_MODE_LIVE):
         """
         AIControllerの初期化
         
         Args:
             prompt_manager (PromptManager): プロンプト管理インスタンス（必須）
+            provider_mode (str): プロバイダーモード（"live" / "fake" / "record"）
             
         Raises:
             ValueError: prompt_managerが指定されていない場合
         """
         if prompt_manager is None:
             raise ValueError("PromptManager instance is required")
+        if provider_mode not in PROVIDER_MODES:
+            raise ValueError(f"Unknown provider mode: {provider_mode}")
         self.prompt_manager = prompt_manager
+        self.provider_mode = provider_mode
         self._providers: Dict[str, Any] = {}
         self.failed_providers: Dict[str, str] = {}
         logger.info("AIControllerを初期化しました")
@@ -58,31 +90,187 @@ class AIController:
         logger.info(f"✅ {name}プロバイダを登録しました")
 
     def _call(self, provider: str, messages: List[Dict[str, str]], **kwargs) -> str:
-        """指定したプロバイダを使用してAIを呼び出す（インスタンスメソッド）"""
+        """
+        指定したプロバイダを使用してAIを呼び出す（インスタンスメソッド）
+
+        送信前に利用量クォータを確認し、応答の usage を利用量台帳に記録する。
+        kwargs の prompt_name は台帳の集計にだけ使い、プロバイダには渡さない。
+        """
         if provider not in self._providers:
             if provider in self.failed_providers:
                 raise AIProviderError(f"プロバイダ '{provider}' は初期化に失敗しています: {self.failed_providers[provider]}")
             raise AIProviderError(f"プロバイダ '{provider}' は登録されていません")
         
+        prompt_name = kwargs.pop("prompt_name", None)
+        ledger = get_usage_ledger()
+        reservation = ledger.acquire(provider, estimate_tokens(messages))
+        
+        start = time.monotonic()
         try:
-            # プロバイダーのcallメソッドを呼び出し
-            response = self._providers[provider].call(messages, **kwargs)
+            with span("llm.call", provider=provider, mode=self.provider_mode):
+                # プロバイダーのcallメソッドを呼び出し
+                response = self._providers[provider].call(messages, **kwargs)
+            
+            # AIProviderResponse 形式（Gemini）はエラーを例外にする
+            if not isinstance(response, dict) and getattr(response, "error", None):
+                raise ResponseFormatError(response.error)
+            
+            ledger.record(
+                provider,
+                usage=response.get("usage") if isinstance(response, dict) else getattr(response, "usage", None),
+                model=(response.get("model") if isinstance(response, dict) else getattr(response, "model", None)) or kwargs.get("model") or getattr(self._providers[provider], "model_name", None),
+                prompt_name=prompt_name,
+                latency_ms=(time.monotonic() - start) * 1000,
+                reservation=reservation,
+            )
             
             # レスポンスの処理
             if isinstance(response, dict):
                 return response.get("content", "")
+            elif hasattr(response, "content"):
+                return response.content or ""
             else:
                 return str(response) if response is not None else ""
                 
         except Exception as e:
             logger.error(f"❌ {provider}プロバイダの呼び出しに失敗: {str(e)}")
-            raise AIProviderError(f"AI呼び出しエラー: {str(e)}")
+            ledger.record(
+                provider,
+                model=kwargs.get("model") or getattr(self._providers[provider], "model_name", None),
+                prompt_name=prompt_name,
+                latency_ms=(time.monotonic() - start) * 1000,
+                outcome="error",
+                reservation=reservation,
+            )
+            raise AIProviderError(f"AI呼び出しエラー: {str(e)}") from e
 
     @staticmethod
     def call(provider: str, messages: List[Dict[str, str]], **kwargs) -> str:
         """静的メソッドとしてAIを呼び出す"""
         return controller._call(provider, messages, **kwargs)
 
+    def route(
+        self,
+        task: str,
+        messages: List[Dict[str, str]],
+        validate: Optional[Callable[[str], bool]] = None,
+        providers: Optional[Sequence[str]] = None,
+        **kwargs
+    ) -> str:
+        """
+        タスクの種類からプロバイダーとモデルを選んでAIを呼び出す
+
+        選択はモデルルーター（src.common.model_routing）のポリシーに従い、結果（成功・レイテンシ）を
+        ルーターに記録する。validate が False を返した場合は、ポリシーの回数まで次の候補に
+        エスカレーションする（エスカレーション先がなければ最後の応答を返す）。
+
+        Args:
+            task: タスクの種類（extract / summarize / evaluate / complete / generate）
+            messages: メッセージのリスト
+            validate: 応答の検証関数（省略時は検証しない）
+            providers: 使ってよいプロバイダー（省略時は登録済みのすべて）
+            **kwargs: プロバイダーに渡す追加のパラメータ（prompt_name の既定はタスク名）
+
+        Returns:
+            str: 生成された応答
+
+        Raises:
+            AIProviderError: 呼び出しに失敗した場合
+            ValueError: 不明なタスクの場合
+        """
+        router = get_model_router()
+        kwargs.setdefault("prompt_name", task)
+        decision = router.choose(task, providers=providers, available=self._providers.keys())
+        escalations = 0
+        while True:
+            start = time.monotonic()
+            try:
+                content = self._call(decision.provider, messages, model=decision.model, **dict(kwargs))
+            except AIProviderError:
+                router.observe(decision.provider, decision.model, (time.monotonic() - start) * 1000, success=False)
+                raise
+            latency_ms = (time.monotonic() - start) * 1000
+            _routed_provider.set(decision.provider)
+
+            valid = validate is None or bool(validate(content))
+            router.observe(decision.provider, decision.model, latency_ms, success=valid)
+            if valid or escalations >= router.max_escalations(task):
+                return content
+
+            logger.warning(f"⚠️ {decision.target}の応答が検証に失敗しました - task: {task}")
+            escalated = router.escalate(decision, providers=providers, available=self._providers.keys())
+            if escalated is None:
+                return content
+            decision = escalated
+            escalations += 1
+
+    def call_structured(
+        self,
+        provider: str,
+        messages: List[Dict[str, str]],
+        schema: Dict[str, Any] = STRUCTURE_SCHEMA,
+        name: str = STRUCTURE_SCHEMA_NAME,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """
+        プロバイダーのネイティブな構造化出力でスキーマに沿ったJSONを取得する
+
+        _call と同様に利用量クォータを確認し、usage を利用量台帳に記録する。
+        結果（成功・レイテンシ）はモデルルーターの観測値にも記録する。
+
+        Args:
+            provider: プロバイダー名
+            messages: メッセージのリスト
+            schema: 応答のJSON Schema（既定は共通の構成スキーマ）
+            name: スキーマ名
+            **kwargs: プロバイダーに渡す追加のパラメータ（prompt_name は台帳の集計にだけ使う）
+
+        Returns:
+            Dict[str, Any]: content（JSON文字列）/ data / provider / model / usage
+
+        Raises:
+            AIProviderError: 呼び出しに失敗した場合、または応答がスキーマに合わない場合
+        """
+        target = self._providers.get(provider)
+        if target is None:
+            if provider in self.failed_providers:
+                raise AIProviderError(f"プロバイダ '{provider}' は初期化に失敗しています: {self.failed_providers[provider]}")
+            raise AIProviderError(f"プロバイダ '{provider}' は登録されていません")
+
+        prompt_name = kwargs.pop("prompt_name", None)
+        model = kwargs.get("model") or getattr(target, "model_name", None)
+        ledger = get_usage_ledger()
+        reservation = ledger.acquire(provider, estimate_tokens(messages))
+
+        start = time.monotonic()
+        try:
+            with span("llm.call_structured", provider=provider, mode=self.provider_mode, schema=name):
+                response = target.call_structured(messages, schema=schema, name=name, **kwargs)
+        except Exception as e:
+            logger.error(f"❌ {provider}プロバイダの構造化出力に失敗: {str(e)}")
+            get_model_router().observe(provider, model, (time.monotonic() - start) * 1000, success=False)
+            ledger.record(
+                provider,
+                model=model,
+                prompt_name=prompt_name,
+                latency_ms=(time.monotonic() - start) * 1000,
+                outcome="error",
+                reservation=reservation,
+            )
+            raise AIProviderError(f"構造化出力エラー: {str(e)}") from e
+
+        latency_ms = (time.monotonic() - start) * 1000
+        get_model_router().observe(provider, model, latency_ms, success=True)
+        ledger.record(
+            provider,
+            usage=response.get("usage"),
+            model=response.get("model") or model,
+            prompt_name=prompt_name,
+            latency_ms=latency_ms,
+            reservation=reservation,
+        )
+        return response
+
     def get_provider(self, provider_name: str) -> Optional[Any]:
         """
         指定されたプロバイダーのインスタンスを取得
@@ -93,6 +281,10 @@ class AIController:
         Returns:
             Optional[Any]: プロバイダーインスタンス、存在しない場合はNone
         """
+        # fake/recordモードでは登録済みのプロバイダー（フェイクまたは記録ラッパー）を返す
+        if self.provider_mode != PROVIDER_MODE_LIVE and provider_name.lower() in self._providers:
+            return self._providers[provider_name.lower()]
+        
         providers = {
             'chatgpt': ChatGPTProvider,
             'claude': ClaudeProvider,
@@ -132,23 +324,102 @@ class AIController:
             logger.error(f"Error generating response from {provider_name}: {str(e)}")
             return f"Error: {str(e)}"
 
-def create_controller() -> AIController:
-    """コントローラーのインスタンスを作成し、プロバイダを登録する"""
+def load_fake_provider_config(path: Optional[str]) -> Dict[str, Any]:
+    """
+    フェイクプロバイダーの設定ファイル（JSON）を読み込む
+    
+    Args:
+        path (Optional[str]): 設定ファイルのパス
+        
+    Returns:
+        Dict[str, Any]: 設定辞書（未指定・読み込み失敗時は空の辞書）
+    """
+    if not path:
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.error(f"❌ フェイクプロバイダー設定の読み込みに失敗: {path} - {str(e)}")
+        return {}
+
+def create_fake_controller(
+    fake_config: Optional[Dict[str, Any]] = None,
+    cassette_dir: Optional[str] = None,
+    providers: Sequence[str] = ("chatgpt", "claude", "gemini")
+) -> AIController:
+    """
+    フェイクプロバイダーを登録したコントローラーを作成する
+    
+    Args:
+        fake_config (Optional[Dict[str, Any]]): フェイクプロバイダーの設定辞書
+        cassette_dir (Optional[str]): 再生するカセットのディレクトリ
+        providers (Sequence[str]): 登録するプロバイダー名
+        
+    Returns:
+        AIController: フェイクモードのコントローラー
+    """
+    fake_controller = AIController(prompt_manager=prompt_manager, provider_mode=PROVIDER_MODE_FAKE)
+    store = CassetteStore(cassette_dir or DEFAULT_CASSETTE_DIR)
+    for name in providers:
+        fake_controller.register_provider(name, FakeLLMProvider(
+            provider_name=name,
+            prompt_manager=prompt_manager,
+            config=FakeProviderConfig.from_dict(fake_config, provider=name),
+            store=store
+        ))
+    return fake_controller
+
+def create_controller(
+    provider_mode: Optional[str] = None,
+    fake_config: Optional[Dict[str, Any]] = None,
+    cassette_dir: Optional[str] = None
+) -> AIController:
+    """
+    コントローラーのインスタンスを作成し、プロバイダを登録する
+    
+    Args:
+        provider_mode (Optional[str]): プロバイダーモード（省略時は環境変数 LLM_PROVIDER_MODE、既定は "live"）
+        fake_config (Optional[Dict[str, Any]]): フェイクプロバイダーの設定（省略時は FAKE_LLM_CONFIG のJSONファイル）
+        cassette_dir (Optional[str]): カセットのディレクトリ（省略時は LLM_CASSETTE_DIR）
+        
+    Returns:
+        AIController: コントローラー
+    """
     # .envファイルの読み込みを保証
     load_dotenv()
     
+    provider_mode = (provider_mode or os.getenv("LLM_PROVIDER_MODE") or PROVIDER_MODE_LIVE).lower()
+    if provider_mode not in PROVIDER_MODES:
+        logger.warning(f"⚠️ 不明なプロバイダーモード '{provider_mode}' のため live で起動します")
+        provider_mode = PROVIDER_MODE_LIVE
+    cassette_dir = cassette_dir or os.getenv("LLM_CASSETTE_DIR") or DEFAULT_CASSETTE_DIR
+    if provider_mode == PROVIDER_MODE_FAKE:
+        if fake_config is None:
+            fake_config = load_fake_provider_config(os.getenv("FAKE_LLM_CONFIG"))
+        logger.info(f"🧪 フェイクプロバイダーモードで起動します - cassettes: {cassette_dir}")
+        return create_fake_controller(fake_config=fake_config, cassette_dir=cassette_dir)
+    
     # プロバイダのインポート
     from src.llm.providers.chatgpt import ChatGPTProvider
     from src.llm.providers.claude import ClaudeProvider
     from src.llm.providers.gemini import GeminiProvider
 
-    controller = AIController(prompt_manager=prompt_manager)
+    controller = AIController(prompt_manager=prompt_manager, provider_mode=provider_mode)
 
     # AIプロバイダーの初期化
     chatgpt_provider = ChatGPTProvider(prompt_manager=prompt_manager)
     claude_provider = ClaudeProvider(prompt_manager=prompt_manager)
     gemini_provider = GeminiProvider(prompt_manager=prompt_manager)
 
+    # recordモードでは実プロバイダーの応答をカセットに記録する
+    if provider_mode == PROVIDER_MODE_RECORD:
+        store = CassetteStore(cassette_dir)
+        logger.info(f"📼 記録モードで起動します - cassettes: {cassette_dir}")
+        chatgpt_provider = RecordingProvider(chatgpt_provider, store, "chatgpt")
+        claude_provider = RecordingProvider(claude_provider, store, "claude")
+        gemini_provider = RecordingProvider(gemini_provider, store, "gemini")
+
     # ChatGPTプロバイダの登録
     try:
         controller.register_provider("chatgpt", chatgpt_provider)
@@ -178,4 +449,4 @@ def create_controller() -> AIController:
 # グローバル変数として遅延定義
 controller = create_controller()
 
-__all__ = ["controller", "AIController", "AIProviderType"] 
\ No newline at end of file
+__all__ = ["controller", "AIController", "AIProviderType", "create_controller", "create_fake_controller", "routed_provider"] 
\ No newline at end of file
@@ -17,9 +17,11 @@ from src.structure.utils import StructureDict
 from src.llm.evaluators.common import EvaluationResult
 from src.common.logging_utils import get_logger, log_exception
 from src.exceptions import PromptNotFoundError
+from src.common.tracing import traced
 
 logger = get_logger(__name__)
 
+@traced("evaluation.evaluate_structure_with")
 def evaluate_structure_with(
     provider_name: str,
     structure: StructureDict,
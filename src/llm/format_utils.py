@@ -1,10 +1,10 @@
-import json
+from src.common import json_codec
 
 def normalize_structure_format(structure: dict) -> dict:
     content = structure.get("content", {})
     if isinstance(content, str):
         try:
-            structure["content"] = json.loads(content)
+            structure["content"] = json_codec.loads(content)
         except Exception:
             structure["content"] = {}
     return structure 
\ No newline at end of file
@@ -11,6 +11,7 @@ import json
 from .controller import AIController
 from .providers.base import ChatMessage
 from .prompts import prompt_manager, PromptManager
+from src.common import json_codec
 from src.exceptions import AIProviderError, APIRequestError, ResponseFormatError, PromptNotFoundError
 from src.types import AIProviderResponse
 from datetime import datetime
@@ -18,6 +19,7 @@ from src.llm.providers.base import BaseLLMProvider
 from src.llm.providers.claude import ClaudeProvider
 from src.llm.providers.gemini import GeminiProvider
 from src.utils.logging import save_log
+from src.common.llm_usage import usage_context
 
 logger = logging.getLogger(__name__)
 
@@ -55,7 +57,8 @@ class LLMHub:
         prompt = prompt_manager.get(model_name, prompt_name)
         if prompt is None:
             raise PromptNotFoundError(f"Prompt not found: {model_name}.{prompt_name}")
-        return provider.chat(prompt, model_name, prompt_manager, **kwargs)
+        with usage_context(prompt_name=prompt_name):
+            return provider.chat(prompt, model_name, prompt_manager, **kwargs)
     
     @staticmethod
     def chat(
@@ -177,13 +180,14 @@ def call_model(provider_name: str, model_name: str, prompt_name: str, prompt_man
     # メッセージ形式に変換
     messages = [ChatMessage(role="user", content=formatted_content)]
     
-    # chatメソッドを呼び出し
-    if provider_name == "claude":
-        # ClaudeProviderは異なる引数形式を期待
-        return provider.chat(prompt, model_name, prompt_manager)
-    else:
-        # その他のプロバイダーは標準的な形式
-        return provider.chat(messages, prompt_manager)
+    # chatメソッドを呼び出し（利用量はプロンプト名ごとに集計する）
+    with usage_context(prompt_name=prompt_name):
+        if provider_name == "claude":
+            # ClaudeProviderは異なる引数形式を期待
+            return provider.chat(prompt, model_name, prompt_manager)
+        else:
+            # その他のプロバイダーは標準的な形式
+            return provider.chat(messages, prompt_manager)
 
 def chat(
     provider_name: str,
@@ -332,7 +336,7 @@ def safe_generate_and_evaluate(chat_history: List[Dict[str, Any]]) -> Dict[str,
         
         # 生成された構成をパース
         try:
-            structure = json.loads(response.content)
+            structure = json_codec.loads(response.content)
         except json.JSONDecodeError:
             raise ValueError("Failed to parse generated structure")
         
@@ -343,7 +347,7 @@ def safe_generate_and_evaluate(chat_history: List[Dict[str, Any]]) -> Dict[str,
         
         # 評価結果をパース
         try:
-            evaluation = json.loads(eval_response.content)
+            evaluation = json_codec.loads(eval_response.content)
         except json.JSONDecodeError:
             raise ValueError("Failed to parse evaluation result")
         
@@ -384,7 +388,7 @@ def normalize_structure_format(raw_data: Dict[str, Any]) -> Dict[str, Any]:
         # contentが文字列の場合はJSONとしてパース
         if isinstance(structure["content"], str):
             try:
-                structure["content"] = json.loads(structure["content"])
+                structure["content"] = json_codec.loads(structure["content"])
             except json.JSONDecodeError:
                 structure["content"] = {"raw": structure["content"]}
         
@@ -7,6 +7,7 @@
 import logging
 from typing import Dict, Optional, Any, List, Union
 from dataclasses import dataclass
+from src.common.prompt_cache import PromptLayout
 from src.exceptions import PromptNotFoundError, TemplateFormatError
 from src.types import MessageParam, MessageParamList
 
@@ -14,12 +15,18 @@ logger = logging.getLogger(__name__)
 
 @dataclass
 class Prompt:
-    """プロンプトテンプレート"""
+    """
+    プロンプトテンプレート
+
+    prefix は呼び出しごとに変わらない指示（プレースホルダーを含めず、整形もしない）で、
+    template の整形結果の前に置く。プロバイダーのプロンプトキャッシュはこの固定部分を再利用する。
+    """
     name: str
     provider: str
     description: str
     template: str
     messages: Optional[List[MessageParam]] = None
+    prefix: str = ""
 
     def render(self, content: str) -> str:
         """
@@ -32,7 +39,7 @@ class Prompt:
             str: レンダリングされたテンプレート
         """
         try:
-            return self.template.format(content=content)
+            return PromptLayout(self.prefix, self.template.format(content=content)).text
         except KeyError as e:
             error_msg = f"Invalid template format: {str(e)}"
             logger.error(error_msg)
@@ -50,10 +57,22 @@ class Prompt:
             **kwargs: テンプレートのプレースホルダーに渡す値
             
         Returns:
-            str: フォーマットされたテンプレート
+            str: フォーマットされたテンプレート（prefix があれば先頭に付く）
+        """
+        return self.layout(**kwargs).text
+
+    def layout(self, **kwargs) -> PromptLayout:
+        """
+        固定のプレフィックスと整形したサフィックスに分けてフォーマット
+        
+        Args:
+            **kwargs: テンプレートのプレースホルダーに渡す値
+            
+        Returns:
+            PromptLayout: prefix と整形済みの template
         """
         try:
-            return self.template.format(**kwargs)
+            return PromptLayout(self.prefix, self.template.format(**kwargs))
         except KeyError as e:
             error_msg = f"Invalid template format: {str(e)}"
             logger.error(error_msg)
@@ -173,7 +192,7 @@ class PromptManager:
             raise PromptNotFoundError(provider, template_name)
         
         try:
-            return prompt.template.format(**kwargs)
+            return PromptLayout(prompt.prefix, prompt.template.format(**kwargs)).text
         except KeyError as e:
             logger.error(f"Template formatting error: {str(e)}")
             raise PromptNotFoundError(provider, template_name)
@@ -288,7 +307,7 @@ class PromptManager:
                     })
             else:
                 # メッセージリストがない場合は、テンプレートをユーザーメッセージとして使用
-                formatted_content = prompt.template.format(**kwargs)
+                formatted_content = PromptLayout(prompt.prefix, prompt.template.format(**kwargs)).text
                 messages.append({
                     "role": "user",
                     "content": formatted_content,
@@ -237,7 +237,12 @@ def register_all_templates(prompt_manager: PromptManager) -> None:
     "implementation": "実装の容易さに関する詳細"
   }}
 }}""",
-            "structure_evaluation": """以下の構成を評価してください。\n\nタイトル: {structure.title}\n説明: {structure.description}\n内容: {structure.content}\n\nこの構成の妥当性を0.0-1.0のスコアで評価し、改善すべき点と理由を述べてください。\n\n構成が未記入、または構成が存在しない場合は、\n「構成が未入力のため、評価できません」とだけ返答してください。\n\n評価結果は以下のJSON形式で返してください:\n{{\n  \"is_valid\": true,\n  \"score\": 0.85,\n  \"feedback\": \"構成は概ね妥当ですが、目的の記載が不足しています。\",\n  \"details\": {{\n    \"intent_match\": \"意図との一致度に関する詳細\",\n    \"clarity\": \"構造の明確さに関する詳細\",\n    \"implementation\": \"実装の容易さに関する詳細\",\n    \"strengths\": [\"強み1\", \"強み2\"],\n    \"weaknesses\": [\"弱み1\", \"弱み2\"],\n    \"suggestions\": [\"改善提案1\", \"改善提案2\"]\n  }}\n}}"""
+            "structure_evaluation": """## 評価対象の構成\n{structure}"""
+        }
+        
+        # 呼び出しごとに変わらない指示（テンプレートの前に置き、プロバイダーのプロンプトキャッシュで再利用する）
+        claude_prefixes = {
+            "structure_evaluation": """あなたはアプリ構成のレビュアーです。このメッセージの最後に示す構成を評価してください。\n\nこの構成の妥当性を0.0-1.0のスコアで評価し、改善すべき点と理由を述べてください。\n\n構成が未記入、または構成が存在しない場合は、\n「構成が未入力のため、評価できません」とだけ返答してください。\n\n評価結果は以下のJSON形式で返してください:\n{\n  \"is_valid\": true,\n  \"score\": 0.85,\n  \"feedback\": \"構成は概ね妥当ですが、目的の記載が不足しています。\",\n  \"details\": {\n    \"intent_match\": \"意図との一致度に関する詳細\",\n    \"clarity\": \"構造の明確さに関する詳細\",\n    \"implementation\": \"実装の容易さに関する詳細\",\n    \"strengths\": [\"強み1\", \"強み2\"],\n    \"weaknesses\": [\"弱み1\", \"弱み2\"],\n    \"suggestions\": [\"改善提案1\", \"改善提案2\"]\n  }\n}"""
         }
         
         claude_descriptions = {
@@ -273,7 +278,11 @@ def register_all_templates(prompt_manager: PromptManager) -> None:
     "implementation": "実装の容易さに関する詳細"
   }}
 }}""",
-            "completion": """以下はユーザーの会話とClaudeによる構成評価を元にしたアプリ構成案です。構成の不足点を補完し、必ず下記のJSON形式で出力してください。\n\n## ユーザー入力\n{{ user_input }}\n\n## Claude構成\n{{ structure }}\n\n---\n**出力形式（期待値）:**\n```json\n{{\n  \"title\": \"構成のタイトル\",\n  \"modules\": [\n    {{ \"name\": \"モジュール名\", \"detail\": \"詳細説明\" }}\n    // ... 必要な数だけ繰り返し\n  ]\n}}\n```\n\n**重要:** Claude評価が失敗した場合やClaude構成が空の場合でも、必ず上記のJSON形式（title, modules）で全体構成を出力してください。\n\n**出力ルール:**\n- 必ずJSON形式のみで出力\n- 自然文や説明文は一切含めない\n- コードブロック（```json）で囲む\n- title, modulesは必須フィールド\n- modulesは配列形式で各モジュールにname, detailを含める\n- descriptionは任意フィールド\n- Claude構成が不十分な場合も、推論で全体構成を補完して出力\n- Claude評価が失敗した場合も、ユーザー入力のみから構成を生成し、必ず上記JSON形式で返す\n\n**禁止事項:**\n- 自然文での説明\n- リスト形式や箇条書きでの出力\n- JSON以外の形式\n- コードブロック外での説明\n\n**例:**\n```json\n{{\n  \"title\": \"ブログサイト構成\",\n  \"modules\": [\n    {{ \"name\": \"ヘッダー\", \"detail\": \"ロゴ、ナビゲーション、検索機能を含む\" }},\n    {{ \"name\": \"メインコンテンツ\", \"detail\": \"記事一覧、記事詳細、カテゴリ\" }},\n    {{ \"name\": \"サイドバー\", \"detail\": \"プロフィール、カテゴリ一覧、最新記事\" }},\n    {{ \"name\": \"フッター\", \"detail\": \"コピーライト、リンク\" }}\n  ]\n}}\n```\n\n**最終確認:**\n- 出力は必ずJSON形式のみ\n- 自然文やMarkdownは一切含めない\n- コードブロック（```json）で囲む\n- 有効なJSON構文であることを確認\n\n必ず上記のJSON形式で出力してください。"""
+            "completion": """## 元の構成\n{structure}\n\n## Claude評価フィードバック\n{claude_feedback}"""
+        }
+        
+        gemini_prefixes = {
+            "completion": """このメッセージの最後に、ユーザーの会話から作られたアプリ構成と、Claudeによるその構成の評価を示します。構成の不足点を補完し、必ず下記のJSON形式で出力してください。\n\n---\n**出力形式（期待値）:**\n```json\n{\n  \"title\": \"構成のタイトル\",\n  \"modules\": [\n    { \"name\": \"モジュール名\", \"detail\": \"詳細説明\" }\n    // ... 必要な数だけ繰り返し\n  ]\n}\n```\n\n**重要:** Claude評価が失敗した場合や元の構成が空の場合でも、必ず上記のJSON形式（title, modules）で全体構成を出力してください。\n\n**出力ルール:**\n- 必ずJSON形式のみで出力\n- 自然文や説明文は一切含めない\n- コードブロック（```json）で囲む\n- title, modulesは必須フィールド\n- modulesは配列形式で各モジュールにname, detailを含める\n- descriptionは任意フィールド\n- 元の構成が不十分な場合も、推論で全体構成を補完して出力\n- Claude評価が失敗した場合も、元の構成のみから構成を生成し、必ず上記JSON形式で返す\n\n**禁止事項:**\n- 自然文での説明\n- リスト形式や箇条書きでの出力\n- JSON以外の形式\n- コードブロック外での説明\n\n**例:**\n```json\n{\n  \"title\": \"ブログサイト構成\",\n  \"modules\": [\n    { \"name\": \"ヘッダー\", \"detail\": \"ロゴ、ナビゲーション、検索機能を含む\" },\n    { \"name\": \"メインコンテンツ\", \"detail\": \"記事一覧、記事詳細、カテゴリ\" },\n    { \"name\": \"サイドバー\", \"detail\": \"プロフィール、カテゴリ一覧、最新記事\" },\n    { \"name\": \"フッター\", \"detail\": \"コピーライト、リンク\" }\n  ]\n}\n```\n\n**最終確認:**\n- 出力は必ずJSON形式のみ\n- 自然文やMarkdownは一切含めない\n- コードブロック（```json）で囲む\n- 有効なJSON構文であることを確認\n\n必ず上記のJSON形式で出力してください。"""
         }
         
         gemini_descriptions = {
@@ -287,12 +296,12 @@ def register_all_templates(prompt_manager: PromptManager) -> None:
         
         # テンプレートを登録
         for provider, templates in [
-            ("chatgpt", (chatgpt_templates, chatgpt_descriptions)),
-            ("claude", (claude_templates, claude_descriptions)),
-            ("gemini", (gemini_templates, gemini_descriptions))
+            ("chatgpt", (chatgpt_templates, chatgpt_descriptions, {})),
+            ("claude", (claude_templates, claude_descriptions, claude_prefixes)),
+            ("gemini", (gemini_templates, gemini_descriptions, gemini_prefixes))
         ]:
             logger.info(f"🔄 {provider} テンプレート登録開始")
-            templates_dict, descriptions_dict = templates
+            templates_dict, descriptions_dict, prefixes_dict = templates
             for name, template in templates_dict.items():
                 description = descriptions_dict.get(name, "")
                 logger.info(f"  📝 {provider}.{name} 登録中...")
@@ -301,7 +310,8 @@ def register_all_templates(prompt_manager: PromptManager) -> None:
                     name=name,
                     provider=provider,
                     description=description,
-                    template=template
+                    template=template,
+                    prefix=prefixes_dict.get(name, "")
                 )
                 prompt_manager.register(prompt)
                 logger.info(f"  ✅ {provider}.{name} 登録完了")
@@ -7,9 +7,12 @@ AIプロバイダーモジュール
 from .chatgpt import ChatGPTProvider
 from .claude import ClaudeProvider
 from .gemini import GeminiProvider
+from .fake import FakeLLMProvider, FakeProviderConfig
 
 __all__ = [
     'ChatGPTProvider',
     'ClaudeProvider',
-    'GeminiProvider'
+    'GeminiProvider',
+    'FakeLLMProvider',
+    'FakeProviderConfig'
 ] 
\ No newline at end of file
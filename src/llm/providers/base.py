@@ -5,6 +5,10 @@ Base classes for LLM providers
 from abc import ABC, abstractmethod
 from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
+from src.exceptions import ResponseFormatError
+from src.common.structured_output import (
+    STRUCTURE_SCHEMA, STRUCTURE_SCHEMA_NAME, parse_structured_content, structured_response
+)
 from src.llm.prompts.manager import PromptManager
 
 @dataclass
@@ -57,4 +61,41 @@ class BaseLLMProvider(ABC):
 
     def call(self, prompt: str, **kwargs) -> AIProviderResponse:
         """APIを呼び出して応答を返す"""
-        raise NotImplementedError("Subclasses must implement call()") 
\ No newline at end of file
+        raise NotImplementedError("Subclasses must implement call()")
+
+    def call_structured(
+        self,
+        messages: List[Dict[str, str]],
+        schema: Dict[str, Any] = STRUCTURE_SCHEMA,
+        name: str = STRUCTURE_SCHEMA_NAME,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """
+        スキーマに沿ったJSONを返す呼び出し（構造化出力）
+
+        既定の実装は通常の call の応答からJSONを読み取って検証する。
+        ネイティブの構造化出力を持つプロバイダーはこのメソッドを上書きする。
+
+        Args:
+            messages: メッセージのリスト
+            schema: 応答のJSON Schema（既定は共通の構成スキーマ）
+            name: スキーマ名
+            **kwargs: call に渡す追加のパラメータ
+
+        Returns:
+            Dict[str, Any]: content（JSON文字列）/ data / provider / model / usage
+
+        Raises:
+            StructuredOutputError: 応答がスキーマに合わない場合
+        """
+        response = self.call(messages, **kwargs)
+        if isinstance(response, dict):
+            content, provider = response.get("content", ""), response.get("provider", "unknown")
+            model, usage = response.get("model", self.model), response.get("usage")
+        else:
+            if getattr(response, "error", None):
+                raise ResponseFormatError(response.provider, response.error)
+            content, provider = response.content, response.provider
+            model, usage = getattr(response, "model", None) or self.model, getattr(response, "usage", None)
+        data = parse_structured_content(content, schema, provider)
+        return structured_response(data, provider, model, usage)
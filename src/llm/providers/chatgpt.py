@@ -7,10 +7,18 @@ ChatGPT AIプロバイダー
 import logging
 import openai
 from openai.types.chat import ChatCompletion
+from src.common import json_codec
 from src.llm.providers.base import BaseLLMProvider, ChatMessage
 from src.types import AIProviderResponse, MessageParamList
 from src.exceptions import ChatGPTAPIError, PromptNotFoundError, ResponseFormatError, APIRequestError
 from src.utils.logging import save_log
+from src.common.tracing import traced
+from src.common.llm_usage import estimate_tokens, get_usage_ledger
+from src.common.prompt_cache import content_text
+from src.common.structured_output import (
+    STRUCTURE_SCHEMA, STRUCTURE_SCHEMA_NAME, STRUCTURED_MAX_TOKENS,
+    parse_structured_content, structured_response, to_openai_response_format
+)
 from src.llm.prompts.manager import PromptManager
 import os
 import json
@@ -30,8 +38,8 @@ def safe_yaml_to_json(yaml_str: str) -> Dict[str, Any]:
         # YAMLをパース
         data = yaml.safe_load(yaml_str)
         # JSONに変換して検証
-        json_str = json.dumps(data)
-        return json.loads(json_str)
+        json_str = json_codec.dumps(data)
+        return json_codec.loads(json_str)
     except Exception as e:
         logger.error(f"YAML to JSON conversion failed: {e}")
         return {}
@@ -59,7 +67,7 @@ def extract_json_part(text: str) -> Dict[str, Any]:
         
         try:
             # 修正したJSONをパース
-            return json.loads(fixed_json)
+            return json_codec.loads(fixed_json)
         except json.JSONDecodeError:
             # YAMLとしてパースを試行
             return safe_yaml_to_json(json_str)
@@ -129,13 +137,14 @@ class ChatGPTProvider(BaseLLMProvider):
             # OpenAIクライアントの初期化
             client = openai.OpenAI(api_key=self.api_key)
             
-            # メッセージ形式の変換
+            # メッセージ形式の変換（キャッシュの区切り付きのコンテンツブロックは本文を連結する。
+            # OpenAIは先頭から一致するプレフィックスを自動でキャッシュする）
             openai_messages = []
             for msg in messages:
                 if isinstance(msg, dict):
                     openai_messages.append({
                         "role": msg.get("role", "user"),
-                        "content": msg.get("content", "")
+                        "content": content_text(msg.get("content", ""))
                     })
                 else:
                     logger.warning(f"Invalid message format: {msg}")
@@ -145,11 +154,13 @@ class ChatGPTProvider(BaseLLMProvider):
             
             # ChatGPT API呼び出し
             start_time = time.monotonic()
+            model = kwargs.get("model") or self.model
             response = client.chat.completions.create(
-                model=self.model,
+                model=model,
                 messages=openai_messages,
                 temperature=kwargs.get("temperature", 0.7),
-                max_tokens=kwargs.get("max_tokens", 1000)
+                max_tokens=kwargs.get("max_tokens", 1000),
+                **({"response_format": kwargs["response_format"]} if kwargs.get("response_format") else {})
             )
             
             end_time = time.monotonic()
@@ -175,12 +186,15 @@ class ChatGPTProvider(BaseLLMProvider):
                 
                 return {
                     "content": content,
-                    "model": self.model,
+                    "model": model,
                     "provider": "chatgpt",
                     "usage": {
                         "prompt_tokens": response.usage.prompt_tokens if response.usage else 0,
                         "completion_tokens": response.usage.completion_tokens if response.usage else 0,
-                        "total_tokens": response.usage.total_tokens if response.usage else 0
+                        "total_tokens": response.usage.total_tokens if response.usage else 0,
+                        "prompt_tokens_details": {
+                            "cached_tokens": getattr(getattr(response.usage, "prompt_tokens_details", None), "cached_tokens", 0) or 0
+                        }
                     }
                 }
             else:
@@ -205,6 +219,34 @@ class ChatGPTProvider(BaseLLMProvider):
             logger.error(error_msg)
             raise APIRequestError("chatgpt", error_msg)
     
+    def call_structured(
+        self,
+        messages: List[Dict[str, str]],
+        schema: Dict[str, Any] = STRUCTURE_SCHEMA,
+        name: str = STRUCTURE_SCHEMA_NAME,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """
+        response_format（json_schema, strict）を指定してスキーマに沿ったJSONを取得
+        
+        Args:
+            messages (List[Dict[str, str]]): メッセージのリスト
+            schema (Dict[str, Any]): 応答のJSON Schema
+            name (str): スキーマ名
+            **kwargs: 追加のパラメータ
+            
+        Returns:
+            Dict[str, Any]: content（JSON文字列）/ data / provider / model / usage
+            
+        Raises:
+            APIRequestError: APIリクエストが失敗した場合
+            StructuredOutputError: 応答がスキーマに合わない場合
+        """
+        kwargs.setdefault("max_tokens", STRUCTURED_MAX_TOKENS)
+        response = self.call(messages, response_format=to_openai_response_format(schema, name), **kwargs)
+        data = parse_structured_content(response["content"], schema, "chatgpt")
+        return structured_response(data, "chatgpt", response.get("model"), response.get("usage"))
+    
     def generate_response(self, prompt: str, **kwargs) -> str:
         """
         プロンプトに対する応答を生成
@@ -231,6 +273,7 @@ class ChatGPTProvider(BaseLLMProvider):
         """
         return self.prompt_manager.get_template("chatgpt", template_name)
 
+    @traced("llm.chatgpt.chat")
     def chat(
         self,
         messages: List[ChatMessage],
@@ -335,8 +378,6 @@ def contains_code_block(text: str) -> bool:
     """
     return bool(re.search(r"```(?:\w*\n)?(.+?)```", text, re.DOTALL))
 
-import re
-
 def extract_code_block(text: str) -> str:
     """
     ChatGPTの応答から最初のコードブロック（```～```）を抽出
@@ -424,13 +465,25 @@ def call_chatgpt_api(
         "max_tokens": 4096
     }
     
+    ledger = get_usage_ledger()
+    reservation = ledger.acquire("chatgpt", estimate_tokens(messages))
+    
     try:
         # APIリクエストの送信
+        start = time.monotonic()
         response = requests.post(url, headers=headers, json=data)
         response.raise_for_status()  # エラーステータスの場合は例外を発生
         
         # レスポンスの解析
-        return response.json()
+        result = response.json()
+        ledger.record(
+            "chatgpt",
+            usage=result.get("usage"),
+            model=result.get("model") or model,
+            latency_ms=(time.monotonic() - start) * 1000,
+            reservation=reservation
+        )
+        return result
         
     except requests.exceptions.RequestException as e:
         logger.error(f"ChatGPT API request failed: {str(e)}")
@@ -441,6 +494,9 @@ def call_chatgpt_api(
     except Exception as e:
         logger.error(f"Unexpected error in ChatGPT API call: {str(e)}")
         raise
+    finally:
+        # 記録済みなら何もしない（失敗した場合だけ予約を戻す）
+        ledger.release(reservation)
 
 def call_chatgpt_evaluation(messages: List[Dict[str, str]]) -> Dict[str, Any]:
     """
@@ -472,7 +528,7 @@ def call_chatgpt_evaluation(messages: List[Dict[str, str]]) -> Dict[str, Any]:
             content = response["choices"][0]["message"]["content"]
             # JSON文字列をパース
             try:
-                return json.loads(content)
+                return json_codec.loads(content)
             except json.JSONDecodeError as e:
                 logger.error(f"Failed to parse evaluation result as JSON: {str(e)}")
                 return {}
@@ -6,12 +6,20 @@ Claude AIプロバイダー
 
 import logging
 from anthropic import Anthropic
+from src.common import json_codec
 from src.llm.providers.base import BaseLLMProvider, ChatMessage
 from src.llm.providers.types import AIProviderResponse
-from src.exceptions import ClaudeAPIError, PromptNotFoundError, ResponseFormatError, APIRequestError
-from src.utils.logging import save_log
+from src.exceptions import ClaudeAPIError, PromptNotFoundError, ResponseFormatError, APIRequestError, UsageQuotaExceededError, StructuredOutputError
+from src.common.llm_capture import OUTCOME_ERROR, capture_llm_io
+from src.common.llm_usage import estimate_tokens, get_usage_ledger
+from src.common.structured_output import (
+    STRUCTURE_SCHEMA, STRUCTURE_SCHEMA_NAME, STRUCTURED_MAX_TOKENS,
+    parse_structured_content, structured_response, to_claude_tool, to_claude_tool_choice
+)
+from src.common.tracing import traced
 from src.llm.prompts.manager import PromptManager
 import os
+import time
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 import json
@@ -19,6 +27,23 @@ from src.exceptions import ProviderInitializationError, APIKeyMissingError
 
 logger = logging.getLogger(__name__)
 
+def usage_from_response(response: Any) -> Dict[str, int]:
+    """
+    Claude応答の usage をトークン数の辞書にする
+
+    Args:
+        response: messages.create() の応答
+
+    Returns:
+        Dict[str, int]: input_tokens / output_tokens と、プロンプトキャッシュの
+        cache_read_input_tokens / cache_creation_input_tokens（usageがない場合は0）
+    """
+    usage = getattr(response, "usage", None)
+    return {
+        name: getattr(usage, name, 0) or 0
+        for name in ("input_tokens", "output_tokens", "cache_read_input_tokens", "cache_creation_input_tokens")
+    }
+
 class ClaudeProvider(BaseLLMProvider):
     """Claude AIプロバイダークラス"""
     
@@ -71,13 +96,13 @@ class ClaudeProvider(BaseLLMProvider):
             return response.content[0].text
         except Exception as e:
             error_msg = f"Claude: API request error: {str(e)}"
-            save_log(
-                "Claude API error",
-                logging.ERROR,
-                {
-                    "model": self.model_name,
-                    "error": error_msg
-                }
+            capture_llm_io(
+                "claude",
+                "claude.generate_response",
+                outcome=OUTCOME_ERROR,
+                model=self.model_name,
+                prompt=prompt,
+                error=error_msg
             )
             raise APIRequestError(error_msg)
     
@@ -93,6 +118,7 @@ class ClaudeProvider(BaseLLMProvider):
         """
         return self.prompt_manager.get_template("claude", template_name)
 
+    @traced("llm.claude.chat")
     def chat(self, prompt: 'Prompt', model_name: str, prompt_manager: 'PromptManager', **kwargs) -> str:
         """
         Claude用の統一chatインターフェース
@@ -105,51 +131,64 @@ class ClaudeProvider(BaseLLMProvider):
             str: 生成された応答
         """
         try:
-            prompt_str = prompt.format(**kwargs)
-            save_log(
-                "Claude API request",
-                logging.INFO,
-                {
-                    "model": model_name,
-                    "prompt": prompt_str
-                }
-            )
-            response = self.client.messages.create(
+            # 固定のプレフィックスを持つテンプレートはキャッシュの区切りを付けて送る
+            if hasattr(prompt, "layout"):
+                layout = prompt.layout(**kwargs)
+                prompt_str, messages = layout.text, layout.to_messages()
+            else:
+                prompt_str = prompt.format(**kwargs)
+                messages = [{"role": "user", "content": prompt_str}]
+            ledger = get_usage_ledger()
+            reservation = ledger.acquire("claude", estimate_tokens(prompt_str))
+            start = time.monotonic()
+            try:
+                response = self.client.messages.create(
+                    model=model_name,
+                    messages=messages,
+                    temperature=kwargs.get("temperature", 0.7),
+                    max_tokens=kwargs.get("max_tokens", 1024)
+                )
+            except Exception:
+                ledger.release(reservation)
+                raise
+            ledger.record(
+                "claude",
+                usage=usage_from_response(response),
                 model=model_name,
-                messages=[{"role": "user", "content": prompt_str}],
-                temperature=kwargs.get("temperature", 0.7),
-                max_tokens=kwargs.get("max_tokens", 1024)
+                latency_ms=(time.monotonic() - start) * 1000,
+                reservation=reservation
             )
             if not response or not response.content:
                 raise ResponseFormatError("Claude: Response format error.")
-            save_log(
-                "Claude API response",
-                logging.INFO,
-                {
-                    "model": model_name,
-                    "result": response.content[0].text
-                }
+            capture_llm_io(
+                "claude",
+                "claude.chat",
+                model=model_name,
+                prompt=prompt_str,
+                response=response.content[0].text
             )
             return response.content[0].text
+        except UsageQuotaExceededError:
+            raise
         except ResponseFormatError as e:
-            save_log(
-                "Claude API error",
-                logging.ERROR,
-                {
-                    "model": model_name,
-                    "error": str(e)
-                }
+            capture_llm_io(
+                "claude",
+                "claude.chat",
+                outcome=OUTCOME_ERROR,
+                model=model_name,
+                prompt=prompt_str if 'prompt_str' in locals() else None,
+                error=str(e)
             )
             raise
         except Exception as e:
             error_msg = f"Claude: API request error: {str(e)}"
-            save_log(
-                "Claude API error",
-                logging.ERROR,
-                {
-                    "model": model_name,
-                    "error": error_msg
-                }
+            capture_llm_io(
+                "claude",
+                "claude.chat",
+                outcome=OUTCOME_ERROR,
+                model=model_name,
+                prompt=prompt_str if 'prompt_str' in locals() else None,
+                error=error_msg
             )
             raise APIRequestError(error_msg)
 
@@ -173,8 +212,9 @@ class ClaudeProvider(BaseLLMProvider):
         
         try:
             # Claude API呼び出し
+            model = kwargs.get("model") or self.model_name
             response = self.client.messages.create(
-                model=self.model_name,
+                model=model,
                 messages=messages,
                 temperature=kwargs.get("temperature", 0.7),
                 max_tokens=kwargs.get("max_tokens", 1000)
@@ -188,12 +228,9 @@ class ClaudeProvider(BaseLLMProvider):
                 
                 return {
                     "content": content,
-                    "model": self.model_name,
+                    "model": model,
                     "provider": "claude",
-                    "usage": {
-                        "input_tokens": response.usage.input_tokens if response.usage else 0,
-                        "output_tokens": response.usage.output_tokens if response.usage else 0
-                    }
+                    "usage": usage_from_response(response)
                 }
             else:
                 error_msg = "Claude API returned empty response"
@@ -205,6 +242,55 @@ class ClaudeProvider(BaseLLMProvider):
             logger.error(error_msg)
             raise APIRequestError("claude", error_msg)
 
+    def call_structured(
+        self,
+        messages: List[Dict[str, str]],
+        schema: Dict[str, Any] = STRUCTURE_SCHEMA,
+        name: str = STRUCTURE_SCHEMA_NAME,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """
+        スキーマを入力に持つツールの使用を強制し、ツール入力としてJSONを取得
+        
+        Args:
+            messages (List[Dict[str, str]]): メッセージのリスト
+            schema (Dict[str, Any]): 応答のJSON Schema
+            name (str): ツール名
+            **kwargs: 追加のパラメータ
+            
+        Returns:
+            Dict[str, Any]: content（JSON文字列）/ data / provider / model / usage
+            
+        Raises:
+            APIRequestError: APIリクエストが失敗した場合
+            StructuredOutputError: ツール呼び出しがない、または入力がスキーマに合わない場合
+        """
+        model = kwargs.get("model") or self.model_name
+        try:
+            response = self.client.messages.create(
+                model=model,
+                messages=messages,
+                temperature=kwargs.get("temperature", 0.7),
+                max_tokens=kwargs.get("max_tokens", STRUCTURED_MAX_TOKENS),
+                tools=[to_claude_tool(schema, name)],
+                tool_choice=to_claude_tool_choice(name)
+            )
+        except Exception as e:
+            error_msg = f"Claude API call failed: {str(e)}"
+            logger.error(error_msg)
+            raise APIRequestError("claude", error_msg)
+        
+        tool_input = next(
+            (block.input for block in response.content or []
+             if getattr(block, "type", None) == "tool_use" and getattr(block, "name", None) == name),
+            None
+        )
+        if tool_input is None:
+            raise StructuredOutputError("claude", f"Claude応答にツール '{name}' の呼び出しが含まれていません（stop_reason: {getattr(response, 'stop_reason', None)}）")
+        
+        data = parse_structured_content(tool_input, schema, "claude")
+        return structured_response(data, "claude", model, usage_from_response(response))
+
 def call_claude_api(
     messages: List[Dict[str, str]],
     model: str = "claude-3-opus-20240229",
@@ -291,7 +377,7 @@ def call_claude_evaluation(messages: List[Dict[str, str]]) -> Dict[str, Any]:
             if "text" in content:
                 # JSON文字列をパース
                 try:
-                    return json.loads(content["text"])
+                    return json_codec.loads(content["text"])
                 except json.JSONDecodeError as e:
                     logger.error(f"Failed to parse evaluation result as JSON: {str(e)}")
                     return {}
@@ -305,5 +391,6 @@ def call_claude_evaluation(messages: List[Dict[str, str]]) -> Dict[str, Any]:
 
 __all__ = [
     'call_claude_api',
-    'call_claude_evaluation'
+    'call_claude_evaluation',
+    'usage_from_response'
 ]
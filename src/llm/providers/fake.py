@@ -0,0 +1,448 @@
+"""
+フェイクLLMプロバイダー
+
+このモジュールは、実際のAPIを呼び出さずに応答を返すローカル代替プロバイダーを提供します。
+カセットに記録済みのプロンプトは記録された応答を再生し、未記録のプロンプトには
+プロバイダーごとの形式（構成JSON・評価JSON）で応答を合成します。
+構造化出力（call_structured）では指定されたスキーマに合うJSONを合成します。
+レイテンシ分布・エラー率・レート制限・JSONの途中切れを設定でき、
+ChatGPT → Claude → Gemini の処理フローを決定的に再現できます。
+キャッシュの区切り（src.common.prompt_cache）を持つプロンプトは、有効期間内に同じプレフィックスを
+送るとキャッシュから読んだものとして、usage に読んだトークン数を含め、その割合だけレイテンシを短くします。
+"""
+
+import hashlib
+import logging
+import math
+import random
+import threading
+import time
+from dataclasses import dataclass, field, fields
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.common import json_codec
+from src.common.prompt_cache import cache_prefix
+from src.common.structured_output import (
+    STRUCTURE_SCHEMA, STRUCTURE_SCHEMA_NAME, parse_structured_content, structured_response, synthesize_from_schema
+)
+from src.exceptions import APIRequestError, RateLimitError
+from src.llm.cassettes import CassetteStore, normalize_messages, prompt_hash
+from src.llm.providers.base import BaseLLMProvider
+
+logger = logging.getLogger(__name__)
+
+# 再生モード
+MODE_REPLAY = "replay"          # カセットのみ（未記録はエラー）
+MODE_SYNTHESIZE = "synthesize"  # 常に合成
+MODE_AUTO = "auto"              # カセット優先、未記録は合成
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal")
+
+
+@dataclass
+class FakeProviderConfig:
+    """フェイクプロバイダーの設定"""
+    mode: str = MODE_AUTO
+    latency_distribution: str = "fixed"
+    latency_ms: float = 0.0
+    latency_jitter_ms: float = 0.0
+    replay_latency: bool = False
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after_s: float = 1.0
+    truncated_json_rate: float = 0.0
+    prompt_cache_ttl_s: float = 300.0
+    cache_latency_savings: float = 0.8
+    seed: Optional[int] = None
+    model_name: str = "fake-llm"
+    response_template: Optional[str] = None
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]], provider: Optional[str] = None) -> "FakeProviderConfig":
+        """
+        辞書から設定を作成する
+
+        {"default": {...}, "providers": {"claude": {...}}} 形式の場合は、
+        default にプロバイダー別の設定を上書きした値を使う。
+
+        Args:
+            data: 設定辞書
+            provider: プロバイダー名
+
+        Returns:
+            FakeProviderConfig: 設定
+        """
+        data = dict(data or {})
+        if "default" in data or "providers" in data:
+            merged = dict(data.get("default", {}))
+            merged.update(data.get("providers", {}).get(provider or "", {}))
+            data = merged
+
+        known = {f.name for f in fields(cls)}
+        values = {key: value for key, value in data.items() if key in known}
+        values.setdefault("extra", {}).update({key: value for key, value in data.items() if key not in known})
+        config = cls(**values)
+        if config.mode not in (MODE_REPLAY, MODE_SYNTHESIZE, MODE_AUTO):
+            raise ValueError(f"不正なモード: {config.mode}")
+        if config.latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"不正なレイテンシ分布: {config.latency_distribution}")
+        return config
+
+
+def estimate_token_count(text: str) -> int:
+    """
+    トークン数を簡易的に見積もる（英数字は約4文字、それ以外は1文字で1トークン）
+
+    Args:
+        text: テキスト
+
+    Returns:
+        int: 見積もりトークン数
+    """
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return math.ceil(ascii_chars / 4) + (len(text) - ascii_chars)
+
+
+class FakeLLMProvider(BaseLLMProvider):
+    """カセット再生と応答合成を行うフェイクLLMプロバイダークラス"""
+
+    def __init__(
+        self,
+        provider_name: str = "chatgpt",
+        prompt_manager: Optional[Any] = None,
+        config: Optional[FakeProviderConfig] = None,
+        store: Optional[CassetteStore] = None,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        FakeLLMProviderの初期化
+
+        Args:
+            provider_name (str): 模倣するプロバイダー名（応答形式・usage形式に影響）
+            prompt_manager (Optional[PromptManager]): プロンプト管理インスタンス
+            config (Optional[FakeProviderConfig]): 設定
+            store (Optional[CassetteStore]): 再生に使うカセットストア
+            sleep (Callable[[float], None]): 待機関数（テストで差し替え可能）
+            clock (Callable[[], float]): プロンプトキャッシュの有効期間の判定に使う時計
+        """
+        self.provider_name = provider_name
+        self.prompt_manager = prompt_manager
+        self.config = config or FakeProviderConfig()
+        self.store = store
+        self.model_name = self.config.model_name
+        self._sleep = sleep
+        self._clock = clock
+        self._random = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        # プレフィックスのハッシュ → キャッシュの有効期限
+        self._prompt_cache: Dict[str, float] = {}
+        self.stats: Dict[str, int] = {
+            "calls": 0, "replayed": 0, "synthesized": 0,
+            "errors": 0, "rate_limited": 0, "truncated": 0,
+            "cache_hits": 0, "cache_writes": 0
+        }
+        super().__init__(model=self.model_name)
+        logger.info(f"🧪 FakeLLMProvider initialized - provider: {provider_name}, mode: {self.config.mode}")
+
+    def _roll(self) -> float:
+        """0以上1未満の乱数を返す（スレッドセーフ）"""
+        with self._lock:
+            return self._random.random()
+
+    def _count(self, key: str) -> None:
+        """統計値を加算する"""
+        with self._lock:
+            self.stats[key] += 1
+
+    def sample_latency_ms(self) -> float:
+        """
+        設定された分布からレイテンシをサンプリングする
+
+        Returns:
+            float: レイテンシ（ミリ秒、0以上）
+        """
+        mean, jitter = self.config.latency_ms, self.config.latency_jitter_ms
+        distribution = self.config.latency_distribution
+        with self._lock:
+            if distribution == "uniform":
+                value = self._random.uniform(mean - jitter, mean + jitter)
+            elif distribution == "normal":
+                value = self._random.gauss(mean, jitter)
+            elif distribution == "lognormal" and mean > 0:
+                # 平均 mean・標準偏差 jitter となる対数正規分布
+                sigma = math.sqrt(math.log(1 + (jitter / mean) ** 2))
+                value = self._random.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma)
+            else:
+                value = mean
+        return max(0.0, value)
+
+    def _prompt_cache_hit(self, prefix: Optional[str]) -> bool:
+        """プレフィックスが有効期間内にキャッシュされているかどうか"""
+        if prefix is None or self.config.prompt_cache_ttl_s <= 0:
+            return False
+        key = hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+        with self._lock:
+            return self._prompt_cache.get(key, 0.0) > self._clock()
+
+    def _store_prompt_cache(self, prefix: str) -> None:
+        """プレフィックスをキャッシュする（読んだ場合も有効期間を延ばす）"""
+        now = self._clock()
+        key = hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+        with self._lock:
+            for expired in [k for k, expires in self._prompt_cache.items() if expires <= now]:
+                del self._prompt_cache[expired]
+            self._prompt_cache[key] = now + self.config.prompt_cache_ttl_s
+
+    def _synthesize(self, messages: List[Dict[str, str]]) -> str:
+        """プロバイダーの役割に沿った応答を合成する"""
+        last_user = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+        key = prompt_hash(self.provider_name, messages)[:8]
+        summary = " ".join(last_user.split())[:40] or "構成"
+
+        if self.config.response_template:
+            return self.config.response_template.format(prompt=last_user, summary=summary, key=key)
+
+        if self.provider_name == "claude":
+            payload = {
+                "score": 0.5 + int(key[:2], 16) / 512,
+                "feedback": f"{summary} についての評価（フェイク応答 {key}）",
+                "details": {"completeness": 0.8, "consistency": 0.7}
+            }
+            return json_codec.dumps(payload)
+
+        payload = {
+            "title": summary,
+            "description": f"フェイク応答により生成された構成（{key}）",
+            "content": {
+                "画面構成": {"ヘッダー": "タイトルとナビゲーション", "メイン": summary},
+                "機能": {"入力": "ユーザー入力の受付", "出力": "結果の表示"}
+            }
+        }
+        return "```json\n" + json_codec.dumps(payload, indent=2) + "\n```"
+
+    def _synthesize_structured(self, messages: List[Dict[str, str]], schema: Dict[str, Any]) -> str:
+        """スキーマに合うJSONを合成する（ネイティブの構造化出力と同じくコードブロックなしのJSONのみ）"""
+        last_user = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+        summary = " ".join(last_user.split())[:40] or "構成"
+        return json_codec.dumps(synthesize_from_schema(schema, summary), indent=2)
+
+    def _truncate(self, content: str) -> str:
+        """JSONが途中で切れた応答を作る"""
+        start = content.find("{")
+        if start < 0 or len(content) - start < 4:
+            return content
+        cut = start + 2 + int((len(content) - start - 3) * (0.3 + 0.5 * self._roll()))
+        return content[:cut]
+
+    def _usage(self, messages: List[Dict[str, str]], content: str,
+               cache: Optional[Tuple[int, int]] = None) -> Dict[str, Any]:
+        """
+        模倣するプロバイダー形式のトークン使用量を返す
+
+        cache（キャッシュから読んだトークン数, キャッシュに書いたトークン数）を指定した場合は、
+        Claude は cache_read_input_tokens / cache_creation_input_tokens（input_tokens はそれ以外の分）、
+        それ以外は prompt_tokens_details.cached_tokens を含める。
+        """
+        prompt_tokens = sum(estimate_token_count(m["content"]) for m in messages)
+        completion_tokens = estimate_token_count(content)
+        if self.provider_name == "claude":
+            usage: Dict[str, Any] = {"input_tokens": prompt_tokens, "output_tokens": completion_tokens}
+            if cache is not None:
+                usage["input_tokens"] = max(0, prompt_tokens - cache[0] - cache[1])
+                usage["cache_read_input_tokens"], usage["cache_creation_input_tokens"] = cache
+            return usage
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+        if cache is not None:
+            usage["prompt_tokens_details"] = {"cached_tokens": cache[0]}
+        return usage
+
+    def respond(self, prompt: Any, schema: Optional[Dict[str, Any]] = None,
+                schema_name: str = STRUCTURE_SCHEMA_NAME) -> Dict[str, Any]:
+        """
+        プロンプトに対する応答を返す（再生または合成、遅延・エラー注入を含む）
+
+        schema を指定した場合は構造化出力として扱い、カセットは「プロバイダー名.スキーマ名」で引く。
+
+        Args:
+            prompt: プロンプト文字列またはメッセージのリスト
+            schema: 構造化出力のJSON Schema
+            schema_name: スキーマ名
+
+        Returns:
+            Dict[str, Any]: content / model / provider / usage / source を含む応答
+
+        Raises:
+            RateLimitError: レート制限を注入した場合
+            APIRequestError: エラーを注入した場合、またはreplayモードで未記録の場合
+        """
+        self._count("calls")
+        prefix = cache_prefix(prompt)
+        messages = normalize_messages(prompt)
+        cassette = f"{self.provider_name}.{schema_name}" if schema is not None else self.provider_name
+
+        recorded = None
+        if self.store is not None and self.config.mode != MODE_SYNTHESIZE:
+            recorded = self.store.get(cassette, messages)
+        if recorded is None and self.config.mode == MODE_REPLAY:
+            self._count("errors")
+            raise APIRequestError(self.provider_name, f"Fake {self.provider_name}: カセットに記録がありません（key: {prompt_hash(cassette, messages)[:12]}）")
+
+        if recorded is not None and self.config.replay_latency and recorded.get("latency_ms") is not None:
+            latency_ms = float(recorded["latency_ms"])
+        else:
+            latency_ms = self.sample_latency_ms()
+
+        # キャッシュから読んだプレフィックスの割合だけレイテンシを短くする
+        cache_hit = self._prompt_cache_hit(prefix)
+        prefix_tokens = estimate_token_count(prefix) if prefix is not None else 0
+        if cache_hit:
+            prompt_tokens = sum(estimate_token_count(m["content"]) for m in messages) or 1
+            latency_ms *= 1 - self.config.cache_latency_savings * min(1.0, prefix_tokens / prompt_tokens)
+        if latency_ms > 0:
+            self._sleep(latency_ms / 1000)
+
+        if self._roll() < self.config.rate_limit_rate:
+            self._count("rate_limited")
+            raise RateLimitError(self.provider_name, f"Fake {self.provider_name}: rate limit exceeded", retry_after=self.config.retry_after_s)
+        if self._roll() < self.config.error_rate:
+            self._count("errors")
+            raise APIRequestError(self.provider_name, f"Fake {self.provider_name}: injected API error")
+
+        if recorded is not None:
+            self._count("replayed")
+            content, source = recorded.get("content", ""), "cassette"
+        else:
+            self._count("synthesized")
+            if schema is not None:
+                content = self._synthesize_structured(messages, schema)
+            else:
+                content = self._synthesize(messages)
+            source = "synthesized"
+
+        if self._roll() < self.config.truncated_json_rate:
+            self._count("truncated")
+            content = self._truncate(content)
+            source += "+truncated"
+
+        cache = None
+        if prefix is not None and self.config.prompt_cache_ttl_s > 0:
+            self._count("cache_hits" if cache_hit else "cache_writes")
+            self._store_prompt_cache(prefix)
+            cache = (prefix_tokens, 0) if cache_hit else (0, prefix_tokens)
+
+        return {
+            "content": content,
+            "model": self.model_name,
+            "provider": self.provider_name,
+            "usage": (recorded or {}).get("usage") or self._usage(messages, content, cache),
+            "source": source,
+            "latency_ms": round(latency_ms, 1)
+        }
+
+    def call(self, messages: List[Dict[str, str]], **kwargs) -> Dict[str, Any]:
+        """
+        実プロバイダーのcallと同じ形式で応答を返す
+
+        Args:
+            messages (List[Dict[str, str]]): メッセージのリスト
+            **kwargs: 追加のパラメータ（model は応答のモデル名に反映し、それ以外は無視される）
+
+        Returns:
+            Dict[str, Any]: 生成された応答
+        """
+        response = self.respond(messages)
+        if kwargs.get("model"):
+            response["model"] = kwargs["model"]
+        return response
+
+    def call_structured(
+        self,
+        messages: List[Dict[str, str]],
+        schema: Dict[str, Any] = STRUCTURE_SCHEMA,
+        name: str = STRUCTURE_SCHEMA_NAME,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """
+        実プロバイダーの構造化出力を模倣する（スキーマに合うJSONを再生または合成する）
+
+        JSONの途中切れを注入した場合は、実プロバイダーと同じく StructuredOutputError になる。
+
+        Args:
+            messages (List[Dict[str, str]]): メッセージのリスト
+            schema (Dict[str, Any]): 応答のJSON Schema
+            name (str): スキーマ名
+            **kwargs: 追加のパラメータ（model は応答のモデル名に反映し、それ以外は無視される）
+
+        Returns:
+            Dict[str, Any]: content（JSON文字列）/ data / provider / model / usage / source
+        """
+        response = self.respond(messages, schema=schema, schema_name=name)
+        data = parse_structured_content(response["content"], schema, self.provider_name)
+        return structured_response(
+            data, self.provider_name, kwargs.get("model") or response["model"], response["usage"],
+            source=response["source"], latency_ms=response["latency_ms"]
+        )
+
+    def generate_response(self, prompt: str, **kwargs) -> str:
+        """
+        プロンプトに対する応答を生成
+
+        Args:
+            prompt (str): 入力プロンプト
+            **kwargs: 追加のパラメータ（無視される）
+
+        Returns:
+            str: 生成された応答
+        """
+        return self.respond(prompt)["content"]
+
+    def chat(self, prompt: Any, *args, **kwargs) -> str:
+        """
+        各プロバイダーのchatインターフェースに対応した応答を返す
+
+        Prompt テンプレートの場合は kwargs で整形したプロンプト（固定のプレフィックスを持つ場合は
+        キャッシュの区切り付き）、ChatMessage のリストの場合はそのままメッセージとして扱う。
+
+        Args:
+            prompt: Prompt テンプレート、文字列、またはメッセージのリスト
+            *args: model_name / prompt_manager など（無視される）
+            **kwargs: テンプレートに渡すパラメータ
+
+        Returns:
+            str: 生成された応答
+        """
+        if hasattr(prompt, "layout") and not isinstance(prompt, (str, list)):
+            prompt = prompt.layout(**kwargs).to_messages()
+        elif hasattr(prompt, "format") and not isinstance(prompt, (str, list)):
+            prompt = prompt.format(**kwargs)
+        return self.respond(prompt)["content"]
+
+    def get_template(self, template_name: str) -> Optional[str]:
+        """
+        指定されたテンプレートを取得
+
+        Args:
+            template_name (str): テンプレート名
+
+        Returns:
+            Optional[str]: テンプレート文字列、存在しない場合はNone
+        """
+        if self.prompt_manager is None:
+            return None
+        return self.prompt_manager.get_template(self.provider_name, template_name)
+
+
+__all__ = [
+    "MODE_AUTO",
+    "MODE_REPLAY",
+    "MODE_SYNTHESIZE",
+    "FakeProviderConfig",
+    "FakeLLMProvider",
+    "estimate_token_count",
+]
@@ -6,15 +6,24 @@ Gemini AIプロバイダー
 
 import logging
 from google import generativeai as genai
+from src.common import json_codec
 from src.llm.providers.base import BaseLLMProvider, ChatMessage
 from src.llm.providers.types import AIProviderResponse
-from src.exceptions import GeminiAPIError, PromptNotFoundError, ResponseFormatError, APIRequestError
-from src.utils.logging import save_log
+from src.exceptions import GeminiAPIError, PromptNotFoundError, ResponseFormatError, APIRequestError, UsageQuotaExceededError
+from src.common.llm_capture import OUTCOME_ERROR, capture_llm_io
+from src.common.llm_usage import estimate_tokens, get_usage_ledger
+from src.common.prompt_cache import content_text
+from src.common.structured_output import (
+    STRUCTURE_SCHEMA, STRUCTURE_SCHEMA_NAME, STRUCTURED_MAX_TOKENS,
+    parse_structured_content, structured_response, to_gemini_response_schema
+)
+from src.common.tracing import traced
 from src.llm.prompts.manager import PromptManager
 from src.llm.prompts.prompt import Prompt
 from src.structure_feedback_engine import StructureFeedbackEngine
 import os
 import json
+import time
 import requests
 import re
 from typing import List, Dict, Any, Optional, Union, Tuple
@@ -31,8 +40,8 @@ def safe_yaml_to_json(yaml_str: str) -> Dict[str, Any]:
         # YAMLをパース
         data = yaml.safe_load(yaml_str)
         # JSONに変換して検証
-        json_str = json.dumps(data)
-        return json.loads(json_str)
+        json_str = json_codec.dumps(data)
+        return json_codec.loads(json_str)
     except Exception as e:
         logger.error(f"YAML to JSON conversion failed: {e}")
         return {}
@@ -79,7 +88,7 @@ def extract_json_part(text: str) -> Dict[str, Any]:
     try:
         # src/utils/files.pyのextract_json_partを使用
         from src.utils.files import extract_json_part as files_extract_json_part
-        return files_extract_json_part(text)
+        return files_extract_json_part(text, provider="gemini")
     except Exception as e:
         # エラー情報をログに保存
         error_dump = {
@@ -98,6 +107,27 @@ def extract_json_part(text: str) -> Dict[str, Any]:
             "original_text": text[:200] + "..." if len(text) > 200 else text
         }
 
+def usage_from_response(response: Any) -> Dict[str, int]:
+    """
+    Gemini応答の usage_metadata をトークン数の辞書にする
+
+    Args:
+        response: generate_content() の応答
+
+    Returns:
+        Dict[str, int]: prompt_tokens / completion_tokens / total_tokens と、プロンプトキャッシュから読んだ
+        cached_content_token_count（usage_metadataがない場合は0）
+    """
+    metadata = getattr(response, "usage_metadata", None)
+    prompt_tokens = getattr(metadata, "prompt_token_count", 0) or 0
+    completion_tokens = getattr(metadata, "candidates_token_count", 0) or 0
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": getattr(metadata, "total_token_count", 0) or prompt_tokens + completion_tokens,
+        "cached_content_token_count": getattr(metadata, "cached_content_token_count", 0) or 0,
+    }
+
 class GeminiProvider(BaseLLMProvider):
     """Gemini AIプロバイダークラス"""
     
@@ -143,6 +173,7 @@ class GeminiProvider(BaseLLMProvider):
             self.model_name = "gemini-1.5-flash"
             # Set the actual model instance after parent constructor
             self.model = genai.GenerativeModel(self.model_name)
+            self._models: Dict[str, Any] = {}
             self.feedback_engine = StructureFeedbackEngine()
             logger.info("✅ GeminiProvider initialized with PromptManager and API Key")
             logger.debug(f"🎯 使用モデル: {self.model_name}")
@@ -201,22 +232,29 @@ class GeminiProvider(BaseLLMProvider):
         """
         return self.prompt_manager.get_template("gemini", template_name)
 
-    def call(self, prompt: str, **kwargs) -> AIProviderResponse:
-        """Gemini APIを呼び出して応答を返す"""
-        try:
-            # リクエストログの保存
-            save_log(
-                "Gemini API request",
-                logging.INFO,
-                {
-                    "model": self.model_name,
-                    "prompt": prompt,
-                    "temperature": kwargs.get("temperature", 0.7),
-                    "max_tokens": kwargs.get("max_tokens", 1024)
-                }
-            )
+    def _generative_model(self, model_name: Optional[str] = None) -> Any:
+        """
+        モデル名に対応する GenerativeModel を返す（既定のモデル以外は初回に作成して再利用する）
+        
+        Args:
+            model_name (Optional[str]): モデル名（省略時は既定のモデル）
             
-            response = self.model.generate_content(
+        Returns:
+            Any: GenerativeModel
+        """
+        if not model_name or model_name == self.model_name:
+            return self.model
+        if model_name not in self._models:
+            self._models[model_name] = genai.GenerativeModel(model_name)
+        return self._models[model_name]
+
+    def call(self, prompt: Union[str, List[Dict[str, str]]], **kwargs) -> AIProviderResponse:
+        """Gemini APIを呼び出して応答を返す（メッセージのリストは本文を連結して送信する）"""
+        if not isinstance(prompt, str):
+            prompt = "\n\n".join(content_text(message.get("content", "")) for message in prompt)
+        model_name = kwargs.get("model") or self.model_name
+        try:
+            response = self._generative_model(model_name).generate_content(
                 prompt,
                 generation_config=genai.types.GenerationConfig(
                     temperature=kwargs.get("temperature", 0.7),
@@ -241,59 +279,60 @@ class GeminiProvider(BaseLLMProvider):
                     reference_json = kwargs.get("reference_json")
                     if reference_json:
                         result = self.feedback_engine.process_structure(
-                            json.dumps(extracted_json),
-                            reference_json
+                            json_codec.dumps(extracted_json, ensure_ascii=True),
+                            reference_json,
+                            provider="gemini"
                         )
                     else:
                         result = extracted_json
                     
-                    # レスポンスログの保存
-                    save_log(
-                        "Gemini API response",
-                        logging.INFO,
-                        {
-                            "model": self.model_name,
-                            "result": result,
-                            "raw": str(response)
-                        }
+                    # 入出力をキャプチャストアに記録
+                    capture_llm_io(
+                        "gemini",
+                        "gemini.call",
+                        model=model_name,
+                        prompt=prompt,
+                        response=content,
+                        result=result
                     )
                     
                     return AIProviderResponse(
-                        content=json.dumps(result),
+                        content=json_codec.dumps(result, ensure_ascii=True),
                         raw=response,
                         provider="gemini",
-                        error=None
+                        error=None,
+                        model=model_name,
+                        usage=usage_from_response(response)
                     )
                 except Exception as e:
                     raise ResponseFormatError(f"Gemini: Failed to process JSON response: {str(e)}")
             
-            # 通常レスポンスのログ保存
-            save_log(
-                "Gemini API response",
-                logging.INFO,
-                {
-                    "model": self.model_name,
-                    "result": content,
-                    "raw": str(response)
-                }
+            # 通常レスポンスの入出力を記録
+            capture_llm_io(
+                "gemini",
+                "gemini.call",
+                model=model_name,
+                prompt=prompt,
+                response=content
             )
             
             return AIProviderResponse(
                 content=content,
                 raw=response,
                 provider="gemini",
-                error=None
+                error=None,
+                model=model_name,
+                usage=usage_from_response(response)
             )
         except ResponseFormatError as e:
             error_msg = f"Gemini: Response format error: {str(e)}"
-            save_log(
-                "Gemini API error",
-                logging.ERROR,
-                {
-                    "model": self.model_name,
-                    "error": error_msg,
-                    "prompt": prompt
-                }
+            capture_llm_io(
+                "gemini",
+                "gemini.call",
+                outcome=OUTCOME_ERROR,
+                model=model_name,
+                prompt=prompt,
+                error=error_msg
             )
             return AIProviderResponse(
                 content="",
@@ -303,14 +342,13 @@ class GeminiProvider(BaseLLMProvider):
             )
         except Exception as e:
             error_msg = f"Gemini: API request error: {str(e)}"
-            save_log(
-                "Gemini API error",
-                logging.ERROR,
-                {
-                    "model": self.model_name,
-                    "error": error_msg,
-                    "prompt": prompt
-                }
+            capture_llm_io(
+                "gemini",
+                "gemini.call",
+                outcome=OUTCOME_ERROR,
+                model=model_name,
+                prompt=prompt,
+                error=error_msg
             )
             return AIProviderResponse(
                 content="",
@@ -319,6 +357,70 @@ class GeminiProvider(BaseLLMProvider):
                 error=error_msg
             )
 
+    def call_structured(
+        self,
+        messages: Union[str, List[Dict[str, str]]],
+        schema: Dict[str, Any] = STRUCTURE_SCHEMA,
+        name: str = STRUCTURE_SCHEMA_NAME,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """
+        response_mime_type と response_schema を指定してスキーマに沿ったJSONを取得
+        
+        Args:
+            messages: プロンプト文字列またはメッセージのリスト（本文を連結して送信する）
+            schema (Dict[str, Any]): 応答のJSON Schema
+            name (str): スキーマ名（記録用）
+            **kwargs: 追加のパラメータ
+            
+        Returns:
+            Dict[str, Any]: content（JSON文字列）/ data / provider / model / usage
+            
+        Raises:
+            APIRequestError: APIリクエストが失敗した場合
+            StructuredOutputError: 応答がスキーマに合わない場合
+        """
+        if isinstance(messages, str):
+            prompt = messages
+        else:
+            prompt = "\n\n".join(content_text(message.get("content", "")) for message in messages)
+        
+        model_name = kwargs.get("model") or self.model_name
+        try:
+            response = self._generative_model(model_name).generate_content(
+                prompt,
+                generation_config=genai.types.GenerationConfig(
+                    temperature=kwargs.get("temperature", 0.7),
+                    max_output_tokens=kwargs.get("max_tokens", STRUCTURED_MAX_TOKENS),
+                    response_mime_type="application/json",
+                    response_schema=to_gemini_response_schema(schema)
+                )
+            )
+            content = response.text
+        except Exception as e:
+            error_msg = f"Gemini: API request error: {str(e)}"
+            capture_llm_io(
+                "gemini",
+                "gemini.call_structured",
+                outcome=OUTCOME_ERROR,
+                model=model_name,
+                prompt=prompt,
+                error=error_msg
+            )
+            raise APIRequestError("gemini", error_msg)
+        
+        data = parse_structured_content(content, schema, "gemini")
+        capture_llm_io(
+            "gemini",
+            "gemini.call_structured",
+            model=model_name,
+            prompt=prompt,
+            response=content,
+            result=data
+        )
+        return structured_response(data, "gemini", model_name, usage_from_response(response))
+
+    @traced("llm.gemini.chat")
     def chat(self, prompt: 'Prompt', model_name: str, prompt_manager: 'PromptManager', **kwargs) -> str:
         """
         Gemini用の統一chatインターフェース
@@ -348,31 +450,33 @@ class GeminiProvider(BaseLLMProvider):
             else:
                 raise ValueError("GEMINI_API_KEY環境変数が設定されていません")
             
-            save_log(
-                "Gemini API request",
-                logging.INFO,
-                {
-                    "model": model_name,
-                    "prompt": prompt_str,
-                    "prompt_length": len(prompt_str),
-                    "kwargs": kwargs,
-                    "api_key_set": bool(api_key)
-                }
-            )
-            
             # APIリクエストの詳細ログ
             logger.info(f"🔗 Gemini API呼び出し:")
             logger.info(f"  - モデル: {model_name}")
             logger.info(f"  - プロンプト長: {len(prompt_str)}")
             logger.info(f"  - パラメータ: {kwargs}")
+            ledger = get_usage_ledger()
+            reservation = ledger.acquire("gemini", estimate_tokens(prompt_str))
             logger.info("📡 Gemini API送信中...")
             
-            response = self.model.generate_content(
-                prompt_str,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=kwargs.get("temperature", 0.7),
-                    max_output_tokens=kwargs.get("max_tokens", 1024)
+            start = time.monotonic()
+            try:
+                response = self._generative_model(model_name).generate_content(
+                    prompt_str,
+                    generation_config=genai.types.GenerationConfig(
+                        temperature=kwargs.get("temperature", 0.7),
+                        max_output_tokens=kwargs.get("max_tokens", 1024)
+                    )
                 )
+            except Exception:
+                ledger.release(reservation)
+                raise
+            ledger.record(
+                "gemini",
+                usage=usage_from_response(response),
+                model=model_name,
+                latency_ms=(time.monotonic() - start) * 1000,
+                reservation=reservation
             )
             
             # レスポンスの詳細ログ
@@ -385,16 +489,6 @@ class GeminiProvider(BaseLLMProvider):
                 error_msg = "Gemini: Response format error - response is None or has no text"
                 logger.error(error_msg)
                 logger.error(f"❌ レスポンス詳細: {str(response)}")
-                save_log(
-                    "Gemini API error",
-                    logging.ERROR,
-                    {
-                        "model": model_name,
-                        "error": error_msg,
-                        "response": str(response) if response else "None",
-                        "response_type": str(type(response))
-                    }
-                )
                 raise ResponseFormatError(error_msg)
             
             response_text = response.text
@@ -404,32 +498,31 @@ class GeminiProvider(BaseLLMProvider):
             logger.debug(f"{response_text}")
             logger.debug(f"{'='*50}")
             
-            save_log(
-                "Gemini API response",
-                logging.INFO,
-                {
-                    "model": model_name,
-                    "result": response_text,
-                    "result_length": len(response_text),
-                    "raw_response": str(response)
-                }
+            capture_llm_io(
+                "gemini",
+                "gemini.chat",
+                model=model_name,
+                prompt=prompt_str,
+                response=response_text
             )
             
             return response_text
             
+        except UsageQuotaExceededError:
+            raise
         except ResponseFormatError as e:
             error_msg = f"Gemini: Response format error: {str(e)}"
             logger.error(error_msg)
             logger.error(f"❌ エラー詳細: {str(e)}")
-            save_log(
-                "Gemini API error",
-                logging.ERROR,
-                {
-                    "model": model_name,
-                    "error": error_msg,
-                    "prompt": prompt_str if 'prompt_str' in locals() else "Unknown",
-                    "error_type": "ResponseFormatError"
-                }
+            capture_llm_io(
+                "gemini",
+                "gemini.chat",
+                outcome=OUTCOME_ERROR,
+                model=model_name,
+                prompt=prompt_str if 'prompt_str' in locals() else None,
+                response=str(response) if 'response' in locals() else None,
+                error=error_msg,
+                error_type="ResponseFormatError"
             )
             # 例外を再発生させるが、Noneは返さない
             raise
@@ -438,16 +531,14 @@ class GeminiProvider(BaseLLMProvider):
             logger.error(error_msg)
             logger.error(f"❌ ネットワークエラー詳細: {str(e)}")
             logger.error(f"❌ 例外型: {type(e).__name__}")
-            save_log(
-                "Gemini API error",
-                logging.ERROR,
-                {
-                    "model": model_name,
-                    "error": error_msg,
-                    "prompt": prompt_str if 'prompt_str' in locals() else "Unknown",
-                    "error_type": "RequestException",
-                    "error_details": str(e)
-                }
+            capture_llm_io(
+                "gemini",
+                "gemini.chat",
+                outcome=OUTCOME_ERROR,
+                model=model_name,
+                prompt=prompt_str if 'prompt_str' in locals() else None,
+                error=error_msg,
+                error_type="RequestException"
             )
             raise APIRequestError(error_msg)
         except json.JSONDecodeError as e:
@@ -455,16 +546,14 @@ class GeminiProvider(BaseLLMProvider):
             logger.error(error_msg)
             logger.error(f"❌ JSONデコードエラー詳細: {str(e)}")
             logger.error(f"❌ 例外型: {type(e).__name__}")
-            save_log(
-                "Gemini API error",
-                logging.ERROR,
-                {
-                    "model": model_name,
-                    "error": error_msg,
-                    "prompt": prompt_str if 'prompt_str' in locals() else "Unknown",
-                    "error_type": "JSONDecodeError",
-                    "error_details": str(e)
-                }
+            capture_llm_io(
+                "gemini",
+                "gemini.chat",
+                outcome=OUTCOME_ERROR,
+                model=model_name,
+                prompt=prompt_str if 'prompt_str' in locals() else None,
+                error=error_msg,
+                error_type="JSONDecodeError"
             )
             raise ResponseFormatError(error_msg)
         except Exception as e:
@@ -474,17 +563,15 @@ class GeminiProvider(BaseLLMProvider):
             logger.error(f"❌ 例外型: {type(e).__name__}")
             import traceback
             logger.error(f"❌ スタックトレース: {traceback.format_exc()}")
-            save_log(
-                "Gemini API error",
-                logging.ERROR,
-                {
-                    "model": model_name,
-                    "error": error_msg,
-                    "prompt": prompt_str if 'prompt_str' in locals() else "Unknown",
-                    "error_type": type(e).__name__,
-                    "error_details": str(e),
-                    "stack_trace": traceback.format_exc()
-                }
+            capture_llm_io(
+                "gemini",
+                "gemini.chat",
+                outcome=OUTCOME_ERROR,
+                model=model_name,
+                prompt=prompt_str if 'prompt_str' in locals() else None,
+                error=error_msg,
+                error_type=type(e).__name__,
+                stack_trace=traceback.format_exc()
             )
             # 例外を再発生させるが、Noneは返さない
             raise APIRequestError(error_msg)
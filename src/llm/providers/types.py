@@ -1,6 +1,6 @@
 """Type definitions for AI providers."""
 
-from typing import Optional, Any
+from typing import Optional, Any, Dict
 
 class AIProviderResponse:
     """Response from an AI provider."""
@@ -10,9 +10,13 @@ class AIProviderResponse:
         content: str,
         raw: Optional[Any] = None,
         provider: str = "",
-        error: Optional[str] = None
+        error: Optional[str] = None,
+        model: Optional[str] = None,
+        usage: Optional[Dict[str, int]] = None
     ):
         self.content = content
         self.raw = raw
         self.provider = provider
-        self.error = error 
\ No newline at end of file
+        self.error = error
+        self.model = model
+        self.usage = usage 
\ No newline at end of file
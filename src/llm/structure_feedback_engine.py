@@ -4,12 +4,11 @@ Structure Feedback Engine
 
 import logging
 from typing import Dict, Any, List, Optional
+from src.common import json_codec
 from src.exceptions import AIProviderError
 from src.llm.controller import AIController
 from src.logger import save_log
-import json
-import os
-from datetime import datetime
+from src.common.llm_capture import capture_llm_io
 
 logger = logging.getLogger(__name__)
 
@@ -28,7 +27,7 @@ class StructureFeedbackEngine:
             prompt = f"""
             以下の構造を評価し、改善点を提案してください。
             構造:
-            {json.dumps(structure, ensure_ascii=False, indent=2)}
+            {json_codec.dumps(structure, indent=2)}
             
             評価結果は以下のJSON形式で返してください:
             {{
@@ -66,30 +65,14 @@ class StructureFeedbackEngine:
             raise
     
     def _save_diff_log(self, original: Dict[str, Any], feedback: Dict[str, Any], provider: str):
-        """差分ログを保存する"""
-        try:
-            # ログディレクトリの作成
-            log_dir = f"logs/claude_gemini_diff"
-            os.makedirs(log_dir, exist_ok=True)
-            
-            # ログファイル名の生成
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            log_file = f"{log_dir}/diff_{provider}_{timestamp}.json"
-            
-            # 差分ログの作成
-            diff_log = {
-                "timestamp": datetime.now().isoformat(),
-                "provider": provider,
-                "original": original,
-                "feedback": feedback
-            }
-            
-            # ログの保存
-            with open(log_file, "w", encoding="utf-8") as f:
-                json.dump(diff_log, f, ensure_ascii=False, indent=2)
-                
-        except Exception as e:
-            logger.error(f"Failed to save diff log: {e}")
+        """差分ログをキャプチャストアに記録する"""
+        capture_llm_io(
+            provider,
+            "llm.structure_feedback.diff",
+            structure_id=original.get("id") if isinstance(original, dict) else None,
+            original=original,
+            feedback=feedback
+        )
     
     def compare_providers(self, structure: Dict[str, Any]) -> Dict[str, Any]:
         """複数のプロバイダーで評価を比較する"""
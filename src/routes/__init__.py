@@ -8,6 +8,12 @@ from .preview_routes import preview_bp
 from .edit_routes import edit_bp
 from .unified_routes import unified_bp
 from .logs_routes import logs_bp
+from .log_viewer_routes import log_viewer_bp
+from .asset_routes import assets_bp, init_assets
+from .trace_routes import traces_bp, init_tracing
+from .search_routes import search_bp
+from .usage_routes import usage_bp, init_usage
+from src.structure.unit_of_work import init_unit_of_work
 
 def register_routes(app: Flask) -> None:
     """
@@ -21,10 +27,31 @@ def register_routes(app: Flask) -> None:
     app.register_blueprint(edit_bp)
     app.register_blueprint(unified_bp)
     app.register_blueprint(logs_bp)
+    app.register_blueprint(log_viewer_bp)
+    app.register_blueprint(traces_bp)
+    app.register_blueprint(search_bp)
+    app.register_blueprint(usage_bp)
+    
+    # リクエストごとのトレース（X-Request-ID と /traces のウォーターフォール表示）
+    init_tracing(app)
+    
+    # LLM呼び出しの利用量に構成ID・セッションIDを付ける（/usage で消費量を確認）
+    init_usage(app)
+    
+    # ハッシュ付き静的アセットの配信とテンプレートヘルパー
+    init_assets(app)
+    
+    # リクエスト単位の構成保存（リクエスト終了時に1回だけ書き込む）
+    init_unit_of_work(app)
     
     print("✅ ルート登録完了:")
     print(f"   - base_bp: {base_bp.url_prefix}")
     print(f"   - preview_bp: {preview_bp.url_prefix}")
     print(f"   - edit_bp: {edit_bp.url_prefix}")
     print(f"   - unified_bp: {unified_bp.url_prefix}")
-    print(f"   - logs_bp: {logs_bp.url_prefix}") 
\ No newline at end of file
+    print(f"   - logs_bp: {logs_bp.url_prefix}")
+    print(f"   - log_viewer_bp: {log_viewer_bp.url_prefix}")
+    print(f"   - traces_bp: {traces_bp.url_prefix}")
+    print(f"   - search_bp: {search_bp.url_prefix}")
+    print(f"   - usage_bp: {usage_bp.url_prefix}")
+    print(f"   - assets_bp: {assets_bp.url_prefix}") 
\ No newline at end of file
@@ -0,0 +1,137 @@
+"""
+静的アセット配信ルート定義モジュール
+
+ハッシュ付きアセット（static/dist 配下）を1年間の immutable キャッシュで配信し、
+Accept-Encoding に応じて事前圧縮版（br/gzip）を返します。
+テンプレートからは asset_url / asset_bundle ヘルパーでURLを解決します。
+"""
+
+import logging
+import mimetypes
+import os
+from typing import List
+
+from flask import Blueprint, Flask, abort, current_app, request, send_from_directory, url_for
+
+from src.common.assets import (
+    ASSET_BUNDLES,
+    DIST_DIR,
+    ENCODING_SUFFIXES,
+    IMMUTABLE_CACHE_CONTROL,
+    AssetManifest,
+    negotiate_encoding,
+)
+
+logger = logging.getLogger(__name__)
+
+assets_bp = Blueprint('assets', __name__, url_prefix='/assets')
+
+# app.extensions に保存するキー
+ASSET_MANIFEST_EXTENSION = "asset_manifest"
+
+
+def get_asset_manifest() -> AssetManifest:
+    """
+    現在のアプリケーションのアセットマニフェストを返す
+
+    Returns:
+        AssetManifest: アセットマニフェスト
+    """
+    manifest = current_app.extensions.get(ASSET_MANIFEST_EXTENSION)
+    if manifest is None:
+        manifest = AssetManifest(current_app.static_folder)
+        current_app.extensions[ASSET_MANIFEST_EXTENSION] = manifest
+    return manifest
+
+
+def asset_url(logical_path: str) -> str:
+    """
+    アセットのURLを返す（テンプレートヘルパー）
+
+    ビルド済みの場合はハッシュ付きURL、未ビルドの場合はコンテンツハッシュを
+    クエリ文字列に付けた通常の静的ファイルURLを返す。
+
+    Args:
+        logical_path: static/ からの相対パス（例: "js/utils.js"）
+
+    Returns:
+        str: アセットのURL
+    """
+    manifest = get_asset_manifest()
+    entry = manifest.lookup(logical_path)
+    if entry:
+        return url_for('assets.serve_asset', filename=entry["path"])
+
+    digest = manifest.fallback_hash(logical_path)
+    if digest:
+        return url_for('static', filename=logical_path, v=digest)
+    return url_for('static', filename=logical_path)
+
+
+def asset_bundle(name: str) -> List[str]:
+    """
+    バンドルを構成するURLのリストを返す（テンプレートヘルパー）
+
+    バンドルがビルド済みで ASSET_BUNDLING が有効な場合は1件、
+    それ以外は元ファイルごとのURLを読み込み順で返す。
+
+    Args:
+        name: バンドル名（例: "unified_interface.js"）
+
+    Returns:
+        List[str]: script/link に指定するURLのリスト
+    """
+    manifest = get_asset_manifest()
+    entry = manifest.bundle(name)
+    if entry and current_app.config.get("ASSET_BUNDLING", True):
+        return [url_for('assets.serve_asset', filename=entry["path"])]
+
+    sources = entry["sources"] if entry else ASSET_BUNDLES.get(name, [])
+    return [asset_url(source) for source in sources]
+
+
+@assets_bp.route('/<path:filename>')
+def serve_asset(filename):
+    """ハッシュ付きアセットを配信する"""
+    manifest = get_asset_manifest()
+    entry = manifest.find_by_hashed_path(filename)
+    if entry is None:
+        abort(404)
+
+    dist_dir = os.path.join(current_app.static_folder, DIST_DIR)
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    encoding = negotiate_encoding(request.headers.get("Accept-Encoding", ""), entry.get("encodings", []))
+
+    if encoding:
+        response = send_from_directory(dist_dir, filename + ENCODING_SUFFIXES[encoding], mimetype=mimetype)
+        response.headers["Content-Encoding"] = encoding
+    else:
+        response = send_from_directory(dist_dir, filename, mimetype=mimetype)
+
+    response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def init_assets(app: Flask) -> None:
+    """
+    アセット配信とテンプレートヘルパーをアプリケーションに登録する
+
+    Args:
+        app (Flask): Flaskアプリケーションインスタンス
+    """
+    app.register_blueprint(assets_bp)
+    app.extensions[ASSET_MANIFEST_EXTENSION] = AssetManifest(app.static_folder)
+
+    @app.context_processor
+    def inject_asset_helpers():
+        return {"asset_url": asset_url, "asset_bundle": asset_bundle}
+
+
+__all__ = [
+    "assets_bp",
+    "asset_url",
+    "asset_bundle",
+    "get_asset_manifest",
+    "init_assets",
+]
@@ -0,0 +1,211 @@
+"""
+ログビューアールート定義モジュール
+
+templates/log_viewer/* の画面と検索APIを提供します。検索は LogSearchService の
+インデックスを使い、アプリケーション内で1つのサービスを共有します。
+LLM入出力のキャプチャ（src.common.llm_capture）の検索・取得APIもここで提供します。
+"""
+
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict
+
+from flask import Blueprint, current_app, jsonify, render_template, request
+
+from src.common.llm_capture import get_capture_store
+from src.tools.log_search import MAX_PER_PAGE, LogSearchService
+
+logger = logging.getLogger(__name__)
+
+log_viewer_bp = Blueprint('log_viewer', __name__, url_prefix='/logs')
+
+# app.extensions に保存するキー
+LOG_SEARCH_EXTENSION = "log_search"
+
+# 構成・ユーザー別ページに表示する最大件数（新しい順）
+PAGE_LIMIT = 500
+
+
+def get_log_search_service() -> LogSearchService:
+    """
+    現在のアプリケーションのログ検索サービスを返す
+
+    ログファイルは app.config["LOG_FILE"]、環境変数 AIDEX_LOG_FILE、"app.log" の順に決まる。
+
+    Returns:
+        LogSearchService: ログ検索サービス
+    """
+    service = current_app.extensions.get(LOG_SEARCH_EXTENSION)
+    if service is None:
+        log_file = current_app.config.get("LOG_FILE") or os.getenv("AIDEX_LOG_FILE", "app.log")
+        service = LogSearchService(log_file)
+        current_app.extensions[LOG_SEARCH_EXTENSION] = service
+    return service
+
+
+def _serialize_stats(stats: Dict[str, Any]) -> Dict[str, Any]:
+    """統計情報の日付をJSON用の文字列にする"""
+    if not stats:
+        return {}
+    date_range = {
+        key: value.strftime('%Y-%m-%d') if isinstance(value, datetime) else value
+        for key, value in stats.get('date_range', {}).items()
+    }
+    return {**stats, 'date_range': date_range}
+
+
+def _criteria_from(data: Dict[str, Any]) -> Dict[str, Any]:
+    """リクエストの値を検索条件に変換する"""
+    def text(key: str) -> str:
+        return str(data.get(key) or '').strip()
+
+    return {
+        'structure_id': text('structure_id') or None,
+        'user_id': text('user_id') or None,
+        'request_id': text('request_id') or None,
+        'level': text('level') or None,
+        'start': text('start_date') or text('start') or None,
+        'end': text('end_date') or text('end') or None,
+        'keyword': text('keyword') or None,
+    }
+
+
+@log_viewer_bp.route('/viewer')
+def index():
+    """ログビューアーのメインページ"""
+    return render_template('log_viewer/index.html')
+
+
+@log_viewer_bp.route('/search', methods=['POST'])
+def search_logs():
+    """
+    ログ検索API
+
+    リクエストJSON: structure_id / user_id / request_id / level / start_date / end_date /
+    keyword / page / limit（1ページの件数） / newest_first
+    """
+    try:
+        data = request.get_json(silent=True)
+        if data is None:
+            return jsonify({"success": False, "error": "リクエストデータがありません"}), 400
+
+        criteria = _criteria_from(data)
+        try:
+            page = int(data.get('page', 1))
+            per_page = int(data.get('limit', data.get('per_page', 100)))
+        except (TypeError, ValueError):
+            return jsonify({"success": False, "error": "page / limit は整数で指定してください"}), 400
+
+        service = get_log_search_service()
+        try:
+            result = service.search(
+                page=page,
+                per_page=per_page,
+                newest_first=bool(data.get('newest_first', True)),
+                **criteria
+            )
+        except ValueError as e:
+            return jsonify({"success": False, "error": f"日付形式が正しくありません: {str(e)}"}), 400
+
+        stats = service.stats(**criteria)
+        return jsonify({
+            "success": True,
+            "logs": result['logs'],
+            "stats": _serialize_stats(stats),
+            "total_count": result['total_count'],
+            "page": result['page'],
+            "per_page": result['per_page'],
+            "pages": result['pages'],
+        })
+
+    except Exception as e:
+        logger.exception(f"❌ ログ検索中にエラーが発生: {str(e)}")
+        return jsonify({"success": False, "error": f"ログ検索中にエラーが発生しました: {str(e)}"}), 500
+
+
+def _render_filtered(template: str, **criteria: str):
+    """構成・ユーザー別ページを描画する"""
+    service = get_log_search_service()
+    result = service.search(page=1, per_page=min(PAGE_LIMIT, MAX_PER_PAGE), newest_first=True, **criteria)
+    return render_template(
+        template,
+        logs=result['logs'],
+        stats=service.stats(**criteria),
+        total_count=result['total_count'],
+        **criteria
+    )
+
+
+@log_viewer_bp.route('/viewer/structure/<structure_id>')
+def view_structure_logs(structure_id: str):
+    """特定の構成IDのログを表示するページ"""
+    try:
+        return _render_filtered('log_viewer/structure_logs.html', structure_id=structure_id)
+    except Exception as e:
+        logger.exception(f"❌ 構成ログ表示中にエラーが発生: {str(e)}")
+        return render_template('log_viewer/error.html', error=f"エラーが発生しました: {str(e)}"), 500
+
+
+@log_viewer_bp.route('/viewer/user/<user_id>')
+def view_user_logs(user_id: str):
+    """特定のユーザーIDのログを表示するページ"""
+    try:
+        return _render_filtered('log_viewer/user_logs.html', user_id=user_id)
+    except Exception as e:
+        logger.exception(f"❌ ユーザーログ表示中にエラーが発生: {str(e)}")
+        return render_template('log_viewer/error.html', error=f"エラーが発生しました: {str(e)}"), 500
+
+
+@log_viewer_bp.route('/viewer/stats')
+def view_stats():
+    """ログ統計情報を表示するページ"""
+    try:
+        stats = get_log_search_service().stats()
+        return render_template('log_viewer/stats.html', stats=stats)
+    except Exception as e:
+        logger.exception(f"❌ 統計情報表示中にエラーが発生: {str(e)}")
+        return render_template('log_viewer/error.html', error=f"エラーが発生しました: {str(e)}"), 500
+
+
+@log_viewer_bp.route('/api/stats')
+def get_stats():
+    """統計情報API"""
+    try:
+        stats = get_log_search_service().stats(**_criteria_from(request.args))
+        return jsonify({"success": True, "stats": _serialize_stats(stats)})
+    except ValueError as e:
+        return jsonify({"success": False, "error": f"日付形式が正しくありません: {str(e)}"}), 400
+    except Exception as e:
+        logger.exception(f"❌ 統計情報取得中にエラーが発生: {str(e)}")
+        return jsonify({"success": False, "error": f"統計情報取得中にエラーが発生しました: {str(e)}"}), 500
+
+
+@log_viewer_bp.route('/api/captures')
+def list_captures():
+    """
+    LLM入出力キャプチャの検索API（インデックスのみ）
+
+    クエリ: call_id / structure_id / provider / outcome / trace_id / start / end / limit
+    """
+    try:
+        keys = ('call_id', 'structure_id', 'provider', 'outcome', 'trace_id', 'start', 'end')
+        criteria = {key: request.args.get(key) or None for key in keys}
+        limit = min(max(request.args.get('limit', 100, type=int), 1), MAX_PER_PAGE)
+        entries = get_capture_store().query(limit=limit, **criteria)
+        for entry in entries:
+            entry.pop('segment', None)
+            entry.pop('member', None)
+        return jsonify({"success": True, "captures": entries, "count": len(entries)})
+    except Exception as e:
+        logger.exception(f"❌ キャプチャ検索中にエラーが発生: {str(e)}")
+        return jsonify({"success": False, "error": f"キャプチャ検索中にエラーが発生しました: {str(e)}"}), 500
+
+
+@log_viewer_bp.route('/api/captures/<call_id>')
+def get_capture(call_id: str):
+    """LLM入出力キャプチャの本体を取得するAPI"""
+    record = get_capture_store().get(call_id)
+    if record is None:
+        return jsonify({"success": False, "error": "キャプチャが見つかりません", "call_id": call_id}), 404
+    return jsonify({"success": True, "capture": record})
@@ -1,10 +1,12 @@
 import os
-import json
 from glob import glob
 from typing import cast, Dict, Any, List
 from flask import Blueprint, render_template, request, jsonify
 from src.structure.utils import load_structure_by_id, save_structure, StructureDict
-from src.structure.history_manager import get_history_diff_data
+from src.structure.history_manager import get_history_diff_data, get_evaluation_completion_history_files
+from src.common import json_codec
+from src.common.http_cache import conditional_get
+from src.common.storage_codec import read_json
 import logging
 
 logger = logging.getLogger(__name__)
@@ -25,9 +27,8 @@ def view_structure_history(structure_id):
     history = []
     for f in files:
         try:
-            with open(f, encoding='utf-8') as fp:
-                data = json.load(fp)
-                history.append(data)
+            data = read_json(f)
+            history.append(data)
         except Exception:
             continue
     return render_template(
@@ -61,11 +62,10 @@ def apply_history(structure_id):
         target_file = None
         for f in files:
             try:
-                with open(f, encoding='utf-8') as fp:
-                    data = json.load(fp)
-                    if data.get('timestamp') == timestamp:
-                        target_file = f
-                        break
+                data = read_json(f)
+                if data.get('timestamp') == timestamp:
+                    target_file = f
+                    break
             except Exception:
                 continue
         
@@ -73,8 +73,7 @@ def apply_history(structure_id):
             return jsonify({'success': False, 'error': '指定されたタイムスタンプの履歴が見つかりません'})
         
         # 履歴ファイルから構成データを読み込み
-        with open(target_file, encoding='utf-8') as fp:
-            history_data = json.load(fp)
+        history_data = read_json(target_file)
         
         # 現在の構成を読み込み
         current_structure = load_structure_by_id(structure_id)
@@ -121,10 +120,9 @@ def view_structure_diff(structure_id):
         files = glob(pattern)
         for f in files:
             try:
-                with open(f, encoding='utf-8') as fp:
-                    data = json.load(fp)
-                    if data.get('timestamp') == timestamp:
-                        return data
+                data = read_json(f)
+                if data.get('timestamp') == timestamp:
+                    return data
             except Exception:
                 continue
         return None
@@ -160,7 +158,7 @@ def generate_diff_data(v1_data: Dict[str, Any], v2_data: Dict[str, Any]) -> Dict
     """
     def json_to_lines(data: Dict[str, Any]) -> List[str]:
         """JSONデータを行のリストに変換"""
-        json_str = json.dumps(data, ensure_ascii=False, indent=2)
+        json_str = json_codec.dumps(data, indent=2)
         return json_str.split('\n')
     
     v1_lines = json_to_lines(v1_data)
@@ -217,13 +215,12 @@ def view_evaluation_history(structure_id):
     evaluations = []
     for f in files:
         try:
-            with open(f, encoding='utf-8') as fp:
-                data = json.load(fp)
-                if 'evaluations' in data and data['evaluations']:
-                    for eval_item in data['evaluations']:
-                        eval_item['history_timestamp'] = data.get('timestamp', '')
-                        eval_item['history_file'] = os.path.basename(f)
-                        evaluations.append(eval_item)
+            data = read_json(f)
+            if 'evaluations' in data and data['evaluations']:
+                for eval_item in data['evaluations']:
+                    eval_item['history_timestamp'] = data.get('timestamp', '')
+                    eval_item['history_file'] = os.path.basename(f)
+                    evaluations.append(eval_item)
         except Exception:
             continue
     
@@ -249,13 +246,12 @@ def view_completion_history(structure_id):
     completions = []
     for f in files:
         try:
-            with open(f, encoding='utf-8') as fp:
-                data = json.load(fp)
-                if 'completions' in data and data['completions']:
-                    for comp_item in data['completions']:
-                        comp_item['history_timestamp'] = data.get('timestamp', '')
-                        comp_item['history_file'] = os.path.basename(f)
-                        completions.append(comp_item)
+            data = read_json(f)
+            if 'completions' in data and data['completions']:
+                for comp_item in data['completions']:
+                    comp_item['history_timestamp'] = data.get('timestamp', '')
+                    comp_item['history_file'] = os.path.basename(f)
+                    completions.append(comp_item)
         except Exception:
             continue
     
@@ -277,19 +273,18 @@ def all_evaluations():
     evaluations = []
     for f in files:
         try:
-            with open(f, encoding='utf-8') as fp:
-                data = json.load(fp)
-                structure_id = data.get('id') or os.path.basename(f).split('_')[0]
-                title = data.get('title', '')
-                if 'evaluations' in data and data['evaluations']:
-                    for eval_item in data['evaluations']:
-                        evaluations.append({
-                            'structure_id': structure_id,
-                            'title': title,
-                            'timestamp': eval_item.get('timestamp', data.get('timestamp', '')),
-                            'score': eval_item.get('score'),
-                            'feedback': eval_item.get('feedback'),
-                        })
+            data = read_json(f)
+            structure_id = data.get('id') or os.path.basename(f).split('_')[0]
+            title = data.get('title', '')
+            if 'evaluations' in data and data['evaluations']:
+                for eval_item in data['evaluations']:
+                    evaluations.append({
+                        'structure_id': structure_id,
+                        'title': title,
+                        'timestamp': eval_item.get('timestamp', data.get('timestamp', '')),
+                        'score': eval_item.get('score'),
+                        'feedback': eval_item.get('feedback'),
+                    })
         except Exception:
             continue
     # 日時降順
@@ -307,18 +302,17 @@ def all_completions():
     completions = []
     for f in files:
         try:
-            with open(f, encoding='utf-8') as fp:
-                data = json.load(fp)
-                structure_id = data.get('id') or os.path.basename(f).split('_')[0]
-                title = data.get('title', '')
-                if 'completions' in data and data['completions']:
-                    for comp_item in data['completions']:
-                        completions.append({
-                            'structure_id': structure_id,
-                            'title': title,
-                            'timestamp': comp_item.get('timestamp', data.get('timestamp', '')),
-                            'content': comp_item.get('content'),
-                        })
+            data = read_json(f)
+            structure_id = data.get('id') or os.path.basename(f).split('_')[0]
+            title = data.get('title', '')
+            if 'completions' in data and data['completions']:
+                for comp_item in data['completions']:
+                    completions.append({
+                        'structure_id': structure_id,
+                        'title': title,
+                        'timestamp': comp_item.get('timestamp', data.get('timestamp', '')),
+                        'content': comp_item.get('content'),
+                    })
         except Exception:
             continue
     # 日時降順
@@ -342,11 +336,10 @@ def compare_evaluation(structure_id, timestamp):
     # 指定timestampの履歴を検索
     for f in files:
         try:
-            with open(f, encoding='utf-8') as fp:
-                data = json.load(fp)
-                if data.get('timestamp') == timestamp:
-                    current_data = data
-                    break
+            data = read_json(f)
+            if data.get('timestamp') == timestamp:
+                current_data = data
+                break
         except Exception:
             continue
     
@@ -355,11 +348,10 @@ def compare_evaluation(structure_id, timestamp):
         current_file = None
         for f in files:
             try:
-                with open(f, encoding='utf-8') as fp:
-                    data = json.load(fp)
-                    if data.get('timestamp') == timestamp:
-                        current_file = f
-                        break
+                data = read_json(f)
+                if data.get('timestamp') == timestamp:
+                    current_file = f
+                    break
             except Exception:
                 continue
         
@@ -368,8 +360,7 @@ def compare_evaluation(structure_id, timestamp):
             current_index = files.index(current_file)
             if current_index + 1 < len(files):
                 try:
-                    with open(files[current_index + 1], encoding='utf-8') as fp:
-                        previous_data = json.load(fp)
+                    previous_data = read_json(files[current_index + 1])
                 except Exception:
                     pass
     
@@ -382,6 +373,7 @@ def compare_evaluation(structure_id, timestamp):
     )
 
 @logs_bp.route('/api/structure/<structure_id>')
+@conditional_get(lambda structure_id: [str(path) for path in get_evaluation_completion_history_files(structure_id)])
 def get_structure_diff_api(structure_id: str):
     """履歴差分データを取得するAPIエンドポイント"""
     try:
@@ -2,9 +2,14 @@
 プレビュールート定義モジュール
 """
 
-from flask import Blueprint, request, jsonify, render_template_string
+from typing import Any, Optional
+
+from flask import Blueprint, request, jsonify, render_template_string, current_app, make_response
+from jinja2 import Template
 from src.llm.controller import AIController
 from src.structure.utils import load_structure_by_id, is_ui_ready
+from src.structure.fingerprint import hash_value
+from src.common.shared_cache import TieredCache, get_revision, get_tiered_cache, structure_scope
 import json
 import logging
 
@@ -12,101 +17,8 @@ logger = logging.getLogger(__name__)
 
 preview_bp = Blueprint('preview', __name__, url_prefix='/preview')
 
-@preview_bp.route('/new', methods=['POST'])
-def new_preview():
-    """新しいプレビューの作成"""
-    try:
-        data = request.get_json()
-        if not data or 'user_input' not in data:
-            return jsonify({
-                'error': 'Invalid request data',
-                'message': 'user_input is required'
-            }), 400
-        
-        # TODO: AIコントローラーを使用してプレビューを生成
-        return jsonify({
-            'status': 'ok',
-            'message': 'Preview created successfully'
-        })
-    except Exception as e:
-        return jsonify({
-            'error': str(e),
-            'message': 'Failed to create preview'
-        }), 500
-
-@preview_bp.route('/<structure_id>')
-def preview_structure(structure_id):
-    """
-    構成をHTMLプレビューとして表示する
-    
-    Args:
-        structure_id: 構成のID
-        
-    Returns:
-        str: レンダリングされたHTML
-    """
-    try:
-        logger.info(f"🎨 プレビュー生成開始 - structure_id: {structure_id}")
-        
-        # 構成データを読み込み
-        structure = load_structure_by_id(structure_id)
-        if not structure:
-            logger.warning(f"❌ 構成が見つかりません - structure_id: {structure_id}")
-            return f"<div style='padding: 20px; color: #ff6b6b;'>構成が見つかりません: {structure_id}</div>", 404
-        
-        content = structure.get("content", {})
-        
-        # UI準備状態をチェック
-        ui_ready = is_ui_ready(structure)
-        if not ui_ready:
-            logger.info(f"ℹ️ UI準備未完了 - structure_id: {structure_id}")
-            return render_template_string("""
-                <div style="padding: 20px; text-align: center; color: #858585;">
-                    <h3>🎨 UIプレビュー</h3>
-                    <p>この構成はまだUI出力に適していません。</p>
-                    <p style="font-size: 12px; margin-top: 10px;">
-                        チャットでUI構成について詳しく説明してください。
-                    </p>
-                </div>
-            """)
-        
-        # HTMLが直接含まれている場合
-        if isinstance(content, str) and ("<div" in content or "<html" in content):
-            logger.info(f"✅ HTML直接表示 - structure_id: {structure_id}")
-            return content
-        
-        # 構造化データの場合、HTMLテンプレートを生成
-        logger.info(f"✅ 構造化データからHTML生成 - structure_id: {structure_id}")
-        return render_structure_to_html(content)
-        
-    except Exception as e:
-        logger.error(f"❌ プレビュー生成エラー - structure_id: {structure_id}, error: {str(e)}")
-        return f"<div style='padding: 20px; color: #ff6b6b;'>プレビュー生成エラー: {str(e)}</div>", 500
-
-def render_structure_to_html(content) -> str:
-    """
-    構造化データをHTMLにレンダリングする
-    
-    Args:
-        content: 構造化データまたは文字列
-        
-    Returns:
-        str: レンダリングされたHTML
-    """
-    try:
-        # contentが文字列の場合はそのまま返す
-        if isinstance(content, str):
-            return content
-        
-        # contentが辞書でない場合はエラー
-        if not isinstance(content, dict):
-            return f"<div style='padding: 20px; color: #ff6b6b;'>サポートされていないデータ形式: {type(content)}</div>"
-        
-        title = content.get("title", "無題のプロジェクト")
-        description = content.get("description", "説明がありません")
-        
-        # 基本HTMLテンプレート
-        html_template = """
+# 構造化データ用のHTMLテンプレート（プロセスごとに1回だけコンパイルする）
+STRUCTURE_PREVIEW_TEMPLATE = """
         <!DOCTYPE html>
         <html lang="ja">
         <head>
@@ -244,11 +156,201 @@ def render_structure_to_html(content) -> str:
         </body>
         </html>
         """
+
+# テンプレートが変わった場合にキャッシュとETagを無効化するためのバージョン
+TEMPLATE_VERSION = hash_value(STRUCTURE_PREVIEW_TEMPLATE)[:12]
+
+# レンダリング済みHTMLのキャッシュ上限（プロセス内のローカル層）
+MAX_PREVIEW_CACHE_ENTRIES = 128
+
+_EXTENSION_KEY = "structure_preview_template"
+
+# レンダリング済みHTMLの共有キャッシュの名前空間（キーはETagと共通でテンプレートのバージョンを含む）
+PREVIEW_CACHE_NAMESPACE = "preview_html"
+
+
+def get_preview_template() -> Template:
+    """
+    コンパイル済みのプレビューテンプレートを取得する（アプリケーションごとに1回だけコンパイル）
+
+    Returns:
+        Template: コンパイル済みテンプレート
+    """
+    template = current_app.extensions.get(_EXTENSION_KEY)
+    if template is None:
+        template = current_app.jinja_env.from_string(STRUCTURE_PREVIEW_TEMPLATE)
+        current_app.extensions[_EXTENSION_KEY] = template
+        logger.info("✅ プレビューテンプレートをコンパイルしました")
+    return template
+
+
+def _html_cache() -> TieredCache:
+    """レンダリング済みHTMLのキャッシュ（ワーカープロセス間で共有する）"""
+    return get_tiered_cache(PREVIEW_CACHE_NAMESPACE, max_entries=MAX_PREVIEW_CACHE_ENTRIES)
+
+
+def _get_cached_html(key: str) -> Optional[str]:
+    return _html_cache().get(key)
+
+
+def _store_cached_html(key: str, html: str) -> None:
+    _html_cache().set(key, html)
+
+
+def clear_preview_cache() -> None:
+    """レンダリング済みHTMLのキャッシュをクリアする"""
+    _html_cache().clear()
+
+
+def get_preview_etag(content: Any, revision: Optional[int] = None) -> str:
+    """
+    プレビューのETagを構成内容のハッシュと構成のリビジョンから生成する
+
+    Args:
+        content: 構成のcontent
+        revision: 構成のスコープのリビジョン（省略時は内容のハッシュのみ）
+
+    Returns:
+        str: ETag（引用符なし、HTMLキャッシュのキーと共通）
+    """
+    etag = f"{hash_value(content)[:32]}-{TEMPLATE_VERSION}"
+    if revision is not None:
+        etag = f"{etag}-r{revision}"
+    return etag
+
+
+def _structure_revision(structure_id: str) -> Optional[int]:
+    """構成のスコープのリビジョン（共有キャッシュを読めない場合はNone）"""
+    try:
+        return get_revision(structure_scope(structure_id))
+    except Exception as e:
+        logger.warning(f"⚠️ 構成のリビジョンを取得できません - structure_id: {structure_id}, error: {str(e)}")
+        return None
+
+
+def _conditional_response(body: str, etag: str):
+    """ETag付きのレスポンスを作成する"""
+    response = make_response(body)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+@preview_bp.route('/new', methods=['POST'])
+def new_preview():
+    """新しいプレビューの作成"""
+    try:
+        data = request.get_json()
+        if not data or 'user_input' not in data:
+            return jsonify({
+                'error': 'Invalid request data',
+                'message': 'user_input is required'
+            }), 400
+        
+        # TODO: AIコントローラーを使用してプレビューを生成
+        return jsonify({
+            'status': 'ok',
+            'message': 'Preview created successfully'
+        })
+    except Exception as e:
+        return jsonify({
+            'error': str(e),
+            'message': 'Failed to create preview'
+        }), 500
+
+@preview_bp.route('/<structure_id>')
+def preview_structure(structure_id):
+    """
+    構成をHTMLプレビューとして表示する
+    
+    Args:
+        structure_id: 構成のID
+        
+    Returns:
+        str: レンダリングされたHTML
+    """
+    try:
+        logger.info(f"🎨 プレビュー生成開始 - structure_id: {structure_id}")
+        
+        # 構成データを読み込み
+        structure = load_structure_by_id(structure_id)
+        if not structure:
+            logger.warning(f"❌ 構成が見つかりません - structure_id: {structure_id}")
+            return f"<div style='padding: 20px; color: #ff6b6b;'>構成が見つかりません: {structure_id}</div>", 404
+        
+        content = structure.get("content", {})
+        
+        # 構成内容が変わらず、他のワーカーでも保存されていなければ304を返す（レンダリングを省略）
+        etag = get_preview_etag(content, _structure_revision(structure_id))
+        if request.if_none_match.contains(etag):
+            logger.info(f"♻️ プレビュー未変更（304） - structure_id: {structure_id}")
+            response = make_response("", 304)
+            response.set_etag(etag)
+            response.headers["Cache-Control"] = "no-cache"
+            return response
+        
+        # UI準備状態をチェック
+        ui_ready = is_ui_ready(structure)
+        if not ui_ready:
+            logger.info(f"ℹ️ UI準備未完了 - structure_id: {structure_id}")
+            return render_template_string("""
+                <div style="padding: 20px; text-align: center; color: #858585;">
+                    <h3>🎨 UIプレビュー</h3>
+                    <p>この構成はまだUI出力に適していません。</p>
+                    <p style="font-size: 12px; margin-top: 10px;">
+                        チャットでUI構成について詳しく説明してください。
+                    </p>
+                </div>
+            """)
+        
+        # HTMLが直接含まれている場合
+        if isinstance(content, str) and ("<div" in content or "<html" in content):
+            logger.info(f"✅ HTML直接表示 - structure_id: {structure_id}")
+            return _conditional_response(content, etag)
+        
+        # 構造化データの場合、HTMLテンプレートを生成
+        logger.info(f"✅ 構造化データからHTML生成 - structure_id: {structure_id}")
+        return _conditional_response(render_structure_to_html(content, cache_key=etag), etag)
+        
+    except Exception as e:
+        logger.error(f"❌ プレビュー生成エラー - structure_id: {structure_id}, error: {str(e)}")
+        return f"<div style='padding: 20px; color: #ff6b6b;'>プレビュー生成エラー: {str(e)}</div>", 500
+
+def render_structure_to_html(content, cache_key: Optional[str] = None) -> str:
+    """
+    構造化データをHTMLにレンダリングする
+    
+    コンパイル済みテンプレートを使い、同じ内容のレンダリング結果はキャッシュから返す。
+    
+    Args:
+        content: 構造化データまたは文字列
+        cache_key: HTMLキャッシュのキー（省略時は内容のハッシュから生成）
+        
+    Returns:
+        str: レンダリングされたHTML
+    """
+    try:
+        # contentが文字列の場合はそのまま返す
+        if isinstance(content, str):
+            return content
+        
+        # contentが辞書でない場合はエラー
+        if not isinstance(content, dict):
+            return f"<div style='padding: 20px; color: #ff6b6b;'>サポートされていないデータ形式: {type(content)}</div>"
+        
+        title = content.get("title", "無題のプロジェクト")
+        description = content.get("description", "説明がありません")
+        
         
-        return render_template_string(html_template, 
-                                    title=title, 
-                                    description=description, 
-                                    content=content.get("content", {}))
+        cache_key = cache_key or get_preview_etag(content)
+        html = _get_cached_html(cache_key)
+        if html is None:
+            html = get_preview_template().render(
+                title=title,
+                description=description,
+                content=content.get("content", {})
+            )
+            _store_cached_html(cache_key, html)
+        return html
         
     except Exception as e:
         logger.error(f"❌ HTMLレンダリングエラー: {str(e)}")
@@ -0,0 +1,61 @@
+"""
+構成検索ルート定義モジュール
+
+src.structure.search_index の全文検索インデックスを使った検索APIを提供します。
+"""
+
+import logging
+
+from flask import Blueprint, jsonify, request
+
+from src.structure.search_index import MAX_PER_PAGE, get_search_index
+
+logger = logging.getLogger(__name__)
+
+search_bp = Blueprint('search', __name__, url_prefix='/search')
+
+
+@search_bp.route('/api')
+def search_structures():
+    """
+    構成の全文検索API
+
+    クエリ: q（空白区切りはAND） / provider / min_score / max_score / since / until /
+    kind（structure / module / message、複数指定可） / page / per_page
+    """
+    query = (request.args.get('q') or '').strip()
+    if not query:
+        return jsonify({"success": False, "error": "検索語（q）を指定してください"}), 400
+
+    try:
+        page = request.args.get('page', 1, type=int)
+        per_page = min(request.args.get('per_page', 20, type=int), MAX_PER_PAGE)
+        index = get_search_index()
+        index.sync_directory()
+        result = index.search(
+            query,
+            provider=request.args.get('provider') or None,
+            min_score=request.args.get('min_score', type=float),
+            max_score=request.args.get('max_score', type=float),
+            since=request.args.get('since') or None,
+            until=request.args.get('until') or None,
+            kinds=request.args.getlist('kind'),
+            page=page,
+            per_page=per_page,
+        )
+        return jsonify({"success": True, "query": query, **result})
+    except Exception as e:
+        logger.exception(f"❌ 構成検索中にエラーが発生: {str(e)}")
+        return jsonify({"success": False, "error": f"構成検索中にエラーが発生しました: {str(e)}"}), 500
+
+
+@search_bp.route('/api/reindex', methods=['POST'])
+def reindex_structures():
+    """データディレクトリの変更をインデックスに取り込むAPI"""
+    try:
+        index = get_search_index()
+        counts = index.sync_directory(force=True)
+        return jsonify({"success": True, "counts": counts, "stats": index.stats()})
+    except Exception as e:
+        logger.exception(f"❌ 検索インデックスの更新中にエラーが発生: {str(e)}")
+        return jsonify({"success": False, "error": f"検索インデックスの更新中にエラーが発生しました: {str(e)}"}), 500
@@ -0,0 +1,132 @@
+"""
+リクエストトレースのルート定義モジュール
+
+リクエストごとにトレースを開始し、X-Request-ID ヘッダーでトレースIDを返します。
+完了したトレースは TraceStore に保存し、/traces でウォーターフォール表示します。
+"""
+
+import logging
+import os
+from typing import Optional
+
+from flask import Blueprint, Flask, abort, current_app, g, jsonify, render_template, request
+
+from src.common.tracing import (
+    DEFAULT_TRACE_DIR,
+    Trace,
+    TraceStore,
+    activate_trace,
+    build_waterfall,
+    is_valid_trace_id,
+)
+
+logger = logging.getLogger(__name__)
+
+traces_bp = Blueprint('traces', __name__, url_prefix='/traces')
+
+# app.extensions に保存するキー
+TRACE_STORE_EXTENSION = "trace_store"
+
+# トレースしないパス（静的ファイル・トレース画面自身）
+UNTRACED_PREFIXES = ("/static", "/assets", "/traces")
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+_G_TRACE = "_aidex_trace"
+_G_RESTORE = "_aidex_trace_restore"
+
+
+def get_trace_store() -> TraceStore:
+    """
+    現在のアプリケーションのトレースストアを返す
+
+    保存先は app.config["TRACE_DIR"]、環境変数 AIDEX_TRACE_DIR、logs/traces の順に決まる。
+
+    Returns:
+        TraceStore: トレースストア
+    """
+    store = current_app.extensions.get(TRACE_STORE_EXTENSION)
+    if store is None:
+        directory = current_app.config.get("TRACE_DIR") or os.getenv("AIDEX_TRACE_DIR", DEFAULT_TRACE_DIR)
+        store = TraceStore(directory)
+        current_app.extensions[TRACE_STORE_EXTENSION] = store
+    return store
+
+
+def init_tracing(app: Flask) -> None:
+    """
+    リクエストごとのトレースを有効にする
+
+    app.config["TRACING_ENABLED"] が False の場合は何もしない。
+
+    Args:
+        app: Flaskアプリケーション
+    """
+    if not app.config.get("TRACING_ENABLED", True):
+        return
+
+    @app.before_request
+    def _start_request_trace():
+        if request.path.startswith(UNTRACED_PREFIXES):
+            return None
+        incoming = request.headers.get(REQUEST_ID_HEADER)
+        trace = Trace(
+            f"{request.method} {request.url_rule.rule if request.url_rule else request.path}",
+            incoming if is_valid_trace_id(incoming) else None,
+            method=request.method,
+            path=request.path,
+            endpoint=request.endpoint,
+        )
+        setattr(g, _G_TRACE, trace)
+        setattr(g, _G_RESTORE, activate_trace(trace))
+        return None
+
+    @app.after_request
+    def _tag_response(response):
+        trace: Optional[Trace] = getattr(g, _G_TRACE, None)
+        if trace is not None:
+            trace.attributes["status"] = response.status_code
+            response.headers[REQUEST_ID_HEADER] = trace.trace_id
+        return response
+
+    @app.teardown_request
+    def _finish_request_trace(exc):
+        trace: Optional[Trace] = g.pop(_G_TRACE, None)
+        restore = g.pop(_G_RESTORE, None)
+        if trace is None:
+            return
+        if exc is not None:
+            trace.attributes["error"] = f"{type(exc).__name__}: {exc}"[:500]
+        trace.finish()
+        if restore is not None:
+            try:
+                restore()
+            except ValueError:
+                # 別コンテキストで開始された場合は元に戻せないが、保存は続ける
+                pass
+        get_trace_store().save(trace)
+
+
+@traces_bp.route('/')
+def index():
+    """最近のトレース一覧"""
+    limit = request.args.get('limit', 50, type=int)
+    return render_template('traces/index.html', traces=get_trace_store().list(limit=limit))
+
+
+@traces_bp.route('/<trace_id>')
+def view_trace(trace_id: str):
+    """1リクエスト分のウォーターフォール表示"""
+    trace = get_trace_store().get(trace_id)
+    if trace is None:
+        abort(404)
+    return render_template('traces/waterfall.html', trace=trace, rows=build_waterfall(trace))
+
+
+@traces_bp.route('/api/<trace_id>')
+def get_trace_api(trace_id: str):
+    """トレースのJSON"""
+    trace = get_trace_store().get(trace_id)
+    if trace is None:
+        return jsonify({"error": "トレースが見つかりません", "trace_id": trace_id}), 404
+    return jsonify(trace)
@@ -16,23 +16,35 @@ import threading
 import re
 from flask_cors import cross_origin
 
-from src.structure.utils import load_structure_by_id, save_structure, StructureDict, is_ui_ready, load_structure
+from src.structure.utils import load_structure_by_id, save_structure, StructureDict, is_ui_ready, load_structure, find_structure_file, get_structure_path
 from src.structure.diff_utils import generate_diff_html
-from src.llm.prompts.manager import PromptManager, PromptNotFoundError
+from src.structure.fingerprint import hash_value
+from src.structure.unit_of_work import load_structure_for_request, stage_structure
+from src.llm.prompts.manager import PromptManager
 from src.llm.prompts.prompt import Prompt
 from src.exceptions import PromptNotFoundError
 from src.utils.files import extract_json_part
 from src.llm.providers.base import ChatMessage
-from src.llm.controller import controller
+from src.llm.controller import controller, routed_provider
 from src.types import safe_cast_message_param, safe_cast_dict, safe_cast_str
 from src.structure.evaluator import evaluate_structure_with
-from src.structure.feedback import call_gemini_ui_generator
-from src.structure.history_manager import load_evaluation_completion_history, load_structure_history, save_evaluation_completion_history, save_structure_history
+from src.structure.history_manager import load_evaluation_completion_history, load_structure_history, save_evaluation_completion_history, save_structure_history, get_history_file_path
+from src.common import json_codec
 from src.common.logging_utils import log_exception, log_request
+from src.analysis.conversation import analyze_conversation
+from src.common.idempotency import coalesce_post
+from src.common.http_cache import conditional_get
+from src.common.shared_cache import structure_scope
+from src.common.tracing import annotate, traced
 from src.structure.helpers import get_minimum_structure_with_gpt
 from src.utils.files import validate_json_string
 from src.structure.structure_analysis import analyze_structure_state as analyze_structure_completeness
-from src.structure.history import get_structure_history, get_latest_structure_history
+from src.structure.rule_engine import get_rule_engine, validate_module
+from src.structure.generation_cache import apply_cached_generation, get_generation_cache, is_generation_cache_enabled
+from src.common.structured_output import is_structured_output_enabled
+from src.common.prompt_cache import PromptLayout
+from src.common.model_routing import get_model_router
+from src.structure.history import get_structure_history, get_latest_structure_history, get_structure_history_path
 
 
 # ロガーの取得
@@ -59,6 +71,22 @@ MessageParam = TypedDict('MessageParam', {
 
 unified_bp = Blueprint('unified', __name__, url_prefix='/unified')
 
+def _load_structure(structure_id: str) -> Optional[Dict[str, Any]]:
+    """リクエスト内で構成を読み込む（同一リクエストでは1回だけディスクから読み込む）"""
+    return load_structure_for_request(structure_id, loader=load_structure_by_id)
+
+def _structure_file_paths(structure_id: str, **_: Any) -> List[Optional[str]]:
+    """条件付きGET用: 構成ファイルのパス"""
+    return [find_structure_file(structure_id)]
+
+def _structure_history_paths(structure_id: str, **_: Any) -> List[Optional[str]]:
+    """条件付きGET用: 構造履歴（JSONL）ファイルのパス"""
+    return [get_structure_history_path(structure_id)]
+
+def _stage_structure(structure_id: str, structure: Dict[str, Any], changed_paths: Optional[List[str]] = None) -> bool:
+    """構成をリクエスト終了時の保存対象に登録する（書き込みはリクエスト終了時に1回）"""
+    return stage_structure(structure_id, structure, changed_paths=changed_paths, saver=save_structure)
+
 @unified_bp.route('/health', methods=['GET'])
 def health_check():
     """ヘルスチェック用エンドポイント"""
@@ -98,6 +126,8 @@ def dict_to_structure_dict(data: Dict[str, Any], structure_id: str) -> Structure
         structure_dict["metadata"] = safe_cast_dict(data["metadata"])
     if data.get("history") is not None:
         structure_dict["history"] = data["history"]
+    if data.get("head") is not None:
+        structure_dict["head"] = data["head"]
     
     return cast(StructureDict, structure_dict)
 
@@ -161,7 +191,7 @@ def _is_structure_json(content: str) -> bool:
     if content.strip().startswith("{") and content.strip().endswith("}"):
         try:
             # JSONとしてパースできるかチェック
-            parsed = json.loads(content.strip())
+            parsed = json_codec.loads(content.strip())
             
             # 新しい厳密な構造チェック（modules配列）
             if isinstance(parsed, dict) and "title" in parsed and "modules" in parsed:
@@ -233,6 +263,36 @@ def create_message_param(
     
     return cast(MessageParam, param)
 
+def _generate_structure_structured(provider: str, prompt: Union[str, PromptLayout], prompt_name: str, task: str) -> Optional[str]:
+    """
+    プロバイダーのネイティブな構造化出力（共通の構成スキーマ）で構成を生成する
+    
+    スキーマ検証済みのJSONをコードブロックで返すため、後続のJSON抽出は追加の呼び出しなしで成功する。
+    
+    Args:
+        provider: プロバイダー名
+        prompt: プロンプト（PromptLayout の場合は固定のプレフィックスにキャッシュの区切りを付けて送る）
+        prompt_name: 利用量台帳に記録するプロンプト名
+        task: モデルを選ぶタスクの種類（ルーティングポリシーのプロバイダー別の候補を使う）
+        
+    Returns:
+        Optional[str]: 構成JSONのコードブロック（無効・失敗時はNoneで、呼び出し元はテキスト応答からの抽出を行う）
+    """
+    if not is_structured_output_enabled():
+        return None
+    try:
+        structured = controller.call_structured(
+            provider,
+            prompt.to_messages() if isinstance(prompt, PromptLayout) else [{"role": "user", "content": prompt}],
+            model=get_model_router().model_for(task, provider),
+            prompt_name=prompt_name
+        )
+    except Exception as e:
+        logger.warning(f"⚠️ {provider}の構造化出力に失敗したため、テキスト応答からの抽出にフォールバックします: {str(e)}")
+        return None
+    logger.info(f"✅ {provider}の構造化出力で構成を取得 - モジュール数: {len(structured['data'].get('modules', []))}")
+    return f"```json\n{structured['content']}\n```"
+
 def _retry_structure_generation(original_message: str, failed_response: str) -> Optional[str]:
     """
     JSON抽出失敗時にChatGPTに対して再プロンプトを送る（強化版）
@@ -320,10 +380,10 @@ def _retry_structure_generation(original_message: str, failed_response: str) ->
             {"role": "user", "content": retry_prompt}
         ]
         
-        retry_response_dict = controller.call(
-            provider="chatgpt",
-            messages=retry_messages,
-            model="gpt-3.5-turbo"
+        retry_response_dict = controller.route(
+            "generate",
+            retry_messages,
+            providers=("chatgpt",)
         )
         
         retry_response_content = retry_response_dict.get('content', '') if isinstance(retry_response_dict, dict) else ''
@@ -335,7 +395,7 @@ def _retry_structure_generation(original_message: str, failed_response: str) ->
             
             # 再プロンプト結果の構造検証
             try:
-                extracted_json = extract_json_part(retry_response_content)
+                extracted_json = extract_json_part(retry_response_content, provider="chatgpt")
                 if extracted_json and "error" not in extracted_json:
                     validation_result = _validate_structure_completeness(extracted_json)
                     if validation_result["is_valid"]:
@@ -354,6 +414,69 @@ def _retry_structure_generation(original_message: str, failed_response: str) ->
         logger.error(f"❌ 再プロンプトエラー: {str(e)}")
         return None
 
+# Gemini補完の固定の指示（構成とフィードバックはこの後ろに置く）
+_GEMINI_JSON_FORMAT = """{
+  "title": "構成タイトル",
+  "description": "構成の説明",
+  "modules": {
+    "module1": {
+      "title": "モジュール1のタイトル",
+      "description": "モジュール1の説明",
+      "sections": {
+        "section1": {
+          "title": "セクション1のタイトル",
+          "content": "セクション1の詳細内容",
+          "implementation": "実装のポイント"
+        }
+      }
+    }
+  }
+}"""
+
+GEMINI_GENERATION_PREFIX = f"""このメッセージの最後に示すClaude評価フィードバックの要件に基づいて、新しい構成を生成してください。
+
+生成要件:
+1. 実用的で実装可能な構成を作成する
+2. モジュール構造を明確にする
+3. 各セクションの詳細を充実させる
+4. 現代的なWebアプリケーションの構成を提案する
+
+生成結果は以下のJSON形式で返してください:
+{_GEMINI_JSON_FORMAT}"""
+
+GEMINI_COMPLETION_PREFIX = f"""このメッセージの最後に示す元の構成を基に、Claude評価フィードバックを踏まえて、より詳細で実装可能な構成に補完してください。
+
+補完の要件:
+1. 元の構成の意図を保持する
+2. より具体的で実装可能な内容に拡張する
+3. モジュール構造を明確にする
+4. 各セクションの詳細を充実させる
+
+補完結果は以下のJSON形式で返してください:
+{_GEMINI_JSON_FORMAT}"""
+
+GEMINI_IMPROVEMENT_PREFIX = """このメッセージの最後に示す構成JSONを改善してください。改善のヒントとしてClaudeによる評価コメントを添えます。
+この指摘を元に、構成JSON全体を再構成し、完成形を JSON形式でのみ 出力してください。
+
+【重要】:
+- JSON形式でのみ出力してください
+- コードブロック（```json）は使用しないでください
+- 説明文やコメントは含めないでください
+- 有効なJSONオブジェクトのみを返してください
+- "title"と"modules"キーは必ず含めてください
+
+出力例:
+{
+  "title": "改善された構成",
+  "description": "Claude評価を反映した改善版",
+  "modules": [
+    {
+      "name": "モジュール名",
+      "description": "モジュールの説明"
+    }
+  ]
+}"""
+
 def apply_gemini_completion(structure: Dict[str, Any]):
     """
     Gemini補完を実行し、結果をstructure["modules"]に統一保存する
@@ -404,76 +527,39 @@ def apply_gemini_completion(structure: Dict[str, Any]):
         claude_feedback = claude_evaluation if claude_evaluation else "Claude評価が利用できません"
         logger.info(f"📋 Claudeフィードバック準備完了: {claude_feedback[:100]}...")
         
+        # 構成内容とフィードバックが前回の補完時から変わっていなければGeminiを呼ばずに再利用
+        # 保存前の編集が反映されていない可能性があるため、保存済みのハッシュではなく現在の内容から計算する
+        content_fingerprint = hash_value(structure["content"]) if "content" in structure else ""
+        source_fingerprint = hash_value([content_fingerprint, claude_feedback])
+        last_completion = next(
+            (c for c in reversed(structure["completions"])
+             if isinstance(c, dict) and c.get("provider") == "gemini" and c.get("status") == "success"),
+            None
+        )
+        if last_completion and last_completion.get("source_fingerprint") == source_fingerprint and structure.get("modules"):
+            logger.info("♻️ 構成に変更がないため、前回のGemini補完結果を再利用します")
+            return {
+                "status": "success",
+                "modules": structure["modules"],
+                "message": "構成に変更がないため、前回のGemini補完結果を再利用しました",
+                "cached": True
+            }
+        
         # 4. 最適化されたプロンプトの作成（空の構成対応）
+        # 固定の指示を先頭、構成とフィードバックを末尾に置き、プロバイダーのプロンプトキャッシュを効かせる
         if not original_content:
             # 空の構成の場合のプロンプト
-            optimized_prompt = f"""
-以下の要件に基づいて、新しい構成を生成してください。
-
-Claude評価フィードバック:
-{claude_feedback}
-
-生成要件:
-1. 実用的で実装可能な構成を作成する
-2. モジュール構造を明確にする
-3. 各セクションの詳細を充実させる
-4. 現代的なWebアプリケーションの構成を提案する
-
-生成結果は以下のJSON形式で返してください:
-{{
-  "title": "構成タイトル",
-  "description": "構成の説明",
-  "modules": {{
-    "module1": {{
-      "title": "モジュール1のタイトル",
-      "description": "モジュール1の説明",
-      "sections": {{
-        "section1": {{
-          "title": "セクション1のタイトル",
-          "content": "セクション1の詳細内容",
-          "implementation": "実装のポイント"
-        }}
-      }}
-    }}
-  }}
-}}
-"""
+            optimized_prompt = PromptLayout(
+                GEMINI_GENERATION_PREFIX,
+                f"Claude評価フィードバック:\n{claude_feedback}"
+            ).text
         else:
             # 既存の構成がある場合のプロンプト
-            optimized_prompt = f"""
-以下の構成を基に、より詳細で実装可能な構成に補完してください。
-
-元の構成:
-{json.dumps(original_content, ensure_ascii=False, indent=2)}
-
-Claude評価フィードバック:
-{claude_feedback}
-
-補完の要件:
-1. 元の構成の意図を保持する
-2. より具体的で実装可能な内容に拡張する
-3. モジュール構造を明確にする
-4. 各セクションの詳細を充実させる
-
-補完結果は以下のJSON形式で返してください:
-{{
-  "title": "構成タイトル",
-  "description": "構成の説明",
-  "modules": {{
-    "module1": {{
-      "title": "モジュール1のタイトル",
-      "description": "モジュール1の説明",
-      "sections": {{
-        "section1": {{
-          "title": "セクション1のタイトル",
-          "content": "セクション1の詳細内容",
-          "implementation": "実装のポイント"
-        }}
-      }}
-    }}
-  }}
-}}
-"""
+            optimized_prompt = PromptLayout(
+                GEMINI_COMPLETION_PREFIX,
+                f"元の構成:\n{json_codec.dumps(original_content, indent=2)}\n\n"
+                f"Claude評価フィードバック:\n{claude_feedback}"
+            ).text
         
         logger.info(f"📤 最適化されたプロンプト作成完了: {len(optimized_prompt)}文字")
         
@@ -483,7 +569,23 @@ Claude評価フィードバック:
         gemini_response = None
         validation_result = None
         
-        while retry_count <= max_retries:
+        # 構造化出力で補完できた場合は、テキスト応答の構文チェックとリトライを行わない
+        completion_prompt: Union[str, PromptLayout] = optimized_prompt
+        try:
+            completion_template = controller.prompt_manager.get_prompt("gemini", "completion")
+            if completion_template:
+                completion_prompt = completion_template.layout(
+                    structure=json_codec.dumps(original_content, indent=2) if original_content else "{}",
+                    claude_feedback=claude_feedback
+                )
+        except Exception as template_error:
+            logger.warning(f"⚠️ プロンプトテンプレート使用でエラー: {template_error}")
+        structured_completion = _generate_structure_structured("gemini", completion_prompt, "gemini.completion", "complete")
+        if structured_completion is not None:
+            gemini_response = structured_completion
+            validation_result = validate_gemini_response_structure(gemini_response)
+        
+        while structured_completion is None and retry_count <= max_retries:
             try:
                 logger.info(f"🔄 Gemini補完実行 (試行 {retry_count + 1}/{max_retries + 1})")
                 
@@ -509,7 +611,7 @@ Claude評価フィードバック:
                             
                             # プロンプトパラメータの準備
                             prompt_params = {
-                                "structure": json.dumps(original_content, ensure_ascii=False, indent=2) if original_content else "{}",
+                                "structure": json_codec.dumps(original_content, indent=2) if original_content else "{}",
                                 "claude_feedback": claude_feedback
                             }
                             logger.debug(f"📋 プロンプトパラメータ: {list(prompt_params.keys())}")
@@ -518,7 +620,7 @@ Claude評価フィードバック:
                             logger.info("📡 Gemini API送信中...")
                             gemini_response = gemini_provider.chat(
                                 gemini_prompt, 
-                                "gemini-1.5-flash", 
+                                get_model_router().model_for("complete", "gemini"), 
                                 controller.prompt_manager,
                                 **prompt_params
                             )
@@ -611,7 +713,7 @@ Claude評価フィードバック:
             logger.info("✅ Gemini補完成功 - 結果を処理中")
             
             # JSON部分を抽出
-            extracted_json = extract_json_part(gemini_response)
+            extracted_json = extract_json_part(gemini_response, provider="gemini")
             
             if extracted_json and "error" not in extracted_json:
                 logger.info(f"✅ JSON抽出成功: {list(extracted_json.keys())}")
@@ -733,15 +835,20 @@ Claude評価フィードバック:
                     "modules": structure["modules"],
                     "timestamp": datetime.now().isoformat(),
                     "status": "success",
-                    "validation_result": validation_result
+                    "validation_result": validation_result,
+                    "source_fingerprint": source_fingerprint
                 }
                 
                 if "completions" not in structure:
                     structure["completions"] = []
                 structure["completions"].append(completion_entry)
                 
-                # 構成を保存
-                save_structure(structure["id"], cast(StructureDict, structure))
+                # 構成を保存（補完で置き換えたパスのみフィンガープリントを再計算）
+                _stage_structure(
+                    structure["id"],
+                    cast(StructureDict, structure),
+                    changed_paths=["modules", "title", "description"]
+                )
                 logger.info("💾 更新された構成を保存")
                 
                 logger.debug(f"[保存後] structure['modules']: {structure.get('modules')}")
@@ -1029,112 +1136,6 @@ def _evaluate_and_append_message(structure: Dict[str, Any]) -> None:
             type="notification"
         ))
 
-def _apply_gemini_completion_auto(structure: Dict[str, Any]) -> None:
-    """Gemini補完を自動実行し、結果を保存（チャットメッセージには通知のみ追加）"""
-    try:
-        # Gemini補完を実行
-        completion_result = call_gemini_ui_generator(structure.get("content", {}))
-        
-        if completion_result:
-            # 補完結果を構造に保存
-            structure["gemini_output"] = {
-                "provider": "gemini",
-                "status": "success",
-                "content": completion_result,
-                "timestamp": datetime.now().isoformat()
-            }
-            
-            # Gemini補完結果をJSONとして解析し、構成に反映
-            try:
-                import json
-                from src.utils.files import extract_json_part
-                
-                # JSON部分を抽出（既に辞書として返される）
-                gemini_output_dict = extract_json_part(completion_result)
-                if gemini_output_dict and "error" not in gemini_output_dict:
-                    logger.info(f"🔍 Gemini補完結果をJSONとして解析: {list(gemini_output_dict.keys())}")
-                    
-                    # structure["modules"]に統一保存
-                    if "modules" in gemini_output_dict:
-                        structure["modules"] = gemini_output_dict["modules"]
-                        logger.info(f"✅ structure['modules']に保存完了 - モジュール数: {len(gemini_output_dict['modules'])}")
-                    else:
-                        # modulesがない場合は、抽出されたJSON全体をmodulesとして保存
-                        structure["modules"] = gemini_output_dict
-                        logger.info(f"✅ structure['modules']にJSON全体を保存 - キー数: {len(gemini_output_dict)}")
-                    
-                    # その他の情報も保存
-                    if "title" in gemini_output_dict:
-                        structure["title"] = gemini_output_dict["title"]
-                        logger.info(f"✅ titleを保存: {gemini_output_dict['title']}")
-                    
-                    if "description" in gemini_output_dict:
-                        structure["description"] = gemini_output_dict["description"]
-                        logger.info(f"✅ descriptionを保存: {gemini_output_dict['description'][:100]}...")
-                    
-                    # 旧フィールドは削除（統一のため）
-                    if "structure" in structure:
-                        del structure["structure"]
-                        logger.info("🗑️ 旧structureフィールドを削除")
-                    
-                    # 構成を保存
-                    save_structure(structure["id"], cast(StructureDict, structure))
-                    logger.info("💾 更新された構成を保存")
-                    
-                else:
-                    logger.warning("⚠️ Gemini補完結果からJSONを抽出できませんでした")
-                    if gemini_output_dict and "error" in gemini_output_dict:
-                        logger.warning(f"JSON抽出エラー: {gemini_output_dict['error']}")
-                    
-            except Exception as merge_error:
-                logger.error(f"❌ 構成マージエラー: {merge_error}")
-                structure["gemini_output"]["merge_error"] = str(merge_error)
-            
-            # 成功通知メッセージのみをChat欄に追加
-            module_count = len(structure.get("modules", {}))
-            structure["messages"].append(create_message_param(
-                role="assistant",
-                content=f"✅ Gemini補完が完了しました - {module_count}個のモジュールを生成",
-                source="gemini",
-                type="notification"
-            ))
-            
-            logger.info("✅ Gemini補完完了")
-        else:
-            logger.warning("⚠️ Gemini補完結果が空です")
-            structure["gemini_output"] = {
-                "provider": "gemini",
-                "status": "failed",
-                "reason": "補完結果が空でした",
-                "timestamp": datetime.now().isoformat()
-            }
-            
-            # エラー通知メッセージのみをChat欄に追加
-            structure["messages"].append(create_message_param(
-                role="assistant",
-                content="❌ Gemini補完に失敗しました",
-                source="gemini",
-                type="notification"
-            ))
-        
-    except Exception as e:
-        logger.error(f"❌ Gemini補完エラー: {e}")
-        structure["gemini_output"] = {
-            "provider": "gemini",
-            "status": "failed",
-            "reason": f"補完中にエラーが発生しました: {str(e)}",
-            "error_details": str(e),
-            "timestamp": datetime.now().isoformat()
-        }
-        
-        # エラー通知メッセージのみをChat欄に追加
-        structure["messages"].append(create_message_param(
-            role="assistant",
-            content=f"❌ Gemini補完中にエラーが発生しました: {str(e)}",
-            source="gemini",
-            type="notification"
-        ))
-
 @unified_bp.route('/<structure_id>')
 def unified_interface(structure_id):
     """
@@ -1155,7 +1156,7 @@ def unified_interface(structure_id):
             structure_id=structure_id
         )
     
-    structure = load_structure_by_id(structure_id)
+    structure = _load_structure(structure_id)
     if not structure:
         return render_template("errors/404.html", message="構成が見つかりません"), 404
     
@@ -1169,10 +1170,7 @@ def unified_interface(structure_id):
     restore_index = request.args.get('restore', type=int)
     
     try:
-        # 構成データの読み込み
-        logger.info(f"📂 構成データ読み込み開始 - structure_id: {structure_id}")
-        structure = load_structure_by_id(structure_id)
-        
+        # 構成データは上で読み込み済み（同一リクエスト内では再読み込みしない）
         if structure:
             logger.info(f"✅ 構成データ読み込み成功")
             # メッセージ履歴の初期化
@@ -1271,14 +1269,15 @@ def unified_interface(structure_id):
         messages=structure.get("messages", []),
         evaluation=evaluation,
         restore_index=restore_index,
-        timestamp=datetime.now().strftime("%Y%m%d_%H%M%S")  # キャッシュバイパス用タイムスタンプ
+        timestamp=datetime.now().strftime("%Y%m%d_%H%M%S")  # デバッグ用JSONの created_at
     )
 
 @unified_bp.route('/<structure_id>/evaluate', methods=['POST'])
+@coalesce_post()
 def evaluate_structure(structure_id):
     """Claude評価を実行する"""
     try:
-        structure = load_structure_by_id(structure_id)
+        structure = _load_structure(structure_id)
         if not structure:
             return jsonify({'success': False, 'error': '構造が見つかりません'}), 404
         
@@ -1313,7 +1312,7 @@ def evaluate_structure(structure_id):
             })
             
             # 構造を保存
-            save_structure(structure_id, cast(StructureDict, structure))
+            _stage_structure(structure_id, cast(StructureDict, structure))
             
             logger.info(f"✅ Claude評価完了: {structure_id}, スコア: {evaluation_result.score}")
             
@@ -1336,7 +1335,7 @@ def evaluate_structure(structure_id):
                 "timestamp": datetime.now().isoformat()
             }
             
-            save_structure(structure_id, cast(StructureDict, structure))
+            _stage_structure(structure_id, cast(StructureDict, structure))
             
             return jsonify({
                 'success': False,
@@ -1352,12 +1351,13 @@ def evaluate_structure(structure_id):
         }), 500
 
 @unified_bp.route('/<structure_id>/complete', methods=['POST'])
+@coalesce_post()
 def complete_structure(structure_id):
     """Gemini補完を実行し、結果を返す"""
     try:
         provider = request.args.get('provider', 'gemini')
         _ = request.get_json(silent=True)
-        structure = load_structure_by_id(structure_id)
+        structure = _load_structure(structure_id)
         if not structure:
             return jsonify({'success': False, 'error': '構造が見つかりません'})
         if provider == 'gemini':
@@ -1372,7 +1372,7 @@ def complete_structure(structure_id):
                     "timestamp": datetime.utcnow().isoformat(),
                     "status": "success"
                 }
-                save_structure(structure_id, cast(StructureDict, structure))
+                _stage_structure(structure_id, cast(StructureDict, structure))
                 
                 # Claude修復結果があればレスポンスに含める
                 response_data = {'success': True, 'message': 'Gemini補完が完了しました'}
@@ -1387,7 +1387,7 @@ def complete_structure(structure_id):
                     "timestamp": datetime.utcnow().isoformat(),
                     "status": "error"
                 }
-                save_structure(structure_id, cast(StructureDict, structure))
+                _stage_structure(structure_id, cast(StructureDict, structure))
                 
                 # Claude修復結果があればレスポンスに含める
                 response_data = {
@@ -1410,6 +1410,7 @@ def complete_structure(structure_id):
         return jsonify({'success': False, 'error': f'Gemini補完の実行に失敗しました: {str(e)}'})
 
 @unified_bp.route('/<structure_id>/evaluation-history')
+@conditional_get(lambda structure_id: [str(get_history_file_path(structure_id))])
 def get_evaluation_history(structure_id):
     """評価履歴を取得する"""
     try:
@@ -1427,7 +1428,7 @@ def get_evaluation_history(structure_id):
         for entry in history_data.get('history', []):
             if entry.get('source') == 'structure_evaluation':
                 try:
-                    content_data = json.loads(entry.get('content', '{}'))
+                    content_data = json_codec.loads(entry.get('content', '{}'))
                     evaluation_history.append({
                         'provider': entry.get('role', 'unknown'),
                         'score': content_data.get('score', 0.0),
@@ -1452,11 +1453,13 @@ def get_evaluation_history(structure_id):
         return jsonify({'success': False, 'error': f'評価履歴の取得に失敗しました: {str(e)}'})
 
 @unified_bp.route('/<structure_id>/chat', methods=['POST'])
+@coalesce_post()
 def send_message(structure_id: str):
     """
     会話メッセージを送信し、AI応答と構成生成・評価を実行するAPI
     """
     try:
+        annotate(structure_id=structure_id)
         log_request(logger, request, f"send_message - structure_id: {structure_id}")
         logger.info(f"💬 会話メッセージ送信開始 - structure_id: {structure_id}")
 
@@ -1479,11 +1482,12 @@ def send_message(structure_id: str):
         message_content = message_param['content']
         source = message_param.get('source', 'chat')
 
-        structure = load_structure_by_id(structure_id)
+        structure = _load_structure(structure_id)
         if not structure:
             return jsonify({"error": "構成が見つかりません"}), 404
 
         structure.setdefault("messages", []).append(message_param)
+        generated_from = len(structure["messages"])
 
         # ユーザーメッセージの場合はtypeを明示的に設定
         if message_param.get('role') == 'user' and not message_param.get('type'):
@@ -1494,8 +1498,25 @@ def send_message(structure_id: str):
         
         is_new_structure = structure.get("title") in ["新規構成", "Untitled Structure"]
         
+        # 新規構成の最初の要望は、類似した過去の要望の生成結果を再利用できる
+        cached_generation = None
+        generation_cache = None
+        if source == "chat" and is_new_structure and is_generation_cache_enabled():
+            generation_cache = get_generation_cache()
+            if data.get('force_fresh'):
+                generation_cache.record_bypass()
+                logger.info("🔁 force_fresh が指定されたため生成キャッシュを使用しません")
+            else:
+                cached_generation = generation_cache.lookup(message_content)
+        
+        if cached_generation is not None:
+            logger.info(f"♻️ 類似した過去の要望の生成結果を再利用します - 類似度: {cached_generation['similarity']}, "
+                        f"元の構成: {cached_generation['entry'].get('structure_id')}")
+            apply_cached_generation(structure, cached_generation)
+            content_changed = True
+        
         # 新規構成の場合は構成生成を強制実行
-        if source == "chat" and is_new_structure:
+        elif source == "chat" and is_new_structure:
             logger.info("🆕 新規チャットからの初回メッセージ、構成化プロンプトを適用します")
             try:
                 prompt_manager = PromptManager()
@@ -1514,8 +1535,10 @@ def send_message(structure_id: str):
                 logger.info(formatted_input)
                 logger.info("=" * 80)
 
-                ai_response_dict = controller.call("chatgpt", [{"role": "user", "content": formatted_input}])
-                raw_response = ai_response_dict.get('content', '') if isinstance(ai_response_dict, dict) else str(ai_response_dict)
+                raw_response = _generate_structure_structured("chatgpt", formatted_input, "structure_from_input", "generate")
+                if raw_response is None:
+                    ai_response_dict = controller.call("chatgpt", [{"role": "user", "content": formatted_input}], prompt_name="structure_from_input")
+                    raw_response = ai_response_dict.get('content', '') if isinstance(ai_response_dict, dict) else str(ai_response_dict)
                 
                 # ChatGPT応答全文をログ出力
                 logger.info("=" * 80)
@@ -1553,7 +1576,7 @@ def send_message(structure_id: str):
                     ))
                     
                     # 構成生成をスキップ
-                    save_structure(structure_id, cast(StructureDict, structure))
+                    _stage_structure(structure_id, cast(StructureDict, structure))
                     return jsonify({
                         "success": True,
                         "messages": structure.get("messages", []),
@@ -1578,7 +1601,7 @@ def send_message(structure_id: str):
                 # 元のJSON抽出も試行（完全な構造がある場合）
                 logger.info("🔍 extract_json_part関数を呼び出し開始")
                 logger.info(f"📝 extract_json_part入力文字数: {len(raw_response)}")
-                extracted_json = extract_json_part(raw_response)
+                extracted_json = extract_json_part(raw_response, provider="chatgpt")
                 
                 # extract_json_partの結果を詳細ログ
                 logger.info("=" * 80)
@@ -1598,7 +1621,7 @@ def send_message(structure_id: str):
                     else:
                         logger.info(f"✅ extract_json_part成功")
                         logger.info(f"✅ 抽出されたキー: {list(extracted_json.keys())}")
-                        logger.info(f"✅ 抽出された内容: {json.dumps(extracted_json, ensure_ascii=False, indent=2)[:500]}...")
+                        logger.info(f"✅ 抽出された内容: {json_codec.dumps(extracted_json, indent=2)[:500]}...")
                 else:
                     logger.warning(f"⚠️ 予期しない結果型: {extracted_json}")
                 logger.info("=" * 80)
@@ -1836,6 +1859,11 @@ def send_message(structure_id: str):
                         type=evaluation_message["type"]
                     ))
 
+                # 生成結果を類似リクエストキャッシュに保存（評価・補完の結果も含める）
+                if generation_cache is not None and structure.get("modules"):
+                    generated_messages = structure["messages"][generated_from:]
+                    generation_cache.store(message_content, structure, generated_messages, structure_id=structure_id)
+
             except (PromptNotFoundError, Exception) as e:
                 log_exception(logger, e, "構成化プロンプト処理中にエラーが発生しました")
                 ai_response_content = "申し訳ありません、構成の生成中にエラーが発生しました。"
@@ -1853,6 +1881,16 @@ def send_message(structure_id: str):
             chat_history = [message_param_to_chat_message(m) for m in recent_messages_params]
             api_messages = [chat_message_to_dict(m) for m in chat_history]
 
+            # 再発話・情報不足を検出したら応答の方針をsystemメッセージで指示する
+            # （structure_id を渡し、構成ごとの類似度インデックスに追加分の発言だけを登録する）
+            guidance = analyze_conversation(
+                [{"role": m.get("role", ""), "content": m.get("content", "")} for m in structure.get("messages", [])],
+                structure_id=structure_id
+            )
+            if guidance and guidance.startswith("prompt:"):
+                api_messages.append({"role": "system", "content": guidance[len("prompt:"):]})
+                logger.info("🧭 会話分析の指示をプロンプトに追加しました")
+
             ai_response_dict = controller.call("chatgpt", messages=api_messages)
             ai_response_content = ai_response_dict.get('content', '') if isinstance(ai_response_dict, dict) else str(ai_response_dict)
             
@@ -1866,15 +1904,20 @@ def send_message(structure_id: str):
                 type="assistant_reply"
             ))
 
-        save_structure(structure_id, cast(StructureDict, structure))
+        _stage_structure(structure_id, cast(StructureDict, structure))
         logger.info(f"✅ メッセージ送信処理完了 - structure_id: {structure_id}")
 
+        # 以降の表示用の追加情報は保存対象に含めないよう、レスポンス用のコピーに反映する
+        staged_structure = structure
+        structure = dict(staged_structure)
+        structure["messages"] = list(staged_structure.get("messages", []))
+
         # 構成データがある場合、structureタイプのメッセージを追加（フロント側の構成カード描画用）
         if structure.get("modules") and content_changed:
             logger.info("📦 構成データを検出、structureタイプのメッセージを追加")
             structure["messages"].append(create_message_param(
                 role="assistant",
-                content=json.dumps(structure["modules"], ensure_ascii=False, indent=2),
+                content=json_codec.dumps(structure["modules"], indent=2),
                 type="structure",
                 source="chatgpt"
             ))
@@ -2026,7 +2069,7 @@ def generate_improved_structure(structure: Dict[str, Any], suggestions: List[str
 **タイトル**: {original_title}
 **説明**: {original_description}
 **構成内容**:
-{json.dumps(original_content, ensure_ascii=False, indent=2)}
+{json_codec.dumps(original_content, indent=2)}
 
 ## Claude評価からの改善提案
 {suggestions_text}
@@ -2057,7 +2100,7 @@ def generate_improved_structure(structure: Dict[str, Any], suggestions: List[str
             return None
         
         # JSON部分を抽出
-        extracted_json = extract_json_part(gemini_response)
+        extracted_json = extract_json_part(gemini_response, provider="gemini")
         if not extracted_json:
             logger.warning("⚠️ Gemini応答から有効なJSONを抽出できませんでした")
             return None
@@ -2160,86 +2203,6 @@ def compare_structures(structure_id):
         logger.error(f"構成比較エラー: {str(e)}")
         return jsonify({'error': f'構成比較中にエラーが発生しました: {str(e)}'}), 500
 
-def generate_diff_result_html(diff_result):
-    """差分結果をHTML形式で生成"""
-    try:
-        html_parts = []
-        
-        # 差分サマリー
-        if diff_result.get('summary'):
-            html_parts.append(f"""
-                <div class="diff-summary" style="background: rgba(78, 201, 176, 0.1); border-left: 4px solid #4ec9b0; padding: 15px; margin-bottom: 20px; border-radius: 0 8px 8px 0;">
-                    <h4 style="color: #4ec9b0; margin: 0 0 10px 0;">📊 差分サマリー</h4>
-                    <p style="margin: 0; color: #cccccc;">{diff_result['summary']}</p>
-                </div>
-            """)
-        
-        # 詳細差分
-        if diff_result.get('details'):
-            html_parts.append('<div class="diff-details">')
-            html_parts.append('<h4 style="color: #4ec9b0; margin: 0 0 15px 0;">🔍 詳細差分</h4>')
-            
-            for detail in diff_result['details']:
-                change_type = detail.get('type', 'unknown')
-                field = detail.get('field', 'unknown')
-                old_value = detail.get('old_value', '')
-                new_value = detail.get('new_value', '')
-                
-                # 変更タイプに応じたスタイル
-                if change_type == 'added':
-                    style_class = 'added'
-                    icon = '➕'
-                    title = '追加'
-                elif change_type == 'removed':
-                    style_class = 'removed'
-                    icon = '➖'
-                    title = '削除'
-                elif change_type == 'modified':
-                    style_class = 'changed'
-                    icon = '🔄'
-                    title = '変更'
-                else:
-                    style_class = 'unchanged'
-                    icon = '📝'
-                    title = 'その他'
-                
-                html_parts.append(f"""
-                    <div class="diff-item {style_class}" style="background: rgba(78, 201, 176, 0.05); border: 1px solid rgba(78, 201, 176, 0.2); border-radius: 8px; padding: 15px; margin-bottom: 10px;">
-                        <div class="diff-header" style="display: flex; align-items: center; gap: 8px; margin-bottom: 10px;">
-                            <span style="font-size: 16px;">{icon}</span>
-                            <strong style="color: #4ec9b0;">{title}</strong>
-                            <span style="color: #cccccc;">- {field}</span>
-                        </div>
-                        <div class="diff-content">
-                            {f'<div class="diff-line removed" style="background: rgba(220, 53, 69, 0.1); color: #dc3545; padding: 8px; border-radius: 4px; margin-bottom: 5px;"><strong>削除:</strong> {old_value}</div>' if old_value else ''}
-                            {f'<div class="diff-line added" style="background: rgba(40, 167, 69, 0.1); color: #28a745; padding: 8px; border-radius: 4px;"><strong>追加:</strong> {new_value}</div>' if new_value else ''}
-                        </div>
-                    </div>
-                """)
-            
-            html_parts.append('</div>')
-        
-        # 統計情報
-        if diff_result.get('statistics'):
-            stats = diff_result['statistics']
-            html_parts.append(f"""
-                <div class="diff-statistics" style="background: rgba(255, 193, 7, 0.1); border-left: 4px solid #ffc107; padding: 15px; margin-top: 20px; border-radius: 0 8px 8px 0;">
-                    <h4 style="color: #ffc107; margin: 0 0 10px 0;">📈 変更統計</h4>
-                    <div style="display: flex; gap: 20px; flex-wrap: wrap;">
-                        <div><strong>追加:</strong> <span style="color: #28a745;">{stats.get('added', 0)}</span></div>
-                        <div><strong>削除:</strong> <span style="color: #dc3545;">{stats.get('removed', 0)}</span></div>
-                        <div><strong>変更:</strong> <span style="color: #ffc107;">{stats.get('modified', 0)}</span></div>
-                        <div><strong>変更なし:</strong> <span style="color: #6c757d;">{stats.get('unchanged', 0)}</span></div>
-                    </div>
-                </div>
-            """)
-        
-        return ''.join(html_parts)
-        
-    except Exception as e:
-        log_exception(logger, e, "差分HTML生成")
-        return f'<div style="color: #dc3545;">差分表示エラー: {str(e)}</div>'
-
 def generate_random_structure_id() -> str:
     """ランダムな構成IDを生成する"""
     return str(uuid.uuid4())
@@ -2270,7 +2233,7 @@ def create_blank_structure(structure_id: str) -> Dict[str, Any]:
     }
     
     # ファイルに保存
-    save_structure(structure_id, cast(StructureDict, blank_structure))
+    _stage_structure(structure_id, cast(StructureDict, blank_structure))
     logger.info(f"✅ 新規構成を作成しました - structure_id: {structure_id}")
     
     return blank_structure
@@ -2293,7 +2256,7 @@ def evaluation_history_page(structure_id):
     logger.info(f"📊 評価履歴ページ表示開始 - structure_id: {structure_id}")
     
     try:
-        structure = load_structure_by_id(structure_id)
+        structure = _load_structure(structure_id)
         if not structure:
             return render_template("errors/404.html", message="構成が見つかりません"), 404
         
@@ -2318,7 +2281,7 @@ def completion_history_page(structure_id):
     logger.info(f"🔁 補完履歴ページ表示開始 - structure_id: {structure_id}")
     
     try:
-        structure = load_structure_by_id(structure_id)
+        structure = _load_structure(structure_id)
         if not structure:
             return render_template("errors/404.html", message="構成が見つかりません"), 404
         
@@ -2404,83 +2367,10 @@ def check_structure_completeness(structure: Dict[str, Any]) -> Dict[str, Any]:
     Returns:
         Dict[str, Any]: 完全性チェック結果
     """
-    result = {
-        "is_complete": True,
-        "missing_fields": [],
-        "suggestions": [],
-        "score_threshold": 0.7
-    }
-    
-    content = structure.get("content", {})
-    evaluation = structure.get("evaluation", {})
-    
-    # 基本的な項目チェック
-    if not structure.get("title"):
-        result["missing_fields"].append("構成のタイトル")
-        result["is_complete"] = False
-    
-    if not structure.get("description"):
-        result["missing_fields"].append("構成の説明")
-        result["suggestions"].append("目的や概要を明確にしてください")
-    
-    # content内の詳細チェック
-    if content and isinstance(content, dict):
-        # 対象ユーザーのチェック
-        if not content.get("対象ユーザー") and not content.get("target_users"):
-            result["missing_fields"].append("対象ユーザー")
-            result["is_complete"] = False
-            result["suggestions"].append("誰が使うアプリか教えてください")
-        
-        # 主要機能のチェック
-        main_functions = content.get("主要機能") or content.get("main_functions") or content.get("機能")
-        if not main_functions or (isinstance(main_functions, dict) and not main_functions):
-            result["missing_fields"].append("主要機能")
-            result["is_complete"] = False
-            result["suggestions"].append("どんな機能が必要か教えてください")
-        
-        # 技術要件のチェック
-        tech_requirements = content.get("技術要件") or content.get("technical_requirements")
-        if not tech_requirements or (isinstance(tech_requirements, dict) and not tech_requirements):
-            result["missing_fields"].append("技術要件")
-            result["is_complete"] = False
-            result["suggestions"].append("使用したい技術があれば教えてください")
-        
-        # 画面構成のチェック
-        screens = content.get("画面構成") or content.get("screens") or content.get("画面")
-        if not screens or (isinstance(screens, dict) and not screens):
-            result["missing_fields"].append("画面構成")
-            result["is_complete"] = False
-            result["suggestions"].append("どんな画面が必要か教えてください")
-    
-    else:
-        # contentが空または無効な場合
-        result["missing_fields"].append("構成の詳細内容")
-        result["is_complete"] = False
-        result["suggestions"].append("構成の詳細を教えてください")
-    
-    # Claude評価スコアチェック
-    if evaluation and evaluation.get("status") == "success":
-        score = evaluation.get("score", 0)
-        if score < result["score_threshold"]:
-            result["is_complete"] = False
-            result["suggestions"].append(f"評価スコアが低いです（{score}）。構成を改善してください")
-        
-        # 評価フィードバックから不足項目を抽出
-        feedback = evaluation.get("feedback", "")
-        if "不足" in feedback or "不十分" in feedback or "不明" in feedback:
-            result["suggestions"].append("評価フィードバックを参考に構成を改善してください")
-    
-    # Gemini補完結果チェック
-    gemini_output = structure.get("gemini_output", {})
-    if gemini_output and gemini_output.get("status") == "success":
-        content_text = gemini_output.get("content", "")
-        if not content_text or len(content_text.strip()) < 50:
-            result["is_complete"] = False
-            result["suggestions"].append("補完結果が不十分です。より詳細な構成が必要です")
-    
-    return result
+    return get_rule_engine().completeness(structure)
 
 @unified_bp.route('/<structure_id>/auto_complete', methods=['POST'])
+@coalesce_post()
 def auto_complete_confirmation(structure_id: str):
     """
     自動補完確認のAPIエンドポイント
@@ -2504,7 +2394,7 @@ def auto_complete_confirmation(structure_id: str):
             return jsonify({"error": "無効な確認値です"}), 400
         
         # 構造データを読み込み
-        structure = load_structure_by_id(structure_id)
+        structure = _load_structure(structure_id)
         if not structure:
             return jsonify({"error": "構成が見つかりません"}), 404
         
@@ -2527,7 +2417,7 @@ def auto_complete_confirmation(structure_id: str):
             }
             
             # 構成を保存
-            save_structure(structure_id, cast(StructureDict, enhanced_structure))
+            _stage_structure(structure_id, cast(StructureDict, enhanced_structure))
             
             logger.info("✅ 自動補完完了")
             return jsonify({
@@ -2554,7 +2444,7 @@ def auto_complete_confirmation(structure_id: str):
             }
             
             # 構成を保存
-            save_structure(structure_id, cast(StructureDict, structure))
+            _stage_structure(structure_id, cast(StructureDict, structure))
             
             return jsonify({
                 "success": True,
@@ -2649,7 +2539,7 @@ def auto_complete_structure(structure: Dict[str, Any], missing_fields: List[str]
 **現在の構成:**
 タイトル: {current_title or "未設定"}
 説明: {current_description or "未設定"}
-内容: {json.dumps(current_content, indent=2, ensure_ascii=False)}
+内容: {json_codec.dumps(current_content, indent=2)}
 
 **不足項目:**
 {chr(10).join([f"- {field}" for field in missing_fields])}
@@ -2688,17 +2578,18 @@ def auto_complete_structure(structure: Dict[str, Any], missing_fields: List[str]
             {"role": "user", "content": completion_prompt}
         ]
         
-        enhanced_response = controller.call(
-            provider="chatgpt",
-            messages=api_messages,
-            model="gpt-3.5-turbo",
+        # 補完結果はJSONで返るはずなので、抽出できない場合は次の候補にエスカレーションする
+        enhanced_response = controller.route(
+            "complete",
+            api_messages,
+            validate=lambda text: "error" not in extract_json_part(text, provider=routed_provider()),
         )
         
         enhanced_content = enhanced_response.get('content', '') if isinstance(enhanced_response, dict) else enhanced_response
         
         if enhanced_content:
             # 改善された構成を抽出
-            enhanced_json = extract_json_part(enhanced_content)
+            enhanced_json = extract_json_part(enhanced_content, provider=routed_provider())
             if enhanced_json and "error" not in enhanced_json:
                 # 構成を更新
                 if "content" in enhanced_json:
@@ -2728,10 +2619,11 @@ def auto_complete_structure(structure: Dict[str, Any], missing_fields: List[str]
         return structure
 
 @unified_bp.route('/<structure_id>/debug-messages')
+@conditional_get(_structure_file_paths, scope=structure_scope)
 def debug_messages(structure_id: str):
     """デバッグ用：メッセージ履歴を表示"""
     try:
-        structure = load_structure_by_id(structure_id)
+        structure = _load_structure(structure_id)
         if not structure:
             return jsonify({"error": "Structure not found"}), 404
         
@@ -2746,12 +2638,13 @@ def debug_messages(structure_id: str):
         return jsonify({"error": str(e)}), 500
 
 @unified_bp.route('/api/structure_content/<structure_id>')
+@conditional_get(_structure_file_paths, scope=structure_scope)
 def get_structure_content(structure_id):
     """構成内容を取得するAPIエンドポイント"""
     try:
         logger.info(f"🔍 構成内容取得リクエスト: {structure_id}")
         
-        structure = load_structure_by_id(structure_id)
+        structure = _load_structure(structure_id)
         if not structure:
             logger.warning(f"❌ 構成が見つかりません: {structure_id}")
             return jsonify({"error": "構成が見つかりません"}), 404
@@ -2780,7 +2673,7 @@ def record_gemini_completion_stats(structure_id: str, status: str, error_message
         stats = {}
         if os.path.exists(stats_file):
             with open(stats_file, 'r', encoding='utf-8') as f:
-                stats = json.load(f)
+                stats = json_codec.loads(f.read())
         
         # 統計を更新
         if "total_completions" not in stats:
@@ -2888,7 +2781,7 @@ def record_gemini_completion_stats(structure_id: str, status: str, error_message
         # 統計を保存
         os.makedirs("logs", exist_ok=True)
         with open(stats_file, 'w', encoding='utf-8') as f:
-            json.dump(stats, f, ensure_ascii=False, indent=2)
+            f.write(json_codec.dumps(stats, indent=2))
             
         logger.info(f"📊 Gemini補完統計を更新: {status} - 成功率: {stats.get('success_rate', 0)}% - 予防効果率: {stats.get('prevention_effectiveness', {}).get('effectiveness_rate', 0)}%")
         
@@ -2928,7 +2821,7 @@ def get_gemini_completion_stats():
             })
         
         with open(stats_file, 'r', encoding='utf-8') as f:
-            stats = json.load(f)
+            stats = json_codec.loads(f.read())
         
         return jsonify({
             "success": True,
@@ -3096,40 +2989,15 @@ def create_optimized_gemini_prompt(structure_content: Dict[str, Any], claude_fee
         str: 最適化されたプロンプト
     """
     # 構造をJSON文字列に変換
-    structure_json = json.dumps(structure_content, ensure_ascii=False, indent=2)
-    
-    # 最適化されたプロンプトテンプレート
-    prompt = f"""以下の構成JSONを改善してください。改善のヒントとしてClaudeによる評価コメントを添えます。
-
-【構成】:
-{structure_json}
-
-【Claude評価コメント】:
-{claude_feedback}
-
-この指摘を元に、構成JSON全体を再構成し、完成形を JSON形式でのみ 出力してください。
-
-【重要】:
-- JSON形式でのみ出力してください
-- コードブロック（```json）は使用しないでください
-- 説明文やコメントは含めないでください
-- 有効なJSONオブジェクトのみを返してください
-- "title"と"modules"キーは必ず含めてください
-
-出力例:
-{{
-  "title": "改善された構成",
-  "description": "Claude評価を反映した改善版",
-  "modules": [
-    {{
-      "name": "モジュール名",
-      "description": "モジュールの説明"
-    }}
-  ]
-}}"""
+    structure_json = json_codec.dumps(structure_content, indent=2)
     
-    return prompt
+    # 固定の指示を先頭、構成と評価コメントを末尾に置く（プロンプトキャッシュで指示部分を再利用できる）
+    return PromptLayout(
+        GEMINI_IMPROVEMENT_PREFIX,
+        f"【構成】:\n{structure_json}\n\n【Claude評価コメント】:\n{claude_feedback}"
+    ).text
 
+@traced("validation.gemini_response")
 def validate_gemini_response_structure(response: str) -> Dict[str, Any]:
     """
     Gemini応答の構造を検証する
@@ -3188,83 +3056,7 @@ def analyze_structure_state(evaluation: str) -> dict:
             - status: "incomplete", "complete", "unknown"
             - reason: 理由の説明
     """
-    try:
-        if not evaluation or not isinstance(evaluation, str):
-            return {"status": "unknown", "reason": "評価文が空または無効です。"}
-        
-        evaluation_lower = evaluation.lower()
-        
-        # 未完成を示すキーワード
-        incomplete_keywords = [
-            "不十分", "未定義", "不足", "不完全", "欠如", "未実装",
-            "insufficient", "undefined", "missing", "incomplete", "lack", "not implemented",
-            "改善が必要", "修正が必要", "追加が必要", "補完が必要",
-            "needs improvement", "needs fixing", "needs addition", "needs completion"
-        ]
-        
-        # 完成を示すキーワード
-        complete_keywords = [
-            "問題ありません", "適切です", "十分です", "完成", "良好",
-            "no problem", "appropriate", "sufficient", "complete", "good",
-            "満足", "優秀", "完璧", "理想的",
-            "satisfactory", "excellent", "perfect", "ideal"
-        ]
-        
-        # 未完成チェック
-        for keyword in incomplete_keywords:
-            if keyword in evaluation_lower:
-                return {
-                    "status": "incomplete", 
-                    "reason": f"構成に未定義の項目があります。補完が必要です。（キーワード: {keyword}）"
-                }
-        
-        # 完成チェック
-        for keyword in complete_keywords:
-            if keyword in evaluation_lower:
-                return {
-                    "status": "complete",
-                    "reason": f"構成は完成しています。（キーワード: {keyword}）"
-                }
-        
-        # スコアベースの判定（数値が含まれている場合）
-        import re
-        score_patterns = [
-            r'(\d+(?:\.\d+)?)/10',  # 10点満点
-            r'(\d+(?:\.\d+)?)%',    # パーセンテージ
-            r'スコア[：:]\s*(\d+(?:\.\d+)?)',  # スコア: 数値
-            r'score[：:]\s*(\d+(?:\.\d+)?)'    # score: 数値
-        ]
-        
-        for pattern in score_patterns:
-            match = re.search(pattern, evaluation)
-            if match:
-                try:
-                    score = float(match.group(1))
-                    if score < 6.0:  # 60%未満は未完成
-                        return {
-                            "status": "incomplete",
-                            "reason": f"評価スコアが低いです（{score}）。改善が必要です。"
-                        }
-                    elif score >= 8.0:  # 80%以上は完成
-                        return {
-                            "status": "complete",
-                            "reason": f"評価スコアが高いです（{score}）。構成は完成しています。"
-                        }
-                except ValueError:
-                    continue
-        
-        # デフォルト: 判別不能
-        return {
-            "status": "unknown", 
-            "reason": "評価文から状態を特定できませんでした。"
-        }
-        
-    except Exception as e:
-        logger.error(f"評価文解析中にエラーが発生: {str(e)}")
-        return {
-            "status": "unknown", 
-            "reason": f"評価文の解析中にエラーが発生しました: {str(e)}"
-        }
+    return get_rule_engine().classify_evaluation(evaluation)
 
 def generate_intervention_message(analysis: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     """
@@ -3357,7 +3149,7 @@ def save_evaluation_to_history(structure_id: str, evaluation_result: Dict[str, A
     """
     try:
         # 評価結果をJSON文字列に変換
-        content = json.dumps(evaluation_result, ensure_ascii=False, indent=2)
+        content = json_codec.dumps(evaluation_result, indent=2)
         
         # 履歴に保存
         success = save_structure_history(
@@ -3523,7 +3315,7 @@ def ensure_modules_exist(structure: Dict[str, Any]) -> Dict[str, Any]:
     if "structure" in structure and structure["structure"]:
         try:
             if isinstance(structure["structure"], str):
-                structure_data = json.loads(structure["structure"])
+                structure_data = json_codec.loads(structure["structure"])
             else:
                 structure_data = structure["structure"]
             
@@ -3541,7 +3333,7 @@ def ensure_modules_exist(structure: Dict[str, Any]) -> Dict[str, Any]:
     if not modules and "content" in structure and structure["content"]:
         try:
             if isinstance(structure["content"], str):
-                content_data = json.loads(structure["content"])
+                content_data = json_codec.loads(structure["content"])
             else:
                 content_data = structure["content"]
             
@@ -3582,10 +3374,11 @@ def ensure_modules_exist(structure: Dict[str, Any]) -> Dict[str, Any]:
     return structure
 
 @unified_bp.route('/<structure_id>/data')
+@conditional_get(_structure_file_paths, scope=structure_scope)
 def get_structure_data(structure_id):
     """構成データを取得する（カードクリック時用）"""
     try:
-        structure = load_structure_by_id(structure_id)
+        structure = _load_structure(structure_id)
         if not structure:
             return jsonify({'success': False, 'error': '構造が見つかりません'}), 404
         
@@ -3622,52 +3415,7 @@ def _validate_structure_completeness(structure_data: Dict[str, Any]) -> Dict[str
     Returns:
         Dict[str, Any]: 検証結果
     """
-    validation_result = {
-        "is_valid": False,
-        "missing_fields": [],
-        "invalid_modules": [],
-        "suggestions": []
-    }
-    
-    try:
-        # 基本フィールドのチェック
-        if "title" not in structure_data:
-            validation_result["missing_fields"].append("title")
-        
-        if "modules" not in structure_data:
-            validation_result["missing_fields"].append("modules")
-            validation_result["suggestions"].append("modules配列を追加してください")
-            return validation_result
-        
-        modules = structure_data.get("modules", [])
-        if not isinstance(modules, list) or len(modules) == 0:
-            validation_result["suggestions"].append("modules配列に少なくとも1つのモジュールを含めてください")
-            return validation_result
-        
-        # 各モジュールの検証
-        valid_modules = 0
-        for i, module in enumerate(modules):
-            module_validation = _validate_module(module, i)
-            if not module_validation["is_valid"]:
-                validation_result["invalid_modules"].append({
-                    "index": i,
-                    "errors": module_validation["errors"],
-                    "suggestions": module_validation["suggestions"]
-                })
-            else:
-                valid_modules += 1
-        
-        # 全体の妥当性判定
-        if len(validation_result["missing_fields"]) == 0 and valid_modules > 0:
-            validation_result["is_valid"] = True
-            validation_result["suggestions"].append("構造は有効です")
-        
-        return validation_result
-        
-    except Exception as e:
-        logger.error(f"構造検証エラー: {str(e)}")
-        validation_result["suggestions"].append(f"構造検証中にエラーが発生しました: {str(e)}")
-        return validation_result
+    return get_rule_engine().validation(structure_data)
 
 def _validate_module(module: Dict[str, Any], index: int) -> Dict[str, Any]:
     """
@@ -3680,67 +3428,10 @@ def _validate_module(module: Dict[str, Any], index: int) -> Dict[str, Any]:
     Returns:
         Dict[str, Any]: 検証結果
     """
-    validation_result = {
-        "is_valid": False,
-        "errors": [],
-        "suggestions": []
-    }
-    
-    try:
-        # 必須フィールドのチェック
-        required_fields = ["id", "type", "title"]
-        for field in required_fields:
-            if field not in module:
-                validation_result["errors"].append(f"必須フィールド '{field}' が不足しています")
-        
-        if validation_result["errors"]:
-            return validation_result
-        
-        # モジュールタイプに応じた配列のチェック
-        module_type = module.get("type", "")
-        type_requirements = {
-            "form": {"fields": "list"},
-            "table": {"columns": "list"}, 
-            "api": {"endpoints": "list"},
-            "chart": {"chart_config": "dict"},
-            "auth": {"auth_config": "dict"},
-            "database": {"tables": "list"},
-            "config": {"settings": "list"},
-            "page": {"layout": "dict"},
-            "component": {"component_config": "dict"}
-        }
-        
-        if module_type in type_requirements:
-            for field_name, expected_type in type_requirements[module_type].items():
-                if field_name not in module:
-                    validation_result["errors"].append(f"モジュールタイプ '{module_type}' には '{field_name}' フィールドが必要です")
-                else:
-                    field_value = module[field_name]
-                    if expected_type == "list":
-                        if not isinstance(field_value, list) or len(field_value) == 0:
-                            validation_result["errors"].append(f"'{field_name}' 配列が空または無効です")
-                    elif expected_type == "dict":
-                        if not isinstance(field_value, dict):
-                            validation_result["errors"].append(f"'{field_name}' は辞書（オブジェクト）である必要があります")
-        
-        # 有効なモジュールタイプのチェック
-        valid_types = list(type_requirements.keys()) + ["unknown"]
-        if module_type not in valid_types:
-            validation_result["suggestions"].append(f"モジュールタイプ '{module_type}' は標準タイプではありません")
-        
-        # 妥当性判定
-        if len(validation_result["errors"]) == 0:
-            validation_result["is_valid"] = True
-            validation_result["suggestions"].append("モジュールは有効です")
-        
-        return validation_result
-        
-    except Exception as e:
-        logger.error(f"モジュール検証エラー (index {index}): {str(e)}")
-        validation_result["errors"].append(f"モジュール検証中にエラーが発生しました: {str(e)}")
-        return validation_result
+    return validate_module(module, index)
 
 @unified_bp.route('/<structure_id>/structure-history')
+@conditional_get(_structure_history_paths)
 def get_structure_history_api(structure_id: str):
     """構造履歴を取得するAPIエンドポイント"""
     try:
@@ -3794,6 +3485,7 @@ def get_structure_history_api(structure_id: str):
 
 
 @unified_bp.route('/<structure_id>/structure-history/compare')
+@conditional_get(_structure_history_paths)
 def compare_structure_history_api(structure_id: str):
     """構造履歴の比較APIエンドポイント"""
     try:
@@ -3829,11 +3521,10 @@ def compare_structure_history_api(structure_id: str):
 
 
 @unified_bp.route('/<structure_id>/structure-history/latest')
+@conditional_get(_structure_history_paths)
 def get_latest_structure_history_api(structure_id: str):
     """最新の構造履歴を取得するAPI"""
     try:
-        from src.structure.history import get_latest_structure_history
-        
         history = get_latest_structure_history(structure_id)
         if history:
             return jsonify({
@@ -3853,7 +3544,24 @@ def get_latest_structure_history_api(structure_id: str):
             "message": f"履歴取得に失敗しました: {str(e)}"
         }), 500
 
+@unified_bp.route('/generation-cache/stats')
+def get_generation_cache_stats():
+    """類似リクエストキャッシュのヒット率などの統計情報を取得するAPI"""
+    try:
+        return jsonify({
+            "status": "success",
+            "enabled": is_generation_cache_enabled(),
+            "stats": get_generation_cache().stats()
+        })
+    except Exception as e:
+        logger.error(f"❌ 生成キャッシュ統計取得エラー: {e}")
+        return jsonify({
+            "status": "error",
+            "message": f"生成キャッシュの統計取得に失敗しました: {str(e)}"
+        }), 500
+
 @unified_bp.route('/<structure_id>/module-diff')
+@conditional_get(lambda structure_id: [get_structure_path(structure_id)], scope=structure_scope)
 def get_module_diff_api(structure_id: str):
     """モジュール差分データを取得するAPI"""
     try:
@@ -3916,7 +3624,7 @@ def handle_yes_no_response(structure_id):
             logger.info("✅ ユーザーが「はい」と回答、Gemini補完を実行します")
             
             # 構成を読み込み
-            structure = load_structure_by_id(structure_id)
+            structure = _load_structure(structure_id)
             if not structure:
                 logger.error("❌ 構成が見つかりません")
                 return jsonify({"error": "構成が見つかりません"}), 404
@@ -3934,7 +3642,7 @@ def handle_yes_no_response(structure_id):
                     type="notification"
                 )
                 structure["messages"].append(success_message)
-                save_structure(structure_id, cast(StructureDict, structure))
+                _stage_structure(structure_id, cast(StructureDict, structure))
                 
                 return jsonify({
                     "status": "completed", 
@@ -3952,7 +3660,7 @@ def handle_yes_no_response(structure_id):
             logger.info("❌ ユーザーが「いいえ」と回答、誘導メッセージを表示します")
             
             # 構成を読み込み
-            structure = load_structure_by_id(structure_id)
+            structure = _load_structure(structure_id)
             if not structure:
                 logger.error("❌ 構成が見つかりません")
                 return jsonify({"error": "構成が見つかりません"}), 404
@@ -3967,7 +3675,7 @@ def handle_yes_no_response(structure_id):
             
             # メッセージを構成に追加
             structure["messages"].append(guidance_message)
-            save_structure(structure_id, cast(StructureDict, structure))
+            _stage_structure(structure_id, cast(StructureDict, structure))
             
             return jsonify({
                 "status": "noted", 
@@ -4120,7 +3828,7 @@ def unified_v2_interface(structure_id):
     
     try:
         # 構造データの読み込み
-        structure = load_structure_by_id(structure_id)
+        structure = _load_structure(structure_id)
         
         if not structure:
             # 構造が見つからない場合は新規作成
@@ -4146,7 +3854,7 @@ def unified_v2_interface(structure_id):
             messages=messages,
             evaluation=evaluation,
             restore_index=restore_index,
-            timestamp=datetime.now().strftime("%Y%m%d_%H%M%S")
+            timestamp=datetime.now().strftime("%Y%m%d_%H%M%S")  # デバッグ用JSONの created_at
         )
         
     except Exception as e:
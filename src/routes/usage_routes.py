@@ -0,0 +1,120 @@
+"""
+LLM利用量のルート定義モジュール
+
+リクエストごとに構成ID・セッションIDを利用量コンテキストに設定し、
+src.common.llm_usage の台帳の消費量・集計・クォータを返すAPIと、
+src.common.model_routing のモデルごとの観測値・直近のルーティング判断を返すAPIを提供します。
+"""
+
+import logging
+import uuid
+
+from flask import Blueprint, Flask, g, jsonify, request, session
+
+from src.common.llm_usage import ROLLUP_FIELDS, WINDOW_SECONDS, get_usage_ledger, set_usage_context
+from src.common.model_routing import get_model_router
+
+logger = logging.getLogger(__name__)
+
+usage_bp = Blueprint('usage', __name__, url_prefix='/usage')
+
+# セッションIDを保存するキー
+SESSION_KEY = "usage_session_id"
+
+# セッションIDを明示するヘッダー（スクリプトなどクッキーを使わないクライアント用）
+SESSION_HEADER = "X-Session-ID"
+
+# 利用量コンテキストを設定しないパス
+UNTRACKED_PREFIXES = ("/static", "/assets", "/usage")
+
+_G_RESTORE = "_aidex_usage_restore"
+
+
+def current_session_id() -> str:
+    """
+    現在のリクエストのセッションIDを返す（なければFlaskセッションに発行する）
+
+    Returns:
+        str: セッションID
+    """
+    header = (request.headers.get(SESSION_HEADER) or "").strip()
+    if header:
+        return header[:64]
+    if SESSION_KEY not in session:
+        session[SESSION_KEY] = uuid.uuid4().hex
+    return session[SESSION_KEY]
+
+
+def init_usage(app: Flask) -> None:
+    """
+    リクエスト中のLLM呼び出しに構成ID・セッションIDを付ける
+
+    Args:
+        app: Flaskアプリケーション
+    """
+
+    @app.before_request
+    def _start_usage_context():
+        if request.path.startswith(UNTRACKED_PREFIXES):
+            return None
+        structure_id = (request.view_args or {}).get("structure_id")
+        setattr(g, _G_RESTORE, set_usage_context(structure_id=structure_id, session_id=current_session_id()))
+        return None
+
+    @app.teardown_request
+    def _finish_usage_context(exc):
+        restore = g.pop(_G_RESTORE, None)
+        if restore is not None:
+            try:
+                restore()
+            except ValueError:
+                # 別コンテキストで設定された場合は元に戻せない
+                pass
+
+
+@usage_bp.route('/api')
+def get_usage_summary():
+    """現在の分・日の消費量とクォータの残量を返すAPI"""
+    try:
+        return jsonify({"success": True, **get_usage_ledger().summary()})
+    except Exception as e:
+        logger.exception(f"❌ 利用量の取得中にエラーが発生: {str(e)}")
+        return jsonify({"success": False, "error": f"利用量の取得中にエラーが発生しました: {str(e)}"}), 500
+
+
+@usage_bp.route('/api/rollups')
+def get_usage_rollups():
+    """
+    分・日単位の利用量の集計API
+
+    クエリ: window（minute / day） / group_by（provider, model, prompt_name, structure_id, session_id の
+    カンマ区切り） / since（UNIX秒）
+    """
+    window = request.args.get('window', 'minute')
+    if window not in WINDOW_SECONDS:
+        return jsonify({"success": False, "error": f"window は {' / '.join(WINDOW_SECONDS)} のいずれかです"}), 400
+    group_by = [name.strip() for name in request.args.get('group_by', '').split(',') if name.strip()]
+    unknown = [name for name in group_by if name not in ROLLUP_FIELDS]
+    if unknown:
+        return jsonify({"success": False, "error": f"不明な集計項目です: {', '.join(unknown)}"}), 400
+
+    try:
+        rollups = get_usage_ledger().rollups(
+            window=window,
+            group_by=group_by or None,
+            since=request.args.get('since', type=float),
+        )
+        return jsonify({"success": True, "window": window, "rollups": rollups})
+    except Exception as e:
+        logger.exception(f"❌ 利用量の集計中にエラーが発生: {str(e)}")
+        return jsonify({"success": False, "error": f"利用量の集計中にエラーが発生しました: {str(e)}"}), 500
+
+
+@usage_bp.route('/api/routing')
+def get_routing_stats():
+    """モデルごとの成功率・p95レイテンシと直近のルーティング判断を返すAPI"""
+    try:
+        return jsonify({"success": True, **get_model_router().stats()})
+    except Exception as e:
+        logger.exception(f"❌ ルーティング情報の取得中にエラーが発生: {str(e)}")
+        return jsonify({"success": False, "error": f"ルーティング情報の取得中にエラーが発生しました: {str(e)}"}), 500
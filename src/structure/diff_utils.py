@@ -1,6 +1,19 @@
-import json
 from typing import Any, Dict, List
 
+from src.common import json_codec
+
+from src.structure.fingerprint import module_hash
+
+def _modules_by_name(modules: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """モジュールを名前で辞書化する（2つ目以降の同じ名前は "<名前>#<位置>" にする）"""
+    result: Dict[str, Dict[str, Any]] = {}
+    for index, module in enumerate(modules):
+        module_name = module.get("name") or module.get("title") or str(module)
+        if module_name in result:
+            module_name = f"{module_name}#{index}"
+        result[module_name] = module
+    return result
+
 def generate_module_diff(before_modules: List[Dict[str, Any]], after_modules: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
     """
     名前ベースで差分を抽出し、追加・削除・変更を分類
@@ -13,19 +26,9 @@ def generate_module_diff(before_modules: List[Dict[str, Any]], after_modules: Li
         Dict containing 'added', 'removed', 'changed' module lists
     """
     try:
-        # モジュールを名前で辞書化
-        before_dict = {}
-        after_dict = {}
-        
-        # before_modulesの処理
-        for module in before_modules:
-            module_name = module.get("name") or module.get("title") or str(module)
-            before_dict[module_name] = module
-        
-        # after_modulesの処理
-        for module in after_modules:
-            module_name = module.get("name") or module.get("title") or str(module)
-            after_dict[module_name] = module
+        # モジュールを名前で辞書化（同じ名前が重複する場合は位置で区別する）
+        before_dict = _modules_by_name(before_modules)
+        after_dict = _modules_by_name(after_modules)
         
         # 差分の計算
         added = []
@@ -48,8 +51,8 @@ def generate_module_diff(before_modules: List[Dict[str, Any]], after_modules: Li
                 before_module = before_dict[name]
                 after_module = after_dict[name]
                 
-                # モジュールの内容を比較
-                if json.dumps(before_module, sort_keys=True) != json.dumps(after_module, sort_keys=True):
+                # モジュールの内容をフィンガープリントで比較
+                if module_hash(before_module) != module_hash(after_module):
                     changed.append({
                         "name": name,
                         "before": before_module,
@@ -114,14 +117,14 @@ def generate_diff_html(before_content: Dict[str, Any], after_content: Dict[str,
             html_parts.append('<div class="diff-section"><h4>➕ 追加された項目:</h4>')
             for path in diff['dictionary_item_added']:
                 value = get_nested_value(after_content, path)
-                html_parts.append(f'<div class="diff-item"><span class="diff-path">{path}</span>: <span class="diff-added">{json.dumps(value, ensure_ascii=False)}</span></div>')
+                html_parts.append(f'<div class="diff-item"><span class="diff-path">{path}</span>: <span class="diff-added">{json_codec.dumps(value)}</span></div>')
             html_parts.append('</div>')
         # 削除
         if 'dictionary_item_removed' in diff:
             html_parts.append('<div class="diff-section"><h4>➖ 削除された項目:</h4>')
             for path in diff['dictionary_item_removed']:
                 value = get_nested_value(before_content, path)
-                html_parts.append(f'<div class="diff-item"><span class="diff-path">{path}</span>: <span class="diff-removed">{json.dumps(value, ensure_ascii=False)}</span></div>')
+                html_parts.append(f'<div class="diff-item"><span class="diff-path">{path}</span>: <span class="diff-removed">{json_codec.dumps(value)}</span></div>')
             html_parts.append('</div>')
         # 変更
         if 'values_changed' in diff:
@@ -132,8 +135,8 @@ def generate_diff_html(before_content: Dict[str, Any], after_content: Dict[str,
                 html_parts.append(f'''
                     <div class="diff-item">
                         <span class="diff-path">{path}</span>:<br>
-                        <span class="diff-removed">旧: {json.dumps(old_value, ensure_ascii=False)}</span><br>
-                        <span class="diff-added">新: {json.dumps(new_value, ensure_ascii=False)}</span>
+                        <span class="diff-removed">旧: {json_codec.dumps(old_value)}</span><br>
+                        <span class="diff-added">新: {json_codec.dumps(new_value)}</span>
                     </div>
                 ''')
             html_parts.append('</div>')
@@ -154,8 +157,8 @@ def get_nested_value(data, path):
         return None
 
 def generate_simple_diff_html(before_content, after_content):
-    before_str = json.dumps(before_content, ensure_ascii=False, indent=2)
-    after_str = json.dumps(after_content, ensure_ascii=False, indent=2)
+    before_str = json_codec.dumps(before_content, indent=2)
+    after_str = json_codec.dumps(after_content, indent=2)
     if before_str == after_str:
         return '<span class="no-changes">変更なし</span>'
     return f'''
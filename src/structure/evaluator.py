@@ -4,17 +4,20 @@
 このモジュールは、構造データの評価機能を提供します。
 """
 
-import json
 import logging
 from typing import Dict, Any, Optional, List, cast, Union, TYPE_CHECKING
 from src.llm.controller import AIController
 from src.llm.providers.base import ChatMessage
 from src.llm.prompts import prompt_manager, PromptManager
 from src.exceptions import AIProviderError, APIRequestError, ResponseFormatError, EvaluationError
+from src.common import json_codec
 from src.common.types import EvaluationResult, StructureDict
 from src.utils.files import extract_json_part
 from src.llm.hub import call_model
 from src.structure.history_manager import save_structure_history
+from src.structure.fingerprint import hash_value, update_fingerprints, get_cached_evaluation, store_cached_evaluation, without_fingerprint_data
+from src.common.tracing import traced
+from src.common.model_routing import get_model_router
 if TYPE_CHECKING:
     from src.llm.evaluators.claude_evaluator import ClaudeEvaluator
 
@@ -25,13 +28,8 @@ def get_prompt_manager() -> PromptManager:
     return prompt_manager
 
 def get_model_for_provider(provider: str) -> str:
-    """プロバイダーに対応するモデル名を取得"""
-    models = {
-        "claude": "claude-3-opus-20240229",
-        "gemini": "gemini-pro",
-        "chatgpt": "gpt-4"
-    }
-    return models.get(provider, "claude-3-opus-20240229")
+    """プロバイダーに対応する評価用のモデル名を取得（evaluate タスクのルーティングポリシーで決まる）"""
+    return get_model_router().model_for("evaluate", provider)
 
 def validate_evaluation_result(result_dict: Dict[str, Any]) -> EvaluationResult:
     """
@@ -104,7 +102,7 @@ def evaluate_structure(structure: Dict[str, Any]) -> EvaluationResult:
             }
         
         # 評価結果の抽出
-        result = extract_json_part(response.get("content", ""))
+        result = extract_json_part(response.get("content", ""), provider=response.get("provider", "unknown"))
         if not result:
             return {
                 "score": 0.0,
@@ -140,16 +138,25 @@ def evaluate_structure(structure: Dict[str, Any]) -> EvaluationResult:
             "is_valid": False
         }
 
+def _evaluation_cache_key(provider: str, content_hash: str) -> str:
+    """評価キャッシュのキーを生成（プロバイダーごとに分離）"""
+    return f"{provider}:{content_hash}"
+
+@traced("evaluation.evaluate_structure_with")
 def evaluate_structure_with(
     structure: Dict[str, Any],
     provider: str = "claude",
-    prompt_manager: Optional[Any] = None
+    prompt_manager: Optional[Any] = None,
+    use_cache: bool = True
 ) -> Any:
     """
     構成（単一カードまたは複数カード）をAIで評価し、全体およびカード単位の評価結果を返す
+
+    内容ハッシュが前回評価時から変わっていないカード・構成はLLMに送信せず、
+    structure["module_evaluations"]にキャッシュされた評価結果を再利用する。
     """
     logger = logging.getLogger(__name__)
-    pm = prompt_manager
+    pm = prompt_manager or get_prompt_manager()
 
     # 構成が複数カード（list）か単一カード（dict）かを判定
     content = structure.get("content")
@@ -193,18 +200,27 @@ def evaluate_structure_with(
                 all_valid = False
                 feedbacks.append(format_message)
                 continue
-            # Claude等で評価
-            prompt = pm.get_prompt(provider, "structure_evaluation")
-            formatted_prompt = prompt.format(structure=card)
-            from src.llm import call_model as llm_call_model
-            response = llm_call_model(
-                model=get_model_for_provider(provider),
-                messages=[{"role": "user", "content": formatted_prompt}],
-                temperature=0.3,
-                max_tokens=1000,
-                provider=provider
-            )
-            evaluation_data = extract_json_part(response.get("content", ""))
+            # 前回評価時から変更のないカードはキャッシュを再利用
+            cache_key = _evaluation_cache_key(provider, hash_value(card))
+            cached = get_cached_evaluation(structure, cache_key) if use_cache else None
+            if cached:
+                logger.info(f"♻️ カード{idx}は未変更のためキャッシュ済み評価を再利用します")
+                evaluation_data = cached
+            else:
+                # Claude等で評価
+                prompt = pm.get_prompt(provider, "structure_evaluation")
+                layout = prompt.layout(structure=json_codec.dumps(card, indent=2, default=str))
+                from src.llm import call_model as llm_call_model
+                response = llm_call_model(
+                    model=get_model_for_provider(provider),
+                    messages=layout.to_messages(),
+                    temperature=0.3,
+                    max_tokens=1000,
+                    provider=provider
+                )
+                evaluation_data = extract_json_part(response.get("content", ""), provider=provider)
+                if "score" in evaluation_data and "error" not in evaluation_data:
+                    store_cached_evaluation(structure, cache_key, evaluation_data)
             score = float(evaluation_data.get("score", 0.0))
             is_valid = bool(evaluation_data.get("is_valid", False))
             feedback = str(evaluation_data.get("feedback", ""))
@@ -252,18 +268,30 @@ def evaluate_structure_with(
                 details=format_details,
                 is_valid=False
             )
-        # Claude等で評価
-        prompt = pm.get_prompt(provider, "structure_evaluation")
-        formatted_prompt = prompt.format(structure=structure)
-        from src.llm import call_model as llm_call_model
-        response = llm_call_model(
-            model=get_model_for_provider(provider),
-            messages=[{"role": "user", "content": formatted_prompt}],
-            temperature=0.3,
-            max_tokens=1000,
-            provider=provider
-        )
-        evaluation_data = extract_json_part(response.get("content", ""))
+        # 構成内容（title, description, content, modules）のハッシュが前回評価時と同じならキャッシュを再利用
+        fields = update_fingerprints(structure)["fields"]
+        content_hash = hash_value([fields.get(key) for key in ("title", "description", "content", "modules")])
+        cache_key = _evaluation_cache_key(provider, content_hash)
+        cached = get_cached_evaluation(structure, cache_key) if use_cache else None
+        if cached:
+            logger.info("♻️ 構成は前回評価時から変更がないため、キャッシュ済み評価を再利用します")
+            evaluation_data = cached
+        else:
+            # Claude等で評価
+            # 評価の指示を固定のプレフィックス、構成をサフィックスにしてプロンプトキャッシュを効かせる
+            prompt = pm.get_prompt(provider, "structure_evaluation")
+            layout = prompt.layout(structure=json_codec.dumps(without_fingerprint_data(structure), indent=2, default=str))
+            from src.llm import call_model as llm_call_model
+            response = llm_call_model(
+                model=get_model_for_provider(provider),
+                messages=layout.to_messages(),
+                temperature=0.3,
+                max_tokens=1000,
+                provider=provider
+            )
+            evaluation_data = extract_json_part(response.get("content", ""), provider=provider)
+            if "score" in evaluation_data and "error" not in evaluation_data:
+                store_cached_evaluation(structure, cache_key, evaluation_data)
         score = float(evaluation_data.get("score", 0.0))
         is_valid = bool(evaluation_data.get("is_valid", False))
         feedback = str(evaluation_data.get("feedback", ""))
@@ -0,0 +1,366 @@
+"""
+構成一括進化ランナーモジュール
+
+このモジュールは、進化対象の構成を並列・プロバイダー別の同時実行数制限付きで処理し、
+チェックポイントによる再開、ドライランでの呼び出し数・トークン数の見積もり、
+候補ごとのレイテンシと結果のサマリーレポートを提供します。
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.structure.fingerprint import canonical_json, hash_value
+from src.common.llm_usage import usage_context
+from src.common.tracing import submit_in_context
+
+logger = logging.getLogger(__name__)
+
+# 自動採用（上書き）しきい値
+DEFAULT_ADOPT_THRESHOLD = 0.90
+
+# プロバイダーごとのデフォルト同時実行数
+DEFAULT_PROVIDER_LIMITS = {"chatgpt": 2, "claude": 2, "gemini": 2}
+
+# 見積もり用の定数（プロンプトの固定部分と評価応答のおおよそのトークン数）
+PROMPT_OVERHEAD_TOKENS = 200
+EVALUATION_COMPLETION_TOKENS = 300
+
+# チェックポイント上で完了扱いとするステータス
+COMPLETED_STATUSES = ("evolved", "adopted")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    テキストのおおよそのトークン数を見積もる（ASCIIは4文字で1トークン、それ以外は1文字1トークン）
+
+    Args:
+        text: 対象テキスト
+
+    Returns:
+        int: 見積もりトークン数
+    """
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars)
+
+
+@dataclass
+class CandidateResult:
+    """候補ごとの処理結果"""
+    id: str
+    status: str
+    latency: float = 0.0
+    intent_match: Optional[float] = None
+    new_id: Optional[str] = None
+    error: Optional[str] = None
+    fingerprint: Optional[str] = None
+    stage_latency: Dict[str, float] = field(default_factory=dict)
+    timestamp: str = field(default_factory=lambda: datetime.now().isoformat())
+
+
+class EvolutionCheckpoint:
+    """処理済み候補を記録するJSONLチェックポイント"""
+
+    def __init__(self, path: Optional[str]):
+        """
+        EvolutionCheckpointの初期化
+
+        Args:
+            path: チェックポイントファイルのパス（Noneの場合は記録しない）
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        if path and os.path.exists(path):
+            self._load()
+
+    def _load(self) -> None:
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"⚠️ チェックポイントの不正な行をスキップ: {line[:80]}")
+                    continue
+                self._entries[entry.get("id")] = entry
+
+    def is_done(self, candidate_id: str, fingerprint: str) -> bool:
+        """
+        候補が同じ内容で処理済みかどうかを判定する
+
+        Args:
+            candidate_id: 候補ID
+            fingerprint: 候補内容のハッシュ
+
+        Returns:
+            bool: 処理済みの場合True
+        """
+        entry = self._entries.get(candidate_id)
+        return bool(
+            entry
+            and entry.get("status") in COMPLETED_STATUSES
+            and entry.get("fingerprint") == fingerprint
+        )
+
+    def record(self, result: CandidateResult) -> None:
+        """
+        処理結果をチェックポイントに追記する
+
+        Args:
+            result: 候補の処理結果
+        """
+        entry = asdict(result)
+        with self._lock:
+            self._entries[result.id] = entry
+            if not self.path:
+                return
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+
+class BatchEvolutionRunner:
+    """構成の一括進化を並列実行するランナー"""
+
+    def __init__(
+        self,
+        improve: Callable[[Dict[str, Any]], Dict[str, Any]],
+        evaluate: Callable[[Dict[str, Any]], Dict[str, Any]],
+        save: Callable[[str, Dict[str, Any]], Any],
+        max_workers: int = 4,
+        provider_limits: Optional[Dict[str, int]] = None,
+        improve_provider: str = "chatgpt",
+        evaluate_provider: str = "claude",
+        checkpoint_path: Optional[str] = None,
+        adopt_threshold: float = DEFAULT_ADOPT_THRESHOLD
+    ):
+        """
+        BatchEvolutionRunnerの初期化
+
+        Args:
+            improve: 構成の改善案を生成する関数
+            evaluate: 改善案を評価し、intent_matchなどを含む辞書を返す関数
+            save: 構成を保存する関数
+            max_workers: 並列処理するワーカー数
+            provider_limits: プロバイダーごとの同時実行数の上限
+            improve_provider: 改善案生成に使うプロバイダー名
+            evaluate_provider: 評価に使うプロバイダー名
+            checkpoint_path: チェックポイントファイルのパス
+            adopt_threshold: 元構成への自動採用しきい値
+        """
+        self.improve = improve
+        self.evaluate = evaluate
+        self.save = save
+        self.max_workers = max(1, max_workers)
+        self.improve_provider = improve_provider
+        self.evaluate_provider = evaluate_provider
+        self.adopt_threshold = adopt_threshold
+        self.checkpoint = EvolutionCheckpoint(checkpoint_path)
+
+        limits = dict(DEFAULT_PROVIDER_LIMITS)
+        limits.update(provider_limits or {})
+        self._semaphores = {
+            name: threading.BoundedSemaphore(max(1, limit)) for name, limit in limits.items()
+        }
+
+    def _with_provider(self, provider: str, func: Callable[[Dict[str, Any]], Dict[str, Any]], payload: Dict[str, Any]) -> Dict[str, Any]:
+        """プロバイダーの同時実行数制限の範囲内で関数を実行する"""
+        semaphore = self._semaphores.get(provider)
+        if semaphore is None:
+            return func(payload)
+        with semaphore:
+            return func(payload)
+
+    def dry_run(self, candidates: List[Dict[str, Any]], resume: bool = True) -> Dict[str, Any]:
+        """
+        実際には呼び出さずに、LLM呼び出し数とトークン数を見積もる
+
+        Args:
+            candidates: 進化対象の候補
+            resume: チェックポイントで処理済みの候補を除外するかどうか
+
+        Returns:
+            Dict[str, Any]: 見積もり結果
+        """
+        estimates = []
+        skipped = 0
+        for candidate in candidates:
+            fingerprint = hash_value(candidate)
+            if resume and self.checkpoint.is_done(candidate.get("id", ""), fingerprint):
+                skipped += 1
+                continue
+            structure_tokens = estimate_tokens(canonical_json(candidate))
+            improve_tokens = {
+                "prompt": structure_tokens + PROMPT_OVERHEAD_TOKENS,
+                "completion": structure_tokens
+            }
+            evaluate_tokens = {
+                "prompt": structure_tokens + PROMPT_OVERHEAD_TOKENS,
+                "completion": EVALUATION_COMPLETION_TOKENS
+            }
+            estimates.append({
+                "id": candidate.get("id"),
+                "calls": {self.improve_provider: 1, self.evaluate_provider: 1},
+                "tokens": {self.improve_provider: improve_tokens, self.evaluate_provider: evaluate_tokens}
+            })
+
+        calls: Dict[str, int] = {}
+        tokens: Dict[str, Dict[str, int]] = {}
+        for estimate in estimates:
+            for provider, count in estimate["calls"].items():
+                calls[provider] = calls.get(provider, 0) + count
+            for provider, usage in estimate["tokens"].items():
+                total = tokens.setdefault(provider, {"prompt": 0, "completion": 0})
+                total["prompt"] += usage["prompt"]
+                total["completion"] += usage["completion"]
+
+        return {
+            "candidates": len(candidates),
+            "skipped": skipped,
+            "to_process": len(estimates),
+            "calls": calls,
+            "tokens": tokens,
+            "per_candidate": estimates
+        }
+
+    def _generate(self, candidate: Dict[str, Any], result: CandidateResult) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """改善案を生成して評価する（LLM呼び出しの利用量は候補の構成IDで記録される）"""
+        stage_started = time.perf_counter()
+        improved = self._with_provider(self.improve_provider, self.improve, candidate)
+        result.stage_latency["improve"] = round(time.perf_counter() - stage_started, 3)
+        if not isinstance(improved, dict) or not improved:
+            raise ValueError("改善案が空です")
+
+        stage_started = time.perf_counter()
+        evaluation = self._with_provider(self.evaluate_provider, self.evaluate, improved)
+        result.stage_latency["evaluate"] = round(time.perf_counter() - stage_started, 3)
+        return improved, evaluation
+
+    def _process(self, candidate: Dict[str, Any], fingerprint: str) -> CandidateResult:
+        """1つの候補を改善・評価・保存する"""
+        candidate_id = candidate["id"]
+        result = CandidateResult(id=candidate_id, status="failed", fingerprint=fingerprint)
+        started = time.perf_counter()
+        try:
+            with usage_context(structure_id=candidate_id):
+                improved, evaluation = self._generate(candidate, result)
+
+            improved = dict(improved)
+            improved["source"] = "evolved"
+            improved.update(evaluation or {})
+            new_id = f"{candidate_id}_evolved"
+            improved["id"] = new_id
+
+            # 改善案は評価結果を反映した状態で1回だけ保存する
+            stage_started = time.perf_counter()
+            self.save(new_id, improved)
+            result.new_id = new_id
+            result.status = "evolved"
+
+            intent_match = improved.get("intent_match", 0) or 0
+            result.intent_match = float(intent_match)
+            if result.intent_match >= self.adopt_threshold:
+                adopted = dict(improved)
+                adopted["id"] = candidate_id
+                self.save(candidate_id, adopted)
+                result.status = "adopted"
+                logger.info(f"🔄 {candidate_id} を自動採用（元構成を上書き）しました")
+            result.stage_latency["save"] = round(time.perf_counter() - stage_started, 3)
+        except Exception as e:
+            result.error = str(e)
+            logger.error(f"❌ 処理失敗: {candidate_id} → {str(e)}")
+        finally:
+            result.latency = round(time.perf_counter() - started, 3)
+        return result
+
+    def run(self, candidates: List[Dict[str, Any]], resume: bool = True) -> Dict[str, Any]:
+        """
+        候補を並列に処理し、サマリーレポートを返す
+
+        Args:
+            candidates: 進化対象の候補
+            resume: チェックポイントで処理済みの候補をスキップするかどうか
+
+        Returns:
+            Dict[str, Any]: サマリーレポート
+        """
+        started = time.perf_counter()
+        results: List[CandidateResult] = []
+        pending = []
+        for candidate in candidates:
+            candidate_id = candidate.get("id")
+            if not candidate_id:
+                logger.warning("⚠️ IDのない候補をスキップします")
+                continue
+            fingerprint = hash_value(candidate)
+            if resume and self.checkpoint.is_done(candidate_id, fingerprint):
+                results.append(CandidateResult(id=candidate_id, status="skipped", fingerprint=fingerprint))
+                continue
+            pending.append((candidate, fingerprint))
+
+        logger.info(f"▶ 一括進化開始 - 対象: {len(pending)}件, スキップ: {len(results)}件, ワーカー数: {self.max_workers}")
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [submit_in_context(executor, self._process, candidate, fingerprint) for candidate, fingerprint in pending]
+            for future in as_completed(futures):
+                result = future.result()
+                self.checkpoint.record(result)
+                results.append(result)
+                logger.info(f"[{result.status}] {result.id} ({result.latency:.2f}s)")
+
+        return build_summary(results, time.perf_counter() - started)
+
+
+def build_summary(results: List[CandidateResult], elapsed: float) -> Dict[str, Any]:
+    """
+    候補ごとの結果からサマリーレポートを作成する
+
+    Args:
+        results: 候補ごとの処理結果
+        elapsed: 全体の経過時間（秒）
+
+    Returns:
+        Dict[str, Any]: サマリーレポート
+    """
+    counts: Dict[str, int] = {}
+    for result in results:
+        counts[result.status] = counts.get(result.status, 0) + 1
+
+    latencies = sorted(result.latency for result in results if result.status not in ("skipped",))
+    latency_summary: Dict[str, float] = {}
+    if latencies:
+        latency_summary = {
+            "min": latencies[0],
+            "max": latencies[-1],
+            "mean": round(sum(latencies) / len(latencies), 3),
+            "p50": latencies[int(0.5 * (len(latencies) - 1))],
+            "p95": latencies[int(0.95 * (len(latencies) - 1))]
+        }
+
+    return {
+        "generated_at": datetime.now().isoformat(),
+        "elapsed": round(elapsed, 3),
+        "total": len(results),
+        "counts": counts,
+        "latency": latency_summary,
+        "candidates": [asdict(result) for result in sorted(results, key=lambda r: r.id)]
+    }
+
+
+__all__ = [
+    "BatchEvolutionRunner",
+    "CandidateResult",
+    "EvolutionCheckpoint",
+    "build_summary",
+    "estimate_tokens",
+    "DEFAULT_ADOPT_THRESHOLD",
+    "DEFAULT_PROVIDER_LIMITS",
+]
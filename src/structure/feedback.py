@@ -6,12 +6,13 @@ import logging
 from typing import Dict, Any, List, Optional
 from src.types import EvaluationResult
 from src.structure.evaluator import evaluate_structure_with
-from src.llm.providers.claude import call_claude_evaluation, call_claude_api
+from src.llm.providers.claude import call_claude_evaluation
 from src.llm.providers.gemini import call_gemini_api
-from src.llm.providers.chatgpt import call_chatgpt_api
+from src.llm.controller import controller
 import difflib
 import html
 import json
+from src.common import json_codec
 from src.structure.history_manager import save_structure_history
 
 logger = logging.getLogger(__name__)
@@ -100,7 +101,7 @@ def analyze_structure_and_suggest(structure: Dict[str, Any]) -> Dict[str, Any]:
 3. 改善提案（具体的な提案をリスト形式で）
 
 構成データ：
-{json.dumps(structure, ensure_ascii=False, indent=2)}
+{json_codec.dumps(structure, indent=2)}
 
 以下のJSON形式で返してください：
 {{
@@ -179,7 +180,7 @@ def call_gemini_ui_generator(structure: Dict[str, Any]) -> str:
 4. インタラクションの提案
 
 構成データ：
-{json.dumps(structure, ensure_ascii=False, indent=2)}
+{json_codec.dumps(structure, indent=2)}
 
 提案は具体的で実装可能な形で記述してください。"""
             }
@@ -256,7 +257,7 @@ def get_diff_highlighted(new_text: str, old_text: str) -> str:
 
 def call_claude(structure: Dict[str, Any]) -> str:
     """
-    Claudeを使って構成を整形する基本関数
+    Claudeを使って構成を整形する基本関数（モデルは complete タスクのルーティングポリシーで決まる）
     
     Args:
         structure (Dict[str, Any]): 整形対象の構成データ
@@ -265,9 +266,14 @@ def call_claude(structure: Dict[str, Any]) -> str:
         str: 整形された構成データ
              エラー時は空文字列を返す
     """
-    prompt = f"次の構成を改善・整形してください：\n{json.dumps(structure, ensure_ascii=False)}"
+    prompt = f"次の構成を改善・整形してください：\n{json_codec.dumps(structure)}"
     try:
-        result = call_claude_api(prompt, model="claude-3-opus-20240229", temperature=0.2)
+        result = controller.route(
+            "complete",
+            [{"role": "user", "content": prompt}],
+            providers=("claude",),
+            temperature=0.2
+        )
         return result or ""
     except Exception as e:
         logger.warning(f"[call_claude] Claude呼び出しエラー: {e}")
@@ -292,7 +298,12 @@ def call_claude_and_gpt(structure: Dict[str, Any]) -> Dict[str, str]:
     # Claude結果をChatGPTに再評価させるなどの連携が想定される
     try:
         prompt = f"次のClaude出力をもとに、構成として完成させてください：\n{claude_result}"
-        gpt_result = call_chatgpt_api(prompt, model="gpt-4", temperature=0.2)
+        gpt_result = controller.route(
+            "generate",
+            [{"role": "user", "content": prompt}],
+            providers=("chatgpt",),
+            temperature=0.2
+        )
         return {"claude": claude_result, "gpt": gpt_result or ""}
     except Exception as e:
         logger.warning(f"[call_claude_and_gpt] GPT呼び出しエラー: {e}")
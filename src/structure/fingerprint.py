@@ -0,0 +1,354 @@
+"""
+構成フィンガープリントモジュール
+
+このモジュールは、構成・モジュール・セクション単位のコンテンツハッシュ（Merkle木）を
+計算・保持し、変更検出と評価結果の再利用を行う機能を提供します。
+"""
+
+import hashlib
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from src.common import json_codec
+
+logger = logging.getLogger(__name__)
+
+# ルートハッシュの対象となるトップレベルフィールド
+# messages / evaluations / completions などの揮発的なフィールドは含めない
+FINGERPRINT_FIELDS = ("title", "description", "content", "modules")
+
+# 構成に保存されるフィンガープリントのキー
+FINGERPRINT_KEY = "fingerprints"
+
+# モジュール単位の評価キャッシュのキー
+EVALUATION_CACHE_KEY = "module_evaluations"
+
+# 評価キャッシュに保持する最大件数
+MAX_EVALUATION_CACHE_ENTRIES = 256
+
+
+def canonical_json(value: Any) -> str:
+    """
+    ハッシュ計算用の正規化JSON文字列を生成する
+
+    Args:
+        value: 対象の値
+
+    Returns:
+        str: キーをソートした区切り文字なしのJSON文字列
+    """
+    return json_codec.dumps(value, sort_keys=True, separators=json_codec.COMPACT_SEPARATORS, default=str)
+
+
+def hash_value(value: Any) -> str:
+    """
+    値のコンテンツハッシュ（sha256）を計算する
+
+    Args:
+        value: 対象の値
+
+    Returns:
+        str: 16進数のハッシュ文字列
+    """
+    return hashlib.sha256(canonical_json(value).encode("utf-8")).hexdigest()
+
+
+def _combine(parts: Iterable[str]) -> str:
+    """子ノードのハッシュを結合して親ノードのハッシュを計算する"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def get_module_key(module: Any, index: int) -> str:
+    """
+    モジュールの識別キーを取得する（generate_module_diffと同じ名前ベース）
+
+    Args:
+        module: モジュールデータ
+        index: リスト内の位置
+
+    Returns:
+        str: モジュールキー
+    """
+    if isinstance(module, dict):
+        key = module.get("name") or module.get("title") or module.get("id")
+        if key:
+            return str(key)
+    return f"#{index}"
+
+
+def iter_modules(modules: Any) -> List[Tuple[str, Any]]:
+    """
+    辞書形式・リスト形式どちらのモジュール定義も(キー, モジュール)のリストに変換する
+
+    リスト形式で名前が重複する場合、2つ目以降のキーは "<名前>#<位置>" になる。
+
+    Args:
+        modules: structure["modules"] などのモジュール定義
+
+    Returns:
+        List[Tuple[str, Any]]: (キー, モジュール)のリスト
+    """
+    if isinstance(modules, dict):
+        return [(str(key), value) for key, value in modules.items()]
+    if not isinstance(modules, list):
+        return []
+    items: List[Tuple[str, Any]] = []
+    seen = set()
+    for index, module in enumerate(modules):
+        key = get_module_key(module, index)
+        if key in seen:
+            # 同じ名前のモジュール・セクションはハッシュが上書きされないよう位置で区別する
+            key = f"{key}#{index}"
+        seen.add(key)
+        items.append((key, module))
+    return items
+
+
+def get_structure_modules(structure: Dict[str, Any]) -> Any:
+    """
+    構成からモジュール定義を取得する（structure["modules"]を優先し、なければcontent["modules"]）
+
+    Args:
+        structure: 構成データ
+
+    Returns:
+        Any: モジュール定義（存在しない場合はNone）
+    """
+    modules = structure.get("modules")
+    if modules:
+        return modules
+    content = structure.get("content")
+    if isinstance(content, dict):
+        return content.get("modules")
+    return None
+
+
+def compute_module_fingerprint(module: Any) -> Dict[str, Any]:
+    """
+    モジュールのフィンガープリント（セクションハッシュと合成ハッシュ）を計算する
+
+    Args:
+        module: モジュールデータ
+
+    Returns:
+        Dict[str, Any]: {"hash": str, "sections": {セクションキー: ハッシュ}}
+    """
+    if not isinstance(module, dict):
+        return {"hash": hash_value(module), "sections": {}}
+
+    sections = {key: hash_value(section) for key, section in iter_modules(module.get("sections"))}
+    own_fields = {key: value for key, value in module.items() if key != "sections"}
+    parts = [hash_value(own_fields)] + [f"{key}:{value}" for key, value in sections.items()]
+    return {"hash": _combine(parts), "sections": sections}
+
+
+def module_hash(module: Any) -> str:
+    """
+    モジュールの合成ハッシュを取得する
+
+    Args:
+        module: モジュールデータ
+
+    Returns:
+        str: モジュールハッシュ
+    """
+    return compute_module_fingerprint(module)["hash"]
+
+
+def _split_path(path: str) -> List[str]:
+    return [part for part in str(path).split("/") if part]
+
+
+def update_fingerprints(
+    structure: Dict[str, Any],
+    changed_paths: Optional[Iterable[str]] = None
+) -> Dict[str, Any]:
+    """
+    構成のフィンガープリントを更新し、structure["fingerprints"]に保存する
+
+    changed_pathsが指定された場合は、保存済みのフィンガープリントを再利用し、
+    指定されたパス（例: "title", "modules", "modules/<key>", "modules/<key>/sections/<key>"）
+    に沿ったノードのみを再計算する。未指定の場合は全体を再計算する。
+
+    Args:
+        structure: 構成データ
+        changed_paths: 変更されたパスのリスト
+
+    Returns:
+        Dict[str, Any]: 更新後のフィンガープリント
+    """
+    previous = structure.get(FINGERPRINT_KEY)
+    if changed_paths is None or not isinstance(previous, dict):
+        dirty_fields = set(FINGERPRINT_FIELDS)
+        dirty_modules: Optional[set] = None
+    else:
+        dirty_fields = set()
+        dirty_modules = set()
+        for path in changed_paths:
+            parts = _split_path(path)
+            if not parts:
+                continue
+            dirty_fields.add(parts[0])
+            if parts[0] == "modules" and len(parts) >= 2 and dirty_modules is not None:
+                dirty_modules.add(parts[1])
+            elif parts[0] in ("modules", "content"):
+                # モジュール全体の置き換え、またはcontent経由のモジュール変更
+                dirty_modules = None
+        if "content" in dirty_fields and not structure.get("modules"):
+            dirty_fields.add("modules")
+            dirty_modules = None
+
+    previous_fields = previous.get("fields", {}) if isinstance(previous, dict) else {}
+    previous_modules = previous.get("modules", {}) if isinstance(previous, dict) else {}
+
+    fields: Dict[str, str] = {}
+    for field in FINGERPRINT_FIELDS:
+        if field == "modules":
+            continue
+        if field in dirty_fields or field not in previous_fields:
+            if field in structure:
+                fields[field] = hash_value(structure.get(field))
+        else:
+            fields[field] = previous_fields[field]
+
+    modules: Dict[str, Dict[str, Any]] = {}
+    for key, module in iter_modules(get_structure_modules(structure)):
+        reusable = (
+            "modules" not in dirty_fields
+            or (dirty_modules is not None and key not in dirty_modules)
+        )
+        if reusable and key in previous_modules:
+            modules[key] = previous_modules[key]
+        else:
+            modules[key] = compute_module_fingerprint(module)
+
+    fields["modules"] = _combine(f"{key}:{value['hash']}" for key, value in modules.items())
+    root = _combine(f"{key}:{fields[key]}" for key in sorted(fields))
+
+    fingerprints = {"root": root, "fields": fields, "modules": modules}
+    structure[FINGERPRINT_KEY] = fingerprints
+    return fingerprints
+
+
+def get_fingerprints(structure: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    保存済みのフィンガープリントを取得する（未計算の場合は計算する）
+
+    Args:
+        structure: 構成データ
+
+    Returns:
+        Dict[str, Any]: フィンガープリント
+    """
+    fingerprints = structure.get(FINGERPRINT_KEY)
+    if isinstance(fingerprints, dict) and "root" in fingerprints:
+        return fingerprints
+    return update_fingerprints(structure)
+
+
+def diff_fingerprints(before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """
+    2つのフィンガープリントを比較し、モジュール単位の変更を分類する
+
+    Args:
+        before: 変更前のフィンガープリント
+        after: 変更後のフィンガープリント
+
+    Returns:
+        Dict[str, List[str]]: added / removed / changed / unchanged のモジュールキー
+    """
+    before_modules = (before or {}).get("modules", {})
+    after_modules = (after or {}).get("modules", {})
+    result: Dict[str, List[str]] = {"added": [], "removed": [], "changed": [], "unchanged": []}
+
+    for key, value in after_modules.items():
+        if key not in before_modules:
+            result["added"].append(key)
+        elif before_modules[key].get("hash") != value.get("hash"):
+            result["changed"].append(key)
+        else:
+            result["unchanged"].append(key)
+    for key in before_modules:
+        if key not in after_modules:
+            result["removed"].append(key)
+    return result
+
+
+def without_fingerprint_data(structure: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    フィンガープリントと評価キャッシュを除いた構成のコピーを返す（プロンプト埋め込み用）
+
+    Args:
+        structure: 構成データ
+
+    Returns:
+        Dict[str, Any]: 浅いコピー
+    """
+    return {key: value for key, value in structure.items() if key not in (FINGERPRINT_KEY, EVALUATION_CACHE_KEY)}
+
+
+def get_cached_evaluation(structure: Dict[str, Any], content_hash: str) -> Optional[Dict[str, Any]]:
+    """
+    コンテンツハッシュに対応するキャッシュ済みの評価結果を取得する
+
+    Args:
+        structure: 構成データ
+        content_hash: 評価対象（モジュール・カード・構成）のハッシュ
+
+    Returns:
+        Optional[Dict[str, Any]]: キャッシュ済みの評価結果（存在しない場合はNone）
+    """
+    cache = structure.get(EVALUATION_CACHE_KEY)
+    if not isinstance(cache, dict):
+        return None
+    cached = cache.get(content_hash)
+    return dict(cached) if isinstance(cached, dict) else None
+
+
+def store_cached_evaluation(structure: Dict[str, Any], content_hash: str, result: Dict[str, Any]) -> None:
+    """
+    評価結果をコンテンツハッシュに紐付けて構成に保存する
+
+    Args:
+        structure: 構成データ
+        content_hash: 評価対象のハッシュ
+        result: 評価結果（score, feedback, details, is_valid）
+    """
+    cache = structure.get(EVALUATION_CACHE_KEY)
+    if not isinstance(cache, dict):
+        cache = {}
+    cache.pop(content_hash, None)
+    cache[content_hash] = {
+        "score": result.get("score", 0.0),
+        "feedback": result.get("feedback", ""),
+        "details": result.get("details", {}),
+        "is_valid": result.get("is_valid", False),
+    }
+    # 古いエントリから削除して上限を保つ（挿入順を利用）
+    while len(cache) > MAX_EVALUATION_CACHE_ENTRIES:
+        cache.pop(next(iter(cache)))
+    structure[EVALUATION_CACHE_KEY] = cache
+
+
+__all__ = [
+    "FINGERPRINT_FIELDS",
+    "FINGERPRINT_KEY",
+    "EVALUATION_CACHE_KEY",
+    "canonical_json",
+    "hash_value",
+    "get_module_key",
+    "iter_modules",
+    "get_structure_modules",
+    "compute_module_fingerprint",
+    "module_hash",
+    "update_fingerprints",
+    "get_fingerprints",
+    "diff_fingerprints",
+    "without_fingerprint_data",
+    "get_cached_evaluation",
+    "store_cached_evaluation",
+]
@@ -0,0 +1,451 @@
+"""
+構成生成の類似リクエストキャッシュモジュール
+
+新規構成の最初の要望（send_message の構成生成）について、正規化した入力を
+文字n-gramのハッシュベクトルにしてインデックスし、過去に生成した構成のうち
+コサイン類似度が閾値以上のものを再利用します。空白・句読点の違いや文の並べ替えは
+同じ要望として扱われます。
+
+エントリはデータディレクトリ直下の JSON Lines ファイルに追記され、再起動後も再利用されます。
+ファイルの書き換え（追い出したエントリの削除）はファイルロックを取ってから読み直して行うため、
+複数のワーカープロセスが同じファイルに追記していても他のワーカーのエントリは失われません。
+エントリは共有キャッシュ（src.common.shared_cache）にも保存し、別のワーカーが保存した要望と
+正規化後に一致する要望は、そのワーカーの再起動を待たずに再利用します。共有キャッシュのエントリは
+GENERATION_CACHE_SCOPE のリビジョンをキーに含み、ファイルの書き換えでリビジョンを進めるため、
+追い出されたエントリは他のワーカーでも読まれなくなります（保持中のエントリは新しいリビジョンで保存し直します）。
+"""
+
+import contextlib
+import copy
+import hashlib
+import logging
+import math
+import os
+import threading
+import unicodedata
+import zlib
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from src.common import json_codec
+from src.common.shared_cache import TieredCache, get_tiered_cache
+
+try:
+    import fcntl
+except ImportError:  # Windowsではプロセス間のロックを取らない（プロセス内のロックのみ）
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# キャッシュファイル名（データディレクトリ直下。load_structures は .json のみを読む）
+CACHE_FILENAME = ".generation_cache.jsonl"
+
+# 再利用する類似度の既定の閾値（環境変数 AIDEX_GENERATION_CACHE_THRESHOLD で変更できる）
+DEFAULT_THRESHOLD = 0.9
+
+# 保持するエントリの上限
+MAX_ENTRIES = 500
+
+# エントリを保存する共有キャッシュの名前空間と、そのローカル層の上限
+GENERATION_CACHE_NAMESPACE = "generation_cache"
+MAX_SHARED_LOCAL_ENTRIES = 64
+
+# 共有キャッシュのエントリを無効化するスコープ（ファイルの書き換えのたびにリビジョンを進める）
+GENERATION_CACHE_SCOPE = "generation_cache:entries"
+
+# ハッシュベクトルの次元数と使う文字n-gram
+VECTOR_DIMENSIONS = 1 << 18
+NGRAM_SIZES = (2, 3)
+
+# 生成結果として保存・再利用する構成のフィールド
+CACHED_FIELDS = (
+    "title", "description", "modules", "evaluations", "evaluation",
+    "claude_evaluation", "gemini_output", "completions",
+)
+
+
+@contextlib.contextmanager
+def _file_lock(path: str) -> Iterator[None]:
+    """
+    ファイルの書き込みをプロセス間で排他する（"<path>.lock" をロックファイルにする）
+
+    Args:
+        path: 排他するファイルのパス
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(f"{path}.lock", "a") as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def normalize_request(text: str) -> str:
+    """
+    要望テキストを正規化する（NFKC・小文字化・空白/句読点/記号の除去）
+
+    Args:
+        text: 要望テキスト
+
+    Returns:
+        str: 正規化したテキスト
+    """
+    normalized = unicodedata.normalize("NFKC", text or "").lower()
+    return "".join(
+        char for char in normalized
+        if not unicodedata.category(char).startswith(("P", "Z", "S", "C"))
+    )
+
+
+def vectorize(normalized: str) -> Dict[int, float]:
+    """
+    正規化したテキストを文字n-gramのハッシュベクトル（L2正規化済み）にする
+
+    語順に依存しない n-gram の出現数なので、文の並べ替えでは類似度がほとんど下がらない。
+
+    Args:
+        normalized: normalize_request() の結果
+
+    Returns:
+        Dict[int, float]: 次元 → 重み
+    """
+    counts: Counter = Counter()
+    for size in NGRAM_SIZES:
+        for i in range(len(normalized) - size + 1):
+            counts[zlib.crc32(normalized[i:i + size].encode("utf-8")) % VECTOR_DIMENSIONS] += 1
+    if not counts and normalized:
+        counts[zlib.crc32(normalized.encode("utf-8")) % VECTOR_DIMENSIONS] = 1
+    norm = math.sqrt(sum(value * value for value in counts.values()))
+    return {dimension: value / norm for dimension, value in counts.items()} if norm else {}
+
+
+def _entry_key(normalized: str) -> str:
+    """正規化した要望からエントリのキーを作る"""
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+class GenerationCache:
+    """
+    類似リクエストの生成結果キャッシュ
+
+    ベクトルの次元ごとの転置リストで、共通するn-gramを持つエントリとの内積だけを計算する。
+    """
+
+    def __init__(self, path: Optional[str] = None, threshold: float = DEFAULT_THRESHOLD,
+                 max_entries: int = MAX_ENTRIES, shared: Optional[TieredCache] = None):
+        """
+        Args:
+            path: JSON Lines ファイルのパス（Noneの場合はメモリのみ）
+            threshold: 再利用するコサイン類似度の閾値
+            max_entries: 保持するエントリの上限
+            shared: 他のワーカーとエントリを共有するキャッシュ（キーは正規化した要望のハッシュ）
+        """
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.shared = shared
+        self._lock = threading.RLock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._vectors: Dict[str, Dict[int, float]] = {}
+        self._postings: Dict[int, set] = {}
+        self._exact: Dict[str, str] = {}
+        self._lines = 0
+        self._stats = Counter()
+        if path:
+            self._load()
+
+    # ------------------------------------------------------------------
+    # 永続化
+    # ------------------------------------------------------------------
+
+    def _load(self) -> None:
+        self._lines = 0
+        if not self.path or not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json_codec.loads(line)
+                except ValueError:
+                    continue
+                self._lines += 1
+                if isinstance(entry, dict) and entry.get("key"):
+                    self._add(entry)
+
+    def _append(self, entry: Dict[str, Any]) -> None:
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with _file_lock(self.path):
+            if self._lines < self.max_entries * 2:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json_codec.dumps(entry, default=str) + "\n")
+                self._lines += 1
+                return
+            self._compact(entry)
+
+    def _compact(self, entry: Dict[str, Any]) -> None:
+        """追い出されたエントリが溜まったら保持中のエントリだけで書き直す（ファイルロック中に呼ぶ）"""
+        # 他のワーカーが追記したエントリを消さないよう、ファイルを読み直してから書き直す
+        self._entries.clear()
+        self._vectors.clear()
+        self._postings.clear()
+        self._exact.clear()
+        self._load()
+        self._add(entry)
+        temp_path = f"{self.path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                for kept in self._entries.values():
+                    f.write(json_codec.dumps(kept, default=str) + "\n")
+            os.replace(temp_path, self.path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self._lines = len(self._entries)
+        if self.shared is not None:
+            # 追い出したエントリを他のワーカーでも無効にし、保持中のエントリだけを保存し直す
+            self.shared.bump_revision(GENERATION_CACHE_SCOPE)
+            for kept in self._entries.values():
+                self.shared.set(kept["key"], kept, scope=GENERATION_CACHE_SCOPE)
+
+    # ------------------------------------------------------------------
+    # インデックス
+    # ------------------------------------------------------------------
+
+    def _add(self, entry: Dict[str, Any]) -> None:
+        key = entry["key"]
+        self._remove(key)
+        vector = vectorize(entry.get("normalized", ""))
+        self._entries[key] = entry
+        self._vectors[key] = vector
+        self._exact[entry.get("normalized", "")] = key
+        for dimension in vector:
+            self._postings.setdefault(dimension, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for dimension in self._vectors.pop(key, {}):
+            keys = self._postings.get(dimension)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[dimension]
+        if self._exact.get(entry.get("normalized", "")) == key:
+            del self._exact[entry["normalized"]]
+
+    def find_similar(self, text: str) -> Optional[Dict[str, Any]]:
+        """
+        最も類似したエントリを探す（閾値は問わない）
+
+        Args:
+            text: 要望テキスト
+
+        Returns:
+            Optional[Dict[str, Any]]: {"entry", "similarity"}。候補がない場合はNone
+        """
+        normalized = normalize_request(text)
+        if not normalized:
+            return None
+        with self._lock:
+            key = self._exact.get(normalized)
+            if key is not None:
+                return {"entry": self._entries[key], "similarity": 1.0}
+            shared_entry = self._shared_entry(normalized)
+            if shared_entry is not None:
+                # 別のワーカーが保存したエントリは類似検索にも使えるよう索引に加える
+                self._add(shared_entry)
+                return {"entry": shared_entry, "similarity": 1.0}
+            query = vectorize(normalized)
+            scores: Counter = Counter()
+            for dimension, weight in query.items():
+                for candidate in self._postings.get(dimension, ()):
+                    scores[candidate] += weight * self._vectors[candidate][dimension]
+            if not scores:
+                return None
+            key, similarity = scores.most_common(1)[0]
+            return {"entry": self._entries[key], "similarity": round(min(similarity, 1.0), 4)}
+
+    def _shared_entry(self, normalized: str) -> Optional[Dict[str, Any]]:
+        """共有キャッシュから正規化後の要望が一致するエントリを返す"""
+        if self.shared is None:
+            return None
+        entry = self.shared.get(_entry_key(normalized), scope=GENERATION_CACHE_SCOPE)
+        if not isinstance(entry, dict) or entry.get("normalized") != normalized:
+            return None
+        return entry
+
+    def lookup(self, text: str, threshold: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        閾値以上に類似した過去の生成結果を返し、ヒット率を記録する
+
+        Args:
+            text: 要望テキスト
+            threshold: コサイン類似度の閾値（省略時は初期化時の値）
+
+        Returns:
+            Optional[Dict[str, Any]]: {"entry", "similarity"}。該当しない場合はNone
+        """
+        threshold = self.threshold if threshold is None else threshold
+        match = self.find_similar(text)
+        with self._lock:
+            self._stats["lookups"] += 1
+            if match is not None and match["similarity"] >= threshold:
+                self._stats["hits"] += 1
+                return {"entry": copy.deepcopy(match["entry"]), "similarity": match["similarity"]}
+            self._stats["misses"] += 1
+        return None
+
+    def record_bypass(self) -> None:
+        """利用者の指定でキャッシュを使わなかったことを記録する"""
+        with self._lock:
+            self._stats["bypassed"] += 1
+
+    def store(self, text: str, structure: Dict[str, Any], messages: List[Dict[str, Any]],
+              structure_id: Optional[str] = None) -> Optional[str]:
+        """
+        生成結果を保存する
+
+        Args:
+            text: 要望テキスト
+            structure: 生成後の構成（CACHED_FIELDS だけを保存する）
+            messages: 生成時に追加されたアシスタントのメッセージ
+            structure_id: 生成元の構成ID
+
+        Returns:
+            Optional[str]: エントリのキー。保存しなかった場合はNone
+        """
+        normalized = normalize_request(text)
+        if not normalized:
+            return None
+        entry = {
+            "key": _entry_key(normalized),
+            "normalized": normalized,
+            "request": text,
+            "structure_id": structure_id,
+            "created_at": datetime.utcnow().isoformat(),
+            "fields": {field: copy.deepcopy(structure[field]) for field in CACHED_FIELDS if field in structure},
+            "messages": copy.deepcopy(messages),
+        }
+        with self._lock:
+            self._add(entry)
+            self._append(entry)
+            self._stats["stores"] += 1
+        if self.shared is not None:
+            self.shared.set(entry["key"], entry, scope=GENERATION_CACHE_SCOPE)
+        return entry["key"]
+
+    def stats(self) -> Dict[str, Any]:
+        """ヒット率などの統計情報を返す"""
+        with self._lock:
+            lookups = self._stats["lookups"]
+            return {
+                "entries": len(self._entries),
+                "threshold": self.threshold,
+                "lookups": lookups,
+                "hits": self._stats["hits"],
+                "misses": self._stats["misses"],
+                "bypassed": self._stats["bypassed"],
+                "stores": self._stats["stores"],
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+            }
+
+
+def apply_cached_generation(structure: Dict[str, Any], match: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    キャッシュの生成結果を構成に反映する
+
+    Args:
+        structure: 反映先の構成
+        match: GenerationCache.lookup() の結果
+
+    Returns:
+        List[Dict[str, Any]]: 構成に追加したメッセージ（再利用の通知を含む）
+    """
+    entry = match["entry"]
+    for field in CACHED_FIELDS:
+        structure.pop(field, None)
+    structure.update(copy.deepcopy(entry.get("fields", {})))
+    # send_message の生成処理と同様に旧フィールドは削除する
+    structure.pop("structure", None)
+    structure.pop("content", None)
+
+    now = datetime.utcnow().isoformat()
+    structure.setdefault("metadata", {})["updated_at"] = now
+    structure["generation_cache"] = {
+        "source_structure_id": entry.get("structure_id"),
+        "similarity": match["similarity"],
+        "reused_at": now,
+    }
+
+    added = []
+    for message in entry.get("messages", []):
+        message = dict(message)
+        message["timestamp"] = now
+        added.append(message)
+    added.append({
+        "role": "assistant",
+        "content": (
+            f"♻️ 以前の類似した要望（類似度 {match['similarity']:.2f}）から生成した構成を再利用しました。"
+            "作り直す場合は「過去の類似構成を再利用せず新しく生成する」を選んで送信してください。"
+        ),
+        "source": "system",
+        "type": "notification",
+        "timestamp": now,
+    })
+    structure.setdefault("messages", []).extend(added)
+    return added
+
+
+_caches: Dict[str, GenerationCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_generation_cache(data_dir: Optional[str] = None) -> GenerationCache:
+    """
+    データディレクトリごとの生成キャッシュを返す
+
+    Args:
+        data_dir: 構成ディレクトリ（省略時は get_data_dir()）
+
+    Returns:
+        GenerationCache: 生成キャッシュ
+    """
+    if data_dir is None:
+        from src.structure.utils import get_data_dir
+        data_dir = get_data_dir()
+    path = os.path.abspath(os.path.join(data_dir, CACHE_FILENAME))
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            threshold = float(os.environ.get("AIDEX_GENERATION_CACHE_THRESHOLD", DEFAULT_THRESHOLD))
+            shared = get_tiered_cache(GENERATION_CACHE_NAMESPACE, max_entries=MAX_SHARED_LOCAL_ENTRIES, data_dir=data_dir)
+            cache = GenerationCache(path, threshold=threshold, shared=shared)
+            _caches[path] = cache
+        return cache
+
+
+def is_generation_cache_enabled() -> bool:
+    """環境変数 AIDEX_GENERATION_CACHE_ENABLED=0 で無効にできる"""
+    return os.environ.get("AIDEX_GENERATION_CACHE_ENABLED", "1") != "0"
+
+
+__all__ = [
+    "CACHED_FIELDS",
+    "GENERATION_CACHE_SCOPE",
+    "normalize_request",
+    "vectorize",
+    "GenerationCache",
+    "apply_cached_generation",
+    "get_generation_cache",
+    "is_generation_cache_enabled",
+]
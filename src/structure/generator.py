@@ -4,6 +4,7 @@ import uuid
 import json
 import logging
 from typing import Dict, Any, Optional
+from src.common import json_codec
 from src.llm.hub import call_model
 from src.llm.prompts import prompt_manager
 from src.exceptions import AIProviderError, PromptNotFoundError
@@ -47,7 +48,7 @@ def extract_json_from_response(content: str) -> Dict[str, Any]:
         if json_end != -1:
             json_content = content[json_start:json_end].strip()
             try:
-                return json.loads(json_content)
+                return json_codec.loads(json_content)
             except json.JSONDecodeError:
                 logger.warning(f"コードブロック内のJSONパースに失敗: {json_content}")
     
@@ -58,7 +59,7 @@ def extract_json_from_response(content: str) -> Dict[str, Any]:
         if json_end > json_start:
             json_content = content[json_start:json_end]
             try:
-                return json.loads(json_content)
+                return json_codec.loads(json_content)
             except json.JSONDecodeError:
                 logger.warning(f"JSONパースに失敗: {json_content}")
     
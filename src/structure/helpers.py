@@ -5,7 +5,10 @@ import json
 import logging
 import re
 from typing import Dict, Any, List, Optional
+from src.common import json_codec
 from src.llm.controller import controller
+from src.common.structured_output import is_structured_output_enabled
+from src.common.model_routing import get_model_router
 
 logger = logging.getLogger(__name__)
 
@@ -67,10 +70,26 @@ def get_minimum_structure_with_gpt(content: str) -> Dict[str, Any]:
 - 必ず有効なJSON形式で返してください
 """
 
+        # 構造化出力が使える場合はスキーマ検証済みのJSONを直接受け取る
+        if is_structured_output_enabled():
+            try:
+                structured = controller.call_structured(
+                    "chatgpt",
+                    [{"role": "user", "content": prompt}],
+                    model=get_model_router().model_for("extract", "chatgpt"),
+                    temperature=0.3,
+                    prompt_name="structure_extraction"
+                )
+                logger.info("✅ 構造化出力で構造抽出に成功")
+                return normalize_minimum_structure(structured["data"])
+            except Exception as e:
+                logger.warning(f"構造化出力での構造抽出に失敗: {e}")
+        
         try:
-            response = controller.call(
-                provider="chatgpt",
-                messages=[{"role": "user", "content": prompt}],
+            response = controller.route(
+                "extract",
+                [{"role": "user", "content": prompt}],
+                validate=lambda text: not extract_json_part(text).get("error"),
                 temperature=0.3
             )
             
@@ -118,7 +137,7 @@ def extract_json_part(text: str) -> Dict[str, Any]:
     if code_match:
         json_str = code_match.group(1).strip()
         try:
-            result = json.loads(json_str)
+            result = json_codec.loads(json_str)
             return result
         except json.JSONDecodeError:
             pass
@@ -139,7 +158,7 @@ def extract_json_part(text: str) -> Dict[str, Any]:
         json_str = re.sub(r',(\s*[}\]])', r'\1', json_str)
         
         try:
-            result = json.loads(json_str)
+            result = json_codec.loads(json_str)
             return result
         except json.JSONDecodeError:
             pass
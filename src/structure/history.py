@@ -1,13 +1,20 @@
 import os
-import json
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 
+from src.common import json_codec
+from src.common.storage_codec import append_jsonl, read_json, read_lines, write_json
+
 def get_structure_history_dir():
     base_dir = os.environ.get('AIDEX_DATA_DIR', '.')
     return os.path.join(base_dir, 'structure_history')
 
 
+def get_structure_history_path(structure_id: str) -> str:
+    """指定IDの構造履歴（JSONL）ファイルのパスを返す"""
+    return os.path.join(get_structure_history_dir(), f"{structure_id}.jsonl")
+
+
 def get_structure_history(structure_id: str) -> List[Dict[str, Any]]:
     """指定IDのStructureHistory一覧を取得"""
     history_list = []
@@ -16,12 +23,10 @@ def get_structure_history(structure_id: str) -> List[Dict[str, Any]]:
         return history_list
     for fname in os.listdir(dir_path):
         if fname.endswith(".json") and structure_id in fname:
-            with open(os.path.join(dir_path, fname), encoding="utf-8") as f:
-                try:
-                    data = json.load(f)
-                    history_list.append(data)
-                except Exception:
-                    continue
+            try:
+                history_list.append(read_json(os.path.join(dir_path, fname)))
+            except Exception:
+                continue
     # timestamp降順
     history_list.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
     return history_list
@@ -33,8 +38,7 @@ def get_history_by_id(history_id: str) -> Optional[Dict[str, Any]]:
     path = os.path.join(dir_path, f"{history_id}.json")
     if not os.path.exists(path):
         return None
-    with open(path, encoding="utf-8") as f:
-        return json.load(f)
+    return read_json(path)
 
 
 def restore_structure_from_history(structure_id: str, history_id: str) -> bool:
@@ -45,8 +49,7 @@ def restore_structure_from_history(structure_id: str, history_id: str) -> bool:
     # 構成ファイルパス
     structure_path = os.path.join("data", f"{structure_id}.json")
     # 上書き保存
-    with open(structure_path, "w", encoding="utf-8") as f:
-        json.dump(history["content"], f, ensure_ascii=False, indent=2)
+    write_json(structure_path, history["content"])
     return True
 
 
@@ -57,7 +60,7 @@ def save_structure_history(structure_id: str,
                           comment: str = "",
                           timestamp: Optional[str] = None) -> bool:
     """
-    Claude評価結果・Gemini補完結果の履歴をJSONL形式で保存
+    Claude評価結果・Gemini補完結果の履歴をJSONL形式で保存（保存形式は AIDEX_STORAGE_CODEC に従う）
     
     Args:
         structure_id (str): 構造ID
@@ -76,7 +79,7 @@ def save_structure_history(structure_id: str,
         os.makedirs(dir_path, exist_ok=True)
         
         # ファイルパス
-        file_path = os.path.join(dir_path, f"{structure_id}.jsonl")
+        file_path = get_structure_history_path(structure_id)
         
         # タイムスタンプの設定
         if timestamp is None:
@@ -99,8 +102,7 @@ def save_structure_history(structure_id: str,
             history_entry["comment"] = comment
         
         # JSONL形式で追記保存
-        with open(file_path, "a", encoding="utf-8") as f:
-            f.write(json.dumps(history_entry, ensure_ascii=False) + "\n")
+        append_jsonl(file_path, history_entry)
         
         print(f"✅ 構造履歴を保存しました: {file_path} (provider: {provider})")
         return True
@@ -112,19 +114,17 @@ def save_structure_history(structure_id: str,
 
 def load_structure_history(structure_id: str) -> List[Dict[str, Any]]:
     """指定IDの構造履歴（JSONL）を新しい順で返す"""
-    dir_path = get_structure_history_dir()
-    file_path = os.path.join(dir_path, f"{structure_id}.jsonl")
+    file_path = get_structure_history_path(structure_id)
     history_list = []
     if not os.path.exists(file_path):
         return history_list
-    with open(file_path, encoding="utf-8") as f:
-        for line in f:
-            try:
-                entry = json.loads(line)
-                history_list.append(entry)
-            except Exception as e:
-                print(f"⚠️ JSONL行の解析に失敗: {e}")
-                continue
+    for line in read_lines(file_path):
+        try:
+            entry = json_codec.loads(line)
+            history_list.append(entry)
+        except Exception as e:
+            print(f"⚠️ JSONL行の解析に失敗: {e}")
+            continue
     # timestamp降順で返す
     history_list.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
     print(f"📖 構造履歴を読み込みました: {len(history_list)}件")
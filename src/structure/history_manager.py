@@ -4,13 +4,14 @@
 このモジュールは、構造の評価・補完・保存操作の履歴を管理します。
 """
 
-import json
 import logging
 import os
 from pathlib import Path
 from datetime import datetime
 from typing import Dict, Any, Optional, List
 
+from src.common.storage_codec import read_json, write_json
+
 logger = logging.getLogger(__name__)
 
 def get_data_dir() -> str:
@@ -49,9 +50,8 @@ def save_structure_history(
         # 既存履歴を読み込み or 初期化
         if file_path.exists():
             try:
-                with file_path.open("r", encoding="utf-8") as f:
-                    data = json.load(f)
-            except (json.JSONDecodeError, IOError) as e:
+                data = read_json(str(file_path))
+            except (ValueError, IOError) as e:
                 logger.warning(f"既存履歴ファイルの読み込みに失敗: {e}")
                 data = _create_initial_history_data(structure_id, module_id)
         else:
@@ -68,8 +68,7 @@ def save_structure_history(
         data["history"].append(history_entry)
         
         # ファイルに保存
-        with file_path.open("w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        write_json(str(file_path), data)
         
         logger.info(f"[HISTORY] Saved: {structure_id} ({role}, {source})")
         return True
@@ -112,8 +111,7 @@ def save_evaluation_completion_history(structure: Dict[str, Any]) -> bool:
         }
         
         # JSONファイルに保存
-        with file_path.open("w", encoding="utf-8") as f:
-            json.dump(history_data, f, ensure_ascii=False, indent=2)
+        write_json(str(file_path), history_data)
             
         logger.info(f"✅ 評価・補完履歴を保存しました: {file_path}")
         return True
@@ -122,6 +120,23 @@ def save_evaluation_completion_history(structure: Dict[str, Any]) -> bool:
         logger.error(f"❌ 評価・補完履歴保存中にエラーが発生: {str(e)}")
         return False
 
+def get_evaluation_completion_history_files(structure_id: str) -> List[Path]:
+    """
+    指定された構造IDの評価・補完履歴ファイルを新しい順で返す
+    
+    Args:
+        structure_id (str): 構造ID
+        
+    Returns:
+        List[Path]: 履歴ファイルのパスのリスト
+    """
+    history_dir = Path("logs/structure_history")
+    if not history_dir.exists():
+        return []
+    history_files = list(history_dir.glob(f"{structure_id}_*.json"))
+    history_files.sort(reverse=True)  # 新しい順
+    return history_files
+
 def load_evaluation_completion_history(structure_id: str) -> List[Dict[str, Any]]:
     """
     指定された構造IDの評価・補完履歴を読み込む
@@ -133,21 +148,14 @@ def load_evaluation_completion_history(structure_id: str) -> List[Dict[str, Any]
         List[Dict[str, Any]]: 履歴データのリスト
     """
     try:
-        history_dir = Path("logs/structure_history")
-        if not history_dir.exists():
-            return []
-            
-        # 構造IDで始まるファイルを検索
-        history_files = list(history_dir.glob(f"{structure_id}_*.json"))
-        history_files.sort(reverse=True)  # 新しい順
+        # 構造IDで始まるファイルを検索（新しい順）
+        history_files = get_evaluation_completion_history_files(structure_id)
         
         histories = []
         for file_path in history_files:
             try:
-                with file_path.open("r", encoding="utf-8") as f:
-                    history_data = json.load(f)
-                    histories.append(history_data)
-            except (json.JSONDecodeError, IOError) as e:
+                histories.append(read_json(str(file_path)))
+            except (ValueError, IOError) as e:
                 logger.warning(f"履歴ファイルの読み込みに失敗: {file_path}, error: {e}")
                 
         logger.info(f"📖 評価・補完履歴を読み込みました: {len(histories)}件")
@@ -175,6 +183,18 @@ def _create_initial_history_data(structure_id: str, module_id: str = "") -> Dict
         "history": []
     }
 
+def get_history_file_path(structure_id: str) -> Path:
+    """
+    load_structure_historyが読み込む履歴ファイルのパスを返す
+    
+    Args:
+        structure_id (str): 構造ID
+        
+    Returns:
+        Path: 履歴ファイルのパス
+    """
+    return Path("data/history") / f"{structure_id}.json"
+
 def load_structure_history(structure_id: str) -> Optional[Dict[str, Any]]:
     """
     構造履歴を読み込む
@@ -186,12 +206,11 @@ def load_structure_history(structure_id: str) -> Optional[Dict[str, Any]]:
         Optional[Dict[str, Any]]: 履歴データ、存在しない場合はNone
     """
     try:
-        file_path = Path("data/history") / f"{structure_id}.json"
+        file_path = get_history_file_path(structure_id)
         if not file_path.exists():
             return None
             
-        with file_path.open("r", encoding="utf-8") as f:
-            return json.load(f)
+        return read_json(str(file_path))
             
     except Exception as e:
         logger.error(f"履歴読み込み中にエラーが発生: {str(e)}")
@@ -343,8 +362,7 @@ class StructureHistoryManager:
                 logger.info(f"履歴数が上限({self.max_history_count}件)を超えたため、古い履歴を削除しました")
             
             # JSONファイルに保存
-            with open(history_file, 'w', encoding='utf-8') as f:
-                json.dump(existing_history, f, ensure_ascii=False, indent=2, default=str)
+            write_json(str(history_file), existing_history)
             
             logger.info(f"✅ 構成評価履歴を保存しました - structure_id: {structure_id}, 履歴数: {len(existing_history)}")
             return True
@@ -370,8 +388,7 @@ class StructureHistoryManager:
                 logger.info(f"履歴ファイルが存在しません - {history_file}")
                 return []
             
-            with open(history_file, 'r', encoding='utf-8') as f:
-                history_data = json.load(f)
+            history_data = read_json(str(history_file))
             
             # 新しい順にソート
             history_data.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
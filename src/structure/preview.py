@@ -1,9 +1,10 @@
 """
 Structure preview module for AIDE-X
 """
-import json
 from typing import Dict, Any, List, Union
 
+from src.common import json_codec
+
 def render_html_from_structure(structure: Dict[str, Any]) -> str:
     """
     Generate HTML form or simple preview from structure template (JSON)
@@ -105,7 +106,7 @@ def render_html_from_structure(structure: Dict[str, Any]) -> str:
         html_parts.append('<h3>🔎 その他の構成プレビュー</h3><hr>')
         try:
             for k, v in structure.items():
-                val = json.dumps(v, ensure_ascii=False, indent=2) if isinstance(v, (dict, list)) else str(v)
+                val = json_codec.dumps(v, indent=2) if isinstance(v, (dict, list)) else str(v)
                 html_parts.append(f"<p><strong>{safe_html(k)}</strong><br><pre style='background:#f5f5f5;padding:0.5em;border:1px solid #ddd;'>{safe_html(val)}</pre></p>")
         except Exception as e:
             html_parts.append(f'<p style="color:red;">⚠ 表示エラー: {e}</p>')
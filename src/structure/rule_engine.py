@@ -0,0 +1,613 @@
+"""
+構成分析ルールエンジンモジュール
+
+構成の状態分析（structure_analysis.analyze_structure_state）、完全性チェック
+（check_structure_completeness）、構造検証（_validate_structure_completeness）、
+Claude評価文の状態判定（unified_routes.analyze_structure_state）のルールを
+プロセスごとに1回だけコンパイルし、構成を1回走査してすべての結果をまとめて計算します。
+
+結果は分析対象フィールドのコンテンツハッシュでメモ化されるため、1リクエスト内で
+同じ構成を何度分析しても走査は1回で済みます。get_rule_engine() のエンジンはメモを
+src.common.shared_cache の共有層にも保存し、ワーカープロセス間で分析結果を共有します。
+"""
+
+import copy
+import hashlib
+import logging
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from src.common.shared_cache import TieredCache, get_tiered_cache
+from src.structure.fingerprint import hash_value
+
+logger = logging.getLogger(__name__)
+
+# ルールが参照するトップレベルフィールド（メモ化のキーはこれらのハッシュ）
+RULE_FIELDS = ("title", "description", "modules", "content", "evaluation", "gemini_output")
+
+# 状態分析でモジュールに必須のフィールド（値が空でないこと）
+STATE_REQUIRED_FIELDS = ("title", "description")
+
+# 構造検証でモジュールに必須のフィールド（キーが存在すること）
+MODULE_REQUIRED_FIELDS = ("id", "type", "title")
+
+# モジュールタイプごとの必須フィールドと型
+MODULE_TYPE_REQUIREMENTS: Dict[str, Dict[str, str]] = {
+    "form": {"fields": "list"},
+    "table": {"columns": "list"},
+    "api": {"endpoints": "list"},
+    "chart": {"chart_config": "dict"},
+    "auth": {"auth_config": "dict"},
+    "database": {"tables": "list"},
+    "config": {"settings": "list"},
+    "page": {"layout": "dict"},
+    "component": {"component_config": "dict"},
+}
+
+# 完全性チェックの content 項目ルール: (不足時の項目名, 別名キー, 提案メッセージ)
+CONTENT_FIELD_RULES: Tuple[Tuple[str, Tuple[str, ...], str], ...] = (
+    ("対象ユーザー", ("対象ユーザー", "target_users"), "誰が使うアプリか教えてください"),
+    ("主要機能", ("主要機能", "main_functions", "機能"), "どんな機能が必要か教えてください"),
+    ("技術要件", ("技術要件", "technical_requirements"), "使用したい技術があれば教えてください"),
+    ("画面構成", ("画面構成", "screens", "画面"), "どんな画面が必要か教えてください"),
+)
+
+# 完全性チェックの評価スコア閾値
+COMPLETENESS_SCORE_THRESHOLD = 0.7
+
+# Claude評価文で未完成を示すキーワード（優先順）
+INCOMPLETE_KEYWORDS = (
+    "不十分", "未定義", "不足", "不完全", "欠如", "未実装",
+    "insufficient", "undefined", "missing", "incomplete", "lack", "not implemented",
+    "改善が必要", "修正が必要", "追加が必要", "補完が必要",
+    "needs improvement", "needs fixing", "needs addition", "needs completion",
+)
+
+# Claude評価文で完成を示すキーワード（優先順）
+COMPLETE_KEYWORDS = (
+    "問題ありません", "適切です", "十分です", "完成", "良好",
+    "no problem", "appropriate", "sufficient", "complete", "good",
+    "満足", "優秀", "完璧", "理想的",
+    "satisfactory", "excellent", "perfect", "ideal",
+)
+
+# 評価フィードバックで不足を示すキーワード
+FEEDBACK_GAP_KEYWORDS = ("不足", "不十分", "不明")
+
+# 評価文中のスコア表記（優先順）
+SCORE_PATTERNS = (
+    r'(\d+(?:\.\d+)?)/10',
+    r'(\d+(?:\.\d+)?)%',
+    r'スコア[：:]\s*(\d+(?:\.\d+)?)',
+    r'score[：:]\s*(\d+(?:\.\d+)?)',
+)
+
+# メモ化する結果の最大件数
+MAX_MEMO_ENTRIES = 512
+
+# 共有キャッシュの名前空間（ルールを変更したらバージョンを上げ、古いプロセスの結果を使わないようにする）
+MEMO_NAMESPACE = "rule_engine:v1"
+
+# 共有キャッシュに保存した結果の有効期間（秒）
+MEMO_TTL_SECONDS = 3600
+
+
+class KeywordMatcher:
+    """
+    複数キーワードを1つの正規表現にコンパイルし、1回の走査で出現するキーワードを集める
+
+    各位置で最長のキーワードにマッチさせ、そのキーワードに含まれる短いキーワードも
+    出現したものとして扱うため、`keyword in text` を全キーワードで評価した結果と一致する。
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        """
+        Args:
+            keywords: キーワード
+        """
+        unique = [keyword for keyword in dict.fromkeys(keywords) if keyword]
+        ordered = sorted(unique, key=len, reverse=True)
+        self._pattern = re.compile("(?=(" + "|".join(re.escape(keyword) for keyword in ordered) + "))")
+        self._contained = {
+            keyword: frozenset(other for other in unique if other in keyword)
+            for keyword in unique
+        }
+
+    def find_all(self, text: str) -> Set[str]:
+        """
+        テキストに含まれるキーワードの集合を返す
+
+        Args:
+            text: 対象テキスト
+
+        Returns:
+            Set[str]: 含まれるキーワード
+        """
+        found: Set[str] = set()
+        for match in self._pattern.finditer(text):
+            found |= self._contained[match.group(1)]
+        return found
+
+
+def _first_present(keywords: Iterable[str], found: Set[str]) -> Optional[str]:
+    """優先順で最初に出現しているキーワードを返す"""
+    for keyword in keywords:
+        if keyword in found:
+            return keyword
+    return None
+
+
+def generate_diagnostic_message(analysis_result: dict) -> str:
+    """
+    分析結果から診断メッセージを生成
+
+    Args:
+        analysis_result: analyze_structure_state()の結果
+
+    Returns:
+        診断メッセージ
+    """
+    if analysis_result["is_empty"]:
+        return analysis_result["diagnostic_message"]
+
+    module_count = analysis_result["module_count"]
+    incomplete_count = len(analysis_result["incomplete_modules"])
+    missing_fields = analysis_result["missing_fields"]
+
+    messages = []
+
+    # モジュール数
+    if module_count == 0:
+        messages.append("モジュールが定義されていません")
+    elif module_count == 1:
+        messages.append("1個のモジュールが定義されています")
+    else:
+        messages.append(f"{module_count}個のモジュールが定義されています")
+
+    # 不完全なモジュール
+    if incomplete_count > 0:
+        if incomplete_count == 1:
+            messages.append("1個のモジュールに記述漏れがあります")
+        else:
+            messages.append(f"{incomplete_count}個のモジュールに記述漏れがあります")
+
+    # 不足フィールド
+    if missing_fields:
+        fields_str = ", ".join(missing_fields)
+        messages.append(f"{fields_str} が不足しています")
+
+    # 完全な場合
+    if incomplete_count == 0 and not missing_fields and module_count > 0:
+        messages.append("構成は完成しています")
+
+    return "。".join(messages) + "。"
+
+
+def validate_module(module: Dict[str, Any], index: int) -> Dict[str, Any]:
+    """
+    個別モジュールの妥当性を検証する
+
+    Args:
+        module: 検証対象のモジュール
+        index: モジュールのインデックス
+
+    Returns:
+        Dict[str, Any]: 検証結果（is_valid / errors / suggestions）
+    """
+    validation_result = {
+        "is_valid": False,
+        "errors": [],
+        "suggestions": []
+    }
+
+    try:
+        for field in MODULE_REQUIRED_FIELDS:
+            if field not in module:
+                validation_result["errors"].append(f"必須フィールド '{field}' が不足しています")
+
+        if validation_result["errors"]:
+            return validation_result
+
+        # モジュールタイプに応じた配列のチェック
+        module_type = module.get("type", "")
+        for field_name, expected_type in MODULE_TYPE_REQUIREMENTS.get(module_type, {}).items():
+            if field_name not in module:
+                validation_result["errors"].append(f"モジュールタイプ '{module_type}' には '{field_name}' フィールドが必要です")
+                continue
+            field_value = module[field_name]
+            if expected_type == "list":
+                if not isinstance(field_value, list) or len(field_value) == 0:
+                    validation_result["errors"].append(f"'{field_name}' 配列が空または無効です")
+            elif expected_type == "dict":
+                if not isinstance(field_value, dict):
+                    validation_result["errors"].append(f"'{field_name}' は辞書（オブジェクト）である必要があります")
+
+        # 有効なモジュールタイプのチェック
+        if module_type not in MODULE_TYPE_REQUIREMENTS and module_type != "unknown":
+            validation_result["suggestions"].append(f"モジュールタイプ '{module_type}' は標準タイプではありません")
+
+        if len(validation_result["errors"]) == 0:
+            validation_result["is_valid"] = True
+            validation_result["suggestions"].append("モジュールは有効です")
+
+        return validation_result
+
+    except Exception as e:
+        logger.error(f"モジュール検証エラー (index {index}): {str(e)}")
+        validation_result["errors"].append(f"モジュール検証中にエラーが発生しました: {str(e)}")
+        return validation_result
+
+
+class _SectionError:
+    """分析の一部で発生した例外（その結果を要求した呼び出し元にだけ送出する）"""
+
+    def __init__(self, error: Exception):
+        self.error = error
+
+
+class StructureRuleEngine:
+    """
+    構成分析のルールをまとめて評価するエンジン
+
+    analyze() は状態分析・完全性チェック・構造検証を1回の走査で計算し、
+    分析対象フィールドのハッシュでメモ化する。呼び出し元には結果のコピーを返す。
+    """
+
+    def __init__(self, max_entries: int = MAX_MEMO_ENTRIES, cache: Optional[TieredCache] = None):
+        """
+        Args:
+            max_entries: メモ化する結果の最大件数
+            cache: メモに使うキャッシュ（省略時はこのエンジンだけのプロセス内のキャッシュ）
+        """
+        self.max_entries = max_entries
+        self.keywords = KeywordMatcher(INCOMPLETE_KEYWORDS + COMPLETE_KEYWORDS + FEEDBACK_GAP_KEYWORDS)
+        self.score_patterns = [re.compile(pattern) for pattern in SCORE_PATTERNS]
+        self._memo = cache if cache is not None else TieredCache(MEMO_NAMESPACE, max_entries=max_entries)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # ------------------------------------------------------------------
+    # メモ化
+    # ------------------------------------------------------------------
+
+    def _remember(self, key: str, compute) -> Dict[str, Any]:
+        # 一部の分析が失敗した結果（_SectionError を含む）はJSONにできないためプロセス内だけに保存される
+        cached = self._memo.get(key)
+        if cached is not None:
+            with self._lock:
+                self.hits += 1
+            return cached
+        result = compute()
+        with self._lock:
+            self.misses += 1
+        self._memo.set(key, result)
+        return result
+
+    def clear(self) -> None:
+        """メモ化した結果を破棄する"""
+        self._memo.clear()
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """メモのヒット数・ミス数・保持件数"""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._memo.local)}
+
+    # ------------------------------------------------------------------
+    # 構成の分析
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def fingerprint(structure: Dict[str, Any]) -> str:
+        """
+        ルールが参照するフィールドのコンテンツハッシュを計算する
+
+        Args:
+            structure: 構成データ
+
+        Returns:
+            str: ハッシュ（キーの有無も区別する）
+        """
+        return hash_value({key: structure[key] for key in RULE_FIELDS if key in structure})
+
+    def analyze(self, structure: Any) -> Dict[str, Any]:
+        """
+        構成を分析し、state / completeness / validation をまとめて返す
+
+        Args:
+            structure: 構成データ
+
+        Returns:
+            Dict[str, Any]: 分析結果（メモ化されたオブジェクトなので変更しないこと）
+        """
+        if not isinstance(structure, dict):
+            return self._evaluate(structure)
+        # 空の構成と、ルール対象外のキーだけを持つ構成は状態分析の結果が異なる
+        key = f"structure:{bool(structure)}:{self.fingerprint(structure)}"
+        return self._remember(key, lambda: self._evaluate(structure))
+
+    def _section(self, structure: Any, name: str) -> Dict[str, Any]:
+        result = self.analyze(structure)[name]
+        if isinstance(result, _SectionError):
+            raise result.error
+        return copy.deepcopy(result)
+
+    def state(self, structure: Optional[dict]) -> dict:
+        """構成の状態分析（structure_analysis.analyze_structure_state の結果）"""
+        return self._section(structure, "state")
+
+    def completeness(self, structure: Dict[str, Any]) -> Dict[str, Any]:
+        """完全性チェック（check_structure_completeness の結果）"""
+        return self._section(structure, "completeness")
+
+    def validation(self, structure: Dict[str, Any]) -> Dict[str, Any]:
+        """構造検証（_validate_structure_completeness の結果）"""
+        return self._section(structure, "validation")
+
+    def _evaluate(self, structure: Any) -> Dict[str, Any]:
+        """ルールを評価する（モジュールの走査は1回）"""
+        state: Any = self._new_state()
+        validation: Dict[str, Any] = {
+            "is_valid": False,
+            "missing_fields": [],
+            "invalid_modules": [],
+            "suggestions": []
+        }
+        try:
+            self._check_state(structure, state)
+        except Exception as e:
+            # 状態分析だけが失敗した場合は、状態を要求した呼び出し元に例外を返す
+            state = _SectionError(e)
+
+        try:
+            modules = self._check_validation(structure, validation)
+            if modules is not None:
+                self._scan_modules(modules, None if isinstance(state, _SectionError) else state, validation)
+        except Exception as e:
+            logger.error(f"構造検証エラー: {str(e)}")
+            validation["suggestions"].append(f"構造検証中にエラーが発生しました: {str(e)}")
+
+        try:
+            completeness: Any = self._check_completeness(structure)
+        except Exception as e:
+            completeness = _SectionError(e)
+
+        return {"state": state, "completeness": completeness, "validation": validation}
+
+    @staticmethod
+    def _new_state() -> Dict[str, Any]:
+        return {
+            "is_empty": False,
+            "module_count": 0,
+            "incomplete_modules": [],
+            "missing_fields": [],
+            "diagnostic_message": ""
+        }
+
+    @staticmethod
+    def _check_state(structure: Any, state: Dict[str, Any]) -> None:
+        """状態分析のトップレベルの判定（空の場合はここで確定する）"""
+        if not structure:
+            state["is_empty"] = True
+            state["diagnostic_message"] = "構成が空です"
+            return
+        modules = structure.get("modules")
+        if not modules:
+            state["is_empty"] = True
+            state["diagnostic_message"] = "モジュールが定義されていません"
+        elif not isinstance(modules, list):
+            state["is_empty"] = True
+            state["diagnostic_message"] = "モジュールがリスト形式ではありません"
+            logger.debug(f"モジュールがリストではない: {type(modules)}")
+
+    @staticmethod
+    def _check_validation(structure: Any, validation: Dict[str, Any]) -> Optional[List[Any]]:
+        """構造検証のトップレベルの判定（キーの有無で判定する）を行い、走査するモジュールを返す"""
+        if "title" not in structure:
+            validation["missing_fields"].append("title")
+        if "modules" not in structure:
+            validation["missing_fields"].append("modules")
+            validation["suggestions"].append("modules配列を追加してください")
+            return None
+
+        modules = structure.get("modules", [])
+        if not isinstance(modules, list) or len(modules) == 0:
+            validation["suggestions"].append("modules配列に少なくとも1つのモジュールを含めてください")
+            return None
+        return modules
+
+    @staticmethod
+    def _scan_modules(modules: List[Any], state: Optional[Dict[str, Any]], validation: Dict[str, Any]) -> None:
+        """モジュールを1回走査して状態分析と構造検証の両方を計算する"""
+        all_fields: Set[str] = set()
+        valid_modules = 0
+
+        for i, module in enumerate(modules):
+            if state is not None:
+                if not isinstance(module, dict):
+                    logger.warning(f"モジュール {i} が辞書ではありません: {type(module)}")
+                    state["incomplete_modules"].append({
+                        "index": i,
+                        "name": f"モジュール{i}",
+                        "reason": "辞書形式ではありません"
+                    })
+                else:
+                    all_fields.update(module.keys())
+                    missing_required = [field for field in STATE_REQUIRED_FIELDS if not module.get(field)]
+                    if missing_required:
+                        module_name = module.get("title", f"モジュール{i}")
+                        state["incomplete_modules"].append({
+                            "index": i,
+                            "name": module_name,
+                            "missing_fields": missing_required,
+                            "reason": f"必須フィールドが不足: {', '.join(missing_required)}"
+                        })
+
+            module_validation = validate_module(module, i)
+            if module_validation["is_valid"]:
+                valid_modules += 1
+            else:
+                validation["invalid_modules"].append({
+                    "index": i,
+                    "errors": module_validation["errors"],
+                    "suggestions": module_validation["suggestions"]
+                })
+
+        if state is not None:
+            state["module_count"] = len(modules)
+            state["missing_fields"] = [field for field in STATE_REQUIRED_FIELDS if field not in all_fields]
+            state["diagnostic_message"] = generate_diagnostic_message(state)
+
+        if len(validation["missing_fields"]) == 0 and valid_modules > 0:
+            validation["is_valid"] = True
+            validation["suggestions"].append("構造は有効です")
+
+    def _check_completeness(self, structure: Dict[str, Any]) -> Dict[str, Any]:
+        """構成に必要なフィールドが揃っているかを確認する"""
+        result = {
+            "is_complete": True,
+            "missing_fields": [],
+            "suggestions": [],
+            "score_threshold": COMPLETENESS_SCORE_THRESHOLD
+        }
+
+        content = structure.get("content", {})
+        evaluation = structure.get("evaluation", {})
+
+        if not structure.get("title"):
+            result["missing_fields"].append("構成のタイトル")
+            result["is_complete"] = False
+
+        if not structure.get("description"):
+            result["missing_fields"].append("構成の説明")
+            result["suggestions"].append("目的や概要を明確にしてください")
+
+        if content and isinstance(content, dict):
+            for label, keys, suggestion in CONTENT_FIELD_RULES:
+                if not any(content.get(key) for key in keys):
+                    result["missing_fields"].append(label)
+                    result["is_complete"] = False
+                    result["suggestions"].append(suggestion)
+        else:
+            result["missing_fields"].append("構成の詳細内容")
+            result["is_complete"] = False
+            result["suggestions"].append("構成の詳細を教えてください")
+
+        # Claude評価スコアチェック
+        if evaluation and evaluation.get("status") == "success":
+            score = evaluation.get("score", 0)
+            if score < result["score_threshold"]:
+                result["is_complete"] = False
+                result["suggestions"].append(f"評価スコアが低いです（{score}）。構成を改善してください")
+
+            feedback = evaluation.get("feedback", "")
+            if self.keywords.find_all(feedback) & set(FEEDBACK_GAP_KEYWORDS):
+                result["suggestions"].append("評価フィードバックを参考に構成を改善してください")
+
+        # Gemini補完結果チェック
+        gemini_output = structure.get("gemini_output", {})
+        if gemini_output and gemini_output.get("status") == "success":
+            content_text = gemini_output.get("content", "")
+            if not content_text or len(content_text.strip()) < 50:
+                result["is_complete"] = False
+                result["suggestions"].append("補完結果が不十分です。より詳細な構成が必要です")
+
+        return result
+
+    # ------------------------------------------------------------------
+    # 評価文の分析
+    # ------------------------------------------------------------------
+
+    def classify_evaluation(self, evaluation: str) -> dict:
+        """
+        Claudeの評価文から構成の状態（incomplete / complete / unknown）を判定する
+
+        Args:
+            evaluation: Claudeの評価文
+
+        Returns:
+            dict: status と reason
+        """
+        if not evaluation or not isinstance(evaluation, str):
+            return {"status": "unknown", "reason": "評価文が空または無効です。"}
+        key = "evaluation:" + hashlib.sha256(evaluation.encode("utf-8")).hexdigest()
+        return dict(self._remember(key, lambda: self._classify(evaluation)))
+
+    def _classify(self, evaluation: str) -> dict:
+        found = self.keywords.find_all(evaluation.lower())
+
+        keyword = _first_present(INCOMPLETE_KEYWORDS, found)
+        if keyword:
+            return {
+                "status": "incomplete",
+                "reason": f"構成に未定義の項目があります。補完が必要です。（キーワード: {keyword}）"
+            }
+
+        keyword = _first_present(COMPLETE_KEYWORDS, found)
+        if keyword:
+            return {
+                "status": "complete",
+                "reason": f"構成は完成しています。（キーワード: {keyword}）"
+            }
+
+        # スコアベースの判定（数値が含まれている場合）
+        for pattern in self.score_patterns:
+            match = pattern.search(evaluation)
+            if not match:
+                continue
+            try:
+                score = float(match.group(1))
+            except ValueError:
+                continue
+            if score < 6.0:  # 60%未満は未完成
+                return {
+                    "status": "incomplete",
+                    "reason": f"評価スコアが低いです（{score}）。改善が必要です。"
+                }
+            if score >= 8.0:  # 80%以上は完成
+                return {
+                    "status": "complete",
+                    "reason": f"評価スコアが高いです（{score}）。構成は完成しています。"
+                }
+
+        return {
+            "status": "unknown",
+            "reason": "評価文から状態を特定できませんでした。"
+        }
+
+
+_engine: Optional[StructureRuleEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_rule_engine() -> StructureRuleEngine:
+    """
+    プロセス共通のルールエンジンを返す（ルールのコンパイルは初回のみ）
+
+    Returns:
+        StructureRuleEngine: ルールエンジン
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = StructureRuleEngine(
+                    cache=get_tiered_cache(MEMO_NAMESPACE, max_entries=MAX_MEMO_ENTRIES, ttl=MEMO_TTL_SECONDS)
+                )
+    return _engine
+
+
+__all__ = [
+    "RULE_FIELDS",
+    "MODULE_TYPE_REQUIREMENTS",
+    "KeywordMatcher",
+    "StructureRuleEngine",
+    "generate_diagnostic_message",
+    "validate_module",
+    "get_rule_engine",
+]
@@ -0,0 +1,615 @@
+"""
+構成の全文検索インデックスモジュール
+
+構成（タイトル・説明・内容）、モジュール、会話メッセージを SQLite FTS5 の転置インデックスに
+登録し、ランキング・絞り込み・ページングつきで検索する機能を提供します。
+
+日本語は形態素解析を使わず文字bigramに分割して登録し（英数字は単語単位）、
+検索語も同じ規則で分割したフレーズとして照合するため、部分文字列検索として振る舞います。
+インデックスは save_structure から文書単位の差分で更新され、
+他の経路で書き換えられたファイルも検索時に更新日時を見て取り込みます。
+"""
+
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from src.common.storage_codec import read_json
+from src.structure.fingerprint import get_structure_modules, iter_modules
+
+logger = logging.getLogger(__name__)
+
+# インデックスファイル名（データディレクトリ直下。load_structures は .json のみを読む）
+INDEX_FILENAME = ".search_index.sqlite3"
+
+# 1文書に登録する本文の最大文字数
+MAX_BODY_CHARS = 20000
+
+# 1ページの最大件数
+MAX_PER_PAGE = 100
+
+# 検索時にデータディレクトリの更新を確認する最小間隔（秒）
+SYNC_INTERVAL = 30.0
+
+# 文書の種類
+KIND_STRUCTURE = "structure"
+KIND_MODULE = "module"
+KIND_MESSAGE = "message"
+
+# bm25 の列の重み（structure_id, kind, ref, text は検索対象外）
+_BM25 = "bm25(docs, 0.0, 0.0, 0.0, 5.0, 1.0, 0.0)"
+
+_WORD_PATTERN = re.compile(r"\w+")
+_ASCII_SPLIT = re.compile(r"[0-9A-Za-z]+|[^0-9A-Za-z]+")
+
+_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS docs USING fts5(
+    structure_id UNINDEXED, kind UNINDEXED, ref UNINDEXED,
+    title, body, text UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 0'
+);
+CREATE TABLE IF NOT EXISTS doc_hashes (
+    structure_id TEXT NOT NULL,
+    doc_key TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    rowid_ref INTEGER NOT NULL,
+    PRIMARY KEY (structure_id, doc_key)
+);
+CREATE TABLE IF NOT EXISTS structures (
+    structure_id TEXT PRIMARY KEY,
+    title TEXT,
+    description TEXT,
+    score REAL,
+    updated_at TEXT,
+    path TEXT,
+    mtime_ns INTEGER
+);
+CREATE TABLE IF NOT EXISTS structure_providers (
+    structure_id TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    PRIMARY KEY (structure_id, provider)
+);
+CREATE INDEX IF NOT EXISTS idx_structures_updated ON structures(updated_at);
+CREATE INDEX IF NOT EXISTS idx_structures_score ON structures(score);
+"""
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    検索用のトークンに分割する
+
+    英数字の連続は小文字の単語、それ以外の文字の連続は文字bigram（1文字の場合はその文字）にする。
+
+    Args:
+        text: 対象テキスト
+
+    Returns:
+        List[str]: トークン
+    """
+    tokens: List[str] = []
+    for word in _WORD_PATTERN.findall(text or ""):
+        for run in _ASCII_SPLIT.findall(word.replace("_", " ")):
+            run = run.strip()
+            if not run:
+                continue
+            if run.isascii():
+                tokens.append(run.lower())
+            elif len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """
+    検索語を FTS5 の MATCH 式に変換する
+
+    空白区切りの語をそれぞれ bigram のフレーズにして AND で結合する。
+    1文字の日本語はその文字で始まる bigram の前方一致にする。
+
+    Args:
+        query: 検索語
+
+    Returns:
+        Optional[str]: MATCH 式。検索できる語がない場合はNone
+    """
+    parts = []
+    for term in (query or "").split():
+        tokens = tokenize(term)
+        if not tokens:
+            continue
+        phrase = " ".join(token.replace('"', '""') for token in tokens)
+        if len(tokens) == 1 and len(tokens[0]) == 1 and not tokens[0].isascii():
+            parts.append(f'"{phrase}"*')
+        else:
+            parts.append(f'"{phrase}"')
+    return " AND ".join(parts) if parts else None
+
+
+def _flatten_text(value: Any, limit: int = MAX_BODY_CHARS) -> str:
+    """値に含まれる文字列を連結する（辞書のキーは含めない）"""
+    pieces: List[str] = []
+    size = 0
+    stack = [value]
+    while stack and size < limit:
+        item = stack.pop()
+        if isinstance(item, str):
+            pieces.append(item)
+            size += len(item) + 1
+        elif isinstance(item, dict):
+            stack.extend(reversed(list(item.values())))
+        elif isinstance(item, (list, tuple)):
+            stack.extend(reversed(item))
+    return "\n".join(pieces)[:limit]
+
+
+def _evaluation_summary(structure: Dict[str, Any]) -> Tuple[List[str], Optional[float]]:
+    """構成の評価からプロバイダーと最高スコアを取り出す"""
+    providers = set()
+    scores: List[float] = []
+
+    evaluations: List[Tuple[Optional[str], Any]] = []
+    if isinstance(structure.get("evaluation"), dict):
+        evaluations.append((None, structure["evaluation"]))
+    if isinstance(structure.get("evaluations"), dict):
+        evaluations.extend(structure["evaluations"].items())
+    if isinstance(structure.get("claude_evaluation"), dict):
+        evaluations.append(("claude", structure["claude_evaluation"]))
+    if isinstance(structure.get("gemini_output"), dict):
+        providers.add("gemini")
+
+    for name, evaluation in evaluations:
+        if not isinstance(evaluation, dict):
+            continue
+        provider = evaluation.get("provider") or name
+        if provider:
+            providers.add(str(provider).lower())
+        score = evaluation.get("score")
+        if isinstance(score, (int, float)) and not isinstance(score, bool):
+            scores.append(float(score))
+    return sorted(providers), (max(scores) if scores else None)
+
+
+def extract_documents(structure: Dict[str, Any]) -> List[Dict[str, str]]:
+    """
+    構成から検索対象の文書（構成本体・モジュール・メッセージ）を取り出す
+
+    Args:
+        structure: 構成データ
+
+    Returns:
+        List[Dict[str, str]]: kind / ref / title / text のリスト
+    """
+    documents = [{
+        "kind": KIND_STRUCTURE,
+        "ref": "",
+        "title": str(structure.get("title") or ""),
+        "text": _flatten_text([structure.get("description"), structure.get("content")]),
+    }]
+
+    for key, module in iter_modules(get_structure_modules(structure)):
+        if isinstance(module, dict):
+            title = str(module.get("title") or module.get("name") or key)
+        else:
+            title = key
+        documents.append({"kind": KIND_MODULE, "ref": key, "title": title, "text": _flatten_text(module)})
+
+    messages = structure.get("messages")
+    if isinstance(messages, list):
+        for index, message in enumerate(messages):
+            if not isinstance(message, dict) or not isinstance(message.get("content"), str):
+                continue
+            documents.append({
+                "kind": KIND_MESSAGE,
+                "ref": str(index),
+                "title": str(message.get("role") or ""),
+                "text": message["content"][:MAX_BODY_CHARS],
+            })
+    return documents
+
+
+def _document_hash(document: Dict[str, str]) -> str:
+    digest = hashlib.sha1()
+    for key in ("title", "text"):
+        digest.update(document[key].encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _excerpt(text: str, query: str, width: int = 80) -> str:
+    """最初に一致した検索語の前後を切り出す"""
+    lowered = text.lower()
+    position = -1
+    for term in (query or "").split():
+        position = lowered.find(term.lower())
+        if position >= 0:
+            break
+    if position < 0:
+        return text[:width * 2]
+    start = max(0, position - width)
+    prefix = "…" if start > 0 else ""
+    suffix = "…" if position + width < len(text) else ""
+    return prefix + text[start:position + width] + suffix
+
+
+class StructureSearchIndex:
+    """
+    構成の全文検索インデックス
+
+    1つのSQLiteファイルをスレッド間で共有し、書き込みはロックで直列化する。
+    """
+
+    def __init__(self, db_path: str, data_dir: Optional[str] = None):
+        """
+        Args:
+            db_path: インデックスファイルのパス（":memory:" も可）
+            data_dir: 更新を取り込む構成ディレクトリ
+        """
+        self.db_path = db_path
+        self.data_dir = data_dir
+        self._lock = threading.RLock()
+        self._last_sync = 0.0
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            if db_path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            self._conn.commit()
+
+    def close(self) -> None:
+        """接続を閉じる"""
+        with self._lock:
+            self._conn.close()
+
+    # ------------------------------------------------------------------
+    # 更新
+    # ------------------------------------------------------------------
+
+    def index_structure(
+        self,
+        structure_id: str,
+        structure: Dict[str, Any],
+        path: Optional[str] = None,
+        mtime_ns: Optional[int] = None
+    ) -> Dict[str, int]:
+        """
+        構成をインデックスに登録する（内容が変わった文書だけを更新する）
+
+        Args:
+            structure_id: 構成ID
+            structure: 構成データ
+            path: 構成ファイルのパス
+            mtime_ns: 構成ファイルの更新日時
+
+        Returns:
+            Dict[str, int]: added / updated / removed / unchanged の件数
+        """
+        documents = {f"{doc['kind']}:{doc['ref']}": doc for doc in extract_documents(structure)}
+        providers, score = _evaluation_summary(structure)
+        metadata = structure.get("metadata") if isinstance(structure.get("metadata"), dict) else {}
+        updated_at = str(metadata.get("updated_at") or structure.get("updated_at") or "")
+        if not updated_at and mtime_ns is not None:
+            updated_at = datetime.fromtimestamp(mtime_ns / 1e9).isoformat()
+        counts = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+
+        with self._lock:
+            conn = self._conn
+            existing = {
+                row["doc_key"]: (row["hash"], row["rowid_ref"])
+                for row in conn.execute(
+                    "SELECT doc_key, hash, rowid_ref FROM doc_hashes WHERE structure_id = ?", (structure_id,))
+            }
+            try:
+                for doc_key, (_, rowid) in existing.items():
+                    if doc_key not in documents:
+                        conn.execute("DELETE FROM docs WHERE rowid = ?", (rowid,))
+                        conn.execute("DELETE FROM doc_hashes WHERE structure_id = ? AND doc_key = ?",
+                                     (structure_id, doc_key))
+                        counts["removed"] += 1
+
+                for doc_key, document in documents.items():
+                    doc_hash = _document_hash(document)
+                    previous = existing.get(doc_key)
+                    if previous and previous[0] == doc_hash:
+                        counts["unchanged"] += 1
+                        continue
+                    if previous:
+                        conn.execute("DELETE FROM docs WHERE rowid = ?", (previous[1],))
+                        counts["updated"] += 1
+                    else:
+                        counts["added"] += 1
+                    cursor = conn.execute(
+                        "INSERT INTO docs (structure_id, kind, ref, title, body, text) VALUES (?, ?, ?, ?, ?, ?)",
+                        (structure_id, document["kind"], document["ref"],
+                         " ".join(tokenize(document["title"])), " ".join(tokenize(document["text"])),
+                         document["text"] or document["title"])
+                    )
+                    conn.execute(
+                        "INSERT OR REPLACE INTO doc_hashes (structure_id, doc_key, hash, rowid_ref) VALUES (?, ?, ?, ?)",
+                        (structure_id, doc_key, doc_hash, cursor.lastrowid)
+                    )
+
+                conn.execute(
+                    "INSERT OR REPLACE INTO structures "
+                    "(structure_id, title, description, score, updated_at, path, mtime_ns) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (structure_id, str(structure.get("title") or ""), str(structure.get("description") or ""),
+                     score, updated_at, path, mtime_ns)
+                )
+                conn.execute("DELETE FROM structure_providers WHERE structure_id = ?", (structure_id,))
+                conn.executemany("INSERT INTO structure_providers (structure_id, provider) VALUES (?, ?)",
+                                 [(structure_id, provider) for provider in providers])
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        return counts
+
+    def remove_structure(self, structure_id: str) -> None:
+        """
+        構成をインデックスから削除する
+
+        Args:
+            structure_id: 構成ID
+        """
+        with self._lock:
+            for table in ("docs", "doc_hashes", "structures", "structure_providers"):
+                self._conn.execute(f"DELETE FROM {table} WHERE structure_id = ?", (structure_id,))
+            self._conn.commit()
+
+    def sync_directory(self, data_dir: Optional[str] = None, force: bool = False) -> Dict[str, int]:
+        """
+        構成ディレクトリの変更を取り込む（更新日時が変わったファイルだけを読み込む）
+
+        Args:
+            data_dir: 構成ディレクトリ（省略時は初期化時のディレクトリ）
+            force: 前回の確認からの経過時間に関係なく確認する
+
+        Returns:
+            Dict[str, int]: indexed / removed / skipped の件数
+        """
+        data_dir = data_dir or self.data_dir
+        counts = {"indexed": 0, "removed": 0, "skipped": 0}
+        if not data_dir or not os.path.isdir(data_dir):
+            return counts
+        now = time.monotonic()
+        if not force and now - self._last_sync < SYNC_INTERVAL:
+            return counts
+        self._last_sync = now
+
+        with self._lock:
+            known = {
+                row["structure_id"]: (row["path"], row["mtime_ns"])
+                for row in self._conn.execute("SELECT structure_id, path, mtime_ns FROM structures")
+            }
+
+        seen = set()
+        for root, _, files in os.walk(data_dir):
+            for filename in files:
+                if not filename.endswith(".json") or "_history" in filename:
+                    continue
+                structure_id = filename[:-len(".json")]
+                if structure_id in seen:
+                    continue
+                path = os.path.join(root, filename)
+                try:
+                    mtime_ns = os.stat(path).st_mtime_ns
+                except OSError:
+                    continue
+                seen.add(structure_id)
+                if known.get(structure_id, (None, None))[1] == mtime_ns:
+                    counts["skipped"] += 1
+                    continue
+                try:
+                    structure = read_json(path)
+                    if isinstance(structure, dict):
+                        self.index_structure(structure_id, structure, path=path, mtime_ns=mtime_ns)
+                        counts["indexed"] += 1
+                except Exception as e:
+                    logger.warning(f"⚠️ 検索インデックスへの登録に失敗: {path} → {e}")
+
+        for structure_id, (path, _) in known.items():
+            if structure_id not in seen and path:
+                self.remove_structure(structure_id)
+                counts["removed"] += 1
+
+        if counts["indexed"] or counts["removed"]:
+            logger.info(f"🔎 検索インデックスを更新: {counts}")
+        return counts
+
+    # ------------------------------------------------------------------
+    # 検索
+    # ------------------------------------------------------------------
+
+    def search(
+        self,
+        query: str,
+        provider: Optional[str] = None,
+        min_score: Optional[float] = None,
+        max_score: Optional[float] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        kinds: Optional[Iterable[str]] = None,
+        page: int = 1,
+        per_page: int = 20
+    ) -> Dict[str, Any]:
+        """
+        構成を検索する（構成ごとに最も関連度の高い文書で順位付けする）
+
+        Args:
+            query: 検索語（空白区切りはAND）
+            provider: 評価・生成したプロバイダー
+            min_score: 評価スコアの下限
+            max_score: 評価スコアの上限
+            since: 更新日時の下限（ISO形式の前方一致比較）
+            until: 更新日時の上限
+            kinds: 対象の文書種類（structure / module / message）
+            page: ページ番号（1始まり）
+            per_page: 1ページの件数
+
+        Returns:
+            Dict[str, Any]: results / total_count / page / per_page / pages
+        """
+        page = max(1, int(page))
+        per_page = min(max(1, int(per_page)), MAX_PER_PAGE)
+        empty = {"results": [], "total_count": 0, "page": page, "per_page": per_page, "pages": 0}
+        match = build_match_query(query)
+        if match is None:
+            return empty
+
+        conditions = ["docs MATCH ?"]
+        params: List[Any] = [match]
+        kinds = [kind for kind in (kinds or []) if kind]
+        if kinds:
+            conditions.append(f"docs.kind IN ({', '.join('?' for _ in kinds)})")
+            params.extend(kinds)
+        if provider:
+            conditions.append(
+                "docs.structure_id IN (SELECT structure_id FROM structure_providers WHERE provider = ?)")
+            params.append(provider.lower())
+        if min_score is not None:
+            conditions.append("s.score >= ?")
+            params.append(float(min_score))
+        if max_score is not None:
+            conditions.append("s.score <= ?")
+            params.append(float(max_score))
+        if since:
+            conditions.append("s.updated_at >= ?")
+            params.append(since)
+        if until:
+            conditions.append("s.updated_at <= ?")
+            params.append(until if "T" in until else f"{until}T23:59:59.999999")
+        where = " AND ".join(conditions)
+
+        matched = (
+            f"SELECT docs.structure_id AS structure_id, docs.kind AS kind, docs.ref AS ref, "
+            f"docs.text AS text, {_BM25} AS rank "
+            f"FROM docs JOIN structures s ON s.structure_id = docs.structure_id WHERE {where}"
+        )
+        best = (
+            f"SELECT structure_id, kind, ref, text, rank, "
+            f"ROW_NUMBER() OVER (PARTITION BY structure_id ORDER BY rank) AS position, "
+            f"COUNT(*) OVER (PARTITION BY structure_id) AS hits FROM ({matched})"
+        )
+
+        with self._lock:
+            total = self._conn.execute(
+                f"SELECT COUNT(DISTINCT structure_id) FROM ({matched})", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT b.*, s.title, s.description, s.score, s.updated_at FROM ({best}) b "
+                f"JOIN structures s ON s.structure_id = b.structure_id "
+                f"WHERE b.position = 1 ORDER BY b.rank, b.structure_id LIMIT ? OFFSET ?",
+                params + [per_page, (page - 1) * per_page]
+            ).fetchall()
+            providers = self._providers([row["structure_id"] for row in rows])
+
+        results = [{
+            "structure_id": row["structure_id"],
+            "title": row["title"],
+            "description": row["description"],
+            "score": row["score"],
+            "updated_at": row["updated_at"],
+            "providers": providers.get(row["structure_id"], []),
+            "rank": round(-row["rank"], 4),
+            "hits": row["hits"],
+            "best_match": {"kind": row["kind"], "ref": row["ref"], "excerpt": _excerpt(row["text"], query)},
+        } for row in rows]
+        return {
+            "results": results,
+            "total_count": total,
+            "page": page,
+            "per_page": per_page,
+            "pages": (total + per_page - 1) // per_page,
+        }
+
+    def _providers(self, structure_ids: List[str]) -> Dict[str, List[str]]:
+        if not structure_ids:
+            return {}
+        placeholders = ", ".join("?" for _ in structure_ids)
+        providers: Dict[str, List[str]] = {}
+        for row in self._conn.execute(
+                f"SELECT structure_id, provider FROM structure_providers WHERE structure_id IN ({placeholders}) "
+                f"ORDER BY provider", structure_ids):
+            providers.setdefault(row["structure_id"], []).append(row["provider"])
+        return providers
+
+    def stats(self) -> Dict[str, Any]:
+        """登録件数を返す"""
+        with self._lock:
+            structures = self._conn.execute("SELECT COUNT(*) FROM structures").fetchone()[0]
+            documents = {
+                row["kind"]: row["count"]
+                for row in self._conn.execute("SELECT kind, COUNT(*) AS count FROM docs GROUP BY kind")
+            }
+        return {"structures": structures, "documents": documents}
+
+
+_indexes: Dict[str, StructureSearchIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_search_index(data_dir: Optional[str] = None) -> StructureSearchIndex:
+    """
+    データディレクトリごとの検索インデックスを返す
+
+    インデックスファイルは環境変数 AIDEX_SEARCH_INDEX で変更できる（既定はデータディレクトリ直下）。
+
+    Args:
+        data_dir: 構成ディレクトリ（省略時は get_data_dir()）
+
+    Returns:
+        StructureSearchIndex: 検索インデックス
+    """
+    if data_dir is None:
+        from src.structure.utils import get_data_dir
+        data_dir = get_data_dir()
+    db_path = os.environ.get("AIDEX_SEARCH_INDEX") or os.path.join(data_dir, INDEX_FILENAME)
+    key = os.path.abspath(db_path) if db_path != ":memory:" else db_path
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = StructureSearchIndex(db_path, data_dir=data_dir)
+            _indexes[key] = index
+        return index
+
+
+def index_saved_structure(structure_id: str, structure: Dict[str, Any], path: str) -> None:
+    """
+    保存直後の構成をインデックスに反映する（失敗しても保存処理には影響させない）
+
+    環境変数 AIDEX_SEARCH_INDEX_ENABLED=0 で無効にできる。
+
+    Args:
+        structure_id: 構成ID
+        structure: 保存した構成データ
+        path: 保存先のパス
+    """
+    if os.environ.get("AIDEX_SEARCH_INDEX_ENABLED", "1") == "0":
+        return
+    try:
+        index = get_search_index(os.path.dirname(path))
+        index.index_structure(structure_id, structure, path=path, mtime_ns=os.stat(path).st_mtime_ns)
+    except Exception as e:
+        logger.warning(f"⚠️ 検索インデックスの更新に失敗: {structure_id} → {e}")
+
+
+__all__ = [
+    "KIND_STRUCTURE",
+    "KIND_MODULE",
+    "KIND_MESSAGE",
+    "tokenize",
+    "build_match_query",
+    "extract_documents",
+    "StructureSearchIndex",
+    "get_search_index",
+    "index_saved_structure",
+]
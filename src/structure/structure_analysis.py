@@ -1,10 +1,14 @@
 """
 構成分析モジュール
 構造JSONの完成度・状態を分析する機能を提供
+
+ルールの評価とメモ化は src.structure.rule_engine が行う。
 """
 
 import logging
-from typing import Dict, List, Any, Optional
+from typing import Optional
+
+from src.structure.rule_engine import get_rule_engine
 
 logger = logging.getLogger(__name__)
 
@@ -26,150 +30,7 @@ def analyze_structure_state(structure: Optional[dict]) -> dict:
             "diagnostic_message": str,     # 診断結果メッセージ
         }
     """
-    logger.debug(f"構成分析開始: structure keys = {list(structure.keys()) if structure else 'None'}")
-    
-    # 初期化
-    result = {
-        "is_empty": False,
-        "module_count": 0,
-        "incomplete_modules": [],
-        "missing_fields": [],
-        "diagnostic_message": ""
-    }
-    
-    # 空チェック
-    if not structure:
-        result["is_empty"] = True
-        result["diagnostic_message"] = "構成が空です"
-        logger.debug("構成が空と判定")
-        return result
-    
-    # modulesの存在チェック
-    modules = structure.get("modules")
-    if not modules:
-        result["is_empty"] = True
-        result["diagnostic_message"] = "モジュールが定義されていません"
-        logger.debug("モジュールが存在しないと判定")
-        return result
-    
-    # modulesがリストかチェック
-    if not isinstance(modules, list):
-        result["is_empty"] = True
-        result["diagnostic_message"] = "モジュールがリスト形式ではありません"
-        logger.debug(f"モジュールがリストではない: {type(modules)}")
-        return result
-    
-    # モジュール数
-    result["module_count"] = len(modules)
-    logger.debug(f"モジュール数: {result['module_count']}")
-    
-    # 空のモジュールリストの場合
-    if result["module_count"] == 0:
-        result["is_empty"] = True
-        result["diagnostic_message"] = "モジュールが定義されていません"
-        logger.debug("モジュールリストが空と判定")
-        return result
-    
-    # 必須フィールドの定義
-    required_fields = ["title", "description"]
-    optional_fields = ["type", "id", "dependencies", "config"]
-    
-    # 全体で出現しているフィールドを収集
-    all_fields = set()
-    incomplete_modules = []
-    
-    # 各モジュールを分析
-    for i, module in enumerate(modules):
-        if not isinstance(module, dict):
-            logger.warning(f"モジュール {i} が辞書ではありません: {type(module)}")
-            incomplete_modules.append({
-                "index": i,
-                "name": f"モジュール{i}",
-                "reason": "辞書形式ではありません"
-            })
-            continue
-        
-        # フィールドを収集
-        module_fields = set(module.keys())
-        all_fields.update(module_fields)
-        
-        # 必須フィールドのチェック
-        missing_required = []
-        for field in required_fields:
-            if field not in module or not module[field]:
-                missing_required.append(field)
-        
-        if missing_required:
-            module_name = module.get("title", f"モジュール{i}")
-            incomplete_modules.append({
-                "index": i,
-                "name": module_name,
-                "missing_fields": missing_required,
-                "reason": f"必須フィールドが不足: {', '.join(missing_required)}"
-            })
-            logger.debug(f"モジュール {i} ({module_name}) に不足フィールド: {missing_required}")
-    
-    result["incomplete_modules"] = incomplete_modules
-    
-    # 全体で不足しているフィールドを判定
-    missing_fields = []
-    for field in required_fields:
-        if field not in all_fields:
-            missing_fields.append(field)
-    
-    result["missing_fields"] = missing_fields
-    
-    # 診断メッセージを生成
-    result["diagnostic_message"] = generate_diagnostic_message(result)
-    
-    logger.debug(f"構成分析完了: {result['diagnostic_message']}")
-    return result
-
-
-def generate_diagnostic_message(analysis_result: dict) -> str:
-    """
-    分析結果から診断メッセージを生成
-    
-    Args:
-        analysis_result: analyze_structure_state()の結果
-        
-    Returns:
-        診断メッセージ
-    """
-    if analysis_result["is_empty"]:
-        return analysis_result["diagnostic_message"]
-    
-    module_count = analysis_result["module_count"]
-    incomplete_count = len(analysis_result["incomplete_modules"])
-    missing_fields = analysis_result["missing_fields"]
-    
-    messages = []
-    
-    # モジュール数
-    if module_count == 0:
-        messages.append("モジュールが定義されていません")
-    elif module_count == 1:
-        messages.append("1個のモジュールが定義されています")
-    else:
-        messages.append(f"{module_count}個のモジュールが定義されています")
-    
-    # 不完全なモジュール
-    if incomplete_count > 0:
-        if incomplete_count == 1:
-            messages.append("1個のモジュールに記述漏れがあります")
-        else:
-            messages.append(f"{incomplete_count}個のモジュールに記述漏れがあります")
-    
-    # 不足フィールド
-    if missing_fields:
-        fields_str = ", ".join(missing_fields)
-        messages.append(f"{fields_str} が不足しています")
-    
-    # 完全な場合
-    if incomplete_count == 0 and not missing_fields and module_count > 0:
-        messages.append("構成は完成しています")
-    
-    return "。".join(messages) + "。"
+    return get_rule_engine().state(structure)
 
 
 def get_structure_completion_rate(structure: dict) -> float:
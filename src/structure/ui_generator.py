@@ -1,7 +1,9 @@
 # utils/gemini_ui.py
 
 import json
+from src.common import json_codec
 from src.llm.controller import AIController
+from src.common.model_routing import get_model_router
 from src.llm.providers.base import ChatMessage
 from typing import Dict, Any, Optional, List, cast, TypedDict, Union
 import logging
@@ -103,7 +105,7 @@ def call_gemini_for_ui(structure: dict) -> dict:
         # JSON文字列の解析
         if isinstance(raw_json_str, str):
             try:
-                free_structure = json.loads(raw_json_str)
+                free_structure = json_codec.loads(raw_json_str)
             except json.JSONDecodeError as e:
                 raise ValueError(f"JSONの解析に失敗しました: {str(e)}")
         else:
@@ -135,20 +137,20 @@ def call_gemini_ui_generator(structure: dict) -> dict:
         # 構造の取得
         content = structure.get("content", {})
         if isinstance(content, str):
-            content = json.loads(content)
+            content = json_codec.loads(content)
         
         # Gemini APIを呼び出し
         messages = [
             ChatMessage(
                 role="user",
-                content=f"以下の構成に対して、UI設計の提案をしてください：\n{json.dumps(content, ensure_ascii=False, indent=2)}"
+                content=f"以下の構成に対して、UI設計の提案をしてください：\n{json_codec.dumps(content, indent=2)}"
             )
         ]
         
         response = AIController.call(
             provider="gemini",
             messages=messages,
-            model="gemini-pro",
+            model=get_model_router().model_for("generate", "gemini"),
             max_tokens=1000
         )
         
@@ -171,14 +173,14 @@ def generate_ui_with_gemini(structure: StructureDict) -> UIComponent:
     messages = [
         ChatMessage(
             role="user",
-            content=f"Generate a UI structure for:\n{json.dumps(structure, indent=2)}"
+            content=f"Generate a UI structure for:\n{json_codec.dumps(structure, indent=2, ensure_ascii=True)}"
         )
     ]
     
     response = AIController.call(
         provider="gemini",
         messages=messages,
-        model="gemini-pro"
+        model=get_model_router().model_for("generate", "gemini")
     )
     
     if not response or "content" not in response:
@@ -191,7 +193,7 @@ def generate_ui_with_gemini(structure: StructureDict) -> UIComponent:
     
     try:
         # Parse response and ensure it matches UIComponent type
-        result = json.loads(response["content"])
+        result = json_codec.loads(response["content"])
         return cast(UIComponent, {
             "type": str(result.get("type", "div")),
             "props": dict(result.get("props", {})),
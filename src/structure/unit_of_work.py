@@ -0,0 +1,317 @@
+"""
+構成ユニットオブワークモジュール
+
+このモジュールは、1リクエスト内で構成の読み込みを1回に抑え、変更されたフィールドを追跡し、
+レスポンスを返す前にまとめて1回だけ保存する機能を提供します。
+"""
+
+import logging
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from flask import Flask, g, got_request_exception, has_app_context, jsonify, make_response
+
+from src.structure.fingerprint import FINGERPRINT_KEY, EVALUATION_CACHE_KEY, hash_value
+
+logger = logging.getLogger(__name__)
+
+# flask.g に保持する属性名
+_G_ATTRIBUTE = "_structure_unit_of_work"
+# ビューで例外が発生したことを示す flask.g の属性名
+_G_FAILED = "_structure_unit_of_work_failed"
+
+# 変更検出の対象外とするフィールド（保存時に再計算されるため）
+_UNTRACKED_FIELDS = (FINGERPRINT_KEY, EVALUATION_CACHE_KEY)
+
+Loader = Callable[[str], Optional[Dict[str, Any]]]
+Saver = Callable[..., Any]
+
+
+def _field_hashes(structure: Dict[str, Any]) -> Dict[str, str]:
+    """トップレベルフィールドごとのハッシュを計算する"""
+    return {
+        key: hash_value(value)
+        for key, value in structure.items()
+        if key not in _UNTRACKED_FIELDS
+    }
+
+
+class StructureUnitOfWork:
+    """リクエスト単位で構成の読み込み・変更追跡・保存をまとめるクラス"""
+
+    def __init__(self, loader: Optional[Loader] = None, saver: Optional[Saver] = None):
+        """
+        StructureUnitOfWorkの初期化
+
+        Args:
+            loader: 構成の読み込み関数（load で指定しない場合に使用。デフォルト: load_structure_by_id）
+            saver: 構成の保存関数（stage で指定しない場合に使用。デフォルト: save_structure）
+        """
+        self._loader = loader
+        self._saver = saver
+        self._savers: Dict[str, Saver] = {}
+        self._identity_map: Dict[str, Dict[str, Any]] = {}
+        self._snapshots: Dict[str, Dict[str, str]] = {}
+        self._staged: Set[str] = set()
+        self._explicit_dirty: Dict[str, Set[str]] = {}
+        self.load_count = 0
+        self.write_count = 0
+
+    def load(self, structure_id: str, loader: Optional[Loader] = None) -> Optional[Dict[str, Any]]:
+        """
+        構成を読み込む（同一リクエスト内では2回目以降はキャッシュ済みのオブジェクトを返す）
+
+        Args:
+            structure_id: 構成ID
+            loader: 読み込み関数（省略時は初期化時の関数）
+
+        Returns:
+            Optional[Dict[str, Any]]: 構成データ（存在しない場合はNone）
+        """
+        if structure_id in self._identity_map:
+            return self._identity_map[structure_id]
+
+        loader = loader or self._loader
+        if loader is None:
+            from src.structure.utils import load_structure_by_id as loader
+        structure = loader(structure_id)
+        self.load_count += 1
+        if not structure:
+            return structure
+
+        self._identity_map[structure_id] = structure
+        self._snapshots[structure_id] = _field_hashes(structure)
+        return structure
+
+    def stage(
+        self,
+        structure_id: str,
+        structure: Dict[str, Any],
+        changed_paths: Optional[List[str]] = None,
+        saver: Optional[Saver] = None
+    ) -> bool:
+        """
+        構成を保存対象として登録する（実際の書き込みはcommit時）
+
+        Args:
+            structure_id: 構成ID
+            structure: 構成データ
+            changed_paths: 変更済みと分かっているパス（任意）
+            saver: この構成の保存関数（省略時は初期化時の関数。最後に指定されたものを使う）
+
+        Returns:
+            bool: 常にTrue（save_structureと同じ戻り値の形に合わせる）
+        """
+        current = self._identity_map.get(structure_id)
+        if current is not None and current is not structure:
+            # 別オブジェクトで置き換えられた場合は全フィールドを変更扱いにする
+            self._snapshots.pop(structure_id, None)
+        self._identity_map[structure_id] = structure
+        self._staged.add(structure_id)
+        if saver is not None:
+            self._savers[structure_id] = saver
+        if changed_paths:
+            self.mark_dirty(structure_id, *changed_paths)
+        return True
+
+    def mark_dirty(self, structure_id: str, *paths: str) -> None:
+        """
+        変更されたパスを明示的に記録する
+
+        Args:
+            structure_id: 構成ID
+            *paths: 変更されたパス（例: "messages", "modules/<key>"）
+        """
+        self._explicit_dirty.setdefault(structure_id, set()).update(paths)
+
+    def dirty_fields(self, structure_id: str) -> Optional[List[str]]:
+        """
+        読み込み時から変更されたフィールドを取得する
+
+        Args:
+            structure_id: 構成ID
+
+        Returns:
+            Optional[List[str]]: 変更されたパス（読み込み時のスナップショットがない場合はNone=全体）
+        """
+        structure = self._identity_map.get(structure_id)
+        snapshot = self._snapshots.get(structure_id)
+        if structure is None or snapshot is None:
+            return None
+
+        current = _field_hashes(structure)
+        changed = {key for key in set(snapshot) | set(current) if snapshot.get(key) != current.get(key)}
+        explicit = self._explicit_dirty.get(structure_id, set())
+        # 明示されたパスのうち、トップレベルが変更されているものは詳細パスとして残す
+        detailed = {path for path in explicit if path.split("/", 1)[0] in changed}
+        top_level = {key for key in changed if not any(path.split("/", 1)[0] == key for path in detailed)}
+        return sorted(top_level | detailed)
+
+    @property
+    def pending(self) -> List[str]:
+        """保存待ちの構成IDのリスト"""
+        return sorted(self._staged)
+
+    def commit(self) -> Dict[str, bool]:
+        """
+        保存対象の構成を書き込む（変更がない構成は書き込まない）
+
+        Returns:
+            Dict[str, bool]: 構成IDごとの保存結果
+        """
+        results: Dict[str, bool] = {}
+        for structure_id in sorted(self._staged):
+            structure = self._identity_map.get(structure_id)
+            if structure is None:
+                continue
+            changed = self.dirty_fields(structure_id)
+            if changed is not None and not changed:
+                logger.debug(f"⏭️ 変更がないため保存をスキップ - structure_id: {structure_id}")
+                results[structure_id] = True
+                continue
+            saver = self._savers.get(structure_id) or self._saver
+            if saver is None:
+                from src.structure.utils import save_structure as saver
+            try:
+                result = saver(structure_id, structure, changed_paths=changed)
+                results[structure_id] = result is not False
+                self.write_count += 1
+                logger.info(f"💾 構成を保存しました - structure_id: {structure_id}, 変更: {changed if changed is not None else '全体'}")
+            except Exception as e:
+                logger.error(f"❌ 構成の保存に失敗しました - structure_id: {structure_id}, error: {str(e)}")
+                results[structure_id] = False
+                continue
+            self._snapshots[structure_id] = _field_hashes(structure)
+            self._explicit_dirty.pop(structure_id, None)
+
+        self._staged = {structure_id for structure_id, ok in results.items() if not ok}
+        return results
+
+    def discard(self) -> List[str]:
+        """
+        保存待ちの構成を書き込まずに破棄する（ビューが失敗した場合用）
+
+        Returns:
+            List[str]: 破棄した構成ID
+        """
+        discarded = self.pending
+        self._staged.clear()
+        return discarded
+
+
+def get_unit_of_work() -> Optional[StructureUnitOfWork]:
+    """
+    現在のリクエストに紐付いたユニットオブワークを取得する
+
+    読み込み関数・保存関数は構成ごとに load / stage で指定する。
+
+    Returns:
+        Optional[StructureUnitOfWork]: アプリケーションコンテキスト外ではNone
+    """
+    if not has_app_context():
+        return None
+    uow = getattr(g, _G_ATTRIBUTE, None)
+    if uow is None:
+        uow = StructureUnitOfWork()
+        setattr(g, _G_ATTRIBUTE, uow)
+    return uow
+
+
+def load_structure_for_request(structure_id: str, loader: Optional[Loader] = None) -> Optional[Dict[str, Any]]:
+    """
+    リクエスト内で構成を読み込む（コンテキスト外では直接読み込む）
+
+    Args:
+        structure_id: 構成ID
+        loader: 読み込み関数
+
+    Returns:
+        Optional[Dict[str, Any]]: 構成データ
+    """
+    uow = get_unit_of_work()
+    if uow is None:
+        if loader is None:
+            from src.structure.utils import load_structure_by_id as loader
+        return loader(structure_id)
+    return uow.load(structure_id, loader=loader)
+
+
+def stage_structure(
+    structure_id: str,
+    structure: Dict[str, Any],
+    changed_paths: Optional[List[str]] = None,
+    saver: Optional[Saver] = None
+) -> bool:
+    """
+    構成をレスポンス前の保存対象に登録する（コンテキスト外では即時保存する）
+
+    Args:
+        structure_id: 構成ID
+        structure: 構成データ
+        changed_paths: 変更済みと分かっているパス
+        saver: 保存関数
+
+    Returns:
+        bool: 登録（または保存）に成功したかどうか
+    """
+    uow = get_unit_of_work()
+    if uow is None:
+        if saver is None:
+            from src.structure.utils import save_structure as saver
+        return saver(structure_id, structure, changed_paths=changed_paths)
+    return uow.stage(structure_id, structure, changed_paths, saver=saver)
+
+
+def init_unit_of_work(app: Flask) -> None:
+    """
+    レスポンスを返す前に保存待ちの構成を書き込むフックを登録する
+
+    保存に失敗した場合は 500 を返す。ビューで例外が発生した場合や 5xx を返す場合は、
+    途中までの変更を書き込まずに破棄する。
+
+    Args:
+        app: Flaskアプリケーション
+    """
+
+    def _mark_failed(sender, exception, **extra):
+        if has_app_context():
+            setattr(g, _G_FAILED, True)
+
+    got_request_exception.connect(_mark_failed, app, weak=False)
+
+    @app.after_request
+    def _commit_structures(response):
+        uow = getattr(g, _G_ATTRIBUTE, None)
+        if uow is None or not uow.pending:
+            return response
+        if getattr(g, _G_FAILED, False) or response.status_code >= 500:
+            discarded = uow.discard()
+            logger.warning(f"⚠️ リクエストが失敗したため構成を保存しません - structure_id: {', '.join(discarded)}")
+            return response
+
+        results = uow.commit()
+        failed = sorted(structure_id for structure_id, ok in results.items() if not ok)
+        if failed:
+            uow.discard()
+            return make_response(jsonify({
+                "success": False,
+                "error": "構成の保存に失敗しました",
+                "structure_ids": failed
+            }), 500)
+        return response
+
+    @app.teardown_request
+    def _discard_structures(exc):
+        # after_request を経ずに終わった場合（例外の伝播など）は書き込まない
+        uow = getattr(g, _G_ATTRIBUTE, None)
+        if uow is not None and uow.pending:
+            discarded = uow.discard()
+            logger.warning(f"⚠️ 保存されなかった構成を破棄しました - structure_id: {', '.join(discarded)}")
+
+
+__all__ = [
+    "StructureUnitOfWork",
+    "get_unit_of_work",
+    "load_structure_for_request",
+    "stage_structure",
+    "init_unit_of_work",
+]
@@ -8,7 +8,14 @@ import uuid
 import logging
 from datetime import datetime
 from uuid import uuid4
-from typing import Dict, Any, List, Optional, cast, TypedDict, Union, Tuple
+from typing import Dict, Any, List, Optional, cast, TypedDict, Union, Tuple, Iterable
+from src.structure.fingerprint import update_fingerprints
+from src.structure.search_index import index_saved_structure
+from src.structure.version_store import HEAD_KEY, record_version, structure_log
+from src.common import json_codec
+from src.common.shared_cache import invalidate_structure
+from src.common.storage_codec import read_json, write_json
+from src.common.tracing import traced
 # from src.types import StructureDict, StructureHistory  # 型エラーのため一時的にコメントアウト
 
 # Initialize logger
@@ -23,9 +30,6 @@ def get_data_dir():
 logger.debug(f"🔧 DATA_DIR設定: {get_data_dir()} (AIDEX_DATA_DIR: {os.environ.get('AIDEX_DATA_DIR', '未設定')})")
 
 # 型定義を一時的にここで定義
-StructureDict = Dict[str, Any]
-StructureHistory = Dict[str, Any]
-
 class StructureHistory(TypedDict):
     """構造の履歴データ型"""
     timestamp: str
@@ -65,19 +69,32 @@ def get_structure(structure_id: str) -> Optional[StructureDict]:
         if not os.path.exists(file_path):
             return None
             
-        with open(file_path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return read_json(file_path)
     except Exception as e:
         print(f"Error loading structure: {e}")
         return None
 
-def save_structure(structure_id: str, structure: StructureDict) -> bool:
+@traced("storage.save_structure")
+def save_structure(
+    structure_id: str,
+    structure: StructureDict,
+    changed_paths: Optional[Iterable[str]] = None
+) -> bool:
     """
     構成を保存する
     
+    保存前にフィンガープリント（構成・モジュール・セクションのハッシュ）を更新する。
+    changed_pathsが指定された場合は、そのパスに沿ったノードのみを再計算する。
+    保存後は全文検索インデックスの変更のあった文書だけを更新し、共有キャッシュの構成のスコープの
+    リビジョンを進める。他のワーカープロセスでは、このリビジョンを含むキー（プレビューのHTMLとETag、
+    条件付きGETのETag）のエントリが最大 AIDEX_CACHE_REVISION_INTERVAL 秒後に読まれなくなる
+    （src.common.shared_cache）。
+    保存形式は AIDEX_STORAGE_CODEC に従う（src.common.storage_codec）。
+    
     Args:
         structure_id (str): 構成のID
         structure (StructureDict): 保存する構成データ
+        changed_paths (Optional[Iterable[str]]): 変更されたパス（例: "modules/<key>"）
         
     Returns:
         bool: 保存が成功したかどうか
@@ -88,11 +105,15 @@ def save_structure(structure_id: str, structure: StructureDict) -> bool:
         os.makedirs(data_dir, exist_ok=True)
         file_path = os.path.join(data_dir, f"{structure_id}.json")
         
-        # Convert datetime objects to strings
-        structure_json = json.dumps(structure, ensure_ascii=False, indent=2, default=str)
+        if isinstance(structure, dict):
+            update_fingerprints(cast(Dict[str, Any], structure), changed_paths)
         
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(structure_json)
+        # datetimeなどは文字列にして保存する
+        write_json(file_path, structure)
+        
+        if isinstance(structure, dict):
+            index_saved_structure(structure_id, cast(Dict[str, Any], structure), file_path)
+        invalidate_structure(structure_id, data_dir)
         return True
     except Exception as e:
         print(f"Error saving structure: {e}")
@@ -114,7 +135,7 @@ def get_structure_history(structure_id: str) -> Optional[StructureHistory]:
             return None
             
         with open(file_path, "r", encoding="utf-8") as f:
-            return json.load(f)
+            return json_codec.loads(f.read())
     except Exception as e:
         print(f"Error loading history: {e}")
         return None
@@ -135,7 +156,7 @@ def save_structure_history(history: StructureHistory, structure_id: str) -> bool
         file_path = f"histories/{structure_id}.json"
         
         with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(history, f, ensure_ascii=False, indent=2)
+            f.write(json_codec.dumps(history, indent=2))
         return True
     except Exception as e:
         print(f"Error saving history: {e}")
@@ -151,50 +172,75 @@ def load_structures() -> List[Dict[str, Any]]:
                 continue
             path = os.path.join(root, filename)
             try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-
-                    # Convert content string to dict if needed
-                    if isinstance(data.get("content"), str):
-                        try:
-                            data["content"] = json.loads(data["content"])
-                        except Exception as e:
-                            logger.error(f"⚠ contentデコード失敗: {filename} → {e}")
-                            data["content"] = {"sections": [], "pages": []}
-
-                    # Add last modified time
-                    updated_at = datetime.fromtimestamp(os.path.getmtime(path)).strftime('%Y-%m-%d %H:%M:%S')
-                    data['updated_at'] = updated_at
-
-                    # Add evaluation info if present
-                    evaluation = data.get("evaluation", {})
-                    data["intent_match"] = round(evaluation.get("intent_match", 0) * 100, 1) if evaluation else None
-                    data["quality_score"] = round(evaluation.get("quality_score", 0) * 100, 1) if evaluation else None
-                    data["intent_reason"] = evaluation.get("intent_reason", "")
-
-                    structures.append(data)
+                data = read_json(path)
+                # Convert content string to dict if needed
+                if isinstance(data.get("content"), str):
+                    try:
+                        data["content"] = json_codec.loads(data["content"])
+                    except Exception as e:
+                        logger.error(f"⚠ contentデコード失敗: {filename} → {e}")
+                        data["content"] = {"sections": [], "pages": []}
+
+                # Add last modified time
+                updated_at = datetime.fromtimestamp(os.path.getmtime(path)).strftime('%Y-%m-%d %H:%M:%S')
+                data['updated_at'] = updated_at
+
+                # Add evaluation info if present
+                evaluation = data.get("evaluation", {})
+                data["intent_match"] = round(evaluation.get("intent_match", 0) * 100, 1) if evaluation else None
+                data["quality_score"] = round(evaluation.get("quality_score", 0) * 100, 1) if evaluation else None
+                data["intent_reason"] = evaluation.get("intent_reason", "")
+
+                structures.append(data)
             except Exception as e:
                 logger.error(f"読み込み失敗: {filename} → {e}")
     return structures
 
-def load_structure_by_id(structure_id: str) -> Optional[Dict[str, Any]]:
+def get_structure_candidate_paths(structure_id: str) -> List[str]:
     """
-    指定されたIDの構成を複数の候補パスから検索して読み込む
+    構成ファイルの候補パスを優先順に返す（AIDEX_DATA_DIRを最優先）
     
     Args:
         structure_id (str): 構成のID
         
     Returns:
-        Optional[Dict[str, Any]]: 構成データ、存在しない場合はNone
+        List[str]: 候補パスのリスト
     """
-    # 候補パスのリスト（AIDEX_DATA_DIRを最優先）
-    possible_paths = [
+    return [
         os.path.join(get_data_dir(), "default", f"{structure_id}.json"),  # AIDEX_DATA_DIR/default/
         os.path.join(get_data_dir(), f"{structure_id}.json"),             # AIDEX_DATA_DIR/
         f"data/default/{structure_id}.json",                        # 従来のパス（後方互換性）
         f"structures/{structure_id}.json",                          # 従来のパス（後方互換性）
         f"data/{structure_id}.json"                                 # 従来のパス（後方互換性）
     ]
+
+def find_structure_file(structure_id: str) -> Optional[str]:
+    """
+    load_structure_by_idが読み込むファイルのパスを返す（ファイル本体は読まない）
+    
+    Args:
+        structure_id (str): 構成のID
+        
+    Returns:
+        Optional[str]: 最初に見つかった構成ファイルのパス、存在しない場合はNone
+    """
+    for path in get_structure_candidate_paths(structure_id):
+        if os.path.exists(path):
+            return path
+    return None
+
+def load_structure_by_id(structure_id: str) -> Optional[Dict[str, Any]]:
+    """
+    指定されたIDの構成を複数の候補パスから検索して読み込む
+    
+    Args:
+        structure_id (str): 構成のID
+        
+    Returns:
+        Optional[Dict[str, Any]]: 構成データ、存在しない場合はNone
+    """
+    # 候補パスのリスト（AIDEX_DATA_DIRを最優先）
+    possible_paths = get_structure_candidate_paths(structure_id)
     
     logger.info(f"📂 構成ファイル読み込み開始: {structure_id}")
     logger.debug(f"  -> DATA_DIR: {get_data_dir()}")
@@ -203,11 +249,11 @@ def load_structure_by_id(structure_id: str) -> Optional[Dict[str, Any]]:
         logger.debug(f"  -> 試行パス: {path}")
         if os.path.exists(path):
             try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    structure = json.load(f)
+                structure = read_json(path)
                 logger.info(f"  ✅ 成功: {path}")
                 return structure
-            except json.JSONDecodeError as e:
+            except ValueError as e:
+                # json.JSONDecodeError と展開できない圧縮ファイル
                 logger.error(f"  ❌ JSONデコードエラー: {path} - {e}")
                 continue  # 次の候補へ
             except Exception as e:
@@ -221,13 +267,29 @@ def load_structure_by_id(structure_id: str) -> Optional[Dict[str, Any]]:
     return None
 
 def load_previous_version(structure_id: str) -> Optional[Dict[str, Any]]:
-    """Load the previous version of a structure"""
+    """
+    構成の1つ前のバージョンを読み込む
+
+    構成が head を持つ場合はバージョンストアから復元し、
+    持たない場合は従来の履歴ファイル（<id>_history.json）を読む。
+
+    Args:
+        structure_id: 構成のID
+
+    Returns:
+        Optional[Dict[str, Any]]: 1つ前の履歴のエントリ（1件しかない場合はその1件）
+    """
+    structure = load_structure_by_id(structure_id)
+    if isinstance(structure, dict) and structure.get(HEAD_KEY):
+        entries = structure_log(structure, limit=2)
+        if entries:
+            return entries[0]
+
     history_path = get_history_path(structure_id)
     if not os.path.exists(history_path):
         return None
 
-    with open(history_path, "r", encoding="utf-8") as f:
-        history = json.load(f)
+    history = read_json(history_path)
 
     if not history:
         return None
@@ -235,31 +297,19 @@ def load_previous_version(structure_id: str) -> Optional[Dict[str, Any]]:
     return history[-2] if len(history) >= 2 else history[-1]
 
 def append_structure_log(structure: Dict[str, Any], action: str, detail: str = "") -> None:
-    """Append a log entry to a structure's history"""
-    now = datetime.now().isoformat()
-
-    # Convert content to string for snapshot
-    snapshot_content = (
-        json.dumps(structure["content"], ensure_ascii=False, indent=2)
-        if isinstance(structure.get("content"), dict)
-        else structure.get("content", "")
-    )
-
-    log_entry = {
-        "timestamp": now,
-        "action": action,
-        "detail": detail,
-        "snapshot": {
-            "content": snapshot_content,
-            "title": structure.get("title", ""),
-            "description": structure.get("description", "")
-        }
-    }
+    """
+    構成の現在の内容をバージョンストアに記録し、head を進める
 
-    if "history" not in structure:
-        structure["history"] = []
+    スナップショットは構成ファイルに埋め込まず、モジュール・セクション単位で
+    src.structure.version_store に保存する（変更のない部分は前のバージョンと共有される）。
+    履歴は structure_log() で従来の形（timestamp / action / detail / snapshot）に復元できる。
 
-    structure["history"].append(log_entry)
+    Args:
+        structure: 構成データ（head を更新する）
+        action: 操作の種類
+        detail: 操作の詳細
+    """
+    record_version(structure, action, detail, datetime.now().isoformat())
 
 def get_candidates_for_evolution(threshold: float = 0.85) -> List[Dict[str, Any]]:
     """Get structures that need evolution (not final and low score)"""
@@ -270,11 +320,10 @@ def get_candidates_for_evolution(threshold: float = 0.85) -> List[Dict[str, Any]
                 continue
             path = os.path.join(root, filename)
             try:
-                with open(path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    if not data.get("is_final", False):
-                        if data.get("intent_match", 1.0) < threshold:
-                            candidates.append(data)
+                data = read_json(path)
+                if not data.get("is_final", False):
+                    if data.get("intent_match", 1.0) < threshold:
+                        candidates.append(data)
             except Exception as e:
                 logger.error(f"読み込み失敗: {filename} → {e}")
     return candidates
@@ -350,7 +399,7 @@ def normalize_structure_for_pages(content: Dict[str, Any]) -> Dict[str, Any]:
 def ensure_json_string(structure: Dict[str, Any]) -> Dict[str, Any]:
     """Ensure structure content is a JSON string"""
     if isinstance(structure.get("content"), dict):
-        structure["content"] = json.dumps(structure["content"], ensure_ascii=False, indent=2)
+        structure["content"] = json_codec.dumps(structure["content"], indent=2)
     return structure
 
 def update_structure_content(original: str, updates: list[dict]) -> str:
@@ -383,7 +432,7 @@ def validate_structure(structure: Union[Dict[str, Any], str]) -> Tuple[bool, Lis
         # JSON文字列の場合は辞書に変換
         if isinstance(structure, str):
             try:
-                structure = json.loads(structure)
+                structure = json_codec.loads(structure)
             except json.JSONDecodeError as e:
                 errors.append(f"JSONの解析に失敗しました: {str(e)}")
                 return False, errors
@@ -405,7 +454,7 @@ def validate_structure(structure: Union[Dict[str, Any], str]) -> Tuple[bool, Lis
         # contentが文字列の場合はJSONとしてパース可能かチェック
         if isinstance(structure.get("content"), str):
             try:
-                json.loads(structure["content"])
+                json_codec.loads(structure["content"])
             except json.JSONDecodeError:
                 errors.append("'content' のJSONパースに失敗しました")
         
@@ -441,7 +490,7 @@ def normalize_structure_format(structure: Union[Dict[str, Any], str]) -> Dict[st
         # JSON文字列の場合は辞書に変換
         if isinstance(structure, str):
             try:
-                structure = json.loads(structure)
+                structure = json_codec.loads(structure)
             except json.JSONDecodeError as e:
                 raise ValueError(f"JSONの解析に失敗しました: {str(e)}")
         
@@ -458,7 +507,7 @@ def normalize_structure_format(structure: Union[Dict[str, Any], str]) -> Dict[st
         # contentが文字列の場合はJSONとしてパース
         if isinstance(normalized["content"], str):
             try:
-                normalized["content"] = json.loads(normalized["content"])
+                normalized["content"] = json_codec.loads(normalized["content"])
             except json.JSONDecodeError:
                 normalized["content"] = {"raw": normalized["content"]}
         
@@ -505,9 +554,8 @@ def load_structure(structure_id: str) -> Dict[str, Any]:
         if not os.path.exists(structure_path):
             raise FileNotFoundError(f"構造データファイルが見つかりません: {structure_path}")
         
-        # ファイルを読み込む
-        with open(structure_path, 'r', encoding='utf-8') as f:
-            structure = json.load(f)
+        # ファイルを読み込む（圧縮形式も判定して読む）
+        structure = read_json(structure_path)
         
         # 構造データを正規化
         return normalize_structure_format(structure)
@@ -570,6 +618,8 @@ __all__ = [
     'StructureDict',
     'StructureHistory',
     'get_structure_path',
+    'get_structure_candidate_paths',
+    'find_structure_file',
     'get_history_path',
     'get_structure',
     'save_structure',
@@ -577,8 +627,10 @@ __all__ = [
     'save_structure_history',
     'load_structures',
     'load_structure',
+    'load_structure_by_id',
     'load_previous_version',
     'append_structure_log',
+    'structure_log',
     'get_candidates_for_evolution',
     'summarize_structure',
     'summarize_user_requirements',
@@ -4,6 +4,8 @@ Structure validation module for AIDE-X
 import json
 from typing import Dict, Any, List, Union
 
+from src.common import json_codec
+
 def evaluate_structure_content(content_json_str: str) -> Dict[str, Any]:
     """
     Evaluate structure content without using Claude
@@ -15,7 +17,7 @@ def evaluate_structure_content(content_json_str: str) -> Dict[str, Any]:
         Dict[str, Any]: Evaluation results including intent match, quality score, and reason
     """
     try:
-        content = json.loads(content_json_str)
+        content = json_codec.loads(content_json_str)
     except json.JSONDecodeError:
         return {
             "intent_match": 0,
@@ -49,7 +51,7 @@ def validate_structure(content_input: Union[str, Dict[str, Any]]) -> List[str]:
     # Parse string to dict if needed
     if isinstance(content_input, str):
         try:
-            content = json.loads(content_input)
+            content = json_codec.loads(content_input)
         except json.JSONDecodeError:
             errors.append("構成内容が不正なJSONです。")
             return errors
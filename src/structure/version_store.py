@@ -0,0 +1,402 @@
+"""
+構成のバージョンストアモジュール
+
+構成のスナップショットを、git のオブジェクトと同じようにコンテンツハッシュで
+アドレスされるオブジェクトとして保存します。
+
+- blob: JSONの値そのもの（セクション・モジュールの項目・タイトルなど）
+- tree: 子オブジェクトのハッシュの並び（content のキー・モジュール・セクション単位で分割）
+- version: スナップショットの tree と親バージョン、操作の記録（timestamp / action / detail）
+
+同じ内容の blob・tree は1つだけ保存されるため、変更のないモジュールやセクションは
+バージョン間で共有されます。構成ファイルには最新バージョンのハッシュ（head）だけを持ち、
+履歴はバージョンの親をたどって復元します。
+
+オブジェクトはデータディレクトリ直下の .versions/objects に保存されます
+（拡張子を付けないため load_structures からは読まれません）。
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+from src.common import json_codec
+
+logger = logging.getLogger(__name__)
+
+# ストアのディレクトリ名（データディレクトリ直下）
+STORE_DIRNAME = ".versions"
+
+# 構成ファイルに保存する最新バージョンのキー
+HEAD_KEY = "head"
+
+# 構成ファイルに埋め込まれていた従来の履歴のキー
+LEGACY_HISTORY_KEY = "history"
+
+# スナップショットに含める構成のフィールド
+# 従来のスナップショット（title / description / content）に加え、トップレベルの modules も含める
+SNAPSHOT_FIELDS = ("title", "description", "content", "modules")
+
+# tree に分割する位置（レベルごとに、子のキーと子のレベルの対応。"*" はすべての子）
+# ここにない値はまとめて1つの blob になる
+SPLIT_RULES: Dict[str, Dict[str, str]] = {
+    "snapshot": {"content": "content", "modules": "modules"},
+    "content": {"modules": "modules", "sections": "sections", "pages": "sections"},
+    "modules": {"*": "module"},
+    "module": {"sections": "sections"},
+    "sections": {"*": "blob"},
+}
+
+
+class VersionStore:
+    """
+    コンテンツアドレスのオブジェクトストア
+
+    Args:
+        root: オブジェクトを保存するディレクトリ
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    # ------------------------------------------------------------------
+    # オブジェクト
+    # ------------------------------------------------------------------
+
+    def _object_path(self, object_id: str) -> str:
+        return os.path.join(self.root, "objects", object_id[:2], object_id[2:])
+
+    def has(self, object_id: str) -> bool:
+        """オブジェクトが保存済みかどうか"""
+        return bool(object_id) and os.path.exists(self._object_path(object_id))
+
+    def put(self, obj: Dict[str, Any]) -> str:
+        """
+        オブジェクトを保存してハッシュを返す（保存済みなら書き込まない）
+
+        キーの順序を保ったままシリアライズした文字列のハッシュをIDにするため、
+        復元した値のキーの順序は保存時と変わらない。
+
+        Args:
+            obj: type を持つオブジェクト（blob / tree / version）
+
+        Returns:
+            str: オブジェクトのハッシュ
+        """
+        data = json_codec.dumps(obj, separators=json_codec.COMPACT_SEPARATORS, default=str)
+        object_id = hashlib.sha256(data.encode("utf-8")).hexdigest()
+        path = self._object_path(object_id)
+        if os.path.exists(path):
+            return object_id
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # 同時に書き込まれても壊れたファイルが見えないように一時ファイルから置き換える
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return object_id
+
+    def get(self, object_id: str) -> Dict[str, Any]:
+        """
+        オブジェクトを読み込む
+
+        Args:
+            object_id: オブジェクトのハッシュ
+
+        Returns:
+            Dict[str, Any]: オブジェクト
+
+        Raises:
+            KeyError: オブジェクトが存在しない場合
+        """
+        path = self._object_path(object_id or "")
+        if not object_id or not os.path.exists(path):
+            raise KeyError(object_id)
+        with open(path, "rb") as f:
+            return json_codec.loads(f.read())
+
+    # ------------------------------------------------------------------
+    # スナップショット
+    # ------------------------------------------------------------------
+
+    def write_value(self, value: Any, level: str = "snapshot") -> str:
+        """
+        値を分割規則に沿って blob / tree として保存する
+
+        Args:
+            value: 保存する値
+            level: SPLIT_RULES のレベル
+
+        Returns:
+            str: 値を表すオブジェクトのハッシュ
+        """
+        rules = SPLIT_RULES.get(level)
+        if rules and isinstance(value, dict):
+            entries = [
+                [str(key), self.write_value(child, rules.get(key, rules.get("*", "blob")))]
+                for key, child in value.items()
+            ]
+            return self.put({"type": "tree", "kind": "dict", "entries": entries})
+        if rules and "*" in rules and isinstance(value, list):
+            items = [self.write_value(child, rules["*"]) for child in value]
+            return self.put({"type": "tree", "kind": "list", "items": items})
+        return self.put({"type": "blob", "data": value})
+
+    def read_value(self, object_id: str) -> Any:
+        """
+        write_value で保存した値を復元する
+
+        Args:
+            object_id: blob または tree のハッシュ
+
+        Returns:
+            Any: 復元した値
+        """
+        obj = self.get(object_id)
+        if obj.get("type") == "blob":
+            return obj.get("data")
+        if obj.get("kind") == "list":
+            return [self.read_value(child) for child in obj.get("items", [])]
+        return {key: self.read_value(child) for key, child in obj.get("entries", [])}
+
+    # ------------------------------------------------------------------
+    # バージョン
+    # ------------------------------------------------------------------
+
+    def commit(self, snapshot: Dict[str, Any], parent: Optional[str], timestamp: str,
+               action: str, detail: str = "") -> str:
+        """
+        スナップショットを新しいバージョンとして保存する
+
+        Args:
+            snapshot: スナップショット（SNAPSHOT_FIELDS の値）
+            parent: 親バージョンのハッシュ
+            timestamp: 操作の時刻
+            action: 操作の種類
+            detail: 操作の詳細
+
+        Returns:
+            str: バージョンのハッシュ
+        """
+        return self.put({
+            "type": "version",
+            "tree": self.write_value(snapshot),
+            "parent": parent,
+            "timestamp": timestamp,
+            "action": action,
+            "detail": detail,
+        })
+
+    def get_version(self, version_id: str) -> Dict[str, Any]:
+        """
+        バージョンを読み込む
+
+        Raises:
+            KeyError: バージョンが存在しない場合
+        """
+        obj = self.get(version_id)
+        if obj.get("type") != "version":
+            raise KeyError(version_id)
+        return obj
+
+    def checkout(self, version_id: str) -> Dict[str, Any]:
+        """
+        バージョンのスナップショットを復元する
+
+        Args:
+            version_id: バージョンのハッシュ
+
+        Returns:
+            Dict[str, Any]: スナップショット
+        """
+        return self.read_value(self.get_version(version_id)["tree"])
+
+    def iter_versions(self, head: Optional[str], limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        head から親をたどってバージョンを新しい順に返す（id を付けたコピー）
+
+        Args:
+            head: 最新バージョンのハッシュ
+            limit: 最大件数
+
+        Yields:
+            Dict[str, Any]: バージョン
+        """
+        version_id = head
+        count = 0
+        seen = set()
+        while version_id and version_id not in seen and (limit is None or count < limit):
+            seen.add(version_id)
+            try:
+                version = self.get_version(version_id)
+            except KeyError:
+                logger.warning(f"⚠️ バージョンが見つかりません: {version_id}")
+                return
+            yield {"id": version_id, **version}
+            version_id = version.get("parent")
+            count += 1
+
+
+def make_snapshot(structure: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    構成からスナップショットに含めるフィールドを取り出す
+
+    modules は構成にある場合だけ含める。content が従来のスナップショットのように
+    JSON文字列の場合は辞書に戻す。
+
+    Args:
+        structure: 構成データ
+
+    Returns:
+        Dict[str, Any]: スナップショット
+    """
+    snapshot = {
+        field: structure.get(field, "")
+        for field in SNAPSHOT_FIELDS
+        if field != "modules" or field in structure
+    }
+    content = snapshot["content"]
+    if isinstance(content, str) and content.lstrip().startswith("{"):
+        try:
+            snapshot["content"] = json_codec.loads(content)
+        except ValueError:
+            pass
+    return snapshot
+
+
+def legacy_snapshot(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    スナップショットを従来の履歴の形（content は整形済みJSON文字列）にする
+
+    Args:
+        snapshot: checkout で復元したスナップショット
+
+    Returns:
+        Dict[str, Any]: content / title / description（modules があれば modules も）
+    """
+    content = snapshot.get("content", "")
+    legacy = {
+        "content": json_codec.dumps(content, indent=2) if isinstance(content, dict) else content,
+        "title": snapshot.get("title", ""),
+        "description": snapshot.get("description", ""),
+    }
+    if "modules" in snapshot:
+        legacy["modules"] = snapshot["modules"]
+    return legacy
+
+
+def record_version(structure: Dict[str, Any], action: str, detail: str, timestamp: str,
+                   store: Optional[VersionStore] = None) -> str:
+    """
+    構成の現在の内容を新しいバージョンとして保存し、head を進める
+
+    構成ファイルに従来の履歴（スナップショットを埋め込んだ history）がある場合は、
+    先にそれをバージョンとして取り込み、history を取り除く。
+
+    Args:
+        structure: 構成データ（head を更新する）
+        action: 操作の種類
+        detail: 操作の詳細
+        timestamp: 操作の時刻
+        store: バージョンストア（省略時は get_version_store()）
+
+    Returns:
+        str: 新しいバージョンのハッシュ
+    """
+    store = store or get_version_store()
+    head = structure.get(HEAD_KEY)
+    legacy = structure.pop(LEGACY_HISTORY_KEY, None)
+    if isinstance(legacy, list):
+        for entry in legacy:
+            if not isinstance(entry, dict):
+                continue
+            head = store.commit(
+                make_snapshot(entry.get("snapshot") or {}), head,
+                entry.get("timestamp", ""), entry.get("action", ""), entry.get("detail", ""),
+            )
+    head = store.commit(make_snapshot(structure), head, timestamp, action, detail)
+    structure[HEAD_KEY] = head
+    return head
+
+
+def structure_log(structure: Dict[str, Any], limit: Optional[int] = None,
+                  store: Optional[VersionStore] = None) -> List[Dict[str, Any]]:
+    """
+    構成の履歴を従来の形（timestamp / action / detail / snapshot）で古い順に返す
+
+    head がなく従来の history を持つ構成はそのまま返す。
+
+    Args:
+        structure: 構成データ
+        limit: 新しいものから数えた最大件数
+        store: バージョンストア（省略時は get_version_store()）
+
+    Returns:
+        List[Dict[str, Any]]: 履歴のエントリ（version にバージョンのハッシュを含む）
+    """
+    head = structure.get(HEAD_KEY)
+    if not head:
+        legacy = structure.get(LEGACY_HISTORY_KEY) or []
+        return list(legacy[-limit:] if limit else legacy)
+    store = store or get_version_store()
+    entries = [
+        {
+            "timestamp": version.get("timestamp", ""),
+            "action": version.get("action", ""),
+            "detail": version.get("detail", ""),
+            "snapshot": legacy_snapshot(store.read_value(version["tree"])),
+            "version": version["id"],
+        }
+        for version in store.iter_versions(head, limit)
+    ]
+    entries.reverse()
+    return entries
+
+
+_stores: Dict[str, VersionStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_version_store(data_dir: Optional[str] = None) -> VersionStore:
+    """
+    データディレクトリごとのバージョンストアを返す
+
+    Args:
+        data_dir: 構成ディレクトリ（省略時は get_data_dir()）
+
+    Returns:
+        VersionStore: バージョンストア
+    """
+    if data_dir is None:
+        from src.structure.utils import get_data_dir
+        data_dir = get_data_dir()
+    root = os.path.abspath(os.path.join(data_dir, STORE_DIRNAME))
+    with _stores_lock:
+        store = _stores.get(root)
+        if store is None:
+            store = VersionStore(root)
+            _stores[root] = store
+        return store
+
+
+__all__ = [
+    "HEAD_KEY",
+    "SNAPSHOT_FIELDS",
+    "SPLIT_RULES",
+    "STORE_DIRNAME",
+    "VersionStore",
+    "get_version_store",
+    "legacy_snapshot",
+    "make_snapshot",
+    "record_version",
+    "structure_log",
+]
@@ -14,19 +14,27 @@ from pathlib import Path
 import re
 from copy import deepcopy
 
+from src.common import json_codec
+from src.common.llm_capture import CaptureStore, get_capture_store
+
 logger = logging.getLogger(__name__)
 
+# 差分ログ（JSON）の既定の保存ディレクトリ
+DEFAULT_DIFF_LOG_DIR = os.path.join("logs", "claude_gemini_diff")
+
 class StructureFeedbackEngine:
     """構造フィードバックエンジン"""
     
-    def __init__(self, log_dir: str = "logs/claude_gemini_diff"):
+    def __init__(self, log_dir: str = DEFAULT_DIFF_LOG_DIR, capture_store: Optional[CaptureStore] = None):
         """
         初期化
         
         Args:
             log_dir (str): 差分ログの保存ディレクトリ
+            capture_store (Optional[CaptureStore]): 差分ログも記録するキャプチャストア（省略時は共通のキャプチャストア）
         """
         self.log_dir = log_dir
+        self.capture_store = capture_store
         os.makedirs(log_dir, exist_ok=True)
     
     def fix_unquoted_keys(self, json_str: str) -> str:
@@ -71,7 +79,7 @@ class StructureFeedbackEngine:
         """
         try:
             # まず通常のJSONパースを試行
-            parsed_json = json.loads(json_str)
+            parsed_json = json_codec.loads(json_str)
             if reference_json:
                 # 参照JSONがある場合は、不足しているキーを補完
                 return self.complement_missing_keys(parsed_json, reference_json), True
@@ -80,7 +88,7 @@ class StructureFeedbackEngine:
             # 未クオートキーの修正を試行
             fixed_json = self.fix_unquoted_keys(json_str)
             try:
-                parsed_json = json.loads(fixed_json)
+                parsed_json = json_codec.loads(fixed_json)
                 if reference_json:
                     # 参照JSONがある場合は、不足しているキーを補完
                     return self.complement_missing_keys(parsed_json, reference_json), True
@@ -106,7 +114,7 @@ class StructureFeedbackEngine:
         fixed_json = self.fix_unquoted_keys(broken_json)
         try:
             # 修正後のJSONをパース
-            parsed_json = json.loads(fixed_json)
+            parsed_json = json_codec.loads(fixed_json)
             # 参照JSONと比較して不足しているキーを補完
             return self.complement_missing_keys(parsed_json, reference_json)
         except json.JSONDecodeError:
@@ -159,14 +167,18 @@ class StructureFeedbackEngine:
         
         return result
     
-    def save_diff_log(self, original: str, repaired: Dict[str, Any], reference: Optional[Dict[str, Any]] = None) -> str:
+    def save_diff_log(self, original: str, repaired: Dict[str, Any], reference: Optional[Dict[str, Any]] = None,
+                      provider: str = "unknown") -> str:
         """
         差分ログを保存
         
+        読みやすいJSONファイルとして保存し、同じ内容をキャプチャストアにも記録する。
+        
         Args:
             original (str): 元のJSON文字列
             repaired (Dict[str, Any]): 修復後のJSON
             reference (Optional[Dict[str, Any]]): 参照用のJSON
+            provider (str): 元のJSONを出力したプロバイダー名
             
         Returns:
             str: ログファイルのパス
@@ -176,15 +188,19 @@ class StructureFeedbackEngine:
         
         log_data = {
             "timestamp": timestamp,
+            "provider": provider,
             "original": original,
             "repaired": repaired,
             "reference": reference,
-            "diff": self.generate_diff(original, json.dumps(repaired, indent=2))
+            "diff": self.generate_diff(original, json_codec.dumps(repaired, indent=2, ensure_ascii=True))
         }
         
         with open(log_file, "w", encoding="utf-8") as f:
-            json.dump(log_data, f, ensure_ascii=False, indent=2)
+            f.write(json_codec.dumps(log_data, indent=2))
         
+        # 修復が発生した記録はサンプリングせず、すぐに書き出す
+        store = self.capture_store or get_capture_store()
+        store.capture(provider, "structure_feedback.diff", log_data, outcome="repaired", flush=True)
         return log_file
     
     def generate_diff(self, original: str, repaired: str) -> str:
@@ -205,13 +221,15 @@ class StructureFeedbackEngine:
         )
         return "\n".join(diff)
     
-    def process_structure(self, gemini_output: str, claude_output: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    def process_structure(self, gemini_output: str, claude_output: Optional[Dict[str, Any]] = None,
+                          provider: str = "unknown") -> Dict[str, Any]:
         """
         構造を処理
         
         Args:
             gemini_output (str): Geminiの出力
             claude_output (Optional[Dict[str, Any]]): Claudeの出力
+            provider (str): gemini_output を出力したプロバイダー名（差分ログに記録する）
             
         Returns:
             Dict[str, Any]: 処理後の構造
@@ -222,7 +240,7 @@ class StructureFeedbackEngine:
             
             # 修復が必要だった場合はログを保存
             if was_repaired:
-                self.save_diff_log(gemini_output, repaired_json, claude_output)
+                self.save_diff_log(gemini_output, repaired_json, claude_output, provider=provider)
             
             return repaired_json
             
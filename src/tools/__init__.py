@@ -5,5 +5,6 @@ This package contains utility tools for development and debugging.
 """
 
 from .log_inspector import LogInspector
+from .log_search import LogSearchService
 
-__all__ = ['LogInspector'] 
\ No newline at end of file
+__all__ = ['LogInspector', 'LogSearchService'] 
\ No newline at end of file
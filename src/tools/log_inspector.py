@@ -2,85 +2,76 @@
 """
 ログインスペクターCLIツール
 
-このツールは、app.logファイルから特定の条件でログを検索・絞り込みできます。
+このツールは、app.logファイル（ローテーション済みのファイルを含む）から
+特定の条件でログを検索・絞り込みできます。検索は src.tools.log_search の
+インデックスを使います。
 """
 
 import argparse
-import re
 import sys
-import os
-from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
-from pathlib import Path
+
+from src.tools.log_search import LogSearchService, summarize_entries
 
 class LogInspector:
-    """ログファイルを検索・絞り込みするクラス"""
+    """
+    ログファイルを検索・絞り込みするクラス
+
+    検索は LogSearchService のインデックスを使い、ファイル全体をメモリに読み込まない。
+    """
     
-    def __init__(self, log_file: str = "app.log"):
+    def __init__(self, log_file: str = "app.log", service: Optional[LogSearchService] = None):
         """
         初期化
         
         Args:
             log_file: ログファイルのパス
+            service: 共有するログ検索サービス（省略時は新規作成）
         """
         self.log_file = log_file
-        self.log_entries = []
+        self.service = service or LogSearchService(log_file)
+        self._log_entries: Optional[List[Dict[str, Any]]] = None
         
     def load_logs(self) -> bool:
         """
-        ログファイルを読み込む
+        ログファイル（ローテーション済みを含む）を索引する
         
         Returns:
-            bool: 読み込みが成功したかどうか
+            bool: 索引が成功したかどうか
         """
         try:
-            if not os.path.exists(self.log_file):
+            if not self.service.discover_files():
                 print(f"❌ ログファイルが見つかりません: {self.log_file}")
                 return False
-                
-            with open(self.log_file, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-            
-            self.log_entries = []
-            current_entry = {}
-            
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    continue
-                    
-                # ログエントリの開始を検出（タイムスタンプで始まる行）
-                timestamp_match = re.match(r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) - (\w+) - (.+)', line)
-                if timestamp_match:
-                    # 前のエントリを保存
-                    if current_entry:
-                        self.log_entries.append(current_entry)
-                    
-                    # 新しいエントリを開始
-                    timestamp, level, message = timestamp_match.groups()
-                    current_entry = {
-                        'timestamp': timestamp,
-                        'level': level,
-                        'message': message,
-                        'raw_line': line
-                    }
-                else:
-                    # マルチラインログの続き
-                    if current_entry:
-                        current_entry['message'] += '\n' + line
-                        current_entry['raw_line'] += '\n' + line
             
-            # 最後のエントリを保存
-            if current_entry:
-                self.log_entries.append(current_entry)
-            
-            print(f"✅ ログファイルを読み込みました: {len(self.log_entries)} エントリ")
+            indexes = self.service.refresh()
+            self._log_entries = None
+            print(f"✅ ログファイルを索引しました: {sum(index.entry_count for index in indexes)} エントリ（{len(indexes)} ファイル）")
             return True
             
         except Exception as e:
             print(f"❌ ログファイルの読み込みに失敗しました: {str(e)}")
             return False
     
+    @property
+    def log_entries(self) -> List[Dict[str, Any]]:
+        """全エントリ（参照されたときに初めて読み込む）"""
+        if self._log_entries is None:
+            self._log_entries = list(self.service.iter_entries())
+        return self._log_entries
+    
+    def search(self, **criteria: Any) -> List[Dict[str, Any]]:
+        """
+        複数の条件を組み合わせて検索する
+        
+        Args:
+            **criteria: LogSearchService.search() と同じ検索条件
+            
+        Returns:
+            List[Dict[str, Any]]: 条件に合うログエントリ（古い順）
+        """
+        return list(self.service.iter_entries(**criteria))
+    
     def filter_by_structure_id(self, structure_id: str) -> List[Dict[str, Any]]:
         """
         構成IDでフィルタリング
@@ -91,11 +82,7 @@ class LogInspector:
         Returns:
             List[Dict[str, Any]]: フィルタリングされたログエントリ
         """
-        filtered = []
-        for entry in self.log_entries:
-            if structure_id.lower() in entry['message'].lower():
-                filtered.append(entry)
-        return filtered
+        return self.search(structure_id=structure_id)
     
     def filter_by_user_id(self, user_id: str) -> List[Dict[str, Any]]:
         """
@@ -107,11 +94,7 @@ class LogInspector:
         Returns:
             List[Dict[str, Any]]: フィルタリングされたログエントリ
         """
-        filtered = []
-        for entry in self.log_entries:
-            if user_id.lower() in entry['message'].lower():
-                filtered.append(entry)
-        return filtered
+        return self.search(user_id=user_id)
     
     def filter_by_level(self, level: str) -> List[Dict[str, Any]]:
         """
@@ -123,11 +106,7 @@ class LogInspector:
         Returns:
             List[Dict[str, Any]]: フィルタリングされたログエントリ
         """
-        filtered = []
-        for entry in self.log_entries:
-            if entry['level'].upper() == level.upper():
-                filtered.append(entry)
-        return filtered
+        return self.search(level=level)
     
     def filter_by_date_range(self, start_date: str, end_date: str) -> List[Dict[str, Any]]:
         """
@@ -141,19 +120,7 @@ class LogInspector:
             List[Dict[str, Any]]: フィルタリングされたログエントリ
         """
         try:
-            start_dt = datetime.strptime(start_date, '%Y-%m-%d')
-            end_dt = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
-            
-            filtered = []
-            for entry in self.log_entries:
-                try:
-                    entry_dt = datetime.strptime(entry['timestamp'][:10], '%Y-%m-%d')
-                    if start_dt <= entry_dt < end_dt:
-                        filtered.append(entry)
-                except ValueError:
-                    continue
-            
-            return filtered
+            return self.search(start=start_date, end=end_date)
         except ValueError as e:
             print(f"❌ 日付形式が正しくありません: {str(e)}")
             return []
@@ -168,11 +135,7 @@ class LogInspector:
         Returns:
             List[Dict[str, Any]]: フィルタリングされたログエントリ
         """
-        filtered = []
-        for entry in self.log_entries:
-            if keyword.lower() in entry['message'].lower():
-                filtered.append(entry)
-        return filtered
+        return self.search(keyword=keyword)
     
     def display_logs(self, logs: List[Dict[str, Any]], show_timestamp: bool = True, show_level: bool = True):
         """
@@ -216,47 +179,7 @@ class LogInspector:
         Returns:
             Dict[str, Any]: 統計情報
         """
-        if not logs:
-            return {}
-        
-        stats = {
-            'total_entries': len(logs),
-            'levels': {},
-            'structure_ids': set(),
-            'user_ids': set(),
-            'date_range': {'start': None, 'end': None}
-        }
-        
-        for entry in logs:
-            # ログレベルの集計
-            level = entry['level']
-            stats['levels'][level] = stats['levels'].get(level, 0) + 1
-            
-            # 構成IDの抽出
-            structure_match = re.search(r'structure_id: ([a-zA-Z0-9_-]+)', entry['message'])
-            if structure_match:
-                stats['structure_ids'].add(structure_match.group(1))
-            
-            # ユーザーIDの抽出
-            user_match = re.search(r'ユーザー: ([a-zA-Z0-9_-]+)', entry['message'])
-            if user_match:
-                stats['user_ids'].add(user_match.group(1))
-            
-            # 日付範囲の更新
-            try:
-                entry_date = datetime.strptime(entry['timestamp'][:10], '%Y-%m-%d')
-                if stats['date_range']['start'] is None or entry_date < stats['date_range']['start']:
-                    stats['date_range']['start'] = entry_date
-                if stats['date_range']['end'] is None or entry_date > stats['date_range']['end']:
-                    stats['date_range']['end'] = entry_date
-            except ValueError:
-                continue
-        
-        # setをlistに変換
-        stats['structure_ids'] = list(stats['structure_ids'])
-        stats['user_ids'] = list(stats['user_ids'])
-        
-        return stats
+        return summarize_entries(logs)
     
     def display_statistics(self, stats: Dict[str, Any]):
         """
@@ -294,20 +217,26 @@ def main():
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog="""
 使用例:
-  python log_inspector.py --structure-id test-001
-  python log_inspector.py --user-id user123 --level INFO
-  python log_inspector.py --start-date 2025-06-19 --end-date 2025-06-20
-  python log_inspector.py --keyword "構成評価"
+  python -m src.tools.log_inspector --structure-id test-001
+  python -m src.tools.log_inspector --user-id user123 --level INFO
+  python -m src.tools.log_inspector --start-date 2025-06-19 --end-date 2025-06-20
+  python -m src.tools.log_inspector --keyword "構成評価" --page 2 --per-page 50
+  python -m src.tools.log_inspector --request-id 3f2a9c --raw
         """
     )
     
     parser.add_argument('--log-file', default='app.log', help='ログファイルのパス (デフォルト: app.log)')
     parser.add_argument('--structure-id', help='構成IDでフィルタリング')
     parser.add_argument('--user-id', help='ユーザーIDでフィルタリング')
-    parser.add_argument('--level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], help='ログレベルでフィルタリング')
-    parser.add_argument('--start-date', help='開始日 (YYYY-MM-DD形式)')
-    parser.add_argument('--end-date', help='終了日 (YYYY-MM-DD形式)')
+    parser.add_argument('--request-id', help='リクエストIDでフィルタリング')
+    parser.add_argument('--level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL'], help='ログレベルでフィルタリング')
+    parser.add_argument('--start-date', help='開始日時 (YYYY-MM-DD または "YYYY-MM-DD HH:MM:SS")')
+    parser.add_argument('--end-date', help='終了日時 (YYYY-MM-DD または "YYYY-MM-DD HH:MM:SS")')
     parser.add_argument('--keyword', help='キーワードでフィルタリング')
+    parser.add_argument('--page', type=int, default=1, help='ページ番号 (デフォルト: 1)')
+    parser.add_argument('--per-page', type=int, default=100, help='1ページの件数 (デフォルト: 100)')
+    parser.add_argument('--newest-first', action='store_true', help='新しい順に表示')
+    parser.add_argument('--no-rotated', action='store_true', help='ローテーション済みのファイルを検索しない')
     parser.add_argument('--no-timestamp', action='store_true', help='タイムスタンプを非表示')
     parser.add_argument('--no-level', action='store_true', help='ログレベルを非表示')
     parser.add_argument('--stats', action='store_true', help='統計情報を表示')
@@ -316,36 +245,41 @@ def main():
     args = parser.parse_args()
     
     # ログインスペクターを初期化
-    inspector = LogInspector(args.log_file)
+    inspector = LogInspector(args.log_file, LogSearchService(args.log_file, include_rotated=not args.no_rotated))
     
-    # ログファイルを読み込み
+    # ログファイルを索引
     if not inspector.load_logs():
         sys.exit(1)
     
-    # フィルタリング
-    filtered_logs = inspector.log_entries
-    
-    if args.structure_id:
-        filtered_logs = inspector.filter_by_structure_id(args.structure_id)
-        print(f"🔍 構成ID '{args.structure_id}' でフィルタリング: {len(filtered_logs)}件")
-    
-    if args.user_id:
-        filtered_logs = inspector.filter_by_user_id(args.user_id)
-        print(f"🔍 ユーザーID '{args.user_id}' でフィルタリング: {len(filtered_logs)}件")
-    
-    if args.level:
-        filtered_logs = inspector.filter_by_level(args.level)
-        print(f"🔍 ログレベル '{args.level}' でフィルタリング: {len(filtered_logs)}件")
-    
-    if args.start_date and args.end_date:
-        filtered_logs = inspector.filter_by_date_range(args.start_date, args.end_date)
-        print(f"🔍 日付範囲 '{args.start_date}' ～ '{args.end_date}' でフィルタリング: {len(filtered_logs)}件")
+    # すべての条件を組み合わせて検索
+    criteria = {
+        'structure_id': args.structure_id,
+        'user_id': args.user_id,
+        'request_id': args.request_id,
+        'level': args.level,
+        'start': args.start_date,
+        'end': args.end_date,
+        'keyword': args.keyword,
+    }
+    try:
+        result = inspector.service.search(
+            page=args.page,
+            per_page=args.per_page,
+            newest_first=args.newest_first,
+            **criteria
+        )
+    except ValueError as e:
+        print(f"❌ 日付形式が正しくありません: {str(e)}")
+        sys.exit(1)
     
-    if args.keyword:
-        filtered_logs = inspector.filter_by_keyword(args.keyword)
-        print(f"🔍 キーワード '{args.keyword}' でフィルタリング: {len(filtered_logs)}件")
+    active = {key: value for key, value in criteria.items() if value}
+    if active:
+        print(f"🔍 条件 {active} で検索: {result['total_count']}件")
+    if result['pages'] > 1:
+        print(f"📄 ページ {result['page']}/{result['pages']}（{result['per_page']}件/ページ）")
     
     # 結果を表示
+    filtered_logs = result['logs']
     if args.raw:
         for entry in filtered_logs:
             print(entry['raw_line'])
@@ -356,11 +290,11 @@ def main():
             show_level=not args.no_level
         )
     
-    # 統計情報を表示
+    # 統計情報を表示（ページではなく条件に合う全件が対象）
     if args.stats:
-        stats = inspector.get_statistics(filtered_logs)
+        stats = inspector.service.stats(**criteria)
         inspector.display_statistics(stats)
 
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,606 @@
+"""
+インデックス付きログ検索サービス
+
+app.log とローテーション済みファイル（app.log.1、app.log.2025-06-19.gz など）を
+ストリーミングで1回だけ走査し、ファイルごとに次のインデックスを作成します。
+
+- タイムスタンプの疎なインデックス（一定バイトごとの (タイムスタンプ, オフセット)）
+  → 期間指定を二分探索でオフセット範囲に変換する
+- レベル・構成ID・ユーザーID・リクエストID・識別子トークンのポスティングリスト
+  → 条件に合うエントリのオフセットだけを読む
+
+稼働中のファイルは追記分だけを差分でインデックスに追加し、ローテーション済みの
+ファイルは (サイズ, 更新時刻) が変わらない限り再利用します。検索結果はページ単位で
+返し、該当ページのエントリだけをファイルから読み出します。
+"""
+
+import bisect
+import glob
+import gzip
+import logging
+import os
+import re
+import threading
+from array import array
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# 疎なインデックスの間隔（バイト）
+SPARSE_INTERVAL = 64 * 1024
+
+# 1ページあたりの最大件数
+MAX_PER_PAGE = 1000
+
+LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+
+# setup_logging() の詳細フォーマット
+#   2025-06-19 10:00:00,123 - root - INFO - func:12 - メッセージ
+# とシンプルフォーマット
+#   2025-06-19 10:00:00,123 - INFO - メッセージ
+# の両方を解釈する
+_HEADER_RE = re.compile(
+    r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) - (?:(\S+) - )?(DEBUG|INFO|WARNING|ERROR|CRITICAL) - (?:\S+:\d+ - )?(.*)$",
+    re.DOTALL
+)
+# レベル名が標準外の行（LogInspector と同じ解釈）
+_LEGACY_HEADER_RE = re.compile(r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) - (\w+) - (.*)$", re.DOTALL)
+_TIMESTAMP_LEN = 23
+
+# インデックス対象の抽出パターン（バイト列に対して適用する）
+_STRUCTURE_ID_RE = re.compile(rb"structure_id[:=]\s*['\"]?([A-Za-z0-9_-]+)")
+_USER_ID_RE = re.compile("ユーザー(?:ID)?[:：]\\s*([A-Za-z0-9_-]+)".encode("utf-8"))
+_REQUEST_ID_RE = re.compile(rb"(?:request_id|req_id|X-Request-ID)[:=]\s*['\"]?([A-Za-z0-9_-]+)", re.IGNORECASE)
+# 識別子トークン: 英字と、数字・ハイフン・アンダースコアのいずれかを含む3文字以上の語
+_IDENTIFIER_PATTERN = r"(?<![A-Za-z0-9_-])(?=[A-Za-z0-9_-]*[A-Za-z])(?=[A-Za-z0-9_-]*[0-9_-])[A-Za-z0-9][A-Za-z0-9_-]{2,}"
+_TOKEN_RE = re.compile(_IDENTIFIER_PATTERN.encode("ascii"))
+_IDENTIFIER_RE = re.compile(_IDENTIFIER_PATTERN)
+
+FIELDS = ("level", "structure_id", "user_id", "request_id", "token")
+
+
+def _looks_like_header(line: bytes) -> bool:
+    """行がログエントリの開始（タイムスタンプ）かどうかを安価に判定する"""
+    return len(line) >= _TIMESTAMP_LEN and line[4:5] == b"-" and line[10:11] == b" " and line[:4].isdigit()
+
+
+def parse_entry(raw: str) -> Optional[Dict[str, Any]]:
+    """
+    ログエントリの文字列（複数行可）を解析する
+
+    Args:
+        raw: ヘッダー行から始まるエントリ
+
+    Returns:
+        Optional[Dict[str, Any]]: timestamp / level / logger / message / raw_line。ヘッダーでなければNone
+    """
+    raw = raw.rstrip("\r\n")
+    match = _HEADER_RE.match(raw)
+    if match:
+        timestamp, logger_name, level, message = match.groups()
+    else:
+        match = _LEGACY_HEADER_RE.match(raw)
+        if not match:
+            return None
+        timestamp, level, message = match.groups()
+        logger_name = None
+    return {
+        "timestamp": timestamp,
+        "level": level,
+        "logger": logger_name,
+        "message": message,
+        "raw_line": raw,
+    }
+
+
+def normalize_time_bound(value: Union[str, datetime, None], upper: bool = False) -> Optional[str]:
+    """
+    期間指定をログのタイムスタンプと辞書順で比較できる文字列にする
+
+    Args:
+        value: "YYYY-MM-DD"、"YYYY-MM-DD HH:MM[:SS]"、ISO形式、datetime のいずれか
+        upper: 終了側の境界として扱う（日付のみの指定はその日の終わりまで含む）
+
+    Returns:
+        Optional[str]: "YYYY-MM-DD HH:MM:SS,mmm" 形式の文字列
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S,") + f"{value.microsecond // 1000:03d}"
+
+    text = str(value).strip().replace("T", " ")
+    if len(text) == 10:
+        datetime.strptime(text, "%Y-%m-%d")
+        return text + (" 23:59:59,999" if upper else " 00:00:00,000")
+    text = text.replace(".", ",")
+    template = "0000-00-00 00:00:00,000"
+    if upper:
+        template = "0000-00-00 23:59:59,999"
+    # 省略された秒・ミリ秒を境界に合わせて補う
+    if len(text) < len(template):
+        text = text + template[len(text):]
+    datetime.strptime(text[:19], "%Y-%m-%d %H:%M:%S")
+    return text[:len(template)]
+
+
+@dataclass
+class LogFileIndex:
+    """1ファイル分のインデックス"""
+    path: str
+    compressed: bool
+    size: int = 0
+    mtime_ns: int = 0
+    inode: int = 0
+    # 索引済みの末尾オフセットと、その時点で最後に開始したエントリ
+    indexed_end: int = 0
+    last_entry_offset: int = -1
+    first_timestamp: Optional[str] = None
+    last_timestamp: Optional[str] = None
+    # 疎なインデックス（タイムスタンプ昇順）
+    sparse_timestamps: List[str] = field(default_factory=list)
+    sparse_offsets: List[int] = field(default_factory=list)
+    # 全エントリのオフセットとフィールド別ポスティングリスト
+    offsets: array = field(default_factory=lambda: array("q"))
+    postings: Dict[str, Dict[str, array]] = field(default_factory=lambda: {name: {} for name in FIELDS})
+
+    @property
+    def entry_count(self) -> int:
+        return len(self.offsets)
+
+    def add_posting(self, field_name: str, value: str, offset: int) -> None:
+        """ポスティングリストにオフセットを追加する（同じエントリの重複は無視する）"""
+        values = self.postings[field_name]
+        posting = values.get(value)
+        if posting is None:
+            values[value] = array("q", [offset])
+        elif posting[-1] != offset:
+            posting.append(offset)
+
+
+def _open_binary(path: str, compressed: bool) -> BinaryIO:
+    return gzip.open(path, "rb") if compressed else open(path, "rb")
+
+
+def _read_entry_at(fh: BinaryIO, offset: int) -> Tuple[bytes, int]:
+    """
+    オフセットから1エントリ分（ヘッダー行と継続行）を読む
+
+    Returns:
+        Tuple[bytes, int]: エントリのバイト列と、次のエントリの開始オフセット
+    """
+    fh.seek(offset)
+    lines = [fh.readline()]
+    position = offset + len(lines[0])
+    while True:
+        line = fh.readline()
+        if not line or _looks_like_header(line):
+            return b"".join(lines), position
+        lines.append(line)
+        position += len(line)
+
+
+class LogSearchService:
+    """
+    ログファイル群を索引して検索するサービス
+
+    インスタンスはインデックスをメモリに保持するため、アプリケーション内で共有して使う。
+    """
+
+    def __init__(self, log_file: str = "app.log", include_rotated: bool = True, sparse_interval: int = SPARSE_INTERVAL):
+        """
+        初期化
+
+        Args:
+            log_file: 稼働中のログファイルのパス
+            include_rotated: ローテーション済みファイル（<log_file>.* / *.gz）も検索する
+            sparse_interval: 疎なインデックスの間隔（バイト）
+        """
+        self.log_file = log_file
+        self.include_rotated = include_rotated
+        self.sparse_interval = sparse_interval
+        self._indexes: Dict[str, LogFileIndex] = {}
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # インデックス
+    # ------------------------------------------------------------------
+    def discover_files(self) -> List[str]:
+        """
+        検索対象のファイルを古い順に返す（稼働中のファイルが最後）
+
+        Returns:
+            List[str]: ファイルパスのリスト
+        """
+        files = []
+        if self.include_rotated:
+            rotated = [
+                path for path in glob.glob(glob.escape(self.log_file) + ".*")
+                if os.path.isfile(path) and not path.endswith((".idx", ".tmp"))
+            ]
+            files.extend(sorted(rotated, key=lambda p: (os.stat(p).st_mtime_ns, p)))
+        if os.path.isfile(self.log_file):
+            files.append(self.log_file)
+        return files
+
+    def refresh(self) -> List[LogFileIndex]:
+        """
+        全ファイルのインデックスを最新化する
+
+        変更のないファイルは再利用し、追記されたファイルは追記分だけを索引する。
+
+        Returns:
+            List[LogFileIndex]: 古い順のインデックス
+        """
+        with self._lock:
+            paths = self.discover_files()
+            indexes = []
+            for path in paths:
+                try:
+                    indexes.append(self._refresh_file(path))
+                except OSError as e:
+                    logger.warning(f"⚠️ ログファイルを索引できません: {path} - {e}")
+            for stale in set(self._indexes) - set(paths):
+                del self._indexes[stale]
+            return indexes
+
+    def _refresh_file(self, path: str) -> LogFileIndex:
+        stat = os.stat(path)
+        compressed = path.endswith(".gz")
+        index = self._indexes.get(path)
+
+        if index is not None and index.size == stat.st_size and index.mtime_ns == stat.st_mtime_ns and index.inode == stat.st_ino:
+            return index
+
+        # 稼働中のファイルへの追記のみ差分で索引する（切り詰め・置き換えは作り直し）
+        if index is None or compressed or index.inode != stat.st_ino or stat.st_size < index.size:
+            index = LogFileIndex(path=path, compressed=compressed)
+            self._indexes[path] = index
+
+        self._index_from(index)
+        index.size = stat.st_size
+        index.mtime_ns = stat.st_mtime_ns
+        index.inode = stat.st_ino
+        return index
+
+    def _index_from(self, index: LogFileIndex) -> None:
+        """索引済みの位置からファイル末尾までを読み、インデックスに追加する"""
+        # 最後のエントリには継続行が追記されている可能性があるため、その先頭から読み直す
+        start = index.last_entry_offset if index.last_entry_offset >= 0 else index.indexed_end
+        resumed = index.last_entry_offset >= 0
+        next_sparse = (index.sparse_offsets[-1] + self.sparse_interval) if index.sparse_offsets else 0
+
+        with _open_binary(index.path, index.compressed) as fh:
+            fh.seek(start)
+            position = start
+            entry_offset = -1
+            entry_lines: List[bytes] = []
+
+            for line in fh:
+                if _looks_like_header(line):
+                    if entry_lines:
+                        self._index_entry(index, entry_offset, entry_lines, resumed and entry_offset == start)
+                    entry_offset = position
+                    entry_lines = [line]
+                    if position >= next_sparse:
+                        index.sparse_timestamps.append(line[:_TIMESTAMP_LEN].decode("ascii", "replace"))
+                        index.sparse_offsets.append(position)
+                        next_sparse = position + self.sparse_interval
+                elif entry_lines:
+                    entry_lines.append(line)
+                position += len(line)
+
+            if entry_lines:
+                self._index_entry(index, entry_offset, entry_lines, resumed and entry_offset == start)
+            index.indexed_end = position
+
+    def _index_entry(self, index: LogFileIndex, offset: int, lines: List[bytes], already_counted: bool) -> None:
+        raw = b"".join(lines)
+        timestamp = raw[:_TIMESTAMP_LEN].decode("ascii", "replace")
+        if not already_counted:
+            index.offsets.append(offset)
+            header = parse_entry(lines[0].decode("utf-8", "replace"))
+            if header:
+                index.add_posting("level", header["level"].upper(), offset)
+        index.last_entry_offset = offset
+        if index.first_timestamp is None:
+            index.first_timestamp = timestamp
+        index.last_timestamp = timestamp
+
+        for match in _STRUCTURE_ID_RE.finditer(raw):
+            index.add_posting("structure_id", match.group(1).decode("ascii"), offset)
+        for match in _USER_ID_RE.finditer(raw):
+            index.add_posting("user_id", match.group(1).decode("ascii"), offset)
+        for match in _REQUEST_ID_RE.finditer(raw):
+            index.add_posting("request_id", match.group(1).decode("ascii"), offset)
+        for token in set(_TOKEN_RE.findall(raw.lower())):
+            index.add_posting("token", token.decode("ascii"), offset)
+
+    # ------------------------------------------------------------------
+    # 検索
+    # ------------------------------------------------------------------
+    def _first_offset_at(self, index: LogFileIndex, fh: BinaryIO, bound: str, after: bool) -> int:
+        """
+        タイムスタンプが境界以上（after=True なら境界より後）となる最初のエントリのオフセット
+
+        疎なインデックスを二分探索して候補ブロックを決め、そのブロックだけを走査する。
+        """
+        if after:
+            position = bisect.bisect_right(index.sparse_timestamps, bound)
+        else:
+            position = bisect.bisect_left(index.sparse_timestamps, bound)
+        if position == 0:
+            offset = 0
+        else:
+            offset = index.sparse_offsets[position - 1]
+        limit = index.sparse_offsets[position] if position < len(index.sparse_offsets) else index.indexed_end
+
+        start = bisect.bisect_left(index.offsets, offset)
+        for entry_offset in index.offsets[start:bisect.bisect_left(index.offsets, limit)]:
+            fh.seek(entry_offset)
+            timestamp = fh.read(_TIMESTAMP_LEN).decode("ascii", "replace")
+            if (timestamp > bound) if after else (timestamp >= bound):
+                return entry_offset
+        return limit
+
+    def _candidates(self, index: LogFileIndex, filters: List[Tuple[str, str]], start: Optional[str], end: Optional[str]) -> Iterator[int]:
+        """条件を満たしうるエントリのオフセットを昇順で返す"""
+        if start and index.last_timestamp and index.last_timestamp < start:
+            return iter(())
+        if end and index.first_timestamp and index.first_timestamp > end:
+            return iter(())
+
+        lists = []
+        for field_name, value in filters:
+            posting = index.postings[field_name].get(value)
+            if posting is None:
+                return iter(())
+            lists.append(posting)
+        lists.sort(key=len)
+        base = lists[0] if lists else index.offsets
+
+        low, high = 0, index.indexed_end
+        if start or end:
+            with _open_binary(index.path, index.compressed) as fh:
+                if start:
+                    low = self._first_offset_at(index, fh, start, after=False)
+                if end:
+                    high = self._first_offset_at(index, fh, end, after=True)
+        selected = base[bisect.bisect_left(base, low):bisect.bisect_left(base, high)]
+        if len(lists) <= 1:
+            return iter(selected)
+
+        others = [set(posting) for posting in lists[1:]]
+        return (offset for offset in selected if all(offset in other for other in others))
+
+    def _build_filters(
+        self,
+        level: Optional[str],
+        structure_id: Optional[str],
+        user_id: Optional[str],
+        request_id: Optional[str],
+        keyword: Optional[str]
+    ) -> Tuple[List[Tuple[str, str]], List[str]]:
+        """
+        検索条件をインデックスで引ける条件と、本文の部分一致で確かめる条件に分ける
+
+        構成ID・ユーザーIDは識別子トークンとして索引されていれば完全一致で引き、
+        索引対象外の形（英字のみなど）は従来どおり本文の部分一致で絞り込む。
+        """
+        filters: List[Tuple[str, str]] = []
+        substrings: List[str] = []
+        if level:
+            filters.append(("level", level.upper()))
+        if request_id:
+            filters.append(("request_id", request_id))
+        for value in (structure_id, user_id):
+            if not value:
+                continue
+            if _IDENTIFIER_RE.fullmatch(value):
+                filters.append(("token", value.lower()))
+            else:
+                substrings.append(value.lower())
+        if keyword:
+            substrings.append(keyword.lower())
+        return filters, substrings
+
+    def search(
+        self,
+        start: Union[str, datetime, None] = None,
+        end: Union[str, datetime, None] = None,
+        level: Optional[str] = None,
+        structure_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+        request_id: Optional[str] = None,
+        keyword: Optional[str] = None,
+        page: int = 1,
+        per_page: int = 100,
+        newest_first: bool = False
+    ) -> Dict[str, Any]:
+        """
+        ログを検索する
+
+        Args:
+            start: 開始日時（日付のみの場合はその日の0時から）
+            end: 終了日時（日付のみの場合はその日の終わりまで）
+            level: ログレベル
+            structure_id: 構成ID
+            user_id: ユーザーID
+            request_id: リクエストID
+            keyword: 本文の部分一致（大文字小文字を区別しない）
+            page: ページ番号（1始まり）
+            per_page: 1ページの件数
+            newest_first: 新しい順に並べる
+
+        Returns:
+            Dict[str, Any]: logs / total_count / page / per_page / pages / files
+        """
+        start_bound = normalize_time_bound(start)
+        end_bound = normalize_time_bound(end, upper=True)
+        page = max(int(page), 1)
+        per_page = min(max(int(per_page), 1), MAX_PER_PAGE)
+        filters, substrings = self._build_filters(level, structure_id, user_id, request_id, keyword)
+
+        indexes = self.refresh()
+        matches: List[Tuple[int, int]] = []
+        for file_no, index in enumerate(indexes):
+            candidates = self._candidates(index, filters, start_bound, end_bound)
+            if not substrings:
+                matches.extend((file_no, offset) for offset in candidates)
+                continue
+            with _open_binary(index.path, index.compressed) as fh:
+                for offset in candidates:
+                    raw, _ = _read_entry_at(fh, offset)
+                    text = raw.decode("utf-8", "replace").lower()
+                    if all(needle in text for needle in substrings):
+                        matches.append((file_no, offset))
+
+        total = len(matches)
+        if newest_first:
+            matches.reverse()
+        page_matches = matches[(page - 1) * per_page:page * per_page]
+
+        return {
+            "logs": self._load_entries(indexes, page_matches),
+            "total_count": total,
+            "page": page,
+            "per_page": per_page,
+            "pages": (total + per_page - 1) // per_page,
+            "files": [index.path for index in indexes],
+        }
+
+    def iter_entries(self, **criteria: Any) -> Iterator[Dict[str, Any]]:
+        """
+        条件に合うエントリを古い順にストリーミングで返す
+
+        Args:
+            **criteria: search() と同じ検索条件（page / per_page / newest_first を除く）
+
+        Yields:
+            Dict[str, Any]: ログエントリ
+        """
+        page = 1
+        while True:
+            result = self.search(page=page, per_page=MAX_PER_PAGE, **criteria)
+            yield from result["logs"]
+            if page >= result["pages"]:
+                return
+            page += 1
+
+    def _load_entries(self, indexes: List[LogFileIndex], matches: List[Tuple[int, int]]) -> List[Dict[str, Any]]:
+        """一致したオフセットのエントリだけを読み出す（ファイルごとに昇順でまとめて読む）"""
+        by_file: Dict[int, List[int]] = {}
+        for file_no, offset in matches:
+            by_file.setdefault(file_no, []).append(offset)
+
+        loaded: Dict[Tuple[int, int], Dict[str, Any]] = {}
+        for file_no, offsets in by_file.items():
+            index = indexes[file_no]
+            source = os.path.basename(index.path)
+            with _open_binary(index.path, index.compressed) as fh:
+                for offset in sorted(offsets):
+                    raw, _ = _read_entry_at(fh, offset)
+                    entry = parse_entry(raw.decode("utf-8", "replace"))
+                    if entry is None:
+                        continue
+                    entry["source"] = source
+                    entry["offset"] = offset
+                    loaded[(file_no, offset)] = entry
+        return [loaded[key] for key in matches if key in loaded]
+
+    # ------------------------------------------------------------------
+    # 統計
+    # ------------------------------------------------------------------
+    def stats(self, **criteria: Any) -> Dict[str, Any]:
+        """
+        統計情報を返す
+
+        条件がなければインデックスだけから集計し、条件があれば該当エントリを読んで集計する。
+
+        Args:
+            **criteria: search() と同じ検索条件
+
+        Returns:
+            Dict[str, Any]: total_entries / levels / structure_ids / user_ids / date_range
+        """
+        if any(criteria.values()):
+            return summarize_entries(self.iter_entries(**criteria))
+
+        indexes = self.refresh()
+        levels: Counter = Counter()
+        structure_ids: set = set()
+        user_ids: set = set()
+        timestamps = []
+        for index in indexes:
+            for level, posting in index.postings["level"].items():
+                levels[level] += len(posting)
+            structure_ids.update(index.postings["structure_id"])
+            user_ids.update(index.postings["user_id"])
+            timestamps.extend(ts for ts in (index.first_timestamp, index.last_timestamp) if ts)
+
+        total = sum(index.entry_count for index in indexes)
+        if not total:
+            return {}
+        return {
+            "total_entries": total,
+            "levels": dict(levels),
+            "structure_ids": sorted(structure_ids),
+            "user_ids": sorted(user_ids),
+            "date_range": _date_range(timestamps),
+        }
+
+
+def _date_range(timestamps: List[str]) -> Dict[str, Optional[datetime]]:
+    dates = []
+    for timestamp in timestamps:
+        try:
+            dates.append(datetime.strptime(timestamp[:10], "%Y-%m-%d"))
+        except ValueError:
+            continue
+    return {"start": min(dates) if dates else None, "end": max(dates) if dates else None}
+
+
+def summarize_entries(entries) -> Dict[str, Any]:
+    """
+    エントリの統計情報を集計する（LogInspector.get_statistics と同じ形式）
+
+    Args:
+        entries: ログエントリのイテラブル
+
+    Returns:
+        Dict[str, Any]: total_entries / levels / structure_ids / user_ids / date_range。空なら {}
+    """
+    total = 0
+    levels: Dict[str, int] = {}
+    structure_ids: set = set()
+    user_ids: set = set()
+    timestamps = []
+    for entry in entries:
+        total += 1
+        levels[entry["level"]] = levels.get(entry["level"], 0) + 1
+        raw = entry["message"].encode("utf-8")
+        structure_ids.update(m.group(1).decode("ascii") for m in _STRUCTURE_ID_RE.finditer(raw))
+        user_ids.update(m.group(1).decode("ascii") for m in _USER_ID_RE.finditer(raw))
+        timestamps.append(entry["timestamp"])
+    if not total:
+        return {}
+    return {
+        "total_entries": total,
+        "levels": levels,
+        "structure_ids": sorted(structure_ids),
+        "user_ids": sorted(user_ids),
+        "date_range": _date_range([min(timestamps), max(timestamps)]),
+    }
+
+
+__all__ = [
+    "LEVELS",
+    "LogFileIndex",
+    "LogSearchService",
+    "normalize_time_bound",
+    "parse_entry",
+    "summarize_entries",
+]
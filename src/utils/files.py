@@ -8,31 +8,41 @@ from datetime import datetime
 from typing import Dict, Any, Optional
 import re
 
+from src.common import json_codec
+from src.common.llm_capture import OUTCOME_ERROR, OUTCOME_SUCCESS, capture_llm_io
+from src.common.tracing import traced
+
 logger = logging.getLogger(__name__)
 
-def extract_json_part(text: str) -> Dict[str, Any]:
+@traced("json.extract")
+def extract_json_part(text: str, provider: str = "unknown") -> Dict[str, Any]:
     """
     ChatGPT応答からJSON構成部分を抽出する関数
     
+    入力テキストはデバッグ用にキャプチャストアへ記録する（抽出に失敗したものは常に保存）。
+    
     Args:
         text (str): ChatGPT応答のテキスト
+        provider (str): 応答を返したプロバイダー（キャプチャの検索に使う）
         
     Returns:
         Dict[str, Any]: 抽出されたJSONデータまたはエラー情報
     """
     logger.info(f"🔍 extract_json_part: 入力テキスト長 = {len(text)}")
     
-    # 入力テキストの保存（デバッグ用）
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    log_filename = f"logs/chatgpt_raw_output_{timestamp}.txt"
-    try:
-        os.makedirs("logs", exist_ok=True)
-        with open(log_filename, "w", encoding="utf-8") as f:
-            f.write(text)
-        logger.info(f"📝 ChatGPT原文を保存: {log_filename}")
-    except Exception as e:
-        logger.warning(f"ChatGPT原文の保存に失敗: {e}")
-    
+    result = _extract_json_part(text)
+    failed = not isinstance(result, dict) or "error" in result
+    capture_llm_io(
+        provider or "unknown",
+        "extract_json_part",
+        outcome=OUTCOME_ERROR if failed else OUTCOME_SUCCESS,
+        raw_output=text,
+        error=result.get("error") if failed and isinstance(result, dict) else None
+    )
+    return result
+
+def _extract_json_part(text: str) -> Dict[str, Any]:
+    """extract_json_part の抽出処理本体"""
     # 1. コードブロック内のJSONを検索（最優先）
     code_block_pattern = r'```(?:json)?\s*\n([\s\S]*?)\n```'
     code_matches = re.findall(code_block_pattern, text)
@@ -122,7 +132,7 @@ def extract_json_part(text: str) -> Dict[str, Any]:
             
             # エラー位置の詳細分析
             try:
-                json.loads(complete_json)
+                json_codec.loads(complete_json)
             except json.JSONDecodeError as json_error:
                 logger.error(f"❌ JSONDecodeError詳細:")
                 logger.error(f"   - エラーメッセージ: {json_error.msg}")
@@ -253,7 +263,7 @@ def validate_json_string(json_str: str) -> Dict[str, Any]:
     # 複数回パースを試行（段階的に修復）
     for attempt in range(3):
         try:
-            result = json.loads(json_str)
+            result = json_codec.loads(json_str)
             return {
                 "is_valid": True,
                 "data": result
@@ -423,7 +433,7 @@ def extract_json_part_old(text: str) -> Optional[Dict[str, Any]]:
                 f.write(f"Unquoted keys: {unquoted_keys}\n")
             for key in unquoted_keys:
                 json_str = json_str.replace(f"{key}:", f'"{key}":')
-        return json.loads(json_str)
+        return json_codec.loads(json_str)
     except json.JSONDecodeError as e:
         logger.error(f"Failed to parse JSON: {str(e)}")
         return None
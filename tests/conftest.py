@@ -226,6 +226,8 @@ os.environ.setdefault("OPENAI_API_KEY", "dummy_key")
 os.environ.setdefault("FLASK_ENV", "testing")
 os.environ.setdefault("FLASK_DEBUG", "True")
 os.environ.setdefault("LOG_LEVEL", "DEBUG")
+# 共有キャッシュはテストごとに明示的に作る（リポジトリのデータディレクトリにファイルを作らない）
+os.environ.setdefault("AIDEX_CACHE_BACKEND", "local")
 
 @pytest.fixture
 def mock_prompt_manager():
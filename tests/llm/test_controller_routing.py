@@ -0,0 +1,71 @@
+"""
+AIControllerのタスク別ルーティングのテスト
+"""
+
+import json
+
+import pytest
+
+from src.common.llm_usage import UsageLedger, set_usage_ledger
+from src.common.model_routing import ModelRouter, load_routing_policy, set_model_router
+from src.llm.controller import PROVIDER_MODE_FAKE, AIController
+from src.llm.prompts import prompt_manager
+from src.llm.providers.fake import FakeLLMProvider, FakeProviderConfig
+
+
+MESSAGES = [{"role": "user", "content": "次の文章から項目を抽出してください"}]
+
+
+@pytest.fixture
+def router():
+    """extract タスクの候補を chatgpt/small → gemini/large にしたルーター"""
+    router = ModelRouter(load_routing_policy(json.dumps({
+        "tasks": {
+            "extract": {
+                "candidates": [
+                    {"provider": "chatgpt", "model": "small"},
+                    {"provider": "gemini", "model": "large"},
+                ],
+                "max_escalations": 1,
+            }
+        }
+    })))
+    set_model_router(router)
+    set_usage_ledger(UsageLedger())
+    yield router
+    set_model_router(None)
+    set_usage_ledger(None)
+
+
+@pytest.fixture
+def fake_controller():
+    """フェイクプロバイダーを登録したコントローラー"""
+    controller = AIController(prompt_manager=prompt_manager, provider_mode=PROVIDER_MODE_FAKE)
+    for name in ("chatgpt", "gemini"):
+        controller.register_provider(name, FakeLLMProvider(name, config=FakeProviderConfig(response_template=f"{name}:{{key}}")))
+    return controller
+
+
+class TestControllerRouting:
+    """タスク別ルーティングのテストクラス"""
+
+    def test_route_uses_policy_model(self, router, fake_controller):
+        """ポリシーの最初の候補で呼び出し、結果を観測値に記録するテスト"""
+        content = fake_controller.route("extract", MESSAGES)
+        assert content.startswith("chatgpt:")
+        assert router.stats()["models"]["chatgpt/small"]["samples"] == 1
+
+    def test_route_escalates_on_validation_failure(self, router, fake_controller):
+        """検証に失敗した応答は次の候補にエスカレーションするテスト"""
+        content = fake_controller.route("extract", MESSAGES, validate=lambda text: text.startswith("gemini:"))
+        assert content.startswith("gemini:")
+
+        stats = router.stats()
+        assert stats["models"]["chatgpt/small"]["success_rate"] == 0.0
+        assert stats["models"]["gemini/large"]["success_rate"] == 1.0
+        assert stats["recent_decisions"][-1]["escalated_from"] == "chatgpt/small"
+
+    def test_route_respects_provider_restriction(self, router, fake_controller):
+        """プロバイダーを制限した場合はその候補だけを使うテスト"""
+        content = fake_controller.route("extract", MESSAGES, providers=("gemini",))
+        assert content.startswith("gemini:")
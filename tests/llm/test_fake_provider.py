@@ -0,0 +1,203 @@
+"""
+フェイクLLMプロバイダーとカセットのテスト
+"""
+
+import json
+
+import pytest
+
+from src.common.prompt_cache import PromptLayout
+from src.common.structured_output import validate_against_schema
+from src.exceptions import APIRequestError, RateLimitError, StructuredOutputError
+from src.llm.cassettes import CassetteStore, RecordingProvider, prompt_hash
+from src.llm.prompts.manager import Prompt
+from src.llm.providers.fake import FakeLLMProvider, FakeProviderConfig
+
+
+MESSAGES = [{"role": "user", "content": "勤怠管理アプリの構成を作成してください"}]
+
+
+class DummyProvider:
+    """記録テスト用の実プロバイダー代替"""
+
+    model_name = "dummy-model"
+
+    def call(self, messages, **kwargs):
+        return {"content": "記録された応答", "usage": {"prompt_tokens": 3, "completion_tokens": 4, "total_tokens": 7}}
+
+
+class TestCassettes:
+    """カセットのテストクラス"""
+
+    def test_prompt_hash_normalizes_input(self):
+        """文字列とメッセージリストで同じキーになるテスト"""
+        assert prompt_hash("chatgpt", MESSAGES[0]["content"]) == prompt_hash("chatgpt", MESSAGES)
+        assert prompt_hash("chatgpt", MESSAGES) != prompt_hash("claude", MESSAGES)
+
+    def test_record_and_replay(self, tmp_path):
+        """記録した応答が再生されるテスト"""
+        store = CassetteStore(str(tmp_path))
+        recorder = RecordingProvider(DummyProvider(), store, "chatgpt")
+        recorder.call(MESSAGES)
+
+        fake = FakeLLMProvider("chatgpt", config=FakeProviderConfig(mode="replay"), store=CassetteStore(str(tmp_path)))
+        response = fake.call(MESSAGES)
+        assert response["content"] == "記録された応答"
+        assert response["usage"]["total_tokens"] == 7
+        assert response["source"] == "cassette"
+
+        with open(tmp_path / "chatgpt.jsonl", encoding="utf-8") as f:
+            entry = json.loads(f.readline())
+        assert entry["model"] == "dummy-model"
+        assert entry["latency_ms"] is not None
+
+
+class TestFakeLLMProvider:
+    """フェイクLLMプロバイダーのテストクラス"""
+
+    def test_replay_mode_requires_cassette(self, tmp_path):
+        """replayモードで未記録のプロンプトはエラーになるテスト"""
+        fake = FakeLLMProvider("chatgpt", config=FakeProviderConfig(mode="replay"), store=CassetteStore(str(tmp_path)))
+        with pytest.raises(APIRequestError):
+            fake.call(MESSAGES)
+
+    def test_synthesized_responses_by_provider(self):
+        """プロバイダーごとの形式で応答が合成されるテスト"""
+        structure = FakeLLMProvider("chatgpt").call(MESSAGES)
+        assert structure["content"].startswith("```json")
+        assert "total_tokens" in structure["usage"]
+
+        evaluation = FakeLLMProvider("claude").call(MESSAGES)
+        assert 0.0 <= json.loads(evaluation["content"])["score"] <= 1.0
+        assert set(evaluation["usage"]) == {"input_tokens", "output_tokens"}
+
+    def test_latency_is_injected(self):
+        """設定したレイテンシで待機するテスト"""
+        sleeps = []
+        config = FakeProviderConfig(latency_distribution="uniform", latency_ms=200, latency_jitter_ms=50, seed=1)
+        fake = FakeLLMProvider("gemini", config=config, sleep=sleeps.append)
+        for _ in range(20):
+            fake.generate_response("テスト")
+        assert len(sleeps) == 20
+        assert all(0.15 <= s <= 0.25 for s in sleeps)
+
+    def test_error_and_rate_limit_injection(self):
+        """エラー率・レート制限の注入が決定的に再現されるテスト"""
+        def run():
+            fake = FakeLLMProvider("chatgpt", config=FakeProviderConfig(error_rate=0.3, rate_limit_rate=0.2, seed=42))
+            outcomes = []
+            for _ in range(50):
+                try:
+                    fake.call(MESSAGES)
+                    outcomes.append("ok")
+                except RateLimitError as e:
+                    assert e.retry_after == 1.0
+                    outcomes.append("rate_limited")
+                except APIRequestError:
+                    outcomes.append("error")
+            return outcomes, fake.stats
+
+        first, stats = run()
+        second, _ = run()
+        assert first == second
+        assert stats["rate_limited"] > 0 and stats["errors"] > 0
+        assert stats["calls"] == 50
+
+    def test_truncated_json(self):
+        """JSONが途中で切れた応答を合成するテスト"""
+        fake = FakeLLMProvider("claude", config=FakeProviderConfig(truncated_json_rate=1.0, seed=3))
+        response = fake.call(MESSAGES)
+        assert response["source"] == "synthesized+truncated"
+        with pytest.raises(json.JSONDecodeError):
+            json.loads(response["content"])
+
+    def test_config_from_dict_with_overrides(self):
+        """プロバイダー別の設定がdefaultを上書きするテスト"""
+        data = {"default": {"latency_ms": 100, "seed": 1}, "providers": {"claude": {"latency_ms": 900}}}
+        assert FakeProviderConfig.from_dict(data, "claude").latency_ms == 900
+        assert FakeProviderConfig.from_dict(data, "chatgpt").latency_ms == 100
+        with pytest.raises(ValueError):
+            FakeProviderConfig.from_dict({"mode": "unknown"})
+
+
+class TestFakeStructuredOutput:
+    """フェイクプロバイダーの構造化出力のテストクラス"""
+
+    def test_synthesizes_schema_conforming_json(self):
+        """合成した応答が共通の構成スキーマに合うテスト"""
+        fake = FakeLLMProvider("gemini", config=FakeProviderConfig(seed=1))
+        response = fake.call_structured(MESSAGES)
+        assert validate_against_schema(response["data"]) == []
+        assert json.loads(response["content"]) == response["data"]
+        assert response["provider"] == "gemini"
+        assert response["source"] == "synthesized"
+
+    def test_truncated_json_raises(self):
+        """JSONの途中切れを注入した場合はスキーマエラーになるテスト"""
+        fake = FakeLLMProvider("chatgpt", config=FakeProviderConfig(truncated_json_rate=1.0, seed=3))
+        with pytest.raises(StructuredOutputError):
+            fake.call_structured(MESSAGES)
+
+    def test_record_and_replay_structured(self, tmp_path):
+        """構造化出力の記録がスキーマ名のカセットで再生されるテスト"""
+        data = {"title": "勤怠管理", "description": "出退勤を記録する", "modules": []}
+
+        class StructuredProvider(DummyProvider):
+            def call_structured(self, messages, schema=None, name=None, **kwargs):
+                return {"content": json.dumps(data, ensure_ascii=False), "data": data, "model": "dummy-model", "usage": {}}
+
+        store = CassetteStore(str(tmp_path))
+        RecordingProvider(StructuredProvider(), store, "chatgpt").call_structured(MESSAGES, name="app_structure")
+        assert (tmp_path / "chatgpt.app_structure.jsonl").exists()
+
+        fake = FakeLLMProvider("chatgpt", config=FakeProviderConfig(mode="replay"), store=CassetteStore(str(tmp_path)))
+        response = fake.call_structured(MESSAGES)
+        assert response["data"] == data
+        assert response["source"] == "cassette"
+        with pytest.raises(APIRequestError):
+            fake.call(MESSAGES)
+
+
+class TestFakePromptCache:
+    """フェイクプロバイダーのプロンプトキャッシュの模倣のテストクラス"""
+
+    PREFIX = "構成を評価してください。評価基準と出力形式は次のとおりです。" * 20
+
+    def test_prefix_cache_saves_latency_and_reports_tokens(self):
+        """同じプレフィックスの2回目はキャッシュから読み、レイテンシが短くなるテスト"""
+        sleeps = []
+        fake = FakeLLMProvider("claude", config=FakeProviderConfig(latency_ms=1000), sleep=sleeps.append)
+        first = fake.call(PromptLayout(self.PREFIX, "構成A").to_messages())
+        second = fake.call(PromptLayout(self.PREFIX, "構成B").to_messages())
+
+        assert first["usage"]["cache_creation_input_tokens"] > 0
+        assert first["usage"]["cache_read_input_tokens"] == 0
+        assert second["usage"]["cache_read_input_tokens"] == first["usage"]["cache_creation_input_tokens"]
+        assert sleeps[0] == 1.0 and sleeps[1] < 0.4
+        assert (fake.stats["cache_writes"], fake.stats["cache_hits"]) == (1, 1)
+
+    def test_cache_expires_and_plain_prompt_is_not_cached(self):
+        """有効期間を過ぎたプレフィックスと区切りのないプロンプトはキャッシュされないテスト"""
+        now = [0.0]
+        fake = FakeLLMProvider("chatgpt", config=FakeProviderConfig(prompt_cache_ttl_s=60), clock=lambda: now[0])
+        messages = PromptLayout(self.PREFIX, "構成A").to_messages()
+        fake.call(messages)
+        now[0] = 61.0
+        assert fake.call(messages)["usage"]["prompt_tokens_details"]["cached_tokens"] == 0
+
+        plain = fake.call([{"role": "user", "content": PromptLayout(self.PREFIX, "構成A").text}])
+        assert "prompt_tokens_details" not in plain["usage"]
+
+    def test_cassette_key_ignores_breakpoints(self):
+        """キャッシュの区切りの有無でカセットのキーが変わらないテスト"""
+        layout = PromptLayout(self.PREFIX, "構成A")
+        assert prompt_hash("claude", layout.to_messages()) == prompt_hash("claude", layout.text)
+
+    def test_prompt_template_layout(self):
+        """固定のプレフィックスを持つテンプレートが区切り付きで整形されるテスト"""
+        prompt = Prompt(name="structure_evaluation", provider="claude", description="",
+                        template="## 評価対象の構成\n{structure}", prefix="出力は {\"score\": 0.5} の形式")
+        layout = prompt.layout(structure="{}")
+        assert layout.prefix == "出力は {\"score\": 0.5} の形式"
+        assert prompt.format(structure="{}") == layout.text
+        assert layout.to_messages()[0]["content"][0]["cache_control"] == {"type": "ephemeral"}
@@ -0,0 +1,58 @@
+"""
+静的アセット配信ルートのテスト
+"""
+
+import gzip
+
+import pytest
+from flask import Flask, render_template_string
+
+from src.common.assets import build_assets
+from src.routes.asset_routes import init_assets
+
+
+@pytest.fixture
+def app(tmp_path):
+    """アセット配信のみを登録したテスト用アプリケーション"""
+    (tmp_path / "js").mkdir()
+    (tmp_path / "js" / "a.js").write_text("class A {}\n" + "// a\n" * 400, encoding="utf-8")
+    (tmp_path / "js" / "b.js").write_text("const b = 1", encoding="utf-8")
+
+    app = Flask(__name__, static_folder=str(tmp_path), static_url_path="/static")
+    app.config["TESTING"] = True
+    app.bundles = {"page.js": ["js/a.js", "js/b.js"]}
+    init_assets(app)
+    return app
+
+
+class TestAssetRoutes:
+    """アセット配信ルートのテストクラス"""
+
+    def test_fallback_before_build(self, app):
+        """未ビルド時は通常の静的URLにコンテンツハッシュが付くテスト"""
+        with app.test_request_context():
+            url = render_template_string("{{ asset_url('js/a.js') }}")
+        assert url.startswith("/static/js/a.js?v=")
+
+    def test_immutable_and_precompressed(self, app):
+        """ハッシュ付きURLがimmutableキャッシュと事前圧縮版で配信されるテスト"""
+        build_assets(app.static_folder, bundles=app.bundles)
+        with app.test_request_context():
+            url = render_template_string("{{ asset_url('js/a.js') }}")
+        assert url.startswith("/assets/js/a.")
+
+        client = app.test_client()
+        plain = client.get(url)
+        assert plain.status_code == 200
+        assert plain.headers["Cache-Control"] == "public, max-age=31536000, immutable"
+        assert "Accept-Encoding" in plain.headers["Vary"]
+        assert plain.mimetype in ("application/javascript", "text/javascript")
+
+        compressed = client.get(url, headers={"Accept-Encoding": "gzip"})
+        assert compressed.headers["Content-Encoding"] == "gzip"
+        assert gzip.decompress(compressed.data) == plain.data
+
+    def test_unknown_asset_returns_404(self, app):
+        """マニフェストにないパスは配信しないテスト"""
+        build_assets(app.static_folder, bundles=app.bundles)
+        assert app.test_client().get("/assets/manifest.json").status_code == 404
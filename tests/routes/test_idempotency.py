@@ -0,0 +1,51 @@
+"""
+POSTエンドポイントの重複実行防止のテスト
+"""
+
+import pytest
+from flask import Flask, jsonify, request
+
+from src.common.idempotency import COALESCED_HEADER, REPLAYED_HEADER, coalesce_post
+
+
+@pytest.fixture
+def app():
+    """重複実行防止を付けたエンドポイントだけのテスト用アプリケーション"""
+    app = Flask(__name__)
+    app.config["TESTING"] = True
+    app.calls = []
+
+    @app.route("/unified/<structure_id>/chat", methods=["POST"])
+    @coalesce_post()
+    def chat(structure_id):
+        app.calls.append(request.get_json())
+        return jsonify({"success": True, "count": len(app.calls)})
+
+    return app
+
+
+class TestCoalescePost:
+    """重複実行防止デコレーターのテストクラス"""
+
+    def test_idempotency_key_replays_response(self, app):
+        """同じ Idempotency-Key の再送は元の応答を返し、処理を再実行しないテスト"""
+        client = app.test_client()
+        headers = {"Idempotency-Key": "abc"}
+        first = client.post("/unified/s1/chat", json={"message": "在庫管理"}, headers=headers)
+        second = client.post("/unified/s1/chat", json={"message": "在庫管理"}, headers=headers)
+
+        assert first.get_json() == second.get_json() == {"success": True, "count": 1}
+        assert second.headers[REPLAYED_HEADER] == "true"
+        assert len(app.calls) == 1
+
+        # 別の構成・キーなしの送信は通常どおり実行する
+        assert client.post("/unified/s2/chat", json={"message": "在庫管理"}, headers=headers).get_json()["count"] == 2
+        assert client.post("/unified/s1/chat", json={"message": "在庫管理"}).get_json()["count"] == 3
+
+    def test_conflicting_body_is_rejected(self, app):
+        """同じキーで異なる内容を送ると422を返すテスト"""
+        client = app.test_client()
+        client.post("/unified/s1/chat", json={"message": "a"}, headers={"Idempotency-Key": "k"})
+        response = client.post("/unified/s1/chat", json={"message": "b"}, headers={"Idempotency-Key": "k"})
+        assert response.status_code == 422
+        assert COALESCED_HEADER not in response.headers
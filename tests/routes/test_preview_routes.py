@@ -0,0 +1,73 @@
+"""
+プレビュールートのキャッシュ・条件付きGETのテスト
+"""
+
+from unittest.mock import patch
+
+import pytest
+from flask import Flask
+
+from src.routes import preview_routes
+from src.routes.preview_routes import preview_bp, render_structure_to_html, clear_preview_cache
+
+
+@pytest.fixture
+def app():
+    """プレビュールートのみを登録したテスト用アプリケーション"""
+    app = Flask(__name__)
+    app.config["TESTING"] = True
+    app.register_blueprint(preview_bp)
+    clear_preview_cache()
+    return app
+
+
+@pytest.fixture
+def structure():
+    """UI出力に適したテスト用構成"""
+    return {
+        "id": "preview_test",
+        "content": {
+            "title": "UI画面構成",
+            "description": "画面レイアウトのプレビュー",
+            "content": {"ヘッダー": {"ロゴ": "左上に配置"}}
+        }
+    }
+
+
+class TestPreviewRoutes:
+    """プレビュールートのテストクラス"""
+
+    def test_etag_and_not_modified(self, app, structure):
+        """ETagが付与され、If-None-Matchが一致すれば304が返るテスト"""
+        with patch.object(preview_routes, "load_structure_by_id", return_value=structure):
+            client = app.test_client()
+            first = client.get("/preview/preview_test")
+            assert first.status_code == 200
+            etag = first.headers["ETag"]
+            assert "UI画面構成" in first.get_data(as_text=True)
+
+            second = client.get("/preview/preview_test", headers={"If-None-Match": etag})
+            assert second.status_code == 304
+            assert second.get_data() == b""
+
+    def test_etag_changes_with_content(self, app, structure):
+        """構成内容が変わるとETagも変わるテスト"""
+        with patch.object(preview_routes, "load_structure_by_id", return_value=structure):
+            client = app.test_client()
+            etag = client.get("/preview/preview_test").headers["ETag"]
+            structure["content"]["content"]["ヘッダー"]["ロゴ"] = "中央に配置"
+
+            response = client.get("/preview/preview_test", headers={"If-None-Match": etag})
+            assert response.status_code == 200
+            assert response.headers["ETag"] != etag
+
+    def test_template_compiled_once_and_html_cached(self, app, structure):
+        """テンプレートのコンパイルが1回で、同じ内容はキャッシュから返るテスト"""
+        with app.app_context():
+            with patch.object(app.jinja_env, "from_string", wraps=app.jinja_env.from_string) as compile_spy:
+                first = render_structure_to_html(structure["content"])
+                second = render_structure_to_html(structure["content"])
+                render_structure_to_html({"title": "別の構成", "content": {}})
+
+            assert first == second
+            assert compile_spy.call_count == 1
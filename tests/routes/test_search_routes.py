@@ -0,0 +1,40 @@
+"""
+構成検索のルートのテスト
+"""
+
+import json
+
+import pytest
+from flask import Flask
+
+from src.routes.search_routes import search_bp
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """検索のみを有効にしたテスト用アプリケーション"""
+    monkeypatch.setenv("AIDEX_DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("AIDEX_SEARCH_INDEX", str(tmp_path / "index.sqlite3"))
+    structure = {"title": "請求書アプリ", "description": "請求書を発行する", "messages": []}
+    (tmp_path / "s1.json").write_text(json.dumps(structure, ensure_ascii=False), encoding="utf-8")
+    app = Flask(__name__)
+    app.config["TESTING"] = True
+    app.register_blueprint(search_bp)
+    return app
+
+
+class TestSearchRoutes:
+    """構成検索のルートのテストクラス"""
+
+    def test_search_api(self, app):
+        """データディレクトリの構成が検索できるテスト"""
+        client = app.test_client()
+        assert client.post("/search/api/reindex").get_json()["counts"]["indexed"] == 1
+
+        data = client.get("/search/api?q=請求書").get_json()
+        assert data["success"] is True
+        assert data["results"][0]["structure_id"] == "s1"
+
+    def test_requires_query(self, app):
+        """検索語がない場合は400を返すテスト"""
+        assert app.test_client().get("/search/api").status_code == 400
@@ -0,0 +1,47 @@
+"""
+リクエストトレースのルートのテスト
+"""
+
+import pytest
+from flask import Flask
+
+from src.common.tracing import span
+from src.routes.trace_routes import init_tracing, traces_bp
+
+
+@pytest.fixture
+def app(tmp_path):
+    """トレースのみを有効にしたテスト用アプリケーション"""
+    app = Flask(__name__, template_folder=str(tmp_path))
+    app.config["TESTING"] = True
+    app.config["TRACE_DIR"] = str(tmp_path / "traces")
+    app.register_blueprint(traces_bp)
+    init_tracing(app)
+
+    @app.route("/work")
+    def work():
+        with span("llm.call", provider="fake"):
+            pass
+        return "ok"
+
+    return app
+
+
+class TestTraceRoutes:
+    """トレースのルートのテストクラス"""
+
+    def test_request_id_header_and_store(self, app):
+        """X-Request-ID を引き継ぎ、完了したトレースが保存されるテスト"""
+        client = app.test_client()
+        response = client.get("/work", headers={"X-Request-ID": "req-abcdef12"})
+        assert response.headers["X-Request-ID"] == "req-abcdef12"
+
+        trace = client.get("/traces/api/req-abcdef12").get_json()
+        assert trace["attributes"]["status"] == 200
+        assert [s["name"] for s in trace["spans"]] == ["llm.call"]
+
+    def test_invalid_request_id_is_replaced(self, app):
+        """不正な X-Request-ID は新しいIDに置き換えられるテスト"""
+        response = app.test_client().get("/work", headers={"X-Request-ID": "bad id!"})
+        assert response.headers["X-Request-ID"] != "bad id!"
+        assert app.test_client().get("/traces/api/unknown-trace").status_code == 404
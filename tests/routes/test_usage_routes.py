@@ -0,0 +1,63 @@
+"""
+LLM利用量のルートのテスト
+"""
+
+import pytest
+from flask import Flask
+
+from src.common.llm_usage import UsageLedger, get_usage_ledger, set_usage_ledger
+from src.common.model_routing import ModelRouter, set_model_router
+from src.routes.usage_routes import init_usage, usage_bp
+
+
+@pytest.fixture
+def app():
+    """利用量のルートのみを有効にしたテスト用アプリケーション"""
+    set_usage_ledger(UsageLedger(quotas={"structure": {"calls_per_day": 5}}))
+    app = Flask(__name__)
+    app.config["TESTING"] = True
+    app.config["SECRET_KEY"] = "test"
+    app.register_blueprint(usage_bp)
+    init_usage(app)
+
+    @app.route("/structures/<structure_id>/generate", methods=["POST"])
+    def generate(structure_id):
+        get_usage_ledger().record("chatgpt", {"prompt_tokens": 10, "completion_tokens": 5}, model="gpt-4")
+        return "ok"
+
+    yield app
+    set_usage_ledger(None)
+
+
+class TestUsageRoutes:
+    """利用量のルートのテストクラス"""
+
+    def test_summary_and_rollups(self, app):
+        """リクエストの構成ID・セッションIDで記録され、APIで確認できるテスト"""
+        client = app.test_client()
+        client.post("/structures/s1/generate", headers={"X-Session-ID": "batch-1"})
+
+        summary = client.get("/usage/api").get_json()
+        assert summary["day"]["usage"]["structure"]["s1"] == {"calls": 1, "tokens": 15}
+        assert summary["day"]["usage"]["session"]["batch-1"]["calls"] == 1
+        assert summary["quotas"][0]["remaining"] == {"s1": 4}
+
+        rollups = client.get("/usage/api/rollups?window=day&group_by=structure_id,model").get_json()["rollups"]
+        assert rollups[0]["structure_id"] == "s1" and rollups[0]["model"] == "gpt-4"
+
+    def test_invalid_window(self, app):
+        """不明な集計単位は400を返すテスト"""
+        assert app.test_client().get("/usage/api/rollups?window=hour").status_code == 400
+
+    def test_routing_stats(self, app):
+        """モデルごとの観測値と直近の判断を返すテスト"""
+        router = ModelRouter()
+        router.observe("chatgpt", "gpt-4o-mini", 120.0, success=True)
+        router.choose("extract")
+        set_model_router(router)
+        try:
+            body = app.test_client().get("/usage/api/routing").get_json()
+        finally:
+            set_model_router(None)
+        assert body["models"]["chatgpt/gpt-4o-mini"]["samples"] == 1
+        assert body["recent_decisions"][-1]["task"] == "extract"
@@ -0,0 +1,135 @@
+"""
+一括進化ランナーのテスト
+"""
+
+import json
+import threading
+import time
+
+from src.structure.evolution_runner import BatchEvolutionRunner, estimate_tokens
+
+
+def make_candidates(count):
+    """テスト用の進化候補を作成"""
+    return [{"id": f"s{i}", "title": f"構成{i}", "intent_match": 0.5} for i in range(count)]
+
+
+class TestBatchEvolutionRunner:
+    """一括進化ランナーのテストクラス"""
+
+    def test_run_saves_once_per_structure(self, tmp_path):
+        """候補ごとに改善案が1回だけ保存されるテスト"""
+        saved = []
+        runner = BatchEvolutionRunner(
+            improve=lambda c: {**c, "title": c["title"] + "改"},
+            evaluate=lambda s: {"intent_match": 0.5},
+            save=lambda sid, s: saved.append(sid),
+            checkpoint_path=str(tmp_path / "checkpoint.jsonl")
+        )
+        report = runner.run(make_candidates(3))
+
+        assert sorted(saved) == ["s0_evolved", "s1_evolved", "s2_evolved"]
+        assert report["counts"] == {"evolved": 3}
+        assert [c["id"] for c in report["candidates"]] == ["s0", "s1", "s2"]
+
+    def test_adopt_over_threshold(self, tmp_path):
+        """しきい値以上の改善案が元構成に採用されるテスト"""
+        saved = {}
+        runner = BatchEvolutionRunner(
+            improve=lambda c: dict(c),
+            evaluate=lambda s: {"intent_match": 0.95},
+            save=lambda sid, s: saved.__setitem__(sid, s),
+            checkpoint_path=None
+        )
+        report = runner.run(make_candidates(1))
+
+        assert report["counts"] == {"adopted": 1}
+        assert saved["s0"]["id"] == "s0"
+        assert saved["s0_evolved"]["source"] == "evolved"
+
+    def test_resume_skips_completed(self, tmp_path):
+        """チェックポイントから再開すると処理済み候補がスキップされるテスト"""
+        checkpoint = str(tmp_path / "checkpoint.jsonl")
+        calls = []
+
+        def improve(candidate):
+            calls.append(candidate["id"])
+            if candidate["id"] == "s1" and calls.count("s1") == 1:
+                raise RuntimeError("一時的なエラー")
+            return dict(candidate)
+
+        def build():
+            return BatchEvolutionRunner(
+                improve=improve,
+                evaluate=lambda s: {"intent_match": 0.5},
+                save=lambda sid, s: None,
+                checkpoint_path=checkpoint
+            )
+
+        first = build().run(make_candidates(3))
+        assert first["counts"] == {"evolved": 2, "failed": 1}
+
+        second = build().run(make_candidates(3))
+        assert second["counts"] == {"skipped": 2, "evolved": 1}
+        assert calls.count("s1") == 2
+
+        with open(checkpoint, encoding="utf-8") as f:
+            entries = [json.loads(line) for line in f]
+        assert len(entries) == 4
+
+    def test_changed_candidate_is_reprocessed(self, tmp_path):
+        """内容が変わった候補はチェックポイントがあっても再処理されるテスト"""
+        checkpoint = str(tmp_path / "checkpoint.jsonl")
+        runner_args = dict(
+            improve=lambda c: dict(c),
+            evaluate=lambda s: {"intent_match": 0.5},
+            save=lambda sid, s: None,
+            checkpoint_path=checkpoint
+        )
+        candidates = make_candidates(1)
+        BatchEvolutionRunner(**runner_args).run(candidates)
+        candidates[0]["title"] = "変更後"
+        report = BatchEvolutionRunner(**runner_args).run(candidates)
+        assert report["counts"] == {"evolved": 1}
+
+    def test_provider_limit_is_respected(self):
+        """プロバイダーごとの同時実行数が制限されるテスト"""
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def improve(candidate):
+            with lock:
+                active.append(candidate["id"])
+                peak.append(len(active))
+            time.sleep(0.02)
+            with lock:
+                active.remove(candidate["id"])
+            return dict(candidate)
+
+        runner = BatchEvolutionRunner(
+            improve=improve,
+            evaluate=lambda s: {"intent_match": 0.5},
+            save=lambda sid, s: None,
+            max_workers=8,
+            provider_limits={"chatgpt": 2}
+        )
+        runner.run(make_candidates(8))
+        assert max(peak) <= 2
+
+    def test_dry_run_does_not_call_providers(self):
+        """ドライランでは呼び出さずに見積もりのみ行うテスト"""
+        def fail(_):
+            raise AssertionError("呼び出されてはいけません")
+
+        runner = BatchEvolutionRunner(improve=fail, evaluate=fail, save=fail)
+        report = runner.dry_run(make_candidates(2))
+
+        assert report["to_process"] == 2
+        assert report["calls"] == {"chatgpt": 2, "claude": 2}
+        assert report["tokens"]["chatgpt"]["prompt"] > 0
+
+    def test_estimate_tokens(self):
+        """トークン数見積もりのテスト"""
+        assert estimate_tokens("abcd" * 10) == 10
+        assert estimate_tokens("構成") == 2
@@ -0,0 +1,163 @@
+"""
+構成フィンガープリント機能のテスト
+"""
+
+import copy
+
+import pytest
+
+from src.structure.fingerprint import (
+    update_fingerprints,
+    get_fingerprints,
+    diff_fingerprints,
+    module_hash,
+    get_cached_evaluation,
+    store_cached_evaluation,
+    without_fingerprint_data,
+)
+from src.structure.diff_utils import generate_module_diff
+
+
+@pytest.fixture
+def structure():
+    """テスト用の構成データ"""
+    return {
+        "id": "fp_test",
+        "title": "テスト構成",
+        "description": "フィンガープリントのテスト",
+        "content": {"overview": "概要"},
+        "modules": {
+            "auth": {
+                "title": "認証",
+                "description": "ログイン機能",
+                "sections": {"login": {"title": "ログイン", "content": "ID/パスワード"}}
+            },
+            "catalog": {
+                "title": "商品カタログ",
+                "description": "商品一覧",
+                "sections": {"list": {"title": "一覧", "content": "ページング"}}
+            }
+        },
+        "messages": [{"role": "user", "content": "こんにちは"}]
+    }
+
+
+class TestFingerprint:
+    """フィンガープリント機能のテストクラス"""
+
+    def test_hash_is_order_independent(self):
+        """キー順序が異なっても同じハッシュになるテスト"""
+        assert module_hash({"a": 1, "b": 2}) == module_hash({"b": 2, "a": 1})
+
+    def test_messages_do_not_affect_root(self, structure):
+        """揮発的なフィールドの変更がルートハッシュに影響しないテスト"""
+        before = update_fingerprints(structure)["root"]
+        structure["messages"].append({"role": "assistant", "content": "返信"})
+        assert update_fingerprints(structure)["root"] == before
+
+    def test_section_change_propagates_to_root(self, structure):
+        """セクションの変更がモジュールとルートに伝播するテスト"""
+        before = copy.deepcopy(update_fingerprints(structure))
+        structure["modules"]["auth"]["sections"]["login"]["content"] = "SSO対応"
+        after = update_fingerprints(structure, changed_paths=["modules/auth/sections/login"])
+
+        assert after["root"] != before["root"]
+        assert after["modules"]["auth"]["hash"] != before["modules"]["auth"]["hash"]
+        assert after["modules"]["catalog"] == before["modules"]["catalog"]
+
+    def test_incremental_update_matches_full_update(self, structure):
+        """変更パス指定の更新が全体再計算と一致するテスト"""
+        update_fingerprints(structure)
+        structure["modules"]["catalog"]["description"] = "商品一覧と検索"
+        incremental = copy.deepcopy(update_fingerprints(structure, changed_paths=["modules/catalog"]))
+        full = update_fingerprints(structure)
+        assert incremental == full
+
+    def test_incremental_update_reuses_untouched_paths(self, structure):
+        """変更パス以外は保存済みハッシュを再利用するテスト"""
+        update_fingerprints(structure)
+        structure["modules"]["auth"]["title"] = "認証（変更）"
+        result = update_fingerprints(structure, changed_paths=["title"])
+        # authは変更パスに含まれないため、古いハッシュが維持される
+        assert result["modules"]["auth"] == get_fingerprints(structure)["modules"]["auth"]
+        assert diff_fingerprints(result, update_fingerprints(structure))["changed"] == ["auth"]
+
+    def test_diff_fingerprints(self, structure):
+        """モジュール単位の差分分類のテスト"""
+        before = copy.deepcopy(update_fingerprints(structure))
+        del structure["modules"]["catalog"]
+        structure["modules"]["auth"]["description"] = "ログインとログアウト"
+        structure["modules"]["order"] = {"title": "注文", "description": "注文処理"}
+        diff = diff_fingerprints(before, update_fingerprints(structure))
+
+        assert diff["added"] == ["order"]
+        assert diff["removed"] == ["catalog"]
+        assert diff["changed"] == ["auth"]
+        assert diff["unchanged"] == []
+
+    def test_list_modules_use_name_keys(self):
+        """リスト形式のモジュールが名前キーで扱われるテスト"""
+        structure = {"content": {"modules": [{"name": "A", "x": 1}, {"title": "B"}, "raw"]}}
+        fingerprints = update_fingerprints(structure)
+        assert list(fingerprints["modules"].keys()) == ["A", "B", "#2"]
+
+    def test_duplicate_names_do_not_collide(self):
+        """同じ名前のモジュール・セクションのハッシュが上書きされないテスト"""
+        structure = {"modules": [
+            {"name": "A", "sections": [{"title": "S", "content": "1"}, {"title": "S", "content": "2"}]},
+            {"name": "A", "x": 1},
+        ]}
+        fingerprints = update_fingerprints(structure)
+        assert list(fingerprints["modules"].keys()) == ["A", "A#1"]
+        assert list(fingerprints["modules"]["A"]["sections"].keys()) == ["S", "S#1"]
+
+        before = copy.deepcopy(fingerprints)
+        structure["modules"][1]["x"] = 2
+        diff = diff_fingerprints(before, update_fingerprints(structure))
+        assert diff["changed"] == ["A#1"]
+        assert diff["unchanged"] == ["A"]
+
+    def test_evaluation_cache(self, structure):
+        """評価キャッシュの保存と取得のテスト"""
+        assert get_cached_evaluation(structure, "claude:abc") is None
+        store_cached_evaluation(structure, "claude:abc", {"score": 0.8, "feedback": "良好", "details": {}, "is_valid": True})
+        cached = get_cached_evaluation(structure, "claude:abc")
+        assert cached["score"] == 0.8
+        assert cached["feedback"] == "良好"
+
+    def test_without_fingerprint_data(self, structure):
+        """プロンプト用コピーからフィンガープリントが除かれるテスト"""
+        update_fingerprints(structure)
+        store_cached_evaluation(structure, "k", {"score": 1.0})
+        stripped = without_fingerprint_data(structure)
+        assert "fingerprints" not in stripped
+        assert "module_evaluations" not in stripped
+        assert stripped["title"] == structure["title"]
+
+
+class TestGenerateModuleDiff:
+    """フィンガープリントによるモジュール差分のテストクラス"""
+
+    def test_unchanged_modules_are_not_reported(self):
+        """キー順序のみ異なるモジュールが変更扱いにならないテスト"""
+        before = [{"name": "auth", "title": "認証", "description": "説明"}]
+        after = [{"description": "説明", "title": "認証", "name": "auth"}]
+        diff = generate_module_diff(before, after)
+        assert diff == {"added": [], "removed": [], "changed": []}
+
+    def test_changed_module_is_reported(self):
+        """内容が変わったモジュールが変更として検出されるテスト"""
+        before = [{"name": "auth", "description": "旧"}]
+        after = [{"name": "auth", "description": "新"}, {"name": "order"}]
+        diff = generate_module_diff(before, after)
+        assert [m["name"] for m in diff["added"]] == ["order"]
+        assert diff["changed"][0]["name"] == "auth"
+        assert diff["changed"][0]["changes"][0]["field"] == "description"
+
+    def test_duplicate_names_are_compared_by_position(self):
+        """同じ名前のモジュールが重複しても後のモジュールで上書きされないテスト"""
+        before = [{"name": "auth", "description": "A"}, {"name": "auth", "description": "B"}]
+        after = [{"name": "auth", "description": "A"}, {"name": "auth", "description": "C"}]
+        diff = generate_module_diff(before, after)
+        assert [m["name"] for m in diff["changed"]] == ["auth#1"]
+        assert diff["changed"][0]["after"]["description"] == "C"
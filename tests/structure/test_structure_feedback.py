@@ -168,4 +168,21 @@ def test_process_structure(feedback_engine, sample_claude_output):
     # テストケース3: 参照JSONなしでの修復
     result = feedback_engine.process_structure(broken_json)
     assert result["title"] == "不完全な構造"
-    assert "content" in result 
\ No newline at end of file
+    assert "content" in result
+
+
+def test_diff_log_is_captured_with_provider(tmp_path, sample_claude_output):
+    """差分ログが呼び出し元のプロバイダー名でキャプチャストアにも記録されるテスト"""
+    from src.common.llm_capture import CaptureStore
+
+    store = CaptureStore(str(tmp_path / "capture"))
+    engine = StructureFeedbackEngine(log_dir=str(tmp_path / "diff"), capture_store=store)
+    result = engine.process_structure('{title: "不完全な構造"}', sample_claude_output, provider="gemini")
+    assert "description" in result
+
+    entries = store.query(provider="gemini")
+    records = store.load(entries)
+    assert [record["source"] for record in records] == ["structure_feedback.diff"]
+    assert records[0]["payload"]["provider"] == "gemini"
+    assert len(list((tmp_path / "diff").glob("diff_*.json"))) == 1
+
@@ -0,0 +1,248 @@
+"""
+構成ユニットオブワークのテスト
+"""
+
+from unittest.mock import MagicMock
+
+import pytest
+from flask import Flask
+
+from src.structure.unit_of_work import (
+    StructureUnitOfWork,
+    init_unit_of_work,
+    load_structure_for_request,
+    stage_structure,
+)
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    """構成の保存先を一時ディレクトリにする"""
+    monkeypatch.setenv("AIDEX_DATA_DIR", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def stored():
+    """読み込み元となる構成データ"""
+    return {
+        "id": "uow_test",
+        "title": "テスト構成",
+        "content": {"overview": "概要"},
+        "messages": []
+    }
+
+
+class TestStructureUnitOfWork:
+    """ユニットオブワークのテストクラス"""
+
+    def test_load_once_per_unit(self, stored):
+        """同一ユニット内で構成が1回だけ読み込まれるテスト"""
+        loader = MagicMock(return_value=stored)
+        uow = StructureUnitOfWork(loader=loader, saver=MagicMock())
+
+        first = uow.load("uow_test")
+        second = uow.load("uow_test")
+
+        assert first is second
+        loader.assert_called_once_with("uow_test")
+
+    def test_commit_writes_once_with_dirty_fields(self, stored):
+        """複数回の保存登録が1回の書き込みにまとめられるテスト"""
+        saver = MagicMock(return_value=True)
+        uow = StructureUnitOfWork(loader=MagicMock(return_value=stored), saver=saver)
+
+        structure = uow.load("uow_test")
+        structure["messages"].append({"role": "user", "content": "こんにちは"})
+        uow.stage("uow_test", structure)
+        structure["title"] = "更新後"
+        uow.stage("uow_test", structure)
+
+        results = uow.commit()
+
+        assert results == {"uow_test": True}
+        saver.assert_called_once()
+        assert saver.call_args.kwargs["changed_paths"] == ["messages", "title"]
+        assert uow.pending == []
+
+    def test_commit_skips_unchanged(self, stored):
+        """変更がない構成は書き込まれないテスト"""
+        saver = MagicMock(return_value=True)
+        uow = StructureUnitOfWork(loader=MagicMock(return_value=stored), saver=saver)
+
+        structure = uow.load("uow_test")
+        uow.stage("uow_test", structure)
+        uow.commit()
+
+        saver.assert_not_called()
+
+    def test_unloaded_structure_is_saved_entirely(self):
+        """読み込みを経ない新規構成は全体保存になるテスト"""
+        saver = MagicMock(return_value=True)
+        uow = StructureUnitOfWork(loader=MagicMock(), saver=saver)
+
+        uow.stage("new_id", {"id": "new_id", "title": "新規構成"})
+        uow.commit()
+
+        saver.assert_called_once()
+        assert saver.call_args.kwargs["changed_paths"] is None
+
+    def test_explicit_paths_are_forwarded(self, stored):
+        """明示された詳細パスが保存関数に渡されるテスト"""
+        stored["modules"] = {"auth": {"title": "認証"}}
+        saver = MagicMock(return_value=True)
+        uow = StructureUnitOfWork(loader=MagicMock(return_value=stored), saver=saver)
+
+        structure = uow.load("uow_test")
+        structure["modules"]["auth"]["title"] = "認証（更新）"
+        uow.stage("uow_test", structure, changed_paths=["modules/auth"])
+        uow.commit()
+
+        assert saver.call_args.kwargs["changed_paths"] == ["modules/auth"]
+
+    def test_saver_is_chosen_when_staged(self, stored):
+        """保存関数が生成時ではなく登録時の指定で選ばれるテスト"""
+        default_saver = MagicMock(return_value=True)
+        saver = MagicMock(return_value=True)
+        uow = StructureUnitOfWork(loader=MagicMock(return_value=stored), saver=default_saver)
+
+        structure = uow.load("uow_test")
+        structure["title"] = "更新後"
+        uow.stage("uow_test", structure, saver=saver)
+        uow.commit()
+
+        saver.assert_called_once()
+        default_saver.assert_not_called()
+
+    def test_discard_drops_pending(self, stored):
+        """破棄した構成は書き込まれないテスト"""
+        saver = MagicMock(return_value=True)
+        uow = StructureUnitOfWork(loader=MagicMock(return_value=stored), saver=saver)
+
+        structure = uow.load("uow_test")
+        structure["title"] = "更新後"
+        uow.stage("uow_test", structure)
+
+        assert uow.discard() == ["uow_test"]
+        assert uow.commit() == {}
+        saver.assert_not_called()
+
+
+class TestRequestScope:
+    """Flaskリクエストとの統合テストクラス"""
+
+    def test_request_end_commits_once(self, stored, data_dir):
+        """レスポンス前に1回だけ保存されるテスト"""
+        loader = MagicMock(return_value=stored)
+        saver = MagicMock(return_value=True)
+
+        app = Flask(__name__)
+        init_unit_of_work(app)
+
+        @app.route("/touch")
+        def touch():
+            structure = load_structure_for_request("uow_test", loader=loader)
+            again = load_structure_for_request("uow_test", loader=loader)
+            structure["messages"].append({"role": "user", "content": "1"})
+            stage_structure("uow_test", structure, saver=saver)
+            again["messages"].append({"role": "assistant", "content": "2"})
+            stage_structure("uow_test", again, saver=saver)
+            assert saver.call_count == 0
+            return "ok"
+
+        response = app.test_client().get("/touch")
+
+        assert response.status_code == 200
+        loader.assert_called_once_with("uow_test")
+        saver.assert_called_once()
+        assert not (data_dir / "uow_test.json").exists()
+
+    def test_saver_after_loader_only_load(self, stored):
+        """読み込み時に保存関数を渡さなくても登録時の保存関数が使われるテスト"""
+        loader = MagicMock(return_value=stored)
+        saver = MagicMock(return_value=True)
+
+        app = Flask(__name__)
+        init_unit_of_work(app)
+
+        @app.route("/touch")
+        def touch():
+            structure = load_structure_for_request("uow_test", loader=loader)
+            structure["title"] = "更新後"
+            stage_structure("uow_test", structure, saver=saver)
+            return "ok"
+
+        response = app.test_client().get("/touch")
+
+        assert response.status_code == 200
+        saver.assert_called_once()
+        assert saver.call_args.args[1]["title"] == "更新後"
+
+    def test_failed_commit_returns_500(self, stored):
+        """保存に失敗した場合は500が返るテスト"""
+        loader = MagicMock(return_value=stored)
+        saver = MagicMock(side_effect=OSError("disk full"))
+
+        app = Flask(__name__)
+        init_unit_of_work(app)
+
+        @app.route("/touch")
+        def touch():
+            structure = load_structure_for_request("uow_test", loader=loader)
+            structure["title"] = "更新後"
+            stage_structure("uow_test", structure, saver=saver)
+            return "ok"
+
+        response = app.test_client().get("/touch")
+
+        assert response.status_code == 500
+        assert response.get_json()["success"] is False
+        saver.assert_called_once()
+
+    def test_view_exception_skips_commit(self, stored):
+        """ビューで例外が発生した場合は途中の変更を保存しないテスト"""
+        loader = MagicMock(return_value=stored)
+        saver = MagicMock(return_value=True)
+
+        app = Flask(__name__)
+        app.config["PROPAGATE_EXCEPTIONS"] = False
+        init_unit_of_work(app)
+
+        @app.route("/touch")
+        def touch():
+            structure = load_structure_for_request("uow_test", loader=loader)
+            structure["title"] = "途中"
+            stage_structure("uow_test", structure, saver=saver)
+            raise RuntimeError("途中で失敗")
+
+        response = app.test_client().get("/touch")
+
+        assert response.status_code == 500
+        saver.assert_not_called()
+
+    def test_view_exception_propagated_skips_commit(self, stored):
+        """テスト時に例外が伝播する場合も保存しないテスト"""
+        loader = MagicMock(return_value=stored)
+        saver = MagicMock(return_value=True)
+
+        app = Flask(__name__)
+        app.testing = True
+        init_unit_of_work(app)
+
+        @app.route("/touch")
+        def touch():
+            structure = load_structure_for_request("uow_test", loader=loader)
+            structure["title"] = "途中"
+            stage_structure("uow_test", structure, saver=saver)
+            raise RuntimeError("途中で失敗")
+
+        with pytest.raises(RuntimeError):
+            app.test_client().get("/touch")
+
+        saver.assert_not_called()
+
+    def test_outside_request_saves_immediately(self, stored):
+        """リクエスト外では即時保存されるテスト"""
+        saver = MagicMock(return_value=True)
+        assert stage_structure("uow_test", stored, saver=saver) is True
+        saver.assert_called_once()
@@ -0,0 +1,104 @@
+"""
+構成のバージョンストアのテスト
+"""
+
+import copy
+import os
+
+import pytest
+
+from src.structure.utils import append_structure_log, structure_log
+from src.structure.version_store import HEAD_KEY, VersionStore, get_version_store, record_version
+
+
+@pytest.fixture
+def store(tmp_path):
+    """一時ディレクトリのバージョンストア"""
+    return VersionStore(str(tmp_path / ".versions"))
+
+
+@pytest.fixture
+def structure():
+    """テスト用の構成データ"""
+    return {
+        "id": "vs_test",
+        "title": "在庫管理",
+        "description": "在庫を管理するアプリ",
+        "content": {"overview": "概要"},
+        "modules": {
+            "auth": {"title": "認証", "sections": {"login": {"title": "ログイン"}}},
+            "stock": {"title": "在庫", "sections": {"list": {"title": "一覧"}, "edit": {"title": "編集"}}},
+        },
+    }
+
+
+def _object_count(store):
+    return sum(len(files) for _, _, files in os.walk(os.path.join(store.root, "objects")))
+
+
+class TestVersionStore:
+    """バージョンストアのテストクラス"""
+
+    def test_checkout_restores_snapshot_in_order(self, store, structure):
+        """保存したスナップショットがキーの順序も含めて復元されるテスト"""
+        head = record_version(structure, "save", "初回保存", "2026-01-01T00:00:00", store=store)
+        snapshot = store.checkout(head)
+        assert snapshot == {key: structure[key] for key in ("title", "description", "content", "modules")}
+        assert list(snapshot["modules"]["stock"]["sections"]) == ["list", "edit"]
+
+    def test_unchanged_modules_are_shared(self, store, structure):
+        """変更のないモジュール・セクションは新しいバージョンでも共有されるテスト"""
+        record_version(structure, "save", "", "2026-01-01T00:00:00", store=store)
+        before = _object_count(store)
+
+        structure["modules"]["stock"]["sections"]["edit"]["title"] = "編集（一括）"
+        record_version(structure, "update", "", "2026-01-01T00:01:00", store=store)
+
+        # 変わったセクション・その親の tree（sections / module / modules / snapshot）・version だけが増える
+        assert _object_count(store) - before == 6
+
+    def test_head_chain_and_log(self, store, structure):
+        """head から親をたどって従来の形の履歴が得られるテスト"""
+        record_version(structure, "save", "初回保存", "2026-01-01T00:00:00", store=store)
+        structure["title"] = "在庫管理v2"
+        head = record_version(structure, "update", "タイトル変更", "2026-01-01T00:01:00", store=store)
+
+        assert structure[HEAD_KEY] == head
+        assert "history" not in structure
+        log = structure_log(structure, store=store)
+        assert [entry["action"] for entry in log] == ["save", "update"]
+        assert log[0]["snapshot"]["title"] == "在庫管理"
+        assert log[1]["snapshot"]["content"] == '{\n  "overview": "概要"\n}'
+        assert structure_log(structure, limit=1, store=store)[0]["version"] == head
+
+    def test_legacy_history_is_migrated(self, store, structure):
+        """構成に埋め込まれた従来の履歴がバージョンとして取り込まれるテスト"""
+        structure["history"] = [{
+            "timestamp": "2025-12-31T00:00:00",
+            "action": "create",
+            "detail": "",
+            "snapshot": {"content": '{"overview": "旧概要"}', "title": "旧タイトル", "description": ""},
+        }]
+        record_version(structure, "save", "", "2026-01-01T00:00:00", store=store)
+
+        log = structure_log(structure, store=store)
+        assert "history" not in structure
+        assert [entry["action"] for entry in log] == ["create", "save"]
+        assert log[0]["snapshot"]["title"] == "旧タイトル"
+        assert '"旧概要"' in log[0]["snapshot"]["content"]
+
+
+class TestAppendStructureLog:
+    """append_structure_log のテストクラス"""
+
+    def test_keeps_only_head_in_structure(self, tmp_path, monkeypatch, structure):
+        """構成にはスナップショットではなく head だけが残るテスト"""
+        monkeypatch.setenv("AIDEX_DATA_DIR", str(tmp_path))
+        original = copy.deepcopy(structure)
+
+        append_structure_log(structure, "save", "保存")
+
+        assert set(structure) - set(original) == {HEAD_KEY}
+        log = structure_log(structure)
+        assert len(log) == 1 and log[0]["detail"] == "保存"
+        assert get_version_store(str(tmp_path)).has(structure[HEAD_KEY])
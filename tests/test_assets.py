@@ -0,0 +1,92 @@
+"""
+静的アセットパイプラインのテスト
+"""
+
+import gzip
+import json
+
+import pytest
+
+from src.common.assets import AssetManifest, build_assets, content_hash, negotiate_encoding
+
+
+@pytest.fixture
+def static_dir(tmp_path):
+    """テスト用のstaticディレクトリ"""
+    (tmp_path / "js").mkdir()
+    (tmp_path / "css").mkdir()
+    (tmp_path / "js" / "a.js").write_text("class A {}\n" + "// a\n" * 400, encoding="utf-8")
+    (tmp_path / "js" / "b.js").write_text("const b = 1", encoding="utf-8")
+    (tmp_path / "css" / "base.css").write_text("body { margin: 0; }\n", encoding="utf-8")
+    return tmp_path
+
+
+BUNDLES = {"page.js": ["js/a.js", "js/b.js"]}
+
+
+class TestBuildAssets:
+    """アセットビルドのテストクラス"""
+
+    def test_hashed_files_and_manifest(self, static_dir):
+        """ハッシュ付きファイルとマニフェストが作成されるテスト"""
+        manifest = build_assets(str(static_dir), bundles=BUNDLES)
+
+        entry = manifest["files"]["js/a.js"]
+        digest = content_hash((static_dir / "js" / "a.js").read_bytes())
+        assert entry["path"] == f"js/a.{digest}.js"
+        assert (static_dir / "dist" / entry["path"]).exists()
+
+        with open(static_dir / "dist" / "manifest.json", encoding="utf-8") as f:
+            assert json.load(f) == manifest
+
+    def test_precompressed_variants(self, static_dir):
+        """一定サイズ以上のファイルだけgzip版が作成されるテスト"""
+        manifest = build_assets(str(static_dir), bundles=BUNDLES)
+
+        large = manifest["files"]["js/a.js"]
+        assert "gzip" in large["encodings"]
+        compressed = (static_dir / "dist" / (large["path"] + ".gz")).read_bytes()
+        assert gzip.decompress(compressed) == (static_dir / "js" / "a.js").read_bytes()
+        assert manifest["files"]["js/b.js"]["encodings"] == []
+
+    def test_bundle_keeps_order(self, static_dir):
+        """バンドルが読み込み順に連結されるテスト"""
+        manifest = build_assets(str(static_dir), bundles=BUNDLES, compress=False)
+
+        bundle = manifest["bundles"]["page.js"]
+        assert bundle["sources"] == ["js/a.js", "js/b.js"]
+        text = (static_dir / "dist" / bundle["path"]).read_text(encoding="utf-8")
+        assert text.index("class A") < text.index("const b = 1")
+
+    def test_hash_stable_across_builds(self, static_dir):
+        """内容が変わらなければ再ビルドしてもパスが変わらないテスト"""
+        first = build_assets(str(static_dir), bundles=BUNDLES)
+        second = build_assets(str(static_dir), bundles=BUNDLES)
+        assert first == second
+
+        (static_dir / "js" / "b.js").write_text("const b = 2", encoding="utf-8")
+        third = build_assets(str(static_dir), bundles=BUNDLES)
+        assert third["files"]["js/b.js"]["path"] != first["files"]["js/b.js"]["path"]
+        assert third["files"]["js/a.js"]["path"] == first["files"]["js/a.js"]["path"]
+
+
+class TestAssetManifest:
+    """マニフェスト参照のテストクラス"""
+
+    def test_lookup_after_build(self, static_dir):
+        """ビルド後はハッシュ付きパスを解決できるテスト"""
+        manifest = AssetManifest(str(static_dir))
+        assert manifest.lookup("js/a.js") is None
+        assert manifest.fallback_hash("js/a.js") == content_hash((static_dir / "js" / "a.js").read_bytes())
+
+        built = build_assets(str(static_dir), bundles=BUNDLES)
+        assert manifest.lookup("js/a.js") == built["files"]["js/a.js"]
+        assert manifest.find_by_hashed_path(built["bundles"]["page.js"]["path"]) is not None
+        assert manifest.find_by_hashed_path("js/unknown.js") is None
+
+    def test_negotiate_encoding(self):
+        """Accept-Encodingに応じたエンコーディング選択のテスト"""
+        assert negotiate_encoding("gzip, deflate, br", ["br", "gzip"]) == "br"
+        assert negotiate_encoding("gzip, br;q=0", ["br", "gzip"]) == "gzip"
+        assert negotiate_encoding("identity", ["br", "gzip"]) is None
+        assert negotiate_encoding("br", ["gzip"]) is None
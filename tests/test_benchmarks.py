@@ -0,0 +1,85 @@
+"""
+ベンチマーク基盤のテスト
+"""
+
+import json
+import random
+
+from benchmarks.corpus import make_llm_response, make_structure, write_structure_corpus
+from benchmarks.loadtest import find_saturation, percentile, summarize
+from benchmarks.runner import compare_reports, measure
+
+
+class TestCorpus:
+    """合成コーパスのテストクラス"""
+
+    def test_deterministic(self):
+        """同じシードから同じ構成が生成されるテスト"""
+        first = make_structure(random.Random(1), "s1", modules=3, messages=10)
+        second = make_structure(random.Random(1), "s1", modules=3, messages=10)
+        assert first == second
+        assert len(first["modules"]) == 3
+        assert len(first["messages"]) == 10
+
+    def test_llm_response_styles(self):
+        """fenced / broken の応答が期待どおりの形になるテスト"""
+        fenced = make_llm_response(random.Random(1), 2, style="fenced")
+        body = fenced.split("```json\n")[1].split("\n```")[0]
+        assert len(json.loads(body)["modules"]) == 2
+
+        broken = make_llm_response(random.Random(1), 2, style="broken")
+        assert 'description: "生成された構成"' in broken
+
+    def test_write_structure_corpus(self, tmp_path):
+        """構成ファイルが指定数書き出されるテスト"""
+        ids = write_structure_corpus(str(tmp_path), count=4, modules=2, messages=4)
+        assert len(ids) == 4
+        assert sorted(p.stem for p in tmp_path.glob("*.json")) == ids
+
+
+class TestRunner:
+    """計測と比較のテストクラス"""
+
+    def test_measure(self):
+        """ラウンド数どおりに計測されるテスト"""
+        result = measure(lambda: sum(range(100)), min_time=0.001, rounds=3)
+        assert result["rounds"] == 3
+        assert result["min"] <= result["median"]
+        assert result["loops"] >= 1
+
+    def test_compare_reports(self):
+        """しきい値を超える悪化が回帰として検出されるテスト"""
+        baseline = {"results": {"a": {"median": 1.0}, "b": {"median": 1.0}, "c": {"median": 1.0}, "gone": {"median": 1.0}}}
+        current = {"results": {"a": {"median": 1.2}, "b": {"median": 0.5}, "c": {"median": 1.05}, "added": {"median": 1.0}}}
+        statuses = {row["name"]: row["status"] for row in compare_reports(baseline, current, threshold=0.1)}
+        assert statuses == {"a": "regression", "b": "improved", "c": "unchanged", "gone": "missing", "added": "new"}
+
+
+class TestLoadTest:
+    """負荷試験の集計のテストクラス"""
+
+    def test_percentile(self):
+        """線形補間の分位点のテスト"""
+        assert percentile([1, 2, 3, 4], 50) == 2.5
+        assert percentile([5], 95) == 5
+        assert percentile([], 50) is None
+
+    def test_summarize_counts_server_errors(self):
+        """5xxと接続エラーのみをエラーとして数えるテスト"""
+        samples = [("data", 200, 0.01), ("data", 304, 0.002), ("module-diff", 404, 0.01), ("chat", 500, 0.2), ("chat", 0, 1.0)]
+        summary = summarize(samples, elapsed=1.0)
+        assert summary["requests"] == 5
+        assert summary["errors"] == 2
+        assert summary["throughput_rps"] == 5.0
+        assert summary["statuses"]["304"] == 1
+
+    def test_find_saturation(self):
+        """p95が基準の倍率を超える直前の同時実行数を返すテスト"""
+        levels = [
+            {"concurrency": 1, "error_rate": 0.0, "latency_ms": {"p95": 100}},
+            {"concurrency": 2, "error_rate": 0.0, "latency_ms": {"p95": 150}},
+            {"concurrency": 4, "error_rate": 0.0, "latency_ms": {"p95": 450}},
+        ]
+        assert find_saturation(levels, factor=3.0) == 2
+        levels[1]["error_rate"] = 0.2
+        assert find_saturation(levels, factor=3.0) == 1
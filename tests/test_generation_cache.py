@@ -0,0 +1,135 @@
+"""
+構成生成の類似リクエストキャッシュのテスト
+"""
+
+from src.common import shared_cache
+from src.common.shared_cache import SQLiteCacheBackend, TieredCache
+from src.structure.generation_cache import GenerationCache, apply_cached_generation, normalize_request
+
+REQUEST = "在庫管理アプリを作りたいです。商品の入出庫を記録して、在庫が少なくなったら通知してほしい。"
+
+
+def _generated():
+    return {
+        "title": "在庫管理アプリ",
+        "description": "商品の入出庫と在庫通知",
+        "modules": [{"title": "在庫一覧"}, {"title": "入出庫記録"}],
+        "evaluations": {"claude": {"status": "success", "score": 0.8}},
+    }
+
+
+class TestNormalizeRequest:
+    """要望テキスト正規化のテストクラス"""
+
+    def test_whitespace_and_punctuation(self):
+        """空白・句読点・全角半角の違いが無視されるテスト"""
+        assert normalize_request("在庫 管理、アプリ！") == normalize_request("在庫管理アプリ")
+        assert normalize_request("ＡＢＣ　App") == "abcapp"
+        assert normalize_request(" 。") == ""
+
+
+class TestGenerationCache:
+    """類似リクエストキャッシュのテストクラス"""
+
+    def test_reordered_request_hits(self):
+        """文を並べ替えた要望がヒットし、無関係な要望はヒットしないテスト"""
+        cache = GenerationCache(threshold=0.85)
+        cache.store(REQUEST, _generated(), [{"role": "assistant", "content": "構成を作成しました"}], structure_id="s1")
+
+        reordered = "商品の入出庫を記録して、在庫が少なくなったら通知してほしい。在庫管理アプリを作りたいです。"
+        match = cache.lookup(reordered)
+        assert match is not None
+        assert match["entry"]["structure_id"] == "s1"
+        assert match["similarity"] >= 0.85
+
+        assert cache.lookup("社員の勤怠を打刻して月末に給与を計算するシステムがほしい") is None
+        assert cache.lookup("") is None
+
+        stats = cache.stats()
+        assert stats["lookups"] == 3
+        assert stats["hits"] == 1
+        assert stats["hit_rate"] == round(1 / 3, 4)
+
+    def test_persistence(self, tmp_path):
+        """ファイルから再読み込みでき、上限を超えると古いエントリが追い出されるテスト"""
+        path = str(tmp_path / "cache.jsonl")
+        cache = GenerationCache(path, max_entries=2)
+        cache.store(REQUEST, _generated(), [])
+        cache.store("顧客管理の仕組みを作りたい", _generated(), [])
+        cache.store("勤怠管理の仕組みを作りたい", _generated(), [])
+
+        reloaded = GenerationCache(path, max_entries=2)
+        assert reloaded.stats()["entries"] == 2
+        assert reloaded.lookup(REQUEST) is None
+        assert reloaded.lookup("勤怠管理の 仕組みを 作りたい")["similarity"] == 1.0
+
+    def test_compaction_keeps_other_workers_entries(self, tmp_path):
+        """書き直しの際に、同じファイルに追記した別のワーカーのエントリが残るテスト"""
+        path = str(tmp_path / "cache.jsonl")
+        first = GenerationCache(path, max_entries=3)
+        second = GenerationCache(path, max_entries=3)
+        for i in range(5):
+            first.store(f"帳票{i}の仕組みを作りたい", _generated(), [])
+        second.store(REQUEST, _generated(), [])
+        first.store("日報の仕組みを作りたい", _generated(), [])
+        # 7件目で書き直しになる
+        first.store("予約管理の仕組みを作りたい", _generated(), [])
+
+        with open(path, encoding="utf-8") as f:
+            assert len(f.readlines()) == 3
+        reloaded = GenerationCache(path, max_entries=3)
+        assert reloaded.lookup(REQUEST)["similarity"] == 1.0
+        assert first.lookup(REQUEST)["similarity"] == 1.0
+        assert not list(tmp_path.glob("*.tmp*"))
+
+    def test_shared_entry_reused_by_other_worker(self, tmp_path):
+        """別のワーカーが保存した要望は、再読み込みを待たずに共有キャッシュから再利用できるテスト"""
+        path = str(tmp_path / "cache.jsonl")
+        shared_path = str(tmp_path / "shared.sqlite3")
+        first = GenerationCache(path, shared=TieredCache("generation_cache", shared=SQLiteCacheBackend(shared_path)))
+        second = GenerationCache(path, shared=TieredCache("generation_cache", shared=SQLiteCacheBackend(shared_path)))
+        second.store(REQUEST, _generated(), [], structure_id="s1")
+
+        match = first.lookup(REQUEST.replace("。", "、"))
+        assert match["similarity"] == 1.0
+        assert match["entry"]["structure_id"] == "s1"
+        assert first.stats()["entries"] == 1
+
+    def test_compaction_invalidates_evicted_shared_entries(self, tmp_path, monkeypatch):
+        """書き直しで追い出したエントリが、他のワーカーでも共有キャッシュから読まれなくなるテスト"""
+        monkeypatch.setattr(shared_cache, "_revisions", shared_cache._Revisions(interval=0))
+        path = str(tmp_path / "cache.jsonl")
+        shared_path = str(tmp_path / "shared.sqlite3")
+        first = GenerationCache(path, max_entries=2, shared=TieredCache("generation_cache", shared=SQLiteCacheBackend(shared_path)))
+        second = GenerationCache(path, max_entries=2, shared=TieredCache("generation_cache", shared=SQLiteCacheBackend(shared_path)))
+        second.store(REQUEST, _generated(), [])
+        for i in range(4):
+            first.store(f"帳票{i}の仕組みを作りたい", _generated(), [])
+        # 5件目で書き直しになり、最初のエントリが追い出される
+        first.store("予約管理の仕組みを作りたい", _generated(), [])
+
+        other = GenerationCache(shared=TieredCache("generation_cache", shared=SQLiteCacheBackend(shared_path)))
+        assert other.lookup(REQUEST) is None
+        assert other.lookup("予約管理の仕組みを作りたい")["similarity"] == 1.0
+        assert other.lookup("帳票3の仕組みを作りたい")["similarity"] == 1.0
+
+    def test_apply_cached_generation(self):
+        """キャッシュの内容が構成に反映され、再利用の通知が追加されるテスト"""
+        cache = GenerationCache()
+        cache.store(REQUEST, _generated(), [{"role": "assistant", "content": "構成を作成しました"}], structure_id="s1")
+        match = cache.lookup(REQUEST)
+
+        structure = {"title": "新規構成", "content": {}, "messages": [{"role": "user", "content": REQUEST}]}
+        added = apply_cached_generation(structure, match)
+
+        assert structure["title"] == "在庫管理アプリ"
+        assert len(structure["modules"]) == 2
+        assert "content" not in structure
+        assert structure["generation_cache"]["source_structure_id"] == "s1"
+        assert [m["content"] for m in structure["messages"][1:-1]] == ["構成を作成しました"]
+        assert structure["messages"][-1]["type"] == "notification"
+        assert len(added) == 2
+
+        # 反映した構成を変更してもキャッシュには影響しない
+        structure["modules"].append({"title": "追加"})
+        assert len(cache.lookup(REQUEST)["entry"]["fields"]["modules"]) == 2
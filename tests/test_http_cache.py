@@ -0,0 +1,129 @@
+"""
+条件付きGETデコレーターのテスト
+"""
+
+import os
+
+import pytest
+from flask import Flask, jsonify
+
+from src.common import shared_cache
+from src.common.http_cache import conditional_get
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    """応答の元になるテスト用ファイル"""
+    path = tmp_path / "structure.json"
+    path.write_text('{"title": "テスト"}', encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def app(data_file):
+    """条件付きGETのエンドポイントのみを持つテスト用アプリケーション"""
+    app = Flask(__name__)
+    app.config["TESTING"] = True
+    app.calls = []
+
+    @app.route("/items/<item_id>")
+    @conditional_get(lambda item_id: [str(data_file) if item_id == "exists" else None])
+    def get_item(item_id):
+        app.calls.append(item_id)
+        if item_id != "exists":
+            return jsonify({"error": "not found"}), 404
+        return jsonify({"title": data_file.read_text(encoding="utf-8")})
+
+    @app.route("/structures/<structure_id>")
+    @conditional_get(lambda structure_id: [str(data_file)], scope=shared_cache.structure_scope)
+    def get_structure(structure_id):
+        app.calls.append(structure_id)
+        return jsonify({"title": data_file.read_text(encoding="utf-8")})
+
+    return app
+
+
+class TestConditionalGet:
+    """条件付きGETデコレーターのテストクラス"""
+
+    def test_not_modified_skips_view(self, app):
+        """If-None-Matchが一致すればビューを呼ばずに304が返るテスト"""
+        client = app.test_client()
+        first = client.get("/items/exists")
+        assert first.status_code == 200
+        assert first.headers["Cache-Control"] == "private, no-cache"
+        assert "Last-Modified" in first.headers
+
+        second = client.get("/items/exists", headers={"If-None-Match": first.headers["ETag"]})
+        assert second.status_code == 304
+        assert app.calls == ["exists"]
+
+    def test_strong_etag(self, app):
+        """ETagが強い検証子で送られ、W/ 付きのIf-None-Matchでも304が返るテスト"""
+        client = app.test_client()
+        etag = client.get("/items/exists").headers["ETag"]
+        assert not etag.startswith("W/")
+
+        response = client.get("/items/exists", headers={"If-None-Match": f"W/{etag}"})
+        assert response.status_code == 304
+
+    def test_if_none_match_weak_comparison(self, app):
+        """If-None-Matchが強いETagと弱い比較で照合されるテスト（W/ 付き・複数指定・不一致）"""
+        client = app.test_client()
+        etag = client.get("/items/exists").headers["ETag"]
+
+        for header in (f'"other", W/{etag}', f'W/"other", {etag}', "*"):
+            response = client.get("/items/exists", headers={"If-None-Match": header})
+            assert response.status_code == 304, header
+            assert response.headers["ETag"] == etag
+
+        response = client.get("/items/exists", headers={"If-None-Match": 'W/"other", "another"'})
+        assert response.status_code == 200
+
+    def test_if_modified_since(self, app):
+        """If-Modified-Sinceでも304が返るテスト"""
+        client = app.test_client()
+        first = client.get("/items/exists")
+        second = client.get("/items/exists", headers={"If-Modified-Since": first.headers["Last-Modified"]})
+        assert second.status_code == 304
+
+    def test_file_change_invalidates(self, app, data_file):
+        """ファイルが更新されると200が返るテスト"""
+        client = app.test_client()
+        etag = client.get("/items/exists").headers["ETag"]
+
+        data_file.write_text('{"title": "更新後のテスト"}', encoding="utf-8")
+        stat = data_file.stat()
+        os.utime(data_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        response = client.get("/items/exists", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+
+    def test_query_string_changes_etag(self, app):
+        """クエリ文字列が異なると別のETagになるテスト"""
+        client = app.test_client()
+        plain = client.get("/items/exists").headers["ETag"]
+        with_query = client.get("/items/exists?detail=1").headers["ETag"]
+        assert plain != with_query
+
+    def test_missing_file_falls_through(self, app):
+        """元ファイルがない場合はビューの応答がそのまま返るテスト"""
+        client = app.test_client()
+        response = client.get("/items/missing")
+        assert response.status_code == 404
+        assert "ETag" not in response.headers
+
+    def test_scope_revision_invalidates(self, app, monkeypatch):
+        """スコープのリビジョンが進むと（別のワーカーでの保存など）ファイルが同じでも200が返るテスト"""
+        monkeypatch.setenv("AIDEX_CACHE_BACKEND", "local")
+        monkeypatch.setattr(shared_cache, "_revisions", shared_cache._Revisions())
+        client = app.test_client()
+        etag = client.get("/structures/s1").headers["ETag"]
+        assert client.get("/structures/s1", headers={"If-None-Match": etag}).status_code == 304
+
+        shared_cache.bump_revision(shared_cache.structure_scope("s1"))
+
+        response = client.get("/structures/s1", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
@@ -0,0 +1,128 @@
+"""
+JSONのエンコード・デコード（json_codec）のテスト
+"""
+
+import dataclasses
+import enum
+import json
+from datetime import datetime
+from uuid import UUID
+
+import pytest
+
+from src.common import json_codec
+
+
+class Color(enum.Enum):
+    RED = 1
+
+
+class Level(enum.IntEnum):
+    HIGH = 3
+
+
+@dataclasses.dataclass
+class Point:
+    x: int
+    y: float
+
+
+VALUES = [
+    {"title": "在庫管理", "content": {"modules": [{"id": "m1", "fields": []}], "empty": {}}, "score": 0.85},
+    [1, -2, 3.5, 0.0, -0.0, True, False, None, "改行\n\"引用\"\t\x01"],
+    {"small": 1e-5, "large": 1e20, "nan": float("nan"), "inf": float("-inf")},
+    {"enum": Color.RED, "int_enum": Level.HIGH, "tuple": (1, 2)},
+    {"created_at": datetime(2025, 1, 2, 3, 4, 5), "point": Point(1, 2.5), "uuid": UUID(int=1)},
+    {"big": 2 ** 70, 1: "int key", None: "none key"},
+    {"z": 1, "a": {"y": 2, "b": 3}, "é": "non-ascii key"},
+]
+
+OPTIONS = [
+    {"indent": 2},
+    {"separators": (",", ":")},
+    {"indent": 2, "sort_keys": True},
+    {},
+    {"indent": 4},
+]
+
+
+class TestJsonCodec:
+    """json_codec のテストクラス"""
+
+    @pytest.mark.parametrize("backend", ["json", "orjson"])
+    def test_dumps_matches_stdlib(self, backend, monkeypatch):
+        """どちらの実装でも json.dumps(ensure_ascii=False) と同じ文字列になるテスト"""
+        monkeypatch.setenv("AIDEX_JSON_BACKEND", backend)
+        for value in VALUES:
+            for options in OPTIONS:
+                for default in (str, None):
+                    try:
+                        expected = json.dumps(value, ensure_ascii=False, default=default, **options)
+                    except TypeError:
+                        with pytest.raises(TypeError):
+                            json_codec.dumps(value, default=default, **options)
+                        continue
+                    assert json_codec.dumps(value, default=default, **options) == expected
+                    assert json_codec.dumps_bytes(value, default=default, **options) == expected.encode("utf-8")
+
+    def test_default_output_is_checked(self):
+        """default の戻り値に一致しない値がある場合も標準ライブラリと同じ出力になるテスト"""
+        value = {"data": object()}
+        assert json_codec.dumps(value, indent=2, default=lambda obj: 1e30) == \
+            json.dumps(value, ensure_ascii=False, indent=2, default=lambda obj: 1e30)
+
+    def test_circular_reference_raises(self):
+        """循環参照は標準ライブラリと同じく ValueError になり、共有された値は変換できるテスト"""
+        shared = {"id": "m1"}
+        assert json_codec.dumps([shared, {"ref": shared}], indent=2) == \
+            json.dumps([shared, {"ref": shared}], ensure_ascii=False, indent=2)
+
+        circular = []
+        circular.append(circular)
+        with pytest.raises(ValueError):
+            json_codec.dumps(circular, indent=2)
+
+    @pytest.mark.parametrize("backend", ["json", "orjson"])
+    def test_loads_matches_stdlib(self, backend, monkeypatch):
+        """どちらの実装でも json.loads と同じ値になり、読めない場合は JSONDecodeError になるテスト"""
+        monkeypatch.setenv("AIDEX_JSON_BACKEND", backend)
+        for text in ['{"a": 1, "a": 2}', "[NaN, Infinity]", str(2 ** 70), "[12345678901234567890, 1.5]",
+                     '"\\ud800"', '{"title": "在庫"}']:
+            assert repr(json_codec.loads(text)) == repr(json.loads(text))
+            assert repr(json_codec.loads(text.encode("utf-8"))) == repr(json.loads(text))
+
+        with pytest.raises(json.JSONDecodeError):
+            json_codec.loads("{broken")
+
+    def test_backend_selection(self, monkeypatch):
+        """AIDEX_JSON_BACKEND=json で標準ライブラリに固定できるテスト"""
+        monkeypatch.setenv("AIDEX_JSON_BACKEND", "json")
+        assert json_codec.get_backend() == json_codec.BACKEND_JSON
+
+        monkeypatch.delenv("AIDEX_JSON_BACKEND")
+        expected = json_codec.BACKEND_JSON if json_codec.orjson is None else json_codec.BACKEND_ORJSON
+        assert json_codec.get_backend() == expected
+
+    def test_flask_provider(self):
+        """jsonify が json_codec で変換され、日本語をエスケープせず標準ライブラリと同じ出力になるテスト"""
+        flask = pytest.importorskip("flask")
+        from src.common.json_provider import CodecJSONProvider, init_json_provider
+
+        app = flask.Flask(__name__)
+        app.debug = False
+        init_json_provider(app)
+        assert isinstance(app.json, CodecJSONProvider)
+        value = {"title": "在庫", "a": 1, "items": [1.5, None]}
+
+        # デバッグ時の整形（indent=2）とそれ以外の詰めた形式の両方を確認する
+        app.json.compact = True
+        with app.app_context():
+            compact = flask.jsonify(value).get_data(as_text=True).strip()
+        app.json.compact = False
+        with app.app_context():
+            indented = flask.jsonify(value).get_data(as_text=True).strip()
+
+        assert "在庫" in compact
+        assert compact == json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        assert indented == json.dumps(value, ensure_ascii=False, sort_keys=True, indent=2)
+        assert app.json.loads('{"title": "在庫"}') == json.loads('{"title": "在庫"}')
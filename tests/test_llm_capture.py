@@ -0,0 +1,87 @@
+"""
+LLM入出力キャプチャストアのテスト
+"""
+
+import gzip
+import json
+import time
+
+from src.common.llm_capture import OUTCOME_ERROR, CaptureConfig, CaptureStore
+from src.common.tracing import start_trace
+
+
+class TestCaptureStore:
+    """キャプチャストアのテストクラス"""
+
+    def test_batches_into_gzip_members(self, tmp_path):
+        """バッファした記録が1つのgzipメンバーとして書き出され、call_idで取得できるテスト"""
+        store = CaptureStore(str(tmp_path), CaptureConfig(flush_records=3))
+        ids = [store.capture("gemini", "gemini.chat", {"prompt": f"p{i}", "response": "r" * 100}) for i in range(5)]
+        assert store.stats["flushes"] == 1
+        store.flush()
+        assert store.stats["flushes"] == 2
+
+        segment = store.segments()[0]
+        with gzip.open(segment, "rt", encoding="utf-8") as f:
+            assert [json.loads(line)["call_id"] for line in f] == ids
+
+        record = store.get(ids[3])
+        assert record["payload"]["prompt"] == "p3"
+        assert record["provider"] == "gemini"
+
+    def test_sampling_keeps_failures(self, tmp_path):
+        """成功はサンプリングされ、失敗は常に保存されるテスト"""
+        config = CaptureConfig(default_rate=1.0, sample_rates={"gemini:success": 0.0, "claude": 0.5}, seed=1)
+        store = CaptureStore(str(tmp_path), config)
+        assert store.capture("gemini", "gemini.chat", {"response": "ok"}) is None
+        assert store.capture("gemini", "gemini.chat", {"error": "boom"}, outcome=OUTCOME_ERROR) is not None
+        kept = [store.capture("claude", "claude.chat", {}) for _ in range(200)]
+        assert 60 < sum(1 for call_id in kept if call_id) < 140
+        assert store.capture("chatgpt", "chatgpt.call", {}) is not None
+
+    def test_query_by_index(self, tmp_path):
+        """構成ID・プロバイダー・結果・トレースIDで検索できるテスト"""
+        store = CaptureStore(str(tmp_path))
+        with start_trace("POST /chat", trace_id="req-capture1") as trace:
+            trace.attributes["structure_id"] = "s-1"
+            store.capture("gemini", "gemini.chat", {"response": "a"})
+        store.capture("claude", "claude.chat", {"error": "x"}, outcome=OUTCOME_ERROR, structure_id="s-2")
+        store.capture("gemini", "gemini.call", {"response": "b"}, structure_id="s-2")
+
+        assert [e["source"] for e in store.query(structure_id="s-2")] == ["gemini.call", "claude.chat"]
+        assert store.query(provider="gemini", trace_id="req-capture1")[0]["structure_id"] == "s-1"
+        errors = store.load(store.query(outcome=OUTCOME_ERROR))
+        assert errors[0]["payload"] == {"error": "x"}
+
+    def test_segment_rotation_and_retention(self, tmp_path, monkeypatch):
+        """上限サイズでセグメントが切り替わり、保持数を超えた古い分から削除されるテスト"""
+        # 時計が進まなくても作成順に並ぶことを確かめる
+        monkeypatch.setattr(time, "time_ns", lambda: 1_700_000_000_000_000_000)
+        config = CaptureConfig(max_segment_bytes=200, max_segments=2, flush_records=1)
+        store = CaptureStore(str(tmp_path), config)
+        ids = [store.capture("gemini", "gemini.chat", {"response": f"{i}" * 400}) for i in range(6)]
+        assert len(store.segments()) == 2
+        assert store.segments()[-1] == store.segment_path
+        assert store.get(ids[-1])["payload"]["response"] == "5" * 400
+        assert store.get(ids[-2])["payload"]["response"] == "4" * 400
+        assert store.get(ids[0]) is None
+        assert [entry["call_id"] for entry in store.query(limit=2)] == [ids[-1], ids[-2]]
+
+    def test_disabled(self, tmp_path):
+        """無効時は何も書き出さないテスト"""
+        store = CaptureStore(str(tmp_path), CaptureConfig(enabled=False))
+        assert store.capture("gemini", "gemini.chat", {}, flush=True) is None
+        assert store.segments() == []
+
+    def test_extract_json_part_records_provider(self, tmp_path):
+        """extract_json_part が応答を返したプロバイダーで記録されるテスト"""
+        from src.common.llm_capture import set_capture_store
+        from src.utils.files import extract_json_part
+
+        store = CaptureStore(str(tmp_path), CaptureConfig(flush_records=1))
+        set_capture_store(store)
+        try:
+            assert "error" in extract_json_part("JSONなし", provider="gemini")
+        finally:
+            set_capture_store(None)
+        assert [entry["provider"] for entry in store.query(outcome=OUTCOME_ERROR)] == ["gemini"]
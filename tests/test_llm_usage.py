@@ -0,0 +1,150 @@
+"""
+LLM利用量の台帳のテスト
+"""
+
+import pytest
+
+from src.common.llm_usage import (
+    QUOTA_MODE_DEFER,
+    UsageLedger,
+    estimate_tokens,
+    load_quotas,
+    normalize_usage,
+    usage_context,
+)
+from src.exceptions import UsageQuotaExceededError
+
+START = 1_750_000_040.0  # UTCで分の区切りから20秒後
+
+
+class FakeClock:
+    """テスト用の時計（sleep で時刻が進む）"""
+
+    def __init__(self, now: float = START):
+        self.now = now
+        self.slept = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class TestNormalizeUsage:
+    """usage形式の正規化のテストクラス"""
+
+    def test_provider_formats(self):
+        """OpenAI・Anthropic・Geminiの形式を同じ値に変換するテスト"""
+        assert normalize_usage({"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}) == (10, 5)
+        assert normalize_usage({"input_tokens": 7, "output_tokens": 3}) == (7, 3)
+
+        class Metadata:
+            prompt_token_count = 4
+            candidates_token_count = 2
+
+        assert normalize_usage(Metadata()) == (4, 2)
+        assert normalize_usage(None) == (0, 0)
+
+    def test_estimate_tokens(self):
+        """英数字は4文字で1トークン、日本語は1文字1トークンで見積もるテスト"""
+        assert estimate_tokens("abcdefgh") == 2
+        assert estimate_tokens([{"role": "user", "content": "在庫"}, {"role": "user", "content": "abcd"}]) == 3
+
+    def test_load_quotas(self, tmp_path):
+        """JSON文字列とファイルからクォータを読み込み、不明な対象を無視するテスト"""
+        assert load_quotas('{"session": {"tokens_per_minute": 100, "unknown": 1}, "team": {}}') == {
+            "session": {"tokens_per_minute": 100}
+        }
+        path = tmp_path / "quotas.json"
+        path.write_text('{"provider:chatgpt": {"calls_per_day": 3}}', encoding="utf-8")
+        assert load_quotas(str(path)) == {"provider:chatgpt": {"calls_per_day": 3}}
+        assert load_quotas(None) == {}
+
+
+class TestUsageLedger:
+    """利用量台帳のテストクラス"""
+
+    def test_rollups_and_context(self):
+        """コンテキストの構成ID・セッションIDで集計されるテスト"""
+        clock = FakeClock()
+        ledger = UsageLedger(clock=clock)
+        with usage_context(structure_id="s1", session_id="a", prompt_name="structure_from_input"):
+            ledger.record("chatgpt", {"prompt_tokens": 100, "completion_tokens": 50}, model="gpt-4")
+        ledger.record("claude", {"input_tokens": 30, "output_tokens": 10}, model="claude-3", session_id="a")
+        clock.now += 60
+        ledger.record("chatgpt", {"prompt_tokens": 1, "completion_tokens": 1}, model="gpt-4", outcome="error")
+
+        minutes = ledger.rollups("minute", group_by=["provider"])
+        assert [(row["provider"], row["calls"]) for row in minutes] == [("chatgpt", 1), ("claude", 1), ("chatgpt", 1)]
+        day = ledger.rollups("day", group_by=["provider"])
+        assert day[0]["provider"] == "chatgpt"
+        assert (day[0]["calls"], day[0]["errors"], day[0]["input_tokens"]) == (2, 1, 101)
+
+        by_prompt = ledger.rollups("day", group_by=["prompt_name", "structure_id"])
+        assert {"prompt_name": "structure_from_input", "structure_id": "s1"}.items() <= by_prompt[1].items()
+
+        summary = ledger.summary()
+        assert summary["day"]["usage"]["session"]["a"] == {"calls": 2, "tokens": 190}
+        assert summary["minute"]["usage"]["global"]["*"] == {"calls": 1, "tokens": 2}
+
+    def test_reject_when_quota_exceeded(self):
+        """セッションのクォータを超える呼び出しを送信前に拒否するテスト"""
+        clock = FakeClock()
+        ledger = UsageLedger(quotas={"session": {"tokens_per_minute": 100}, "provider:claude": {"calls_per_day": 1}}, clock=clock)
+        with usage_context(session_id="a"):
+            ledger.acquire("chatgpt", estimated_tokens=40)
+            ledger.record("chatgpt", {"prompt_tokens": 60, "completion_tokens": 20})
+            with pytest.raises(UsageQuotaExceededError) as info:
+                ledger.acquire("chatgpt", estimated_tokens=40)
+        assert info.value.violation["scope"] == "session"
+        assert info.value.retry_after == 40.0
+
+        # 別のセッションは影響を受けない
+        ledger.acquire("chatgpt", estimated_tokens=40, session_id="b")
+
+        ledger.record("claude", {"input_tokens": 1})
+        with pytest.raises(UsageQuotaExceededError) as info:
+            ledger.acquire("claude")
+        assert info.value.violation["window"] == "day"
+        assert ledger.summary()["rejected"] == 2
+
+    def test_acquire_reserves_until_settled(self):
+        """acquire が見積もりを予約し、record で精算・release で戻すテスト"""
+        clock = FakeClock()
+        ledger = UsageLedger(quotas={"global": {"tokens_per_minute": 100, "calls_per_minute": 3}}, clock=clock)
+        first = ledger.acquire("chatgpt", estimated_tokens=60)
+        # 記録前の同時呼び出しも予約の合計で判定する
+        with pytest.raises(UsageQuotaExceededError) as info:
+            ledger.acquire("chatgpt", estimated_tokens=60)
+        assert info.value.violation["used"] == 60
+
+        ledger.record("chatgpt", {"prompt_tokens": 20, "completion_tokens": 10}, reservation=first)
+        second = ledger.acquire("chatgpt", estimated_tokens=60)
+        assert ledger.check("chatgpt", estimated_tokens=11)["used"] == 90
+
+        ledger.release(second)
+        ledger.release(second)
+        assert ledger.check("chatgpt", estimated_tokens=70) is None
+        assert ledger.summary()["minute"]["usage"]["global"]["*"] == {"calls": 1, "tokens": 30}
+
+    def test_defer_until_next_minute(self):
+        """deferモードでは次の分まで待ってから送信するテスト"""
+        clock = FakeClock()
+        ledger = UsageLedger(quotas={"global": {"calls_per_minute": 1}}, mode=QUOTA_MODE_DEFER,
+                             max_defer_seconds=60, clock=clock, sleep=clock.sleep)
+        ledger.record("gemini", {"prompt_token_count": 5})
+        ledger.acquire("gemini")
+        assert clock.slept == [40.0]
+        assert ledger.summary()["deferred"] == 1
+
+    def test_persistence(self, tmp_path):
+        """記録をファイルから読み直して日単位のクォータに反映するテスト"""
+        clock = FakeClock()
+        UsageLedger(str(tmp_path), clock=clock).record("chatgpt", {"prompt_tokens": 70, "completion_tokens": 30}, session_id="a")
+
+        reloaded = UsageLedger(str(tmp_path), quotas={"session": {"tokens_per_day": 120}}, clock=clock)
+        assert reloaded.summary()["day"]["usage"]["session"]["a"]["tokens"] == 100
+        assert reloaded.check("chatgpt", estimated_tokens=30, session_id="a")["limit"] == "tokens_per_day"
+        assert reloaded.check("chatgpt", estimated_tokens=10, session_id="a") is None
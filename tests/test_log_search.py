@@ -0,0 +1,137 @@
+"""
+インデックス付きログ検索サービスのテスト
+"""
+
+import gzip
+import os
+
+import pytest
+
+from src.tools.log_inspector import LogInspector
+from src.tools.log_search import LogSearchService, normalize_time_bound
+
+
+def _line(timestamp: str, level: str, message: str) -> str:
+    return f"{timestamp} - root - {level} - handler:10 - {message}\n"
+
+
+@pytest.fixture
+def log_dir(tmp_path):
+    """ローテーション済み（gzip・平文）と稼働中のログファイル"""
+    old = "".join(
+        _line(f"2025-06-18 10:00:{i:02d},000", "INFO", f"💾 構造保存開始 - structure_id: old-{i}")
+        for i in range(5)
+    )
+    with gzip.open(tmp_path / "app.log.2.gz", "wt", encoding="utf-8") as f:
+        f.write(old)
+
+    (tmp_path / "app.log.1").write_text(
+        _line("2025-06-19 09:00:00,000", "WARNING", "⚠️ 応答が空です request_id=req-001")
+        + _line("2025-06-19 09:30:00,000", "INFO", "ユーザー: user-42 がログイン"),
+        encoding="utf-8"
+    )
+
+    live = [
+        _line(f"2025-06-20 12:{i:02d}:00,000", "ERROR" if i % 10 == 0 else "INFO",
+              f"💬 会話メッセージ送信開始 - structure_id: s-{i % 3}")
+        for i in range(60)
+    ]
+    live.insert(5, "Traceback (most recent call last):\n  ValueError: 複数行の例外\n")
+    (tmp_path / "app.log").write_text("".join(live), encoding="utf-8")
+
+    os.utime(tmp_path / "app.log.2.gz", (1, 1))
+    os.utime(tmp_path / "app.log.1", (2, 2))
+    return tmp_path
+
+
+class TestLogSearchService:
+    """ログ検索サービスのテストクラス"""
+
+    def test_searches_rotated_and_live_files(self, log_dir):
+        """gzipを含むローテーション済みファイルが古い順に検索されるテスト"""
+        service = LogSearchService(str(log_dir / "app.log"), sparse_interval=256)
+        result = service.search(per_page=1000)
+        assert result["total_count"] == 5 + 2 + 60
+        assert [os.path.basename(p) for p in result["files"]] == ["app.log.2.gz", "app.log.1", "app.log"]
+        assert result["logs"][0]["timestamp"] == "2025-06-18 10:00:00,000"
+        assert result["logs"][-1]["timestamp"] == "2025-06-20 12:59:00,000"
+
+    def test_filters_use_indexes(self, log_dir):
+        """レベル・構成ID・リクエストID・ユーザーIDの絞り込みのテスト"""
+        service = LogSearchService(str(log_dir / "app.log"), sparse_interval=256)
+        assert service.search(level="error")["total_count"] == 6
+        assert service.search(structure_id="s-1")["total_count"] == 20
+        assert service.search(structure_id="s-0", level="ERROR")["total_count"] == 2
+        assert service.search(structure_id="old-3")["logs"][0]["source"] == "app.log.2.gz"
+        assert service.search(request_id="req-001")["logs"][0]["level"] == "WARNING"
+        assert service.search(user_id="user-42")["total_count"] == 1
+        assert service.search(keyword="複数行")["logs"][0]["message"].endswith("ValueError: 複数行の例外")
+
+    def test_time_range_and_pagination(self, log_dir):
+        """期間指定の境界とページ分割のテスト"""
+        service = LogSearchService(str(log_dir / "app.log"), sparse_interval=256)
+        result = service.search(start="2025-06-20 12:10", end="2025-06-20 12:19:00", per_page=4, page=3)
+        assert result["total_count"] == 10
+        assert result["pages"] == 3
+        assert [log["timestamp"][11:16] for log in result["logs"]] == ["12:18", "12:19"]
+
+        assert service.search(start="2025-06-19", end="2025-06-19")["total_count"] == 2
+        newest = service.search(newest_first=True, per_page=1)["logs"][0]
+        assert newest["timestamp"] == "2025-06-20 12:59:00,000"
+
+    def test_incremental_append(self, log_dir):
+        """稼働中のファイルへの追記（継続行を含む）が差分で索引されるテスト"""
+        log_file = log_dir / "app.log"
+        service = LogSearchService(str(log_file), sparse_interval=256)
+        assert service.search(structure_id="s-late")["total_count"] == 0
+        indexed_end = service.refresh()[-1].indexed_end
+
+        with open(log_file, "a", encoding="utf-8") as f:
+            f.write("  続きの行 structure_id: s-late\n")
+            f.write(_line("2025-06-20 13:00:00,000", "INFO", "後から追記 structure_id: s-late"))
+
+        index = service.refresh()[-1]
+        assert index.indexed_end > indexed_end
+        assert index.entry_count == 61
+        assert service.search(structure_id="s-late")["total_count"] == 2
+
+    def test_stats(self, log_dir):
+        """インデックスからの全体統計と、条件付き統計のテスト"""
+        service = LogSearchService(str(log_dir / "app.log"), sparse_interval=256)
+        stats = service.stats()
+        assert stats["total_entries"] == 67
+        assert stats["levels"] == {"INFO": 60, "ERROR": 6, "WARNING": 1}
+        assert "old-4" in stats["structure_ids"]
+        assert stats["user_ids"] == ["user-42"]
+        assert stats["date_range"]["start"].day == 18
+
+        filtered = service.stats(level="ERROR")
+        assert filtered["total_entries"] == 6
+        assert filtered["structure_ids"] == ["s-0", "s-1", "s-2"]
+
+    def test_normalize_time_bound(self):
+        """期間指定の正規化のテスト"""
+        assert normalize_time_bound("2025-06-19") == "2025-06-19 00:00:00,000"
+        assert normalize_time_bound("2025-06-19", upper=True) == "2025-06-19 23:59:59,999"
+        assert normalize_time_bound("2025-06-19T10:30", upper=True) == "2025-06-19 10:30:59,999"
+        with pytest.raises(ValueError):
+            normalize_time_bound("06/19/2025")
+
+
+class TestLogInspector:
+    """LogInspector の互換性のテストクラス"""
+
+    def test_filters(self, log_dir):
+        """従来のフィルターと統計が同じ形で返るテスト"""
+        inspector = LogInspector(str(log_dir / "app.log"))
+        assert inspector.load_logs()
+        assert len(inspector.filter_by_level("WARNING")) == 1
+        assert len(inspector.filter_by_date_range("2025-06-18", "2025-06-18")) == 5
+        assert len(inspector.log_entries) == 67
+        stats = inspector.get_statistics(inspector.filter_by_structure_id("s-2"))
+        assert stats["total_entries"] == 20
+        assert stats["levels"] == {"INFO": 18, "ERROR": 2}
+
+    def test_missing_file(self, tmp_path):
+        """ログファイルがない場合は False を返すテスト"""
+        assert not LogInspector(str(tmp_path / "missing.log")).load_logs()
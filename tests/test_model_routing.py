@@ -0,0 +1,89 @@
+"""
+タスク別のモデルルーティングのテスト
+"""
+
+import json
+
+import pytest
+
+from src.common.model_routing import DEFAULT_POLICY, ModelRouter, load_routing_policy
+
+
+def _policy(**overrides):
+    """extract タスクの候補を2つに絞ったポリシー"""
+    policy = load_routing_policy(json.dumps({
+        "min_samples": 3,
+        "tasks": {
+            "extract": {
+                "candidates": [
+                    {"provider": "chatgpt", "model": "small"},
+                    {"provider": "gemini", "model": "large"},
+                ],
+                "latency_slo_ms": 1000,
+                "min_success_rate": 0.8,
+                **overrides,
+            }
+        },
+    }))
+    return policy
+
+
+class TestModelRouter:
+    """モデルルーターのテストクラス"""
+
+    def test_picks_first_candidate_and_logs_decision(self, tmp_path):
+        """観測値がない場合は最初の候補を選び、判断を記録するテスト"""
+        router = ModelRouter(_policy(), log_dir=str(tmp_path), clock=lambda: 1_750_000_000.0)
+        decision = router.choose("extract")
+        assert (decision.provider, decision.model, decision.tier) == ("chatgpt", "small", 0)
+
+        [log_file] = list(tmp_path.iterdir())
+        assert json.loads(log_file.read_text(encoding="utf-8"))["reason"] == "first candidate"
+        assert router.stats()["recent_decisions"][-1]["model"] == "small"
+
+    def test_skips_candidates_missing_targets(self):
+        """成功率またはp95レイテンシが目標を満たさない候補を飛ばすテスト"""
+        router = ModelRouter(_policy())
+        for _ in range(3):
+            router.observe("chatgpt", "small", 50.0, success=False)
+        decision = router.choose("extract")
+        assert decision.target == "gemini/large"
+        assert "success_rate" in decision.skipped[0]["reason"]
+
+        router = ModelRouter(_policy())
+        for _ in range(3):
+            router.observe("chatgpt", "small", 5000.0, success=True)
+        assert "SLO" in router.choose("extract").skipped[0]["reason"]
+
+    def test_falls_back_to_best_success_rate(self):
+        """すべての候補が目標を満たさない場合は成功率が最も高い候補を選ぶテスト"""
+        router = ModelRouter(_policy())
+        for success in (True, False, False):
+            router.observe("chatgpt", "small", 50.0, success=success)
+        for success in (True, True, False):
+            router.observe("gemini", "large", 50.0, success=success)
+        decision = router.choose("extract")
+        assert decision.target == "gemini/large"
+        assert len(decision.skipped) == 2
+
+    def test_provider_filters_and_escalation(self):
+        """プロバイダーの制限・登録状況で候補を絞り、次の候補にエスカレーションするテスト"""
+        router = ModelRouter(_policy())
+        assert router.choose("extract", available=["gemini"]).target == "gemini/large"
+        assert router.choose("extract", providers=["claude"]).model == "claude-3-opus-20240229"
+
+        decision = router.choose("extract")
+        escalated = router.escalate(decision)
+        assert escalated.target == "gemini/large"
+        assert escalated.escalated_from == "chatgpt/small"
+        assert router.escalate(escalated) is None
+
+    def test_model_for_and_policy_validation(self):
+        """プロバイダー固定の呼び出しのモデルとポリシーの検証のテスト"""
+        router = ModelRouter()
+        evaluate = DEFAULT_POLICY["tasks"]["evaluate"]["candidates"]
+        assert router.model_for("evaluate", "claude") == evaluate[0]["model"]
+        with pytest.raises(ValueError):
+            router.choose("translate")
+        with pytest.raises(ValueError):
+            load_routing_policy('{"tasks": {"translate": {}}}')
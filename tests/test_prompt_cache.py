@@ -0,0 +1,78 @@
+"""
+プロンプトキャッシュ向けのプロンプト配置とキャッシュのトークン数の記録のテスト
+"""
+
+from src.common.llm_usage import UsageLedger, estimate_tokens, normalize_cache_usage, normalize_usage
+from src.common.prompt_cache import PromptLayout, cache_prefix, content_text, flatten_messages
+
+
+class TestPromptLayout:
+    """プロンプトの配置のテストクラス"""
+
+    def test_prefix_comes_first_with_breakpoint(self):
+        """固定のプレフィックスが先頭に置かれ、末尾にキャッシュの区切りが付くテスト"""
+        layout = PromptLayout("評価の指示", "構成データ")
+        assert layout.text == "評価の指示\n\n構成データ"
+
+        blocks = layout.to_messages()[0]["content"]
+        assert blocks[0] == {"type": "text", "text": "評価の指示\n\n", "cache_control": {"type": "ephemeral"}}
+        assert blocks[1] == {"type": "text", "text": "構成データ"}
+        assert content_text(blocks) == layout.text
+
+    def test_without_prefix_is_plain_message(self):
+        """プレフィックスがない場合は通常のメッセージになるテスト"""
+        assert PromptLayout("", "本文").to_messages() == [{"role": "user", "content": "本文"}]
+        assert cache_prefix(PromptLayout("", "本文").to_messages()) is None
+
+    def test_cache_prefix_depends_only_on_prefix(self):
+        """サフィックスが違っても同じプレフィックスとして判定されるテスト"""
+        first = cache_prefix(PromptLayout("指示", "構成A").to_messages())
+        second = cache_prefix(PromptLayout("指示", "構成B").to_messages())
+        assert first is not None and first == second
+        assert cache_prefix(PromptLayout("別の指示", "構成A").to_messages()) != first
+        assert cache_prefix("指示\n\n構成A") is None
+
+    def test_flatten_messages(self):
+        """区切りを扱えないプロバイダー向けに本文を連結するテスト"""
+        messages = [{"role": "system", "content": "system"}, *PromptLayout("指示", "構成").to_messages()]
+        assert flatten_messages(messages) == [
+            {"role": "system", "content": "system"},
+            {"role": "user", "content": "指示\n\n構成"},
+        ]
+
+
+class TestCacheUsage:
+    """キャッシュのトークン数の記録のテストクラス"""
+
+    def test_provider_formats(self):
+        """Anthropic・OpenAI・Geminiのキャッシュのトークン数を読み取るテスト"""
+        anthropic = {"input_tokens": 10, "output_tokens": 5,
+                     "cache_read_input_tokens": 800, "cache_creation_input_tokens": 0}
+        assert normalize_cache_usage(anthropic) == (800, 0)
+        # Anthropic の input_tokens はキャッシュ分を含まないため加算してそろえる
+        assert normalize_usage(anthropic) == (810, 5)
+
+        openai = {"prompt_tokens": 1200, "completion_tokens": 50, "prompt_tokens_details": {"cached_tokens": 1024}}
+        assert normalize_cache_usage(openai) == (1024, 0)
+        assert normalize_usage(openai) == (1200, 50)
+
+        class Metadata:
+            prompt_token_count = 900
+            candidates_token_count = 10
+            cached_content_token_count = 600
+
+        assert normalize_cache_usage(Metadata()) == (600, 0)
+        assert normalize_cache_usage(None) == (0, 0)
+
+    def test_rollups_include_cache_tokens(self):
+        """集計にキャッシュから読んだ・書いたトークン数が含まれるテスト"""
+        ledger = UsageLedger(clock=lambda: 1_750_000_040.0)
+        ledger.record("claude", {"input_tokens": 5, "output_tokens": 1, "cache_creation_input_tokens": 100})
+        ledger.record("claude", {"input_tokens": 5, "output_tokens": 1, "cache_read_input_tokens": 100})
+        row = ledger.rollups("day", group_by=["provider"])[0]
+        assert (row["input_tokens"], row["cache_read_tokens"], row["cache_write_tokens"]) == (210, 100, 100)
+
+    def test_estimate_tokens_reads_content_blocks(self):
+        """コンテンツブロックのメッセージも本文で見積もるテスト"""
+        layout = PromptLayout("abcd", "在庫")
+        assert estimate_tokens(layout.to_messages()) == estimate_tokens(layout.text)
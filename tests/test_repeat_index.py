@@ -0,0 +1,81 @@
+"""
+再発話検出の類似度インデックスのテスト
+"""
+
+import difflib
+import random
+
+from src.analysis.conversation import analyze_conversation, detect_repeated_user_messages
+from src.common import analyzer
+from src.analysis.similarity import RepeatIndex, clear_repeat_indexes, get_repeat_index
+
+
+def _brute_force(messages, threshold):
+    """従来の総当たりによる判定"""
+    latest = messages[-1]
+    for prev in messages[:-1][::-1]:
+        if difflib.SequenceMatcher(None, latest, prev).ratio() >= threshold:
+            return prev
+    return None
+
+
+class TestRepeatIndex:
+    """類似度インデックスのテストクラス"""
+
+    def setup_method(self):
+        clear_repeat_indexes()
+
+    def test_detects_repeat(self):
+        """言い回しの違う再発話を検出するテスト"""
+        history = [
+            {"role": "user", "content": "アプリを作りたい"},
+            {"role": "assistant", "content": "どんなアプリですか？"},
+            {"role": "user", "content": "アプリを作りたいです"},
+        ]
+        assert detect_repeated_user_messages(history, 0.85) == (True, "アプリを作りたい")
+        assert detect_repeated_user_messages(history, 0.85, structure_id="s-1") == (True, "アプリを作りたい")
+
+        history.append({"role": "user", "content": "在庫管理の機能を追加したい"})
+        assert detect_repeated_user_messages(history, structure_id="s-1") == (False, None)
+        assert len(get_repeat_index("s-1")) == 3
+
+    def test_matches_brute_force(self):
+        """ランダムな会話で総当たりと同じ結果になるテスト"""
+        rng = random.Random(7)
+        alphabet = "アプリ作りたい機能目的使うですます。、"
+        for _ in range(30):
+            index = RepeatIndex()
+            bases = ["".join(rng.choice(alphabet) for _ in range(rng.randint(3, 25))) for _ in range(4)]
+            messages = []
+            for _ in range(25):
+                chars = list(rng.choice(bases))
+                for _ in range(rng.randint(0, 2)):
+                    chars.insert(rng.randint(0, len(chars)), rng.choice(alphabet))
+                messages.append("".join(chars))
+                index.sync(messages)
+                for threshold in (0.85, 0.9):
+                    assert index.find_repeat(-1, threshold) == _brute_force(messages, threshold)
+
+    def test_sync_rebuilds_on_rewrite(self):
+        """過去の発言が書き換えられた場合はインデックスを作り直すテスト"""
+        index = RepeatIndex()
+        index.sync(["請求書を発行したい", "日報を共有したい"])
+        index.sync(["顧客一覧を表示したい", "請求書を発行したい"])
+        assert len(index) == 2
+        assert index.find_repeat(-1, 0.9) is None
+        index.sync(["顧客一覧を表示したい", "請求書を発行したい", "顧客一覧を表示したいです"])
+        assert index.find_repeat(-1, 0.85) == "顧客一覧を表示したい"
+
+    def test_analyze_conversation_uses_structure_index(self):
+        """analyze_conversation に structure_id を渡すと構成ごとのインデックスで判定するテスト"""
+        history = [
+            {"role": "user", "content": "アプリを作りたい"},
+            {"role": "assistant", "content": "どんなアプリですか？"},
+            {"role": "user", "content": "アプリを作りたいです"},
+        ]
+        expected = analyze_conversation(history)
+        assert expected.startswith("prompt:")
+        assert analyze_conversation(history, structure_id="s-1") == expected
+        assert analyzer.analyze_conversation(history, structure_id="s-2") == expected
+        assert len(get_repeat_index("s-1")) == 2
+        assert len(get_repeat_index("s-2")) == 2
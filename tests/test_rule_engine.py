@@ -0,0 +1,80 @@
+"""
+構成分析ルールエンジンのテスト
+"""
+
+from src.structure.rule_engine import (
+    COMPLETE_KEYWORDS,
+    INCOMPLETE_KEYWORDS,
+    KeywordMatcher,
+    StructureRuleEngine,
+)
+from src.structure.structure_analysis import analyze_structure_state
+
+
+def _structure():
+    return {
+        "title": "在庫管理アプリ",
+        "description": "倉庫の在庫を管理する",
+        "content": {"対象ユーザー": "倉庫担当者", "機能": {"在庫一覧": "表示"}},
+        "modules": [
+            {"id": "m1", "type": "table", "title": "在庫一覧", "description": "一覧", "columns": ["品名"]},
+            {"id": "m2", "type": "form", "title": "入庫登録"},
+        ],
+    }
+
+
+class TestKeywordMatcher:
+    """キーワード照合のテストクラス"""
+
+    def test_matches_substring_semantics(self):
+        """重なり・包含関係のあるキーワードも `in` 判定と同じ結果になるテスト"""
+        keywords = INCOMPLETE_KEYWORDS + COMPLETE_KEYWORDS
+        matcher = KeywordMatcher(keywords)
+        for text in ["this is incomplete", "構成は不十分で不足がある", "needs completion", "no problem, good", "なし"]:
+            assert matcher.find_all(text) == {k for k in keywords if k in text}
+
+
+class TestStructureRuleEngine:
+    """ルールエンジンのテストクラス"""
+
+    def test_single_analysis_serves_all_callers(self):
+        """1回の分析で状態・完全性・検証の結果がまとめて得られるテスト"""
+        engine = StructureRuleEngine()
+        structure = _structure()
+
+        state = engine.state(structure)
+        assert state["module_count"] == 2
+        assert [m["index"] for m in state["incomplete_modules"]] == [1]
+
+        validation = engine.validation(structure)
+        assert validation["is_valid"] is True
+        assert validation["invalid_modules"][0]["index"] == 1
+
+        completeness = engine.completeness(structure)
+        assert completeness["missing_fields"] == ["技術要件", "画面構成"]
+        assert engine.stats == {"hits": 2, "misses": 1, "entries": 1}
+
+    def test_memo_follows_content(self):
+        """内容が変わると再計算され、結果の変更がメモに影響しないテスト"""
+        engine = StructureRuleEngine()
+        structure = _structure()
+        engine.state(structure)["incomplete_modules"].clear()
+        assert len(engine.state(structure)["incomplete_modules"]) == 1
+
+        structure["modules"][1]["description"] = "入庫を登録する"
+        assert engine.state(structure)["incomplete_modules"] == []
+        assert engine.stats["misses"] == 2
+
+    def test_empty_structures(self):
+        """空の構成と、ルール対象外のキーだけを持つ構成を区別するテスト"""
+        assert analyze_structure_state({})["diagnostic_message"] == "構成が空です"
+        assert analyze_structure_state({"id": "x"})["diagnostic_message"] == "モジュールが定義されていません"
+
+    def test_classify_evaluation(self):
+        """評価文のキーワード・スコアによる判定テスト"""
+        engine = StructureRuleEngine()
+        assert engine.classify_evaluation("This looks incomplete")["reason"].endswith("（キーワード: incomplete）")
+        assert engine.classify_evaluation("構成は良好です")["status"] == "complete"
+        assert engine.classify_evaluation("スコア: 4")["status"] == "incomplete"
+        assert engine.classify_evaluation("7/10, 85%")["status"] == "complete"
+        assert engine.classify_evaluation("")["status"] == "unknown"
@@ -0,0 +1,86 @@
+"""
+構成の全文検索インデックスのテスト
+"""
+
+import json
+import os
+
+from src.structure.search_index import StructureSearchIndex, build_match_query, tokenize
+
+
+def _structure(title, description, provider=None, score=None, updated_at="2025-07-01T10:00:00", messages=()):
+    structure = {
+        "title": title,
+        "description": description,
+        "metadata": {"updated_at": updated_at},
+        "modules": [{"title": "在庫一覧", "description": "商品の在庫数を表示する"}],
+        "messages": [{"role": "user", "content": content} for content in messages],
+    }
+    if provider:
+        structure["evaluations"] = {provider: {"provider": provider, "status": "success", "score": score}}
+    return structure
+
+
+class TestTokenize:
+    """トークン分割のテストクラス"""
+
+    def test_bigrams_and_words(self):
+        """日本語はbigram、英数字は小文字の単語になるテスト"""
+        assert tokenize("在庫管理API") == ["在庫", "庫管", "管理", "api"]
+        assert tokenize("顧客 a") == ["顧客", "a"]
+        assert build_match_query('請求書 "x') == '"請求 求書" AND "x"'
+        assert build_match_query("体") == '"体"*'
+        assert build_match_query("  ") is None
+
+
+class TestStructureSearchIndex:
+    """検索インデックスのテストクラス"""
+
+    def test_search_ranking_and_filters(self):
+        """タイトル一致が上位になり、プロバイダー・スコア・日付で絞り込めるテスト"""
+        index = StructureSearchIndex(":memory:")
+        index.index_structure("s1", _structure("請求書アプリ", "請求書を発行する", "claude", 0.9))
+        index.index_structure("s2", _structure("勤怠アプリ", "打刻を記録する", "gemini", 0.4,
+                                               updated_at="2025-06-01T00:00:00", messages=["請求書も出したい"]))
+
+        result = index.search("請求書")
+        assert [r["structure_id"] for r in result["results"]] == ["s1", "s2"]
+        assert result["results"][1]["best_match"]["kind"] == "message"
+        assert result["results"][0]["providers"] == ["claude"]
+
+        assert [r["structure_id"] for r in index.search("在庫", provider="gemini")["results"]] == ["s2"]
+        assert index.search("在庫", min_score=0.5)["total_count"] == 1
+        assert index.search("在庫", since="2025-06-15")["results"][0]["structure_id"] == "s1"
+        assert index.search("在庫", until="2025-06-01")["results"][0]["structure_id"] == "s2"
+        assert index.search("在庫", kinds=["message"])["total_count"] == 0
+
+        page = index.search("アプリ", per_page=1, page=2)
+        assert page["total_count"] == 2 and page["pages"] == 2 and len(page["results"]) == 1
+
+    def test_incremental_update(self):
+        """変更された文書だけが更新され、削除された文書は検索されないテスト"""
+        index = StructureSearchIndex(":memory:")
+        structure = _structure("請求書アプリ", "請求書を発行する", messages=["最初の要望"])
+        assert index.index_structure("s1", structure)["added"] == 3
+
+        structure["messages"].append({"role": "user", "content": "入金消込も欲しい"})
+        counts = index.index_structure("s1", structure)
+        assert counts == {"added": 1, "updated": 0, "removed": 0, "unchanged": 3}
+        assert index.search("消込")["total_count"] == 1
+
+        structure["modules"] = []
+        assert index.index_structure("s1", structure)["removed"] == 1
+        assert index.search("在庫")["total_count"] == 0
+
+    def test_sync_directory(self, tmp_path):
+        """更新日時が変わったファイルだけを取り込み、消えたファイルを削除するテスト"""
+        path = tmp_path / "s1.json"
+        path.write_text(json.dumps(_structure("請求書アプリ", "発行"), ensure_ascii=False), encoding="utf-8")
+        (tmp_path / "s1_history.json").write_text("[]", encoding="utf-8")
+        index = StructureSearchIndex(str(tmp_path / "index.sqlite3"), data_dir=str(tmp_path))
+
+        assert index.sync_directory(force=True) == {"indexed": 1, "removed": 0, "skipped": 0}
+        assert index.sync_directory(force=True)["skipped"] == 1
+        os.remove(path)
+        assert index.sync_directory(force=True)["removed"] == 1
+        assert index.search("請求書")["total_count"] == 0
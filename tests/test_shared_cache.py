@@ -0,0 +1,175 @@
+"""
+プロセス間で共有するキャッシュ（shared_cache）のテスト
+"""
+
+import pytest
+
+from src.common import shared_cache
+from src.common.shared_cache import (
+    LocalCache,
+    RedisCacheBackend,
+    SQLiteCacheBackend,
+    TieredCache,
+    get_shared_backend,
+    structure_scope,
+)
+from src.structure.utils import save_structure
+
+
+class FakeClock:
+    """テスト用の時計"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeRedis:
+    """Redisクライアントの最小限の代用（get / set / delete / scan_iter / incr）"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, px=None):
+        self.data[key] = value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def scan_iter(self, match):
+        return [key for key in list(self.data) if key.startswith(match.rstrip("*"))]
+
+    def incr(self, key):
+        self.data[key] = int(self.data.get(key, 0)) + 1
+        return self.data[key]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """リビジョンの保持時間を時計で進められるようにする"""
+    clock = FakeClock()
+    monkeypatch.setattr(shared_cache, "_revisions", shared_cache._Revisions(interval=1.0, clock=clock))
+    return clock
+
+
+def _workers(tmp_path):
+    """同じSQLiteファイルを開いた2つのワーカープロセスの代わり"""
+    path = str(tmp_path / "cache.sqlite3")
+    return (TieredCache("test", shared=SQLiteCacheBackend(path)),
+            TieredCache("test", shared=SQLiteCacheBackend(path)))
+
+
+class TestSharedCache:
+    """共有キャッシュのテストクラス"""
+
+    def test_local_cache_lru_and_ttl(self):
+        """ローカル層が上限を超えると古いものから破棄し、期限切れを返さないテスト"""
+        clock = FakeClock()
+        cache = LocalCache(max_entries=2, clock=clock)
+        cache.set("a", 1)
+        cache.set("b", 2, ttl=5)
+        cache.get("a")
+        cache.set("c", 3)
+        assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+
+        cache.set("d", 4, ttl=5)
+        clock.now += 5
+        assert cache.get("d") is None
+
+    def test_value_shared_between_workers(self, tmp_path):
+        """一方のワーカーが保存した値を、もう一方が共有層から読めるテスト"""
+        first, second = _workers(tmp_path)
+        first.set("html", "<div>在庫</div>")
+
+        assert second.get("html") == "<div>在庫</div>"
+        assert second.get("html") == "<div>在庫</div>"
+        assert second.stats()["shared_hits"] == 1
+        assert second.stats()["local_hits"] == 1
+
+        second.clear()
+        assert first.shared.get("test:html") is None
+
+    def test_non_json_value_stays_local(self, tmp_path):
+        """JSONにできない値はローカル層だけに保存されるテスト"""
+        first, second = _workers(tmp_path)
+        value = {"error": ValueError("x")}
+        first.set("key", value)
+        assert first.get("key") is value
+        assert second.get("key") is None
+
+    def test_revision_bounds_stale_reads(self, tmp_path, clock):
+        """別のワーカーでリビジョンが進むと、保持時間の経過後に古い値が読まれなくなるテスト"""
+        first, second = _workers(tmp_path)
+        scope = "structure:s1"
+        second.set("summary", {"title": "旧"}, scope=scope)
+        assert second.get("summary", scope=scope) == {"title": "旧"}
+
+        shared_cache._revisions.bump(first.shared, scope)
+        # 保存したワーカーでは待たずに無効になる
+        assert first.get("summary", scope=scope) is None
+        # 他のワーカーでは保持時間のあいだだけ古い値が読まれる
+        assert second.get("summary", scope=scope) == {"title": "旧"}
+        clock.now += 1.0
+        assert second.get("summary", scope=scope) is None
+
+    def test_save_structure_invalidates_other_worker(self, tmp_path, clock, monkeypatch):
+        """一方のワーカーで構成を保存すると、もう一方のワーカーの構成のエントリが無効になるテスト"""
+        monkeypatch.setenv("AIDEX_DATA_DIR", str(tmp_path))
+        monkeypatch.setenv("AIDEX_CACHE_BACKEND", "sqlite")
+        monkeypatch.delenv("AIDEX_CACHE_PATH", raising=False)
+        saving = TieredCache("test", shared=get_shared_backend(str(tmp_path)))
+        other = TieredCache("test", shared=SQLiteCacheBackend(str(tmp_path / shared_cache.CACHE_FILENAME)))
+        scope = structure_scope("s1")
+        other.set("summary", {"title": "旧"}, scope=scope)
+        assert saving.get("summary", scope=scope) == {"title": "旧"}
+
+        assert save_structure("s1", {"id": "s1", "title": "新", "content": {}}) is True
+
+        assert saving.get("summary", scope=scope) is None
+        assert other.get("summary", scope=scope) == {"title": "旧"}
+        clock.now += 1.0
+        assert other.get("summary", scope=scope) is None
+
+    def test_delete_removes_both_layers(self, tmp_path):
+        """delete がローカル層と共有層の両方から値を削除するテスト"""
+        first, second = _workers(tmp_path)
+        first.set("key", {"status": 200})
+        assert second.get("key") == {"status": 200}
+        second.delete("key")
+        assert second.get("key") is None
+        assert first.shared.get("test:key") is None
+
+    def test_shared_failure_falls_back_to_local(self):
+        """共有層の読み書きに失敗してもローカル層で動作を続けるテスト"""
+        class BrokenBackend:
+            name = "broken"
+
+            def get(self, key):
+                raise OSError("disk I/O error")
+
+            def set(self, key, value, ttl=None):
+                raise OSError("disk I/O error")
+
+        cache = TieredCache("test", shared=BrokenBackend())
+        assert cache.get("key") is None
+        cache.set("key", "value")
+        assert cache.get("key") == "value"
+
+    def test_redis_adapter(self, clock):
+        """Redisの共有層で値とリビジョンを共有できるテスト"""
+        client = FakeRedis()
+        first = TieredCache("test", shared=RedisCacheBackend(client=client))
+        second = TieredCache("test", shared=RedisCacheBackend(client=client))
+        first.set("key", [1, "在庫"], ttl=60)
+        assert second.get("key") == [1, "在庫"]
+
+        assert first.shared.incr("structure:s1") == 1
+        assert second.shared.counter("structure:s1") == 1
+        first.clear()
+        assert second.shared.counter("structure:s1") == 1
+        assert client.get("aidex:cache:test:key") is None
@@ -0,0 +1,88 @@
+"""
+シングルフライトと冪等キーストアのテスト
+"""
+
+import threading
+import time
+
+import pytest
+
+from src.common.shared_cache import SQLiteCacheBackend, TieredCache
+from src.common.single_flight import IdempotencyStore, SingleFlight
+
+
+class TestSingleFlight:
+    """シングルフライトのテストクラス"""
+
+    def test_concurrent_calls_share_one_execution(self):
+        """実行中の同じキーの呼び出しが1回の実行結果を共有するテスト"""
+        flights = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        executions = []
+
+        def work():
+            executions.append(1)
+            started.set()
+            release.wait(5)
+            return {"result": len(executions)}
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flights.do("chat:s1", work)))
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=lambda: results.append(flights.do("chat:s1", work))) for _ in range(3)]
+        for thread in followers:
+            thread.start()
+        while flights.stats()["shared"] < 3:
+            time.sleep(0.001)
+        release.set()
+        for thread in [leader, *followers]:
+            thread.join(5)
+
+        assert len(executions) == 1
+        assert sorted(shared for _, shared in results) == [False, True, True, True]
+        assert all(result == {"result": 1} for result, _ in results)
+
+        # 完了後の呼び出しは新しく実行する
+        assert flights.do("chat:s1", work) == ({"result": 2}, False)
+        assert flights.stats() == {"executed": 2, "shared": 3, "in_flight": 0}
+
+    def test_error_is_shared_and_cleared(self):
+        """例外も共有され、実行中の記録は残らないテスト"""
+        flights = SingleFlight()
+        with pytest.raises(ValueError):
+            flights.do("k", lambda: (_ for _ in ()).throw(ValueError("失敗")))
+        assert flights.do("k", lambda: "ok") == ("ok", False)
+
+
+class TestIdempotencyStore:
+    """冪等キーストアのテストクラス"""
+
+    def test_ttl_and_capacity(self):
+        """保持期間を過ぎた応答と上限を超えた古い応答が破棄されるテスト"""
+        now = [1000.0]
+        store = IdempotencyStore(ttl=60, max_entries=2, clock=lambda: now[0])
+        store.put("a", "fp", 200, b"{}")
+        assert store.get("a").body == b"{}"
+
+        now[0] += 61
+        assert store.get("a") is None
+
+        for key in ("b", "c", "d"):
+            store.put(key, "fp", 200, key.encode())
+        assert store.get("b") is None
+        assert store.get("d").body == b"d"
+        assert store.stats()["entries"] == 2
+
+    def test_shared_between_workers(self, tmp_path):
+        """共有層を使うと、別のワーカーで保存した応答を再送に返せるテスト"""
+        path = str(tmp_path / "cache.sqlite3")
+        first = IdempotencyStore(ttl=60, cache=TieredCache("idempotency", shared=SQLiteCacheBackend(path)))
+        second = IdempotencyStore(ttl=60, cache=TieredCache("idempotency", shared=SQLiteCacheBackend(path)))
+        first.put("key", "fp", 201, b'{"title": "\xe5\x9c\xa8\xe5\xba\xab"}', {"Content-Type": "application/json"})
+
+        stored = second.get("key")
+        assert (stored.status, stored.body) == (201, b'{"title": "\xe5\x9c\xa8\xe5\xba\xab"}')
+        assert stored.headers == {"Content-Type": "application/json"}
+        assert second.stats()["replayed"] == 1
@@ -0,0 +1,115 @@
+"""
+構成・履歴ファイルの保存形式（コーデック）のテスト
+"""
+
+import json
+
+import pytest
+
+from src.common.storage_codec import (
+    append_jsonl,
+    detect_codec,
+    dumps,
+    file_codec,
+    get_write_codec,
+    loads,
+    read_json,
+    read_lines,
+    write_json,
+)
+
+
+class TestStorageCodec:
+    """保存形式の読み書きのテストクラス"""
+
+    def test_default_is_legacy_json(self, tmp_path, monkeypatch):
+        """既定では従来どおり整形済みの非圧縮JSONで保存されるテスト"""
+        monkeypatch.delenv("AIDEX_STORAGE_CODEC", raising=False)
+        path = tmp_path / "s.json"
+        write_json(str(path), {"title": "在庫"})
+        assert path.read_text(encoding="utf-8") == json.dumps({"title": "在庫"}, ensure_ascii=False, indent=2)
+
+    def test_gzip_round_trip(self, tmp_path, monkeypatch):
+        """gzipで保存したファイルが透過的に読めるテスト"""
+        monkeypatch.setenv("AIDEX_STORAGE_CODEC", "gzip")
+        value = {"title": "在庫", "messages": [{"role": "user", "content": "在庫を管理したい"}] * 50}
+        path = tmp_path / "s.json"
+        write_json(str(path), value)
+
+        assert file_codec(str(path)) == "gzip"
+        assert read_json(str(path)) == value
+        assert len(path.read_bytes()) < len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+
+    def test_reads_legacy_plain_json(self, tmp_path):
+        """従来の非圧縮ファイルもそのまま読めるテスト"""
+        path = tmp_path / "legacy.json"
+        path.write_text('{\n  "title": "旧形式"\n}', encoding="utf-8")
+        assert detect_codec(path.read_bytes()) == "json"
+        assert read_json(str(path)) == {"title": "旧形式"}
+
+    def test_invalid_data_raises_value_error(self):
+        """壊れたファイルは ValueError になるテスト"""
+        with pytest.raises(ValueError):
+            loads(b"\x1f\x8bbroken")
+        with pytest.raises(ValueError):
+            loads(b"{broken")
+
+    def test_unknown_codec_falls_back_to_json(self, monkeypatch):
+        """不明な形式の指定は json として扱うテスト"""
+        monkeypatch.setenv("AIDEX_STORAGE_CODEC", "lz4")
+        assert get_write_codec() == "json"
+
+    def test_zstd_round_trip(self):
+        """zstdで符号化した値が読めるテスト"""
+        pytest.importorskip("zstandard")
+        data = dumps({"title": "在庫"}, codec="zstd")
+        assert detect_codec(data) == "zstd"
+        assert loads(data) == {"title": "在庫"}
+
+
+class TestJsonLines:
+    """JSON Lines の追記と読み込みのテストクラス"""
+
+    def test_append_gzip_members(self, tmp_path):
+        """1件ごとのgzipメンバーを連結して追記・読み込みできるテスト"""
+        path = str(tmp_path / "h.jsonl")
+        for i in range(3):
+            append_jsonl(path, {"i": i}, codec="gzip")
+        assert file_codec(path) == "gzip"
+        assert [json.loads(line) for line in read_lines(path)] == [{"i": 0}, {"i": 1}, {"i": 2}]
+
+    def test_append_keeps_existing_format(self, tmp_path):
+        """既存ファイルの形式に合わせて追記されるテスト"""
+        path = tmp_path / "h.jsonl"
+        path.write_text('{"i": 0}\n', encoding="utf-8")
+        append_jsonl(str(path), {"i": 1}, codec="gzip")
+        assert path.read_text(encoding="utf-8") == '{"i": 0}\n{"i": 1}\n'
+
+
+class TestStructureStorage:
+    """構成・履歴の保存処理が保存形式に従うテストクラス"""
+
+    def test_save_and_load_structure(self, tmp_path, monkeypatch):
+        """gzipで保存した構成が load_structure_by_id / load_structures で読めるテスト"""
+        from src.structure.utils import load_structure_by_id, load_structures, save_structure
+
+        monkeypatch.setenv("AIDEX_DATA_DIR", str(tmp_path))
+        monkeypatch.setenv("AIDEX_STORAGE_CODEC", "gzip")
+        monkeypatch.setattr("src.structure.utils.index_saved_structure", lambda *args, **kwargs: None)
+        assert save_structure("gz1", {"id": "gz1", "title": "圧縮", "description": "", "content": {}})
+
+        assert file_codec(str(tmp_path / "gz1.json")) == "gzip"
+        assert load_structure_by_id("gz1")["title"] == "圧縮"
+        assert [s["id"] for s in load_structures()] == ["gz1"]
+
+    def test_structure_history_jsonl(self, tmp_path, monkeypatch):
+        """構造履歴（JSONL）を圧縮して追記しても読み込めるテスト"""
+        from src.structure.history import load_structure_history, save_structure_history
+
+        monkeypatch.setenv("AIDEX_DATA_DIR", str(tmp_path))
+        monkeypatch.setenv("AIDEX_STORAGE_CODEC", "gzip")
+        save_structure_history("h1", {"title": "A"}, provider="claude", timestamp="2026-01-01T00:00:00")
+        save_structure_history("h1", {"title": "B"}, provider="gemini", timestamp="2026-01-01T00:01:00")
+
+        assert file_codec(str(tmp_path / "structure_history" / "h1.jsonl")) == "gzip"
+        assert [entry["content"]["title"] for entry in load_structure_history("h1")] == ["B", "A"]
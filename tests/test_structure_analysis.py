@@ -3,9 +3,9 @@
 """
 
 import pytest
+from src.structure.rule_engine import generate_diagnostic_message
 from src.structure.structure_analysis import (
     analyze_structure_state,
-    generate_diagnostic_message,
     get_structure_completion_rate,
     get_structure_quality_score
 )
@@ -0,0 +1,103 @@
+"""
+構成出力の共通スキーマと構造化出力設定のテスト
+"""
+
+import json
+
+import pytest
+
+from src.common.structured_output import (
+    STRUCTURE_SCHEMA,
+    parse_structured_content,
+    synthesize_from_schema,
+    to_claude_tool,
+    to_claude_tool_choice,
+    to_gemini_response_schema,
+    to_openai_response_format,
+    validate_against_schema,
+)
+from src.exceptions import StructuredOutputError
+
+
+VALID_STRUCTURE = {
+    "title": "勤怠管理アプリ",
+    "description": "出退勤を記録する",
+    "modules": [
+        {
+            "id": "attendance_form",
+            "type": "form",
+            "title": "出退勤入力",
+            "description": "出勤・退勤時刻を入力する",
+            "fields": [{"label": "日付", "name": "date", "type": "date", "required": True}],
+            "columns": [],
+        }
+    ],
+}
+
+
+class TestProviderSchemas:
+    """プロバイダー別の構造化出力設定のテストクラス"""
+
+    def test_openai_response_format(self):
+        """OpenAIのresponse_formatがstrictなjson_schemaになるテスト"""
+        response_format = to_openai_response_format()
+        assert response_format["type"] == "json_schema"
+        assert response_format["json_schema"]["strict"] is True
+        assert response_format["json_schema"]["schema"] == STRUCTURE_SCHEMA
+        assert response_format["json_schema"]["schema"] is not STRUCTURE_SCHEMA
+
+    def test_gemini_response_schema_drops_unsupported_keys(self):
+        """Geminiのresponse_schemaから未対応のキーが除かれ、型名が大文字になるテスト"""
+        schema = to_gemini_response_schema()
+        assert "additionalProperties" not in json.dumps(schema)
+        assert schema["type"] == "OBJECT"
+        module = schema["properties"]["modules"]["items"]
+        assert module["properties"]["type"]["enum"][0] == "form"
+        assert module["properties"]["fields"]["items"]["properties"]["required"]["type"] == "BOOLEAN"
+
+    def test_claude_tool(self):
+        """Claudeのツール定義とtool_choiceが同じ名前を使うテスト"""
+        tool = to_claude_tool()
+        assert tool["input_schema"] == STRUCTURE_SCHEMA
+        assert to_claude_tool_choice(tool["name"]) == {"type": "tool", "name": tool["name"]}
+
+
+class TestValidation:
+    """スキーマ検証のテストクラス"""
+
+    def test_valid_structure(self):
+        """妥当な構成はエラーなしで読み込めるテスト"""
+        assert validate_against_schema(VALID_STRUCTURE) == []
+        text = "```json\n" + json.dumps(VALID_STRUCTURE, ensure_ascii=False) + "\n```"
+        assert parse_structured_content(text) == VALID_STRUCTURE
+
+    def test_schema_errors(self):
+        """型・enum・必須項目・未定義の項目の違反を検出するテスト"""
+        invalid = json.loads(json.dumps(VALID_STRUCTURE))
+        module = invalid["modules"][0]
+        module["type"] = "wizard"
+        module["fields"][0]["required"] = "yes"
+        del module["columns"]
+        invalid["extra"] = 1
+
+        errors = validate_against_schema(invalid)
+        assert any("$.modules[0].type" in error for error in errors)
+        assert any("$.modules[0].fields[0].required" in error for error in errors)
+        assert any("$.modules[0].columns" in error for error in errors)
+        assert any("$.extra" in error for error in errors)
+
+        with pytest.raises(StructuredOutputError) as exc_info:
+            parse_structured_content(invalid, provider="gemini")
+        assert exc_info.value.errors == errors
+
+    def test_invalid_json(self):
+        """JSONとして読めない応答はStructuredOutputErrorになるテスト"""
+        with pytest.raises(StructuredOutputError):
+            parse_structured_content('{"title": "途中で')
+
+    def test_synthesized_data_conforms(self):
+        """合成したデータがスキーマに合い、決定的であるテスト"""
+        data = synthesize_from_schema(STRUCTURE_SCHEMA, "勤怠管理")
+        assert validate_against_schema(data) == []
+        assert data == synthesize_from_schema(STRUCTURE_SCHEMA, "勤怠管理")
+        assert data["modules"][0]["id"] == "modules_0_id"
@@ -0,0 +1,123 @@
+"""
+リクエストトレースのテスト
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.common.tracing import (
+    TraceContextFilter,
+    TraceStore,
+    build_waterfall,
+    current_trace_id,
+    propagate,
+    span,
+    start_thread_in_context,
+    start_trace,
+    submit_in_context,
+    traced,
+)
+
+
+@traced("json.extract")
+def _extract(value):
+    return value * 2
+
+
+class TestTracing:
+    """トレースとスパンのテストクラス"""
+
+    def test_nested_spans(self):
+        """スパンの親子関係と所要時間が記録されるテスト"""
+        with start_trace("POST /chat") as trace:
+            with span("llm.call", provider="gemini"):
+                assert _extract(2) == 4
+            with pytest.raises(ValueError):
+                with span("storage.save_structure"):
+                    raise ValueError("書き込み失敗")
+
+        llm, extract, save = trace.spans
+        assert llm.attributes == {"provider": "gemini"}
+        assert extract.name == "json.extract" and extract.parent_id == llm.span_id
+        assert save.status == "error" and "書き込み失敗" in save.error
+        assert all(s.duration_ms is not None for s in trace.spans)
+        assert trace.duration_ms >= llm.duration_ms
+
+    def test_noop_outside_trace(self):
+        """トレース外ではスパンを記録せずそのまま実行されるテスト"""
+        assert current_trace_id() is None
+        with span("llm.call") as current:
+            assert current is None
+        assert _extract(3) == 6
+
+    def test_propagates_to_threads_and_executors(self):
+        """スレッドとエグゼキューターにトレースIDとスパンが引き継がれるテスト"""
+        seen = []
+
+        def work(label):
+            seen.append((label, current_trace_id()))
+            with span(f"worker.{label}"):
+                pass
+
+        with start_trace("POST /evaluate", trace_id="req-00000001") as trace:
+            with span("fan_out"):
+                start_thread_in_context(work, "thread").join()
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    for future in [submit_in_context(executor, work, f"pool{i}") for i in range(2)]:
+                        future.result()
+                wrapped = propagate(work)
+            ThreadPoolExecutor(max_workers=1).submit(wrapped, "propagated").result()
+
+        assert sorted(seen) == [("pool0", "req-00000001"), ("pool1", "req-00000001"),
+                                ("propagated", "req-00000001"), ("thread", "req-00000001")]
+        parents = {s.name: s.parent_id for s in trace.spans}
+        fan_out_id = next(s.span_id for s in trace.spans if s.name == "fan_out")
+        assert parents["worker.thread"] == fan_out_id
+        assert parents["worker.pool0"] == fan_out_id
+        assert parents["worker.propagated"] == fan_out_id
+
+    def test_log_filter(self):
+        """ログレコードにリクエストIDが付与されるテスト"""
+        record = logging.LogRecord("t", logging.INFO, __file__, 1, "msg", None, None)
+        TraceContextFilter().filter(record)
+        assert record.trace_tag == ""
+        with start_trace("GET /", trace_id="req-00000002"):
+            TraceContextFilter().filter(record)
+        assert record.request_id == "req-00000002"
+        assert record.trace_tag == " [request_id=req-00000002]"
+
+
+class TestTraceStore:
+    """トレースストアとウォーターフォールのテストクラス"""
+
+    def test_save_get_list_and_prune(self, tmp_path):
+        """保存・読み込み・一覧・上限超過分の削除のテスト"""
+        store = TraceStore(str(tmp_path), max_traces=3)
+        for i in range(5):
+            with start_trace("GET /data", trace_id=f"trace-{i:04d}") as trace:
+                with span("storage.load"):
+                    pass
+            assert store.save(trace)
+        store.prune()
+
+        listed = store.list()
+        assert len(listed) == 3
+        assert listed[0]["span_count"] == 1
+        assert store.get("trace-0004")["spans"][0]["name"] == "storage.load"
+        assert store.get("../etc/passwd") is None
+
+    def test_build_waterfall(self):
+        """深さ優先の並びと位置・幅の百分率のテスト"""
+        trace = {
+            "duration_ms": 100.0,
+            "spans": [
+                {"span_id": "0002", "parent_id": "0001", "name": "json.extract", "start_ms": 60.0, "duration_ms": 10.0},
+                {"span_id": "0001", "parent_id": None, "name": "llm.call", "start_ms": 10.0, "duration_ms": 50.0},
+                {"span_id": "0003", "parent_id": None, "name": "storage.save_structure", "start_ms": 80.0, "duration_ms": 20.0},
+            ],
+        }
+        rows = build_waterfall(trace)
+        assert [(r["name"], r["depth"]) for r in rows] == [("llm.call", 0), ("json.extract", 1), ("storage.save_structure", 0)]
+        assert rows[0]["offset_pct"] == 10.0 and rows[0]["width_pct"] == 50.0
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+静的アセットのビルドスクリプト
+
+使用方法:
+    python tools/build_assets.py [--no-compress] [--no-clean]
+
+機能:
+    - static/ 以下の .js / .css をコンテンツハッシュ付きのファイル名で static/dist/ に出力
+    - gzip（brotliがインストールされていれば brotli も）の事前圧縮版を作成
+    - ページ単位のバンドル（ASSET_BUNDLES）を作成
+    - static/dist/manifest.json にマニフェストを書き出し
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.common.assets import DIST_DIR, MANIFEST_NAME, build_assets
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="静的アセットをハッシュ付きでビルドします")
+    parser.add_argument("--static-dir", default=str(project_root / "static"), help="staticディレクトリ")
+    parser.add_argument("--no-compress", action="store_true", help="gzip/brotliの事前圧縮版を作成しない")
+    parser.add_argument("--no-clean", action="store_true", help="古いビルド出力を削除しない")
+    args = parser.parse_args()
+
+    manifest = build_assets(args.static_dir, compress=not args.no_compress, clean=not args.no_clean)
+
+    original = sum(entry["size"] for entry in manifest["files"].values())
+    print(f"📦 ファイル: {len(manifest['files'])} 件（合計 {original:,} bytes）")
+    for name, entry in manifest["bundles"].items():
+        encodings = ", ".join(entry["encodings"]) or "なし"
+        print(f"   - {name} -> {entry['path']} ({entry['size']:,} bytes, 圧縮版: {encodings})")
+    print(f"✅ マニフェストを書き出しました: {Path(args.static_dir) / DIST_DIR / MANIFEST_NAME}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())